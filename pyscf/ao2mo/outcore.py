@@ -19,6 +19,8 @@ import h5py
 from pyscf import gto
 from pyscf import lib
 from pyscf.lib import logger
+from pyscf.lib import profiler
+from pyscf.lib import memplan
 from pyscf.ao2mo import _ao2mo
 from pyscf.ao2mo import incore
 from pyscf import __config__
@@ -266,12 +268,15 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo',
 
 # transform e1
     fswap = lib.H5TmpFile()
-    half_e1(mol, mo_coeffs, fswap, intor, aosym, comp, max_memory, ioblk_size,
-            log, compact)
+    with profiler.region(mol, 'ao2mo 1 pass'):
+        half_e1(mol, mo_coeffs, fswap, intor, aosym, comp, max_memory,
+                ioblk_size, log, compact)
 
     time_1pass = log.timer('AO->MO transformation for %s 1 pass'%intor,
                            *time_0pass)
 
+    rstat = _IOStats()
+    wstat = _IOStats()
     def load(icomp, row0, row1, buf):
         if icomp+1 < comp:
             icomp += 1
@@ -279,13 +284,17 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo',
             row0, row1 = row1, min(nij_pair, row1+iobuflen)
             icomp = 0
         if row0 < row1:
+            t0 = time.time()
             _load_from_h5g(fswap['%d'%icomp], row0, row1, buf)
+            rstat.record((row1-row0)*nao_pair*8, t0)
 
     def save(icomp, row0, row1, buf):
+        t0 = time.time()
         if comp == 1:
             h5d_eri[row0:row1] = buf[:row1-row0]
         else:
             h5d_eri[icomp,row0:row1] = buf[:row1-row0]
+        wstat.record((row1-row0)*nkl_pair*8, t0)
 
     ioblk_size = max(max_memory*.1, ioblk_size)
     iobuflen = guess_e2bufsize(ioblk_size, nij_pair, max(nao_pair,nkl_pair))[0]
@@ -303,9 +312,14 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo',
     ao_loc = mol.ao_loc_nr('_cart' in intor)
     ti0 = time_1pass
     istep = 0
-    with lib.call_in_background(load) as prefetch:
+    with profiler.region(mol, 'ao2mo 2 pass'), \
+            lib.call_in_background(load) as prefetch:
         with lib.call_in_background(save) as async_write:
-            _load_from_h5g(fswap['0'], 0, min(nij_pair, iobuflen), buf_prefetch)
+            t0 = time.time()
+            row1 = min(nij_pair, iobuflen)
+            _load_from_h5g(fswap['0'], 0, row1, buf_prefetch)
+            rstat.record(row1*nao_pair*8, t0)
+            rstat.waited(t0)
 
             for row0, row1 in prange(0, nij_pair, iobuflen):
                 nrow = row1 - row0
@@ -316,16 +330,25 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo',
                                istep, ijmoblks, icomp, row0, row1, nrow)
 
                     buf, buf_prefetch = buf_prefetch, buf
+                    t0 = time.time()
                     prefetch(icomp, row0, row1, buf_prefetch)
+                    rstat.waited(t0)
                     _ao2mo.nr_e2(buf[:nrow], mokl, klshape, aosym, klmosym,
                                  ao_loc=ao_loc, out=outbuf)
+                    t0 = time.time()
                     async_write(icomp, row0, row1, outbuf)
+                    wstat.waited(t0)
                     outbuf, buf_write = buf_write, outbuf  # avoid flushing writing buffer
 
                     ti1 = (time.clock(), time.time())
                     log.debug1('step 2 [%d/%d] CPU time: %9.2f, Wall time: %9.2f',
                                istep, ijmoblks, ti1[0]-ti0[0], ti1[1]-ti0[1])
                     ti0 = ti1
+            t0 = time.time()
+    # The remaining writing is flushed when exiting call_in_background
+    wstat.waited(t0)
+    rstat.report(log, 'step 2 read')
+    wstat.report(log, 'step 2 write')
     fswap = None
     if isinstance(erifile, str):
         feri.close()
@@ -436,17 +459,20 @@ def half_e1(mol, mo_coeffs, swapfile,
     e1buflen = max([x[2] for x in shranges])
 
     e2buflen, chunks = guess_e2bufsize(ioblk_size, nij_pair, e1buflen)
+    wstat = _IOStats()
     def save(istep, iobuf):
+        t0 = time.time()
         for icomp in range(comp):
             _transpose_to_h5g(fswap, '%d/%d'%(icomp,istep), iobuf[icomp],
                               e2buflen, None)
+        wstat.record(iobuf.nbytes, t0)
 
     # transform e1
     ti0 = log.timer('Initializing ao2mo.outcore.half_e1', *time0)
     with lib.call_in_background(save) as async_write:
-        buf1 = numpy.empty((comp*e1buflen,nao_pair))
-        buf2 = numpy.empty((comp*e1buflen,nij_pair))
-        buf_write = numpy.empty_like(buf2)
+        buf1 = memplan.empty((comp*e1buflen,nao_pair), label='eri_ao')
+        buf2 = memplan.empty((comp*e1buflen,nij_pair), label='iobuf')
+        buf_write = memplan.empty((comp*e1buflen,nij_pair), label='iobuf')
         fill = _ao2mo.nr_e1fill
         f_e1 = _ao2mo.nr_e1
         for istep,sh_range in enumerate(shranges):
@@ -466,12 +492,41 @@ def half_e1(mol, mo_coeffs, swapfile,
                 iobuf[:,p0:p1] = buf.reshape(comp,aoshs[2],nij_pair)
             ti0 = log.timer_debug1('gen AO/transform MO [%d/%d]'%(istep+1,nstep), *ti0)
 
+            t0 = time.time()
             async_write(istep, iobuf)
+            wstat.waited(t0)
             buf2, buf_write = buf_write, buf2
+        t0 = time.time()
+    wstat.waited(t0)
+    wstat.report(log, 'step 1 write')
 
     fswap = None
     return swapfile
 
+class _IOStats(object):
+    '''Statistics of the I/O carried out in a background thread'''
+    def __init__(self):
+        self.nbytes = 0
+        self.io_time = 0
+        self.wait_time = 0
+
+    def record(self, nbytes, t0):
+        '''Add an I/O operation started at wall time t0'''
+        self.nbytes += nbytes
+        self.io_time += time.time() - t0
+
+    def waited(self, t0):
+        '''Add the time the main thread was blocked by the I/O thread'''
+        self.wait_time += time.time() - t0
+
+    def report(self, log, title):
+        '''Throughput and the fraction of I/O time hidden behind computation'''
+        if log.verbose >= logger.DEBUG and self.io_time > 0:
+            overlap = max(0, 1 - self.wait_time / self.io_time)
+            log.debug('%s %.8g MB in %.2f s, %.8g MB/s, overlap efficiency %.1f%%',
+                      title, self.nbytes/1e6, self.io_time,
+                      self.nbytes/1e6/self.io_time, overlap*100)
+
 def _load_from_h5g(h5group, row0, row1, out):
     nrow = row1 - row0
     col0 = 0
@@ -678,7 +733,11 @@ def guess_e1bufsize(max_memory, ioblk_size, nij_pair, nao_pair, comp):
     ioblk_words = int(min(ioblk_size*1e6/8, iobuf_words))
 
     e1buflen = int(mem_words*.66/(comp*(nij_pair*2+nao_pair)))
-    e1buflen = max(e1buflen, IOBUF_ROW_MIN)
+    if e1buflen < IOBUF_ROW_MIN:
+        mem_min = IOBUF_ROW_MIN*comp*(nij_pair*2+nao_pair)/.66 * 8/1e6
+        memplan.over_budget('ao2mo.outcore requires %.1f MB memory, '
+                            'max_memory %d MB' % (mem_min, max_memory))
+        e1buflen = IOBUF_ROW_MIN
     return e1buflen, mem_words, iobuf_words, ioblk_words
 
 def guess_e2bufsize(ioblk_size, nrows, ncols):
@@ -68,6 +68,17 @@ class KnownValues(unittest.TestCase):
         feri.close()
         self.assertTrue(numpy.allclose(eri1, eriref))
 
+    def test_io_stats(self):
+        with tempfile.TemporaryFile('w+') as f:
+            log = lib.logger.Logger(f, lib.logger.DEBUG)
+            ao2mo.outcore.general(mol, (mo,)*4, lib.H5TmpFile(),
+                                  max_memory=1, ioblk_size=.1, verbose=log)
+            f.seek(0)
+            out = f.read()
+        self.assertTrue('step 1 write' in out)
+        self.assertTrue('step 2 read %.8g MB' % (nao**2*(nao+1)**2/4*8e-6) in out)
+        self.assertTrue('overlap efficiency' in out)
+
     def test_nroutcore_eri(self):
         ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
         erifile = ftmp.name
@@ -29,6 +29,9 @@ import numpy
 from pyscf import gto
 from pyscf import lib
 from pyscf.lib import logger
+from pyscf.lib import profiler
+from pyscf.lib import memplan
+from pyscf.lib import checkpoint
 from pyscf import ao2mo
 from pyscf.ao2mo import _ao2mo
 from pyscf.cc import _ccsd
@@ -64,8 +67,29 @@ def kernel(mycc, eris=None, t1=None, t2=None, max_cycle=50, tol=1e-8,
     else:
         adiis = None
 
+    ckpt = checkpoint.new(mycc, 'ccsd', tag=lib.finger(numpy.hstack(eris.mo_energy)))
+    istep0 = 0
+    normt = 0
+    if ckpt is not None:
+        state = ckpt.load()
+        if state is not None:
+            istep0 = int(state['istep']) + 1
+            log.note('Restart CCSD from checkpoint %s after cycle %d',
+                     ckpt.filename, istep0)
+            t1, t2 = mycc.vector_to_amplitudes(state['vec'])
+            eold = state['eold']
+            eccsd = state['eccsd']
+            normt = state['normt']
+            if adiis is not None and 'diis' in state:
+                adiis.load_state(state['diis'])
+        state = None
+
     conv = False
-    for istep in range(max_cycle):
+    if istep0 > 0 and abs(eccsd-eold) < tol and normt < tolnormt:
+        conv = True
+        istep0 = max_cycle
+    for istep in range(istep0, max_cycle):
+        region = profiler.region(mycc, 'CCSD iter').enter()
         t1new, t2new = mycc.update_amps(t1, t2, eris)
         normt = numpy.linalg.norm(mycc.amplitudes_to_vector(t1new, t2new) -
                                   mycc.amplitudes_to_vector(t1, t2))
@@ -80,10 +104,21 @@ def kernel(mycc, eris=None, t1=None, t2=None, max_cycle=50, tol=1e-8,
         eold, eccsd = eccsd, mycc.energy(t1, t2, eris)
         log.info('cycle = %d  E(CCSD) = %.15g  dE = %.9g  norm(t1,t2) = %.6g',
                  istep+1, eccsd, eccsd - eold, normt)
+        if ckpt is not None:
+            state = {'istep': istep, 'eold': eold, 'eccsd': eccsd,
+                     'normt': normt,
+                     'vec': mycc.amplitudes_to_vector(t1, t2)}
+            if adiis is not None:
+                state['diis'] = adiis.dump_state()
+            ckpt.save(state, istep)
+            state = None
         cput1 = log.timer('CCSD iter', *cput1)
+        region.exit()
         if abs(eccsd-eold) < tol and normt < tolnormt:
             conv = True
             break
+    if ckpt is not None:
+        ckpt.clear()
     log.timer('CCSD', *cput0)
     return conv, eccsd, t1, t2
 
@@ -120,12 +155,13 @@ def update_amps(mycc, t1, t2, eris):
         fswap = None
     else:
         fswap = lib.H5TmpFile()
-    fwVOov, fwVooV = _add_ovvv_(mycc, t1, t2, eris, fvv, t1new, t2new, fswap)
+    fwVOov, fwVooV = mycc._add_ovvv_(t1, t2, eris, fvv, t1new, t2new, fswap)
     time1 = log.timer_debug1('ovvv', *time1)
 
     unit = nocc**2*nvir*7 + nocc**3 + nocc*nvir**2
-    max_memory = max(0, mycc.max_memory - lib.current_memory()[0])
-    blksize = min(nvir, max(BLKMIN, int((max_memory*.9e6/8-nocc**4)/unit)))
+    max_memory = memplan.available(mycc.max_memory)
+    blksize = memplan.block_size(mycc.max_memory, unit, nocc**4, BLKMIN, nvir,
+                                 .9, 'CCSD update_amps', log)
     log.debug1('max_memory %d MB,  nocc,nvir = %d,%d  blksize = %d',
                max_memory, nocc, nvir, blksize)
 
@@ -272,7 +308,17 @@ def update_amps(mycc, t1, t2, eris):
     return t1new, t2new
 
 
-def _add_ovvv_(mycc, t1, t2, eris, fvv, t1new, t2new, fswap):
+def _add_ovvv_(mycc, t1, t2, eris, fvv, t1new, t2new, fswap, partition=None):
+    '''Add the ovvv contributions to fvv, t1new and t2new.
+
+    Kwargs:
+        partition : function
+            partition(tasks, costs) returns the blocks of virtual orbitals
+            to be handled by the current process.  Only the contributions
+            of these blocks are computed.  See :mod:`cc.mpiccsd`.  If
+            partition has the method bcast, the block size is taken from the
+            master process (see :func:`_bcast_blksize`).
+    '''
     time1 = time.clock(), time.time()
     log = logger.Logger(mycc.stdout, mycc.verbose)
     nocc, nvir = t1.shape
@@ -284,21 +330,37 @@ def _add_ovvv_(mycc, t1, t2, eris, fvv, t1new, t2new, fswap):
         wVOov = fswap.create_dataset('wVOov', (nvir,nocc,nocc,nvir), 'f8')
     wooVV = numpy.zeros((nocc,nocc*nvir_pair))
 
-    max_memory = mycc.max_memory - lib.current_memory()[0]
+    max_memory = memplan.available(mycc.max_memory)
     unit = nocc*nvir**2*2.5 + nocc**2*nvir + 2
-    blksize = min(nvir, max(BLKMIN, int((max_memory*.95e6/8-wooVV.size)/unit)))
+    blksize = memplan.block_size(mycc.max_memory, unit, wooVV.size, BLKMIN,
+                                 nvir, .95, 'CCSD ovvv', log)
+    blksize = _bcast_blksize(partition, blksize)
     log.debug1('max_memory %d MB,  nocc,nvir = %d,%d  blksize = %d',
                max_memory, nocc, nvir, blksize)
-    def load_ovvv(p0, p1):
+    def load_ovvv(p0, p1, buf):
         if p0 < p1:
             buf[:p1-p0] = eris.ovvv[:,p0:p1].transpose(1,0,2)
 
-    buf = numpy.empty((blksize,nocc,nvir_pair))
+    vir_blocks = lib.prange(0, nvir, blksize)
+    if partition is not None:
+        vir_blocks = list(vir_blocks)
+        # partition may return a generator which assigns the tasks on demand
+        vir_blocks = partition(vir_blocks, [p1-p0 for p0, p1 in vir_blocks])
+    vir_blocks = iter(vir_blocks)
+    def next_block():
+        # (nvir, nvir) marks the end of the tasks for the prefetch
+        return next(vir_blocks, (nvir, nvir))
+
+    buf = memplan.empty((blksize,nocc,nvir_pair), label='ovvv')
+    buf_prefetch = memplan.empty((blksize,nocc,nvir_pair), label='ovvv')
     with lib.call_in_background(load_ovvv, sync=not mycc.async_io) as prefetch:
-        load_ovvv(0, blksize)
-        for p0, p1 in lib.prange(0, nvir, blksize):
-            eris_vovv, buf = buf[:p1-p0], numpy.empty_like(buf)
-            prefetch(p1, min(nvir, p1+blksize))
+        p0, p1 = next_block()
+        load_ovvv(p0, p1, buf)
+        while p0 < p1:
+            q0, q1 = next_block()
+            # prefetch waits for the previous load (into buf) to finish
+            prefetch(q0, q1, buf_prefetch)
+            eris_vovv = buf[:p1-p0]
 
             #:wooVV -= numpy.einsum('jc,ciba->jiba', t1[:,p0:p1], eris_vovv)
             lib.ddot(numpy.asarray(t1[:,p0:p1], order='C'),
@@ -324,8 +386,10 @@ def _add_ovvv_(mycc, t1, t2, eris, fvv, t1new, t2new, fswap):
             theta = t2[:,:,p0:p1].transpose(1,2,0,3) * 2
             theta -= t2[:,:,p0:p1].transpose(0,2,1,3)
             t1new += lib.einsum('icjb,cjba->ia', theta, eris_vovv)
-            theta = None
+            theta = eris_vovv = None
             time1 = log.timer_debug1('vovv [%d:%d]'%(p0, p1), *time1)
+            buf, buf_prefetch = buf_prefetch, buf
+            p0, p1 = q0, q1
 
     if fswap is None:
         wooVV = lib.unpack_tril(wooVV.reshape(nocc**2,nvir_pair))
@@ -449,21 +513,30 @@ def _add_vvvv_full(mycc, t1, t2, eris, out=None, with_ovvv=False):
     return Ht2.reshape(t2.shape)
 
 
-def _contract_vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
+def _contract_vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None,
+                      partition=None):
     '''Ht2 = numpy.einsum('ijcd,acbd->ijab', t2, vvvv)
 
     Args:
         vvvv : None or integral object
             if vvvv is None, contract t2 to AO-integrals using AO-direct algorithm
+
+    Kwargs:
+        partition : function
+            partition(tasks, costs) returns the integral blocks to be handled
+            by the current process.  Ht2 holds the contributions of these
+            blocks only.  If partition has the method bcast, the block size
+            is taken from the master process (see :func:`_bcast_blksize`).
     '''
     if vvvv is None or len(vvvv.shape) == 2:
         # AO-direct or vvvv in 4-fold symmetry
-        return _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out, verbose)
+        return _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out, verbose, partition)
     else:
-        return _contract_s1vvvv_t2(mycc, mol, vvvv, t2, out, verbose)
+        return _contract_s1vvvv_t2(mycc, mol, vvvv, t2, out, verbose, partition)
 
 
-def _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
+def _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None,
+                        partition=None):
     '''Ht2 = numpy.einsum('ijcd,acbd->ijab', t2, vvvv)
     where vvvv has to be real and has the 4-fold permutation symmetry
 
@@ -510,13 +583,21 @@ def _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
                                  'CVHFsetnr_direct_scf')
         blksize = max(BLKMIN, numpy.sqrt(max_memory*.9e6/8/nvirb**2/2.5))
         blksize = int(min((nvira+3)/4, blksize))
+        blksize = _bcast_blksize(partition, blksize)
         sh_ranges = ao2mo.outcore.balance_partition(ao_loc, blksize)
         blksize = max(x[2] for x in sh_ranges)
         eribuf = numpy.empty((blksize,blksize,nvirb,nvirb))
         loadbuf = numpy.empty((blksize,blksize,nvirb,nvirb))
         fint = gto.moleintor.getints4c
 
-        for ip, (ish0, ish1, ni) in enumerate(sh_ranges):
+        ish_blocks = list(range(len(sh_ranges)))
+        if partition is not None:
+            costs = [ao_loc[sh_ranges[ip][1]] * (ao_loc[sh_ranges[ip][1]] -
+                                                 ao_loc[sh_ranges[ip][0]])
+                     for ip in ish_blocks]
+            ish_blocks = partition(ish_blocks, costs)
+        for ip in ish_blocks:
+            ish0, ish1, ni = sh_ranges[ip]
             for jsh0, jsh1, nj in sh_ranges[:ip]:
                 eri = fint(intor, mol._atm, mol._bas, mol._env,
                            shls_slice=(ish0,ish1,jsh0,jsh1), aosym='s2kl',
@@ -552,6 +633,7 @@ def _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
         unit = nvira*nvir_pair*2 + nvirb**2*nvira/4 + 1
         blksize = numpy.sqrt(max(BLKMIN**2, max_memory*.95e6/8/unit))
         blksize = int(min((nvira+3)/4, blksize))
+        blksize = _bcast_blksize(partition, blksize)
 
         tril2sq = lib.square_mat_in_trilu_indices(nvira)
         loadbuf = numpy.empty((blksize,blksize,nvirb,nvirb))
@@ -568,15 +650,19 @@ def _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
                                        ctypes.c_int(nvirb))
                 contract_blk_(tmp, i0, i1, j0, j1)
 
+        vir_blocks = list(lib.prange(0, nvira, blksize))
+        if partition is not None:
+            vir_blocks = partition(vir_blocks, [(p1-p0)*p1 for p0, p1 in vir_blocks])
         with lib.call_in_background(block_contract, sync=not mycc.async_io) as bcontract:
             readbuf = numpy.empty((blksize,nvira,nvir_pair))
             readbuf1 = numpy.empty_like(readbuf)
-            for p0, p1 in lib.prange(0, nvira, blksize):
+            for p0, p1 in vir_blocks:
                 bcontract(p0, p1)
                 time0 = log.timer_debug1('vvvv [%d:%d]'%(p0,p1), *time0)
     return Ht2.reshape(t2.shape)
 
-def _contract_s1vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
+def _contract_s1vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None,
+                        partition=None):
     '''Ht2 = numpy.einsum('ijcd,acdb->ijab', t2, vvvv)
     where vvvv can be real or complex and no permutation symmetry is available in vvvv.
 
@@ -600,12 +686,29 @@ def _contract_s1vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
     max_memory = mycc.max_memory - lib.current_memory()[0]
     unit = nvirb**2*nvira*2 + nocc2*nvirb + 1
     blksize = min(nvira, max(BLKMIN, int(max_memory*1e6/8/unit)))
-
-    for p0,p1 in lib.prange(0, nvira, blksize):
+    blksize = _bcast_blksize(partition, blksize)
+
+    vir_blocks = lib.prange(0, nvira, blksize)
+    if partition is not None:
+        vir_blocks = list(vir_blocks)
+        vir_blocks = partition(vir_blocks, [p1-p0 for p0, p1 in vir_blocks])
+        Ht2[:] = 0
+    for p0,p1 in vir_blocks:
         Ht2[:,p0:p1] = lib.einsum('xcd,acbd->xab', x2, vvvv[p0:p1])
         time0 = log.timer_debug1('vvvv [%d:%d]' % (p0,p1), *time0)
     return Ht2.reshape(t2.shape)
 
+def _bcast_blksize(partition, blksize):
+    '''The block size of the master process if the tasks are distributed by
+    partition.  The block size derived from the free memory can be different
+    on each process.  All processes have to generate the same list of tasks
+    for the partition.'''
+    bcast = getattr(partition, 'bcast', None)
+    if bcast is None:
+        return blksize
+    else:
+        return bcast(blksize)
+
 def _unpack_t2_tril(t2tril, nocc, nvir, out=None, t2sym='jiba'):
     t2 = numpy.ndarray((nocc,nocc,nvir,nvir), dtype=t2tril.dtype, buffer=out)
     idx,idy = numpy.tril_indices(nocc)
@@ -788,6 +891,11 @@ class CCSD(lib.StreamObject):
             Avoid all I/O (also for DIIS). Default is False.
         level_shift : float
             A shift on virtual orbital energies to stablize the CCSD iteration
+        checkpoint : str
+            File to save the amplitudes and the DIIS subspace of each
+            iteration, and the energies of the finished task blocks of the
+            (T) correction.  An interrupted calculation restarts from the
+            last saved iteration or task.  See :mod:`lib.checkpoint`.
         frozen : int or list
             If integer is given, the inner-most orbitals are frozen from CC
             amplitudes.  Given the orbital indices (0-based) in a list, both
@@ -875,6 +983,7 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
         self._nocc = None
         self._nmo = None
         self.chkfile = mf.chkfile
+        self.checkpoint = None
 
         keys = set(('max_cycle', 'conv_tol', 'iterative_damping',
                     'conv_tol_normt', 'diis', 'diis_space', 'diis_file',
@@ -964,6 +1073,7 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
 
     energy = energy
     _add_vvvv = _add_vvvv
+    _add_ovvv_ = _add_ovvv_
     update_amps = update_amps
 
     def kernel(self, t1=None, t2=None, eris=None):
@@ -975,10 +1085,11 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
             self.check_sanity()
         self.dump_flags()
 
-        self.converged, self.e_corr, self.t1, self.t2 = \
-                kernel(self, eris, t1, t2, max_cycle=self.max_cycle,
-                       tol=self.conv_tol, tolnormt=self.conv_tol_normt,
-                       verbose=self.verbose)
+        with profiler.region(self, 'CCSD'):
+            self.converged, self.e_corr, self.t1, self.t2 = \
+                    kernel(self, eris, t1, t2, max_cycle=self.max_cycle,
+                           tol=self.conv_tol, tolnormt=self.conv_tol_normt,
+                           verbose=self.verbose)
         self._finalize()
         return self.e_corr, self.t1, self.t2
 
@@ -1099,14 +1210,12 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
         # eris.fock = numpy.diag(self._scf.mo_energy)
         # return eris
 
-        nmo = self.nmo
+        nocc = self.nocc
+        nvir = self.nmo - nocc
         nao = self.mo_coeff.shape[0]
-        nmo_pair = nmo * (nmo+1) // 2
-        nao_pair = nao * (nao+1) // 2
-        mem_incore = (max(nao_pair**2, nmo**4) + nmo_pair**2) * 8/1e6
-        mem_now = lib.current_memory()[0]
+        mem_incore = _mem_usage(nocc, nvir, nao)[0]
         if (self._scf._eri is not None and
-            (mem_incore+mem_now < self.max_memory or self.incore_complete)):
+            (memplan.fits(mem_incore, self.max_memory) or self.incore_complete)):
             return _make_eris_incore(self, mo_coeff)
 
         elif getattr(self._scf, 'with_df', None):
@@ -1348,20 +1457,24 @@ def _make_eris_outcore(mycc, mo_coeff=None):
 
     ao_loc = mol.ao_loc_nr()
     nao_pair = nao * (nao+1) // 2
-    blksize = int(min(8e9,max_memory*.5e6)/8/(nao_pair+nmo**2)/nocc)
-    blksize = min(nmo, max(BLKMIN, blksize))
+    # Three buffers (buf, buf_prefetch, outbuf) of blksize*nocc rows.  The
+    # buffers are limited to 8 GB in total.
+    unit = (nao_pair*2+nmo**2)*nocc
+    blkmax = min(nmo, max(BLKMIN, int(8e9/8/unit)))
+    blksize = memplan.block_size(mycc.max_memory, unit, 0, BLKMIN, blkmax,
+                                 .9, 'CCSD _make_eris_outcore', log)
     log.debug1('blksize %d', blksize)
     cput2 = cput1
 
     fload = ao2mo.outcore._load_from_h5g
-    buf = numpy.empty((blksize*nocc,nao_pair))
-    buf_prefetch = numpy.empty_like(buf)
+    buf = memplan.empty((blksize*nocc,nao_pair), label='eri_ao')
+    buf_prefetch = memplan.empty((blksize*nocc,nao_pair), label='eri_ao')
     def prefetch(p0, p1, rowmax):
         p0, p1 = p1, min(rowmax, p1+blksize)
         if p0 < p1:
             fload(fswap['0'], p0*nocc, p1*nocc, buf_prefetch)
 
-    outbuf = numpy.empty((blksize*nocc,nmo**2))
+    outbuf = memplan.empty((blksize*nocc,nmo**2), label='eri_mo')
     with lib.call_in_background(prefetch, sync=not mycc.async_io) as bprefetch:
         fload(fswap['0'], 0, min(nocc,blksize)*nocc, buf_prefetch)
         for p0, p1 in lib.prange(0, nocc, blksize):
@@ -1439,6 +1552,20 @@ def _make_df_eris_outcore(mycc, mo_coeff=None):
     log.timer('CCSD integral transformation', *cput0)
     return eris
 
+def _mem_usage(nocc, nvir, nao=None):
+    '''Memory (in MB) required by CCSD with incore and outcore integrals'''
+    nmo = nocc + nvir
+    if nao is None:
+        nao = nmo
+    nmo_pair = nmo * (nmo+1) // 2
+    nao_pair = nao * (nao+1) // 2
+    # t2, t2new and the DIIS error vector
+    basic = (nocc*nvir)**2*3 * 8/1e6
+    incore = (max(nao_pair**2, nmo**4) + nmo_pair**2) * 8/1e6 + basic
+    # wVOov and wVooV intermediates
+    outcore = (nocc*nvir)**2*2 * 8/1e6 + basic
+    return incore, outcore, basic
+
 def _fp(nocc, nvir):
     '''Total float points'''
     return (nocc**3*nvir**2*2 + nocc**2*nvir**3*2 +     # Ftilde
@@ -27,7 +27,13 @@ import numpy
 from pyscf import lib
 from pyscf import symm
 from pyscf.lib import logger
+from pyscf.lib import checkpoint
 from pyscf.cc import _ccsd
+from pyscf import __config__
+
+# With mycc.checkpoint, the ledger of the finished tasks is saved every
+# CHECKPOINT_INTERVAL tasks.  Every save rewrites the checkpoint file.
+CHECKPOINT_INTERVAL = getattr(__config__, 'cc_ccsd_t_checkpoint_interval', 10)
 
 # t3 as ijkabc
 
@@ -72,10 +78,14 @@ def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE):
         drv = _ccsd.libcc.CCsd_t_zcontract
     else:
         drv = _ccsd.libcc.CCsd_t_contract
-    et_sum = numpy.zeros(1, dtype=dtype)
-    def contract(a0, a1, b0, b1, cache):
+    # The energy of each task is accumulated separately and recorded in the
+    # ledger, so that finished tasks can be skipped when restarting.
+    def contract(itask, cache):
+        a0, a1, b0, b1 = tasks[itask]
         cache_row_a, cache_col_a, cache_row_b, cache_col_b = cache
-        drv(et_sum.ctypes.data_as(ctypes.c_void_p),
+        t0 = time.time()
+        et = numpy.zeros(1, dtype=dtype)
+        drv(et.ctypes.data_as(ctypes.c_void_p),
             mo_energy.ctypes.data_as(ctypes.c_void_p),
             t1T.ctypes.data_as(ctypes.c_void_p),
             t2T.ctypes.data_as(ctypes.c_void_p),
@@ -93,6 +103,12 @@ def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE):
             cache_col_a.ctypes.data_as(ctypes.c_void_p),
             cache_row_b.ctypes.data_as(ctypes.c_void_p),
             cache_col_b.ctypes.data_as(ctypes.c_void_p))
+        et_tasks[itask] = et[0]
+        wall_tasks[itask] = time.time() - t0
+        done[itask] = True
+        if ckpt is not None:
+            ckpt.save({'tasks': tasks, 'et': et_tasks, 'wall': wall_tasks,
+                       'done': done}, numpy.count_nonzero(done)-1)
         cpu2[:] = log.timer_debug1('contract %d:%d,%d:%d'%(a0,a1,b0,b1), *cpu2)
 
     # The rest 20% memory for cache b
@@ -103,35 +119,84 @@ def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE):
     bufsize *= .8  #*.8 for [a0:a1]/[b0:b1] partition
     bufsize = max(8, bufsize)
     log.debug('max_memory %d MB (%d MB in use)', max_memory, mem_now)
-    with lib.call_in_background(contract, sync=not mycc.async_io) as async_contract:
-        for a0, a1 in reversed(list(lib.prange_tril(0, nvir, bufsize))):
-            cache_row_a = numpy.asarray(eris_vvop[a0:a1,:a1], order='C')
-            if a0 == 0:
-                cache_col_a = cache_row_a
-            else:
-                cache_col_a = numpy.asarray(eris_vvop[:a0,a0:a1], order='C')
-            async_contract(a0, a1, a0, a1, (cache_row_a,cache_col_a,
-                                            cache_row_a,cache_col_a))
-
-            for b0, b1 in lib.prange_tril(0, a0, bufsize/8):
-                cache_row_b = numpy.asarray(eris_vvop[b0:b1,:b1], order='C')
-                if b0 == 0:
-                    cache_col_b = cache_row_b
+
+    tasks = _gen_tasks(nvir, bufsize)
+    ckpt = checkpoint.new(mycc, 'ccsd_t', tag=lib.finger(t1))
+    state = None
+    if ckpt is not None:
+        ckpt.interval = max(ckpt.interval, CHECKPOINT_INTERVAL)
+        state = ckpt.load()
+    if state is None:
+        et_tasks = numpy.zeros(len(tasks), dtype=dtype)
+        wall_tasks = numpy.zeros(len(tasks))
+        done = numpy.zeros(len(tasks), dtype=bool)
+    else:
+        # Keep the task partition of the interrupted run
+        tasks = numpy.asarray(state['tasks'])
+        et_tasks = numpy.asarray(state['et'], dtype=dtype)
+        wall_tasks = numpy.asarray(state['wall'])
+        done = numpy.asarray(state['done'], dtype=bool)
+        log.info('Restart CCSD(T) from checkpoint %s, %d of %d tasks done',
+                 ckpt.filename, numpy.count_nonzero(done), len(tasks))
+    state = None
+    tasks = [tuple(int(x) for x in task) for task in tasks]
+
+    try:
+        with lib.call_in_background(contract, sync=not mycc.async_io) as async_contract:
+            a_loaded = None
+            for itask, (a0, a1, b0, b1) in enumerate(tasks):
+                if done[itask]:
+                    continue
+                if a_loaded != (a0, a1):
+                    cache_row_a = numpy.asarray(eris_vvop[a0:a1,:a1], order='C')
+                    if a0 == 0:
+                        cache_col_a = cache_row_a
+                    else:
+                        cache_col_a = numpy.asarray(eris_vvop[:a0,a0:a1], order='C')
+                    a_loaded = (a0, a1)
+                if b0 == a0:
+                    cache_row_b, cache_col_b = cache_row_a, cache_col_a
                 else:
-                    cache_col_b = numpy.asarray(eris_vvop[:b0,b0:b1], order='C')
-                async_contract(a0, a1, b0, b1, (cache_row_a,cache_col_a,
-                                                cache_row_b,cache_col_b))
+                    cache_row_b = numpy.asarray(eris_vvop[b0:b1,:b1], order='C')
+                    if b0 == 0:
+                        cache_col_b = cache_row_b
+                    else:
+                        cache_col_b = numpy.asarray(eris_vvop[:b0,b0:b1], order='C')
+                async_contract(itask, (cache_row_a,cache_col_a,
+                                       cache_row_b,cache_col_b))
+    finally:
+        # t2 is transposed in place. Restore it even if the loop is
+        # interrupted so that the calculation can be restarted
+        t2 = restore_t2_inplace(t2T)
+    cache_row_a = cache_col_a = cache_row_b = cache_col_b = None
+
+    if log.verbose >= logger.DEBUG and len(tasks) > 0:
+        log.debug('CCSD(T) %d tasks, wall time per task min %.3g max %.3g '
+                  'mean %.3g', len(tasks), wall_tasks.min(), wall_tasks.max(),
+                  wall_tasks.mean())
 
-    t2 = restore_t2_inplace(t2T)
-    et_sum *= 2
-    if abs(et_sum[0].imag) > 1e-4:
+    et_sum = et_tasks.sum() * 2
+    if abs(et_sum.imag) > 1e-4:
         logger.warn(mycc, 'Non-zero imaginary part of CCSD(T) energy was found %s',
-                    et_sum[0])
-    et = et_sum[0].real
+                    et_sum)
+    et = et_sum.real
+    if ckpt is not None:
+        ckpt.clear()
     log.timer('CCSD(T)', *cpu0)
     log.note('CCSD(T) correction = %.15g', et)
     return et
 
+def _gen_tasks(nvir, bufsize):
+    '''Split the (a,b,c) virtual triples into tasks (a0,a1,b0,b1).  Task
+    (a0,a1,b0,b1) handles a in [a0:a1], b in [b0:b1], c <= b.  The tasks of
+    the same [a0:a1] block are consecutive to share the cache of [a0:a1].'''
+    tasks = []
+    for a0, a1 in reversed(list(lib.prange_tril(0, nvir, bufsize))):
+        tasks.append((a0, a1, a0, a1))
+        for b0, b1 in lib.prange_tril(0, a0, bufsize/8):
+            tasks.append((a0, a1, b0, b1))
+    return tasks
+
 def _sort_eri(mycc, eris, nocc, nvir, vvop, log):
     cpu1 = (time.clock(), time.time())
     mol = mycc.mol
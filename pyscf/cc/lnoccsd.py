@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Local natural orbital (LNO) based local correlation
+
+The occupied orbitals are localized.  For each localized occupied orbital
+(LMO) i, a fragment is constructed with
+
+    * the LMOs j of which the semi-canonical MP2 pair energy e_ij is larger
+      than thresh_pair (pair screening and the occupied domain of i)
+    * the natural orbitals of the virtual MP2 density of LMO i with
+      occupation numbers larger than thresh_vir (NO truncation)
+
+Distant pairs are prescreened by a dipole estimate of e_ij in O(N^2) time.
+The semi-canonical pair energies are only computed for the pairs which
+survive the prescreening.
+
+The fragment is solved with DF-CCSD (or MP2).  The correlation energy of
+LMO i is extracted by projecting the first occupied index of the amplitudes
+onto LMO i.  Optionally (mp2_correction), the truncation error is corrected
+by the difference between the canonical DF-MP2 energy and the sum of the
+fragment MP2 energies.
+
+Ref:
+    Rolik, Kallay, J. Chem. Phys. 135, 104111 (2011)
+    Nagy, Kallay, J. Chem. Phys. 146, 214106 (2017)
+'''
+
+import time
+from functools import reduce
+import numpy
+import scipy.linalg
+from pyscf import lib
+from pyscf.lib import logger
+from pyscf.lib import memplan
+from pyscf.ao2mo import _ao2mo
+from pyscf import df
+from pyscf import lo
+from pyscf.cc import dfccsd
+from pyscf.mp import dfmp2
+from pyscf import __config__
+
+LO_TYPE = getattr(__config__, 'cc_lnoccsd_lo_type', 'boys')
+THRESH_PAIR = getattr(__config__, 'cc_lnoccsd_thresh_pair', 1e-6)
+THRESH_VIR = getattr(__config__, 'cc_lnoccsd_thresh_vir', 1e-5)
+# Pairs of which the dipole estimate is smaller than
+# thresh_pair * PRESCREEN_RATIO are dropped without computing the
+# semi-canonical pair energies
+PRESCREEN_RATIO = getattr(__config__, 'cc_lnoccsd_prescreen_ratio', .1)
+# The dipole estimate is not used for the pairs of which the distance between
+# the centroids is smaller than CLOSE_PAIR_SPREAD * (spread_i + spread_j)
+CLOSE_PAIR_SPREAD = getattr(__config__, 'cc_lnoccsd_close_pair_spread', 3.)
+
+
+def localize_occ(mol, orbocc, lo_type=LO_TYPE, verbose=None):
+    '''Localized occupied orbitals
+
+    Args:
+        lo_type : str
+            'boys', 'pipek' or 'ibo'
+    '''
+    if lo_type.lower() in ('boys', 'fb'):
+        loc = lo.Boys(mol, orbocc)
+    elif lo_type.lower() in ('pipek', 'pm'):
+        loc = lo.PM(mol, orbocc)
+    elif lo_type.lower() == 'ibo':
+        iboc = lo.ibo.ibo(mol, orbocc, verbose=verbose)
+        # IBOs may slightly deviate from the occupied space.  Take the
+        # closest unitary rotation of orbocc.
+        u = reduce(numpy.dot, (orbocc.conj().T, mol.intor_symmetric('int1e_ovlp'), iboc))
+        u, w, vh = scipy.linalg.svd(u)
+        return numpy.dot(orbocc, numpy.dot(u, vh))
+    else:
+        raise KeyError('Unknown localization method %s' % lo_type)
+    if verbose is not None:
+        loc.verbose = verbose
+    return loc.kernel()
+
+
+def kernel(mlno, lo_coeff=None, verbose=None):
+    '''LNO correlation energy
+
+    Returns:
+        e_corr, e_frag.  e_frag is the correlation energy of each LMO.
+    '''
+    cput0 = (time.clock(), time.time())
+    log = logger.new_logger(mlno, verbose)
+    mf = mlno._scf
+    mol = mf.mol
+    mo_coeff = mf.mo_coeff
+    mo_energy = mf.mo_energy
+    nocc = numpy.count_nonzero(mf.mo_occ > 0)
+    nfrz = mlno.frozen
+    orbcore = mo_coeff[:,:nfrz]
+    orbvir = mo_coeff[:,nocc:]
+    ev = mo_energy[nocc:]
+    nvir = orbvir.shape[1]
+
+    if lo_coeff is None:
+        lo_coeff = localize_occ(mol, mo_coeff[:,nfrz:nocc], mlno.lo_type,
+                                mlno.verbose)
+    nlo = lo_coeff.shape[1]
+    fock = mf.get_fock()
+    foo = lib.einsum('pi,pq,qj->ij', lo_coeff, fock, lo_coeff)
+    fii = foo.diagonal()
+    Lov = _make_lov(mlno, lo_coeff, orbvir).reshape(-1,nlo,nvir)
+    cput1 = log.timer('LNO DF integrals', *cput0)
+
+    e_est, dist, spread = _dipole_pair_estimate(mol, lo_coeff, orbvir, fii, ev)
+    prescreened = ((dist >= CLOSE_PAIR_SPREAD * (spread[:,None] + spread)) &
+                   (e_est < mlno.thresh_pair * PRESCREEN_RATIO))
+    log.debug('%d of %d LMO pairs are prescreened by the dipole estimate',
+              numpy.count_nonzero(prescreened), nlo**2)
+
+    e_frag = numpy.zeros(nlo)
+    e_frag_mp2 = numpy.zeros(nlo)
+    frag_sizes = []
+    for i in range(nlo):
+        # Semi-canonical MP2 amplitudes of the pairs (i,j) which survive the
+        # prescreening
+        cand = ~prescreened[i]
+        cand[i] = True
+        kij = lib.einsum('pa,pjb->jab', Lov[:,i], Lov[:,cand])
+        tij = kij / (fii[i] + fii[cand,None,None] - ev[:,None] - ev)
+        e_pair = (numpy.einsum('jab,jab->j', tij, kij) * 2 -
+                  numpy.einsum('jab,jba->j', tij, kij))
+        kept_pair = abs(e_pair) > mlno.thresh_pair
+        kept_pair[numpy.count_nonzero(cand[:i])] = True
+        domain = numpy.zeros(nlo, dtype=bool)
+        domain[numpy.where(cand)[0][kept_pair]] = True
+        tij = tij[kept_pair]
+        kij = None
+
+        # Natural orbitals of the virtual density of LMO i
+        theta = tij * 2 - tij.transpose(0,2,1)
+        dvir = lib.einsum('jac,jbc->ab', tij, theta)
+        dvir += lib.einsum('jca,jcb->ab', tij, theta)
+        dvir = (dvir + dvir.T) * .5
+        theta = tij = None
+        occ_no, u = scipy.linalg.eigh(dvir)
+        kept = abs(occ_no) > mlno.thresh_vir
+        uvir = _semi_canonicalize(u[:,kept], numpy.diag(ev))[1]
+        evir = lib.einsum('ax,a,ay->xy', uvir, ev, uvir).diagonal()
+
+        eocc, uocc = scipy.linalg.eigh(foo[domain][:,domain])
+        # Coefficients of LMO i in the semi-canonical active occupied orbitals
+        ci = uocc[numpy.count_nonzero(domain[:i])]
+        nocc_a = eocc.size
+        nvir_a = evir.size
+        frag_sizes.append((nocc_a, nvir_a))
+        log.debug('LMO %d  pairs %d (%d evaluated)  active orbitals (%d occ, %d vir)',
+                  i, numpy.count_nonzero(abs(e_pair) > mlno.thresh_pair),
+                  e_pair.size, nocc_a, nvir_a)
+
+        # Fragment MP2
+        lov = lib.einsum('pjb,jJ,bB->pJB', Lov[:,domain], uocc, uvir)
+        ovov = lib.dot(lov.reshape(-1,nocc_a*nvir_a).T,
+                       lov.reshape(-1,nocc_a*nvir_a))
+        ovov = ovov.reshape(nocc_a,nvir_a,nocc_a,nvir_a)
+        lov = None
+        eia = eocc[:,None] - evir
+        t2 = ovov.transpose(0,2,1,3) / lib.direct_sum('ia+jb->ijab', eia, eia)
+        e_frag_mp2[i] = _projected_energy(ci, t2, ovov)
+
+        if mlno.solver.upper() == 'MP2':
+            e_frag[i] = e_frag_mp2[i]
+        else:
+            orbfrz_occ = numpy.hstack((orbcore, lo_coeff[:,~domain]))
+            mo = numpy.hstack((orbfrz_occ,
+                               lib.dot(lo_coeff[:,domain], uocc),
+                               lib.dot(orbvir, uvir),
+                               lib.dot(orbvir, u[:,~kept])))
+            nfrz_occ = orbfrz_occ.shape[1]
+            frozen = (list(range(nfrz_occ)) +
+                      list(range(nfrz_occ+nocc_a+nvir_a, mo.shape[1])))
+            e_frag[i] = _solve_ccsd(mlno, mo, frozen, ci, t2)
+        log.debug('LMO %d  E_frag = %.15g  E_frag(MP2) = %.15g',
+                  i, e_frag[i], e_frag_mp2[i])
+        cput1 = log.timer_debug1('LMO %d' % i, *cput1)
+
+    mlno.e_frag = e_frag
+    mlno.e_frag_mp2 = e_frag_mp2
+    mlno.frag_sizes = frag_sizes
+    e_corr = e_frag.sum()
+    if mlno.mp2_correction:
+        if mlno.e_corr_mp2 is None:
+            mp = dfmp2.DFMP2(mf, frozen=nfrz)
+            mp.with_df = mlno.with_df
+            mp.verbose = 0
+            mlno.e_corr_mp2 = mp.kernel(with_t2=False)[0]
+        de = mlno.e_corr_mp2 - e_frag_mp2.sum()
+        log.info('MP2 correction of the truncated fragments = %.15g', de)
+        e_corr += de
+    log.timer('LNO-%s' % mlno.solver, *cput0)
+    return e_corr, e_frag
+
+def _make_lov(mlno, lo_coeff, orbvir):
+    '''DF integrals (L|ia) of the LMOs and the canonical virtual orbitals'''
+    nlo = lo_coeff.shape[1]
+    nvir = orbvir.shape[1]
+    naux = mlno.with_df.get_naoaux()
+    mo = numpy.asarray(numpy.hstack((lo_coeff, orbvir)), order='F')
+    ijslice = (0, nlo, nlo, nlo+nvir)
+    memplan.check(naux*nlo*nvir*8e-6, mlno.max_memory, 'LNO Lov', mlno)
+    Lov = numpy.empty((naux,nlo*nvir))
+    p1 = 0
+    for eri1 in mlno.with_df.loop():
+        p0, p1 = p1, p1 + eri1.shape[0]
+        Lov[p0:p1] = _ao2mo.nr_e2(eri1, mo, ijslice, aosym='s2')
+    return Lov
+
+def _dipole_pair_estimate(mol, lo_coeff, orbvir, fii, ev):
+    '''Estimate of the pair energies |e_ij| in the dipole approximation, and
+    the distances between the centroids and the spreads of the LMOs.
+
+    In the dipole approximation (ia|jb) = mu_ia T_ij mu_jb with
+    T_ij = (1 - 3 n n^T) / R_ij^3, and the Coulomb part of the pair energy is
+    2 \sum_ab (ia|jb)^2 / (e_a+e_b-f_ii-f_jj).  With
+    1/(x+y) <= 1/(2 sqrt(xy)), it is bounded by
+    \sum_{xyzw} T_xy T_zw M_i^{xz} M_j^{yw}, where
+    M_i = \sum_a mu_ia mu_ia^T / sqrt(e_a-f_ii).  The cost is O(N^2) for all
+    pairs.
+    '''
+    nlo = lo_coeff.shape[1]
+    r = mol.intor_symmetric('int1e_r', comp=3)
+    r2 = mol.intor_symmetric('int1e_r2')
+    centroids = lib.einsum('xpq,pi,qi->ix', r, lo_coeff, lo_coeff)
+    spread = lib.einsum('pq,pi,qi->i', r2, lo_coeff, lo_coeff)
+    spread = numpy.sqrt(abs(spread - numpy.einsum('ix,ix->i', centroids, centroids)))
+
+    mu = lib.einsum('xpq,pi,qa->iax', r, lo_coeff, orbvir)
+    mu *= (abs(ev - fii[:,None]) + 1e-12)[:,:,None] ** -.25
+    m = lib.einsum('iax,iay->ixy', mu, mu)
+    mu = None
+
+    rij = centroids[:,None] - centroids
+    dist = numpy.sqrt(numpy.einsum('ijx,ijx->ij', rij, rij))
+    diag = numpy.eye(nlo, dtype=bool)
+    dist[diag] = 1
+    n = rij / dist[:,:,None]
+    t = numpy.eye(3) - 3 * numpy.einsum('ijx,ijy->ijxy', n, n)
+    t /= dist[:,:,None,None]**3
+    dist[diag] = 0
+    tm = numpy.einsum('ijxy,jyw->ijxw', t, m)
+    tmt = numpy.einsum('ijxw,ijzw->ijxz', tm, t)
+    e_est = numpy.einsum('ijxz,ixz->ij', tmt, m)
+    e_est[diag] = numpy.inf
+    return e_est, dist, spread
+
+def _semi_canonicalize(u, fock):
+    '''Rotate the orbitals u to diagonalize fock in the space of u'''
+    e, v = scipy.linalg.eigh(lib.einsum('px,pq,qy->xy', u, fock, u))
+    return e, lib.dot(u, v)
+
+def _projected_energy(ci, tau, ovov):
+    '''Correlation energy of the occupied orbital ci (in the basis of the
+    active occupied orbitals)'''
+    taui = numpy.einsum('i,ijab->jab', ci, tau)
+    ovovi = numpy.einsum('i,iajb->ajb', ci, ovov)
+    e = numpy.einsum('jab,ajb', taui, ovovi) * 2
+    e -= numpy.einsum('jab,bja', taui, ovovi)
+    return e
+
+def _solve_ccsd(mlno, mo_coeff, frozen, ci, t2_guess):
+    mf = mlno._scf
+    mo_occ = numpy.zeros(mo_coeff.shape[1])
+    mo_occ[:numpy.count_nonzero(mf.mo_occ > 0)] = 2
+    mycc = dfccsd.RCCSD(mf, frozen, mo_coeff, mo_occ)
+    mycc.with_df = mlno.with_df
+    mycc.verbose = mlno.verbose - 1
+    mycc.max_memory = mlno.max_memory
+    mycc.conv_tol = mlno.conv_tol
+    eris = mycc.ao2mo()
+    t1 = numpy.zeros((t2_guess.shape[0],t2_guess.shape[2]))
+    mycc.kernel(t1, t2_guess, eris)
+    if not mycc.converged:
+        logger.warn(mlno, 'Fragment CCSD not converged')
+    tau = mycc.t2 + numpy.einsum('ia,jb->ijab', mycc.t1, mycc.t1)
+    return _projected_energy(ci, tau, numpy.asarray(eris.ovov))
+
+
+class LNOCCSD(lib.StreamObject):
+    '''Local natural orbital CCSD
+
+    Attributes:
+        frozen : int
+            Number of frozen core orbitals.  Default is 0.
+        lo_type : str
+            Localization method of the occupied orbitals: 'boys', 'pipek'
+            or 'ibo'.  Default is 'boys'.
+        thresh_pair : float
+            LMO j is included in the domain of LMO i if the estimated pair
+            energy |e_ij| is larger than thresh_pair.  Default is 1e-6.
+        thresh_vir : float
+            Virtual natural orbitals with occupation numbers smaller than
+            thresh_vir are discarded.  Default is 1e-5.
+        solver : str
+            'CCSD' or 'MP2'.  Default is 'CCSD'.
+        mp2_correction : bool
+            Whether to correct the truncation error with canonical DF-MP2.
+            The canonical DF-MP2 is O(N^5).  Default is False.
+
+    Saved results:
+        e_corr : float
+            LNO correlation energy
+        e_frag : ndarray
+            The correlation energy of each LMO
+        e_frag_mp2 : ndarray
+            The fragment MP2 energy of each LMO
+        e_corr_mp2 : float
+            Canonical DF-MP2 correlation energy (if mp2_correction is set)
+        frag_sizes : list
+            The number of active occupied and virtual orbitals of each
+            fragment
+    '''
+
+    conv_tol = getattr(__config__, 'cc_lnoccsd_LNOCCSD_conv_tol', 1e-7)
+    mp2_correction = getattr(__config__, 'cc_lnoccsd_LNOCCSD_mp2_correction', False)
+
+    def __init__(self, mf, frozen=0):
+        self.mol = mf.mol
+        self._scf = mf
+        self.verbose = self.mol.verbose
+        self.stdout = self.mol.stdout
+        self.max_memory = mf.max_memory
+
+        self.frozen = frozen
+        self.lo_type = LO_TYPE
+        self.thresh_pair = THRESH_PAIR
+        self.thresh_vir = THRESH_VIR
+        self.solver = 'CCSD'
+        if getattr(mf, 'with_df', None):
+            self.with_df = mf.with_df
+        else:
+            self.with_df = df.DF(mf.mol)
+            self.with_df.auxbasis = df.make_auxbasis(mf.mol, mp2fit=True)
+
+##################################################
+# don't modify the following attributes, they are not input options
+        self.e_corr = None
+        self.e_frag = None
+        self.e_frag_mp2 = None
+        self.e_corr_mp2 = None
+        self.frag_sizes = None
+        self._keys = set(self.__dict__.keys())
+
+    @property
+    def e_tot(self):
+        return self.e_corr + self._scf.e_tot
+
+    def dump_flags(self):
+        log = logger.Logger(self.stdout, self.verbose)
+        log.info('')
+        log.info('******** %s ********', self.__class__)
+        log.info('frozen = %s', self.frozen)
+        log.info('lo_type = %s', self.lo_type)
+        log.info('thresh_pair = %g', self.thresh_pair)
+        log.info('thresh_vir = %g', self.thresh_vir)
+        log.info('solver = %s', self.solver)
+        log.info('mp2_correction = %s', self.mp2_correction)
+        log.info('max_memory %d MB (current use %d MB)',
+                 self.max_memory, lib.current_memory()[0])
+        return self
+
+    def kernel(self, lo_coeff=None):
+        '''
+        Args:
+            lo_coeff : 2D array
+                Localized occupied orbitals (excluding the frozen core).  If
+                not given, they are generated by the method lo_type.
+        '''
+        self.dump_flags()
+        self.e_corr, self.e_frag = kernel(self, lo_coeff, self.verbose)
+        logger.note(self, 'E(%s) = %.15g  E_corr = %.15g',
+                    self.__class__.__name__, self.e_tot, self.e_corr)
+        return self.e_corr
+
+LNO = LNOCCSD
+
+
+if __name__ == '__main__':
+    from pyscf import gto, scf
+    mol = gto.Mole()
+    mol.atom = '''
+    C  0.000  0.000  0.000
+    C  1.330  0.000  0.000
+    H -0.570  0.940  0.000
+    H -0.570 -0.940  0.000
+    H  1.900  0.940  0.000
+    H  1.900 -0.940  0.000'''
+    mol.basis = 'cc-pvdz'
+    mol.verbose = 4
+    mol.build()
+    mf = scf.RHF(mol).density_fit().run()
+    e_ref = dfccsd.RCCSD(mf, frozen=2).run().e_corr
+
+    mlno = LNOCCSD(mf, frozen=2).run()
+    print(mlno.e_corr - e_ref)
+
+    mlno.mp2_correction = True
+    print(mlno.kernel() - e_ref)
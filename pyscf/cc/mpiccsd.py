@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+MPI-parallel RCCSD for molecules
+
+The integral blocks of the vvvv and ovvv contractions are distributed over
+the MPI processes using the partition helpers of :mod:`pbc.mpitools`.  Each
+process contracts its blocks and the partial results are summed with
+allreduce.  The amplitudes and the other (cheaper) terms are replicated on
+every process.  Without mpi4py, the calculation runs in one process.
+
+The program should be launched by mpirun on all processes, e.g.
+
+    mpirun -np 4 python ccsd_script.py
+
+Examples::
+
+    >>> from pyscf import gto, scf
+    >>> from pyscf.cc import mpiccsd
+    >>> mol = gto.M(atom='H 0 0 0; F 0 0 1.1', basis='ccpvdz')
+    >>> mf = scf.RHF(mol).run()
+    >>> mycc = mpiccsd.CCSD(mf).run()
+'''
+
+import numpy
+from pyscf import lib
+from pyscf.lib import logger
+from pyscf.cc import ccsd
+from pyscf import __config__
+
+try:
+    from mpi4py import MPI
+    from pyscf.pbc.mpitools import mpi
+    comm = mpi.comm
+    rank = mpi.rank
+    size = comm.Get_size()
+except (ImportError, OSError):
+    MPI = mpi = comm = None
+    rank = 0
+    size = 1
+
+# 'balanced' for static partition based on the estimated costs, 'stealing'
+# for dynamic load balancing
+PARTITION = getattr(__config__, 'cc_mpiccsd_partition', 'balanced')
+# Max number of elements in each Allreduce call
+ALLREDUCE_BLKSIZE = getattr(__config__, 'cc_mpiccsd_allreduce_blksize', 1<<26)
+
+
+class _Partition(object):
+    '''Distribute the tasks over the processes.  The tasks are the blocks of
+    the integrals.  Their sizes depend on the free memory of the process.
+    bcast is used to take the block size of the master process so that all
+    processes split the tasks in the same way.'''
+    def __call__(self, tasks, costs):
+        '''The tasks to be executed on the current process'''
+        if size == 1:
+            return tasks
+        elif PARTITION == 'stealing':
+            # A generator. Tasks are fetched from other processes on demand
+            return mpi.work_stealing_partition(tasks)
+        else:
+            return mpi.work_balanced_partition(tasks, costs)
+
+    def bcast(self, obj):
+        if size > 1:
+            obj = comm.bcast(obj)
+        return obj
+_partition = _Partition()
+
+def _allreduce_(buf):
+    '''Sum buf over all processes inplace'''
+    if size > 1:
+        assert(buf.flags.c_contiguous)
+        vec = buf.reshape(-1)
+        for p0, p1 in lib.prange(0, vec.size, ALLREDUCE_BLKSIZE):
+            comm.Allreduce(MPI.IN_PLACE, vec[p0:p1], op=MPI.SUM)
+    return buf
+
+
+def _add_ovvv_(mycc, t1, t2, eris, fvv, t1new, t2new, fswap=None):
+    if size == 1:
+        return ccsd._add_ovvv_(mycc, t1, t2, eris, fvv, t1new, t2new, fswap)
+
+    # Contributions of the local blocks are computed in separated buffers.
+    # They are added to fvv, t1new, t2new after the allreduce.
+    fvv1 = numpy.zeros_like(fvv)
+    t1new1 = numpy.zeros_like(t1new)
+    t2new1 = numpy.zeros_like(t2new)
+    wVOov, wVooV = ccsd._add_ovvv_(mycc, t1, t2, eris, fvv1, t1new1, t2new1,
+                                   None, _partition)
+    wVooV = numpy.asarray(wVooV, order='C')
+    for x in (fvv1, t1new1, t2new1, wVOov, wVooV):
+        _allreduce_(x)
+    fvv += fvv1
+    t1new += t1new1
+    t2new += t2new1
+    return wVOov, wVooV
+
+
+class _ChemistsERIs(ccsd._ChemistsERIs):
+    def _contract_vvvv_t2(self, mycc, t2, vvvv_or_direct=False, out=None, verbose=None):
+        if isinstance(vvvv_or_direct, numpy.ndarray):
+            vvvv = vvvv_or_direct
+        elif vvvv_or_direct:  # AO-direct contraction
+            vvvv = None
+        else:
+            vvvv = self.vvvv
+        Ht2 = ccsd._contract_vvvv_t2(mycc, self.mol, vvvv, t2, out, verbose,
+                                     _partition)
+        return _allreduce_(Ht2)
+
+def _distribute_eris(eris):
+    '''Convert eris to the _ChemistsERIs which contracts the vvvv integrals in
+    parallel'''
+    if isinstance(eris, _ChemistsERIs):
+        return eris
+    eris_mpi = _ChemistsERIs()
+    eris_mpi.__dict__.update(eris.__dict__)
+    return eris_mpi
+
+
+class CCSD(ccsd.CCSD):
+    __doc__ = ccsd.CCSD.__doc__
+
+    def __init__(self, mf, frozen=0, mo_coeff=None, mo_occ=None):
+        ccsd.CCSD.__init__(self, mf, frozen, mo_coeff, mo_occ)
+        if rank > 0:
+            # Output and checkpoint files are handled by the master process
+            self.verbose = logger.QUIET
+            self.chkfile = None
+
+    def dump_flags(self):
+        ccsd.CCSD.dump_flags(self)
+        logger.info(self, 'MPI processes = %d', size)
+        return self
+
+    def ccsd(self, t1=None, t2=None, eris=None):
+        if eris is None:
+            eris = self.ao2mo(self.mo_coeff)
+        eris = _distribute_eris(eris)
+        checkpoint = self.checkpoint
+        if rank > 0:
+            self.checkpoint = None
+        try:
+            return ccsd.CCSD.ccsd(self, t1, t2, eris)
+        finally:
+            self.checkpoint = checkpoint
+
+    def ao2mo(self, mo_coeff=None):
+        return _distribute_eris(ccsd.CCSD.ao2mo(self, mo_coeff))
+
+    _add_ovvv_ = _add_ovvv_
+
+RCCSD = CCSD
+
+
+if __name__ == '__main__':
+    from pyscf import gto, scf
+
+    mol = gto.Mole()
+    mol.atom = [
+        [8 , (0. , 0.     , 0.)],
+        [1 , (0. , -0.757 , 0.587)],
+        [1 , (0. , 0.757  , 0.587)]]
+    mol.basis = 'cc-pvdz'
+    mol.verbose = 4 if rank == 0 else 0
+    mol.build()
+    mf = scf.RHF(mol).run()
+    mycc = CCSD(mf).run()
+    print(mycc.e_corr - -0.2133432465136917)
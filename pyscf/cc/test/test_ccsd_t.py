@@ -13,11 +13,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import unittest
+import tempfile
 import numpy
 from functools import reduce
 
 from pyscf import gto, scf, lib, symm
+from pyscf.lib import checkpoint
 from pyscf import cc
 from pyscf.cc import ccsd_t
 from pyscf.cc import gccsd, gccsd_t
@@ -189,6 +192,38 @@ class KnownValues(unittest.TestCase):
         self.assertAlmostEqual(e0, e1.real, 9)
         self.assertAlmostEqual(e1, -0.98756910139720788-0.0019567929592079489j, 9)
 
+    def test_ccsd_t_restart(self):
+        class Interrupt(Exception):
+            pass
+        mycc = copy.copy(mcc)
+        eris = mycc.ao2mo()
+        e_ref = mycc.ccsd_t(eris=eris)
+
+        save = checkpoint.Checkpoint.save
+        def interrupt(self, state, cycle=None):
+            save(self, state, cycle)
+            if cycle == 4:
+                raise Interrupt
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        mycc.checkpoint = checkpoint.Checkpoint(ftmp.name, async_flush=False)
+        mycc.async_io = False
+        mycc.max_memory = 1  # to split the (T) correction into many tasks
+        try:
+            checkpoint.Checkpoint.save = interrupt
+            with lib.temporary_env(ccsd_t, CHECKPOINT_INTERVAL=2):
+                self.assertRaises(Interrupt, mycc.ccsd_t, eris=eris)
+        finally:
+            checkpoint.Checkpoint.save = save
+        # The ledger is saved every 2 tasks
+        state = checkpoint.Checkpoint(ftmp.name, 'ccsd_t').load()
+        self.assertEqual(state['done'].sum(), 4)
+        self.assertTrue(len(state['tasks']) > 5)
+
+        mycc.checkpoint = ftmp.name
+        e = mycc.ccsd_t(eris=eris)
+        self.assertAlmostEqual(e, e_ref, 9)
+        self.assertTrue(checkpoint.Checkpoint(ftmp.name, 'ccsd_t').load() is None)
+
 
 if __name__ == "__main__":
     print("Full Tests for CCSD(T)")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import numpy
+
+from pyscf import gto
+from pyscf import scf
+from pyscf.cc import dfccsd, lnoccsd
+from pyscf.mp import dfmp2
+
+mol = gto.Mole()
+mol.verbose = 7
+mol.output = '/dev/null'
+mol.atom = [
+    [8 , (0. , 0.     , 0.)],
+    [1 , (0. , -0.757 , 0.587)],
+    [1 , (0. , 0.757  , 0.587)]]
+mol.basis = '631g'
+mol.build()
+mf = scf.RHF(mol).density_fit(auxbasis='weigend')
+mf.conv_tol = 1e-12
+mf.kernel()
+
+def tearDownModule():
+    global mol, mf
+    mol.stdout.close()
+    del mol, mf
+
+class KnownValues(unittest.TestCase):
+    def test_no_truncation(self):
+        mycc = dfccsd.RCCSD(mf, frozen=1).run(conv_tol=1e-10)
+        mlno = lnoccsd.LNOCCSD(mf, frozen=1)
+        mlno.thresh_pair = 0
+        mlno.thresh_vir = 0
+        mlno.conv_tol = 1e-10
+        mlno.mp2_correction = True
+        mlno.kernel()
+        self.assertAlmostEqual(mlno.e_corr, mycc.e_corr, 7)
+        self.assertAlmostEqual(mlno.e_frag.sum(), mycc.e_corr, 7)
+        self.assertAlmostEqual(mlno.e_frag_mp2.sum(), mlno.e_corr_mp2, 7)
+
+    def test_lno_ccsd(self):
+        e_ref = dfccsd.RCCSD(mf, frozen=1).run().e_corr
+        mlno = lnoccsd.LNOCCSD(mf, frozen=1)
+        mlno.thresh_vir = 1e-3
+        mlno.mp2_correction = True
+        e_corr = mlno.kernel()
+        self.assertTrue(mlno.frag_sizes[0][1] < mol.nao_nr() - 5)
+        self.assertAlmostEqual(e_corr, e_ref, 3)
+        self.assertAlmostEqual(mlno.e_corr_mp2, dfmp2.DFMP2(mf, frozen=1).kernel()[0], 9)
+
+        mlno.lo_type = 'pipek'
+        self.assertAlmostEqual(mlno.kernel(), e_ref, 3)
+
+    def test_lno_mp2(self):
+        mlno = lnoccsd.LNOCCSD(mf)
+        mlno.solver = 'MP2'
+        mlno.lo_type = 'ibo'
+        self.assertFalse(mlno.mp2_correction)
+        mlno.thresh_pair = 0
+        mlno.thresh_vir = 0
+        self.assertAlmostEqual(mlno.kernel(), dfmp2.DFMP2(mf).kernel()[0], 7)
+
+    def test_prescreen(self):
+        mol1 = gto.M(atom='''O 0 0 0; H 0 -0.757 0.587; H 0 0.757 0.587
+                     O 8 0 0; H 8 -0.757 0.587; H 8 0.757 0.587''',
+                     basis='631g', verbose=0)
+        mf1 = scf.RHF(mol1).density_fit(auxbasis='weigend').run()
+        mlno = lnoccsd.LNOCCSD(mf1, frozen=2)
+        mlno.solver = 'MP2'
+        mlno.thresh_pair = 1e-6
+        lo_coeff = lnoccsd.localize_occ(mol1, mf1.mo_coeff[:,2:10])
+        e_corr = mlno.kernel(lo_coeff)
+
+        nocc = 10
+        fock = mf1.get_fock()
+        fii = numpy.einsum('pi,pq,qi->i', lo_coeff, fock, lo_coeff)
+        e_est, dist, spread = lnoccsd._dipole_pair_estimate(
+            mol1, lo_coeff, mf1.mo_coeff[:,nocc:], fii, mf1.mo_energy[nocc:])
+        self.assertTrue(numpy.count_nonzero(e_est < 1e-7) >= 32)
+
+        ratio = lnoccsd.PRESCREEN_RATIO
+        lnoccsd.PRESCREEN_RATIO = 0
+        try:
+            e_ref = mlno.kernel(lo_coeff)
+        finally:
+            lnoccsd.PRESCREEN_RATIO = ratio
+        self.assertAlmostEqual(e_corr, e_ref, 8)
+
+
+if __name__ == "__main__":
+    print("Full Tests for LNO-CCSD")
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# The tests can be executed in parallel as well
+#     mpirun -np 2 python test_mpiccsd.py
+#
+
+import unittest
+import numpy
+
+from pyscf import gto, lib
+from pyscf import scf
+from pyscf.cc import ccsd, mpiccsd
+
+mol = gto.Mole()
+mol.verbose = 7
+mol.output = '/dev/null'
+mol.atom = [
+    [8 , (0. , 0.     , 0.)],
+    [1 , (0. , -0.757 , 0.587)],
+    [1 , (0. , 0.757  , 0.587)]]
+mol.basis = '631g'
+mol.build()
+mf = scf.RHF(mol).run(conv_tol=1e-12)
+
+def tearDownModule():
+    global mol, mf
+    mol.stdout.close()
+    del mol, mf
+
+def partitions(nproc):
+    return [lambda tasks, costs, i=i: tasks[i::nproc] for i in range(nproc)]
+
+class KnownValues(unittest.TestCase):
+    def test_ccsd(self):
+        mycc = mpiccsd.CCSD(mf).run(conv_tol=1e-10)
+        self.assertAlmostEqual(mycc.e_corr, -0.13539788570500952, 8)
+
+        mycc = mpiccsd.CCSD(mf)
+        mycc.direct = True
+        mycc.max_memory = 1
+        mycc.run(conv_tol=1e-10)
+        self.assertAlmostEqual(mycc.e_corr, -0.13539788570500952, 8)
+
+    def test_uneven_memory(self):
+        # The block sizes derived from the free memory are different on each
+        # process.  All processes have to split the tasks in the same way.
+        max_memory = lib.current_memory()[0] + 20
+        if mpiccsd.size > 1:
+            max_memory = mpiccsd.comm.bcast(max_memory)
+        buf = None
+        if mpiccsd.rank > 0:
+            buf = numpy.ones((60,1000,1000))
+        try:
+            mycc = mpiccsd.CCSD(mf)
+            mycc.max_memory = max_memory
+            mycc.direct = True
+            mycc.run(conv_tol=1e-10)
+        finally:
+            buf = None
+        self.assertAlmostEqual(mycc.e_corr, -0.13539788570500952, 8)
+
+    def test_partition_vvvv(self):
+        mycc = ccsd.CCSD(mf)
+        mycc.max_memory = 1
+        eris = mycc.ao2mo()
+        nocc = mycc.nocc
+        nvir = mycc.nmo - nocc
+        numpy.random.seed(2)
+        t2 = numpy.random.random((nocc,nocc,nvir,nvir))
+        ref = ccsd._contract_vvvv_t2(mycc, mol, eris.vvvv, t2)
+        ht2 = sum(ccsd._contract_vvvv_t2(mycc, mol, eris.vvvv, t2, partition=f)
+                  for f in partitions(3))
+        self.assertAlmostEqual(abs(ht2 - ref).max(), 0, 12)
+
+        nao = mol.nao_nr()
+        t2 = numpy.random.random((nocc,nocc,nao,nao))
+        ref = ccsd._contract_vvvv_t2(mycc, mol, None, t2)
+        ht2 = sum(ccsd._contract_vvvv_t2(mycc, mol, None, t2, partition=f)
+                  for f in partitions(3))
+        self.assertAlmostEqual(abs(ht2 - ref).max(), 0, 12)
+
+    def test_partition_ovvv(self):
+        mycc = ccsd.CCSD(mf)
+        mycc.max_memory = 1
+        eris = mycc.ao2mo()
+        nocc = mycc.nocc
+        nvir = mycc.nmo - nocc
+        numpy.random.seed(3)
+        t1 = numpy.random.random((nocc,nvir)) * .1
+        t2 = numpy.random.random((nocc,nocc,nvir,nvir)) * .1
+        t2 = t2 + t2.transpose(1,0,3,2)
+        def add_ovvv(partition):
+            fvv = numpy.zeros((nvir,nvir))
+            t1new = numpy.zeros_like(t1)
+            t2new = numpy.zeros_like(t2)
+            w1, w2 = ccsd._add_ovvv_(mycc, t1, t2, eris, fvv, t1new, t2new,
+                                     None, partition)
+            return [fvv, t1new, t2new, w1, w2]
+        ref = add_ovvv(None)
+        out = [add_ovvv(f) for f in partitions(2)]
+        for i, x in enumerate(ref):
+            self.assertAlmostEqual(abs(out[0][i] + out[1][i] - x).max(), 0, 12)
+
+        # Tasks generated on demand, as the work-stealing partition
+        out = [add_ovvv(lambda tasks, costs, f=f: iter(f(tasks, costs)))
+               for f in partitions(2)]
+        for i, x in enumerate(ref):
+            self.assertAlmostEqual(abs(out[0][i] + out[1][i] - x).max(), 0, 12)
+
+
+if __name__ == "__main__":
+    print("Full Tests for MPI-parallel CCSD")
+    unittest.main()
@@ -30,6 +30,16 @@ DFBASIS = getattr(__config__, 'df_addons_aug_etb_beta', 'weigend')
 ETB_BETA = getattr(__config__, 'df_addons_aug_dfbasis', 2.0)
 FIRST_ETB_ELEMENT = getattr(__config__, 'df_addons_aug_start_at', 36)  # 'Rb'
 
+# Storage of the 3-index DF tensors in HDF5 files.  Compression is a
+# filter of h5py ('gzip' or 'lzf'), applied after the byte shuffle filter.
+# If CDERI_MANTISSA_BITS is set, the DF tensors are rounded to this number of
+# mantissa bits (52 for double precision) before compression.  The relative
+# error of each element is bounded by 2**-(CDERI_MANTISSA_BITS+1).
+CDERI_CHUNK_SIZE = getattr(__config__, 'df_addons_cderi_chunk_size', 1)  # MB
+CDERI_COMPRESSION = getattr(__config__, 'df_addons_cderi_compression', None)
+CDERI_COMPRESSION_OPTS = getattr(__config__, 'df_addons_cderi_compression_opts', None)
+CDERI_MANTISSA_BITS = getattr(__config__, 'df_addons_cderi_mantissa_bits', None)
+
 # For code compatiblity in python-2 and python-3
 if sys.version_info >= (3,):
     unicode = str
@@ -78,6 +88,72 @@ class load(ao2mo.load):
         ao2mo.load.__init__(self, eri, dataname)
 
 
+def cderi_dataset_options(shape, dtype=numpy.double):
+    '''Keyword arguments of h5py create_dataset for a DF tensor of shape
+    (..., naux, npair).  The DF tensors are read in blocks of auxiliary
+    functions.  Each chunk holds complete rows (or a contiguous segment of
+    one row if a row is larger than CDERI_CHUNK_SIZE).
+    '''
+    opts = {}
+    if len(shape) > 1 and all(n > 0 for n in shape):
+        chunk_words = max(1, int(CDERI_CHUNK_SIZE*1e6/numpy.dtype(dtype).itemsize))
+        ncol = shape[-1]
+        if ncol >= chunk_words:
+            chunks = (1,) * (len(shape)-1) + (chunk_words,)
+        else:
+            chunks = (1,) * (len(shape)-2) + (min(shape[-2], chunk_words//ncol), ncol)
+        opts['chunks'] = chunks
+        if CDERI_COMPRESSION:
+            opts['compression'] = CDERI_COMPRESSION
+            opts['compression_opts'] = CDERI_COMPRESSION_OPTS
+            opts['shuffle'] = True
+    return opts
+
+def create_cderi_dataset(h5group, key, shape=None, dtype=numpy.double, data=None):
+    '''Create the HDF5 dataset for the DF tensor with the chunk and
+    compression settings of :func:`cderi_dataset_options`.  If data is
+    given, it is rounded by :func:`truncate_mantissa` and written to the
+    dataset.
+    '''
+    if data is not None:
+        data = numpy.asarray(data)
+        shape, dtype = data.shape, data.dtype
+    dset = h5group.create_dataset(key, shape, dtype,
+                                  **cderi_dataset_options(shape, dtype))
+    if data is not None and data.size > 0:
+        dset[:] = truncate_mantissa(data)
+    return dset
+
+def truncate_mantissa(a, nbits=None):
+    '''Round the float64 (or complex128) array to nbits mantissa bits.  The
+    trailing zero bits make the data highly compressible.  Default nbits is
+    CDERI_MANTISSA_BITS.  The input array is returned if nbits is None.
+    '''
+    if nbits is None:
+        nbits = CDERI_MANTISSA_BITS
+    a = numpy.asarray(a)
+    if nbits is None or nbits >= 52 or a.dtype not in (numpy.double, numpy.complex128):
+        return a
+    drop = 52 - int(nbits)
+    u = numpy.array(a, order='C').view(numpy.uint64)
+    # Round half up on the magnitude then clear the dropped bits
+    u += numpy.uint64(1 << (drop-1))
+    u &= numpy.uint64(~((1 << drop) - 1) & 0xffffffffffffffff)
+    return u.view(a.dtype).reshape(a.shape)
+
+def storage_size(h5obj):
+    '''Disk footprint and the uncompressed size (in bytes) of a HDF5 dataset
+    or all datasets of a HDF5 group'''
+    import h5py
+    if isinstance(h5obj, h5py.Dataset):
+        return h5obj.id.get_storage_size(), h5obj.size * h5obj.dtype.itemsize
+    stored = nbytes = 0
+    for key in h5obj:
+        s1, n1 = storage_size(h5obj[key])
+        stored += s1
+        nbytes += n1
+    return stored, nbytes
+
 def aug_etb_for_dfbasis(mol, dfbasis=DFBASIS, beta=ETB_BETA,
                         start_at=FIRST_ETB_ELEMENT):
     '''augment weigend basis with even-tempered gaussian basis
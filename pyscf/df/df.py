@@ -161,11 +161,18 @@ class DF(lib.StreamObject):
             self.build()
         if blksize is None:
             blksize = self.blockdim
+        nbytes = io_time = 0
         with addons.load(self._cderi, 'j3c') as feri:
             naoaux = feri.shape[0]
             for b0, b1 in self.prange(0, naoaux, blksize):
+                t0 = time.time()
                 eri1 = numpy.asarray(feri[b0:b1], order='C')
+                nbytes += eri1.nbytes
+                io_time += time.time() - t0
                 yield eri1
+        if isinstance(self._cderi, str) and io_time > 0:
+            logger.debug1(self, 'Read %.8g MB of cderi, %.8g MB/s',
+                          nbytes/1e6, nbytes/1e6/io_time)
 
     def prange(self, start, end, step):
         if isinstance(self._call_count, int):
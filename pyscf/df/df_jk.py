@@ -25,6 +25,7 @@ import numpy
 from pyscf import lib
 from pyscf import scf
 from pyscf.lib import logger
+from pyscf.lib import profiler
 from pyscf.ao2mo import _ao2mo
 
 libri = lib.load_library('libri')
@@ -114,7 +115,8 @@ def density_fit(mf, auxbasis=None, with_df=None):
             if self.with_df:
                 if mol is None: mol = self.mol
                 if dm is None: dm = self.make_rdm1()
-                vj, vk = self.with_df.get_jk(dm, hermi)
+                with profiler.region(self, 'get_jk'):
+                    vj, vk = self.with_df.get_jk(dm, hermi)
                 return vj, vk
             else:
                 return mf_class.get_jk(self, mol, dm, hermi)
@@ -21,6 +21,7 @@ import numpy
 import scipy.linalg
 from pyscf import lib
 from pyscf.lib import logger
+from pyscf.lib import intcache
 from pyscf import gto
 from pyscf.df import addons
 from pyscf import __config__
@@ -34,7 +35,7 @@ format_aux_basis = addons.make_auxmol
 
 
 def aux_e2(mol, auxmol, intor='int3c2e', aosym='s1', comp=None, out=None,
-           cintopt=None):
+           cintopt=None, shls_slice=None):
     '''3-center AO integrals (ij|L), where L is the auxiliary basis.
 
     Kwargs:
@@ -43,9 +44,17 @@ def aux_e2(mol, auxmol, intor='int3c2e', aosym='s1', comp=None, out=None,
             reduce the overhead of cintopt initialization repeatedly.
 
             cintopt = gto.moleintor.make_cintopt(mol._atm, mol._bas, mol._env, intor)
+        shls_slice : 6-element tuple
+            (ish0, ish1, jsh0, jsh1, ksh0, ksh1).  The shell ranges of the
+            two AO indices and the auxiliary index.  ksh0 and ksh1 are the
+            shell IDs in auxmol.
     '''
     from pyscf.gto.moleintor import getints, make_cintopt
-    shls_slice = (0, mol.nbas, 0, mol.nbas, mol.nbas, mol.nbas+auxmol.nbas)
+    if shls_slice is None:
+        shls_slice = (0, mol.nbas, 0, mol.nbas, mol.nbas, mol.nbas+auxmol.nbas)
+    else:
+        shls_slice = (tuple(shls_slice[:4]) +
+                      (mol.nbas+shls_slice[4], mol.nbas+shls_slice[5]))
 
     # Extract the call of the two lines below
     #  pmol = gto.mole.conc_mol(mol, auxmol)
@@ -99,6 +108,15 @@ def cholesky_eri(mol, auxbasis='weigend+etb', auxmol=None,
     if auxmol is None:
         auxmol = addons.make_auxmol(mol, auxbasis)
 
+    if intcache.ENABLED and fauxe2 is aux_e2:
+        key = intcache.fingerprint('cholesky_eri', mol, auxmol,
+                                   mol._add_suffix(int3c), aosym,
+                                   mol._add_suffix(int2c), LINEAR_DEP_THR)
+        cderi = intcache.load(key)
+        if cderi is not None:
+            log.debug('Load cderi from integral cache %s', key)
+            return cderi
+
     j2c = auxmol.intor(int2c, hermi=1)
     naux = j2c.shape[0]
     log.debug('size of aux basis %d', naux)
@@ -122,6 +140,8 @@ def cholesky_eri(mol, auxbasis='weigend+etb', auxmol=None,
     j3c = None
     if cderi.flags.f_contiguous:
         cderi = lib.transpose(cderi.T)
+    if intcache.ENABLED and fauxe2 is aux_e2:
+        intcache.save(key, cderi)
     log.timer('cholesky_eri', *t0)
     return cderi
 
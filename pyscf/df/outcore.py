@@ -24,8 +24,10 @@ import h5py
 from pyscf import lib
 from pyscf import gto
 from pyscf.lib import logger
+from pyscf.lib import intcache
 from pyscf import ao2mo
 from pyscf.ao2mo import _ao2mo
+from pyscf.df import addons
 from pyscf.df.addons import make_auxmol
 from pyscf import __config__
 
@@ -51,6 +53,20 @@ def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='j3c', tmpdir=No
     if auxmol is None:
         auxmol = make_auxmol(mol, auxbasis)
 
+    if intcache.ENABLED:
+        key = intcache.fingerprint('cholesky_eri', mol, auxmol, dataname,
+                                   mol._add_suffix(int3c), aosym,
+                                   mol._add_suffix(int2c), comp, LINEAR_DEP_THR)
+        cached = intcache.h5file(key)
+        if cached is not None:
+            log.debug('Load cderi from integral cache %s', cached)
+            feri = _create_h5file(erifile, dataname)
+            with h5py.File(cached, 'r') as fcache:
+                feri.copy(fcache[dataname], dataname)
+            feri.close()
+            log.timer('cholesky_eri', *time0)
+            return erifile
+
     if tmpdir is None:
         tmpdir = lib.param.TMPDIR
     swapfile = tempfile.NamedTemporaryFile(dir=tmpdir)
@@ -69,13 +85,10 @@ def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='j3c', tmpdir=No
 
     feri = _create_h5file(erifile, dataname)
     if comp == 1:
-        chunks = (min(int(16e3/nao),naoaux), nao) # 128K
-        h5d_eri = feri.create_dataset(dataname, (naoaux,nao_pair), 'f8',
-                                      chunks=chunks)
+        h5d_eri = addons.create_cderi_dataset(feri, dataname, (naoaux,nao_pair))
     else:
-        chunks = (1, min(int(16e3/nao),naoaux), nao) # 128K
-        h5d_eri = feri.create_dataset(dataname, (comp,naoaux,nao_pair), 'f8',
-                                      chunks=chunks)
+        h5d_eri = addons.create_cderi_dataset(feri, dataname,
+                                              (comp,naoaux,nao_pair))
     aopairblks = len(fswap[dataname+'/0'])
 
     ioblk_size = max(max_memory*.1, ioblk_size)
@@ -96,13 +109,19 @@ def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='j3c', tmpdir=No
                 buf[:nrow,col0:col1] = dat[row0:row1]
                 col0 = col1
             if comp == 1:
-                h5d_eri[row0:row1] = buf[:nrow]
+                h5d_eri[row0:row1] = addons.truncate_mantissa(buf[:nrow])
             else:
-                h5d_eri[icomp,row0:row1] = buf[:nrow]
+                h5d_eri[icomp,row0:row1] = addons.truncate_mantissa(buf[:nrow])
             ti0 = log.timer('step 2 [%d/%d], [%d,%d:%d], row = %d'%
                             (istep, totstep, icomp, row0, row1, nrow), *ti0)
 
     fswap.close()
+    if log.verbose >= logger.DEBUG:
+        stored, nbytes = addons.storage_size(h5d_eri)
+        log.debug('cderi %s: %.8g MB on disk, %.8g MB uncompressed',
+                  dataname, stored/1e6, nbytes/1e6)
+    if intcache.ENABLED:
+        intcache.save_h5(key, feri, dataname)
     feri.close()
     log.timer('cholesky_eri', *time0)
     return erifile
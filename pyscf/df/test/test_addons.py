@@ -25,6 +25,16 @@ from pyscf import df
 
 
 class KnownValues(unittest.TestCase):
+    def test_truncate_mantissa(self):
+        numpy.random.seed(2)
+        a = numpy.random.random((4,5)) - .5
+        b = df.addons.truncate_mantissa(a, 20)
+        self.assertTrue(abs(b/a - 1).max() <= 2**-21)
+        self.assertTrue(numpy.all(b.view(numpy.uint64) & numpy.uint64(2**32-1) == 0))
+        self.assertTrue(df.addons.truncate_mantissa(a) is a)
+        z = a + a[::-1] * 1j
+        self.assertAlmostEqual(abs(df.addons.truncate_mantissa(z, 40) - z).max(), 0, 11)
+
     def test_aug_etb(self):
         mol = gto.M(
             verbose = 0,
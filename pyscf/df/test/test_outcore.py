@@ -109,6 +109,30 @@ class KnownValues(unittest.TestCase):
         eri1 = numpy.dot(cderi1.T, cderi1)
         self.assertAlmostEqual(abs(eri0-eri1).max(), 0, 9)
 
+    def test_compressed_cderi(self):
+        cderi0 = df.incore.cholesky_eri(mol, auxmol=auxmol)
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        df.addons.CDERI_COMPRESSION = 'gzip'
+        df.addons.CDERI_MANTISSA_BITS = 30
+        try:
+            df.outcore.cholesky_eri(mol, ftmp.name, auxmol=auxmol)
+        finally:
+            df.addons.CDERI_COMPRESSION = None
+            df.addons.CDERI_MANTISSA_BITS = None
+        with h5py.File(ftmp.name, 'r') as f:
+            cderi1 = f['j3c'][:]
+            stored, nbytes = df.addons.storage_size(f['j3c'])
+        self.assertTrue(stored < nbytes * .7)
+        self.assertTrue(abs(cderi1 - cderi0).max() < abs(cderi0).max() * 2**-30)
+
+        dm = numpy.eye(mol.nao_nr())
+        mydf = df.DF(mol, auxbasis='weigend')
+        vj0, vk0 = df.df_jk.get_jk(mydf, dm)
+        mydf._cderi = ftmp.name
+        vj1, vk1 = df.df_jk.get_jk(mydf, dm)
+        self.assertAlmostEqual(abs(vj1 - vj0).max(), 0, 7)
+        self.assertAlmostEqual(abs(vk1 - vk0).max(), 0, 7)
+
 #    def test_int3c2e_ip(self):
 #        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
 #        df.outcore.cholesky_eri(mol, ftmp.name, int3c='int3c2e_ip1',
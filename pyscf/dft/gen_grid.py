@@ -35,6 +35,8 @@ from pyscf import __config__
 
 libdft = lib.load_library('libdft')
 BLKSIZE = 128  # needs to be the same to lib/gto/grid_ao_drv.c
+# Edge length (in Bohr) of the boxes to group grids spatially
+GROUP_BOX_SIZE = getattr(__config__, 'dft_gen_grid_GROUP_BOX_SIZE', 1.2)
 
 # ~= (L+1)**2/3
 LEBEDEV_ORDER = {
@@ -277,10 +279,18 @@ def gen_atomic_grids(mol, atom_grid={}, radi_method=radi.gauss_chebyshev,
 
 def gen_partition(mol, atom_grids_tab,
                   radii_adjust=None, atomic_radii=radi.BRAGG_RADII,
-                  becke_scheme=original_becke):
+                  becke_scheme=original_becke, becke_cutoff=None):
     '''Generate the mesh grid coordinates and weights for DFT numerical integration.
     We can change radii_adjust, becke_scheme functions to generate different meshgrid.
 
+    Kwargs:
+        becke_cutoff : float
+            If specified, the Becke partition function of a grid is computed
+            with the atoms within the distance becke_cutoff (in Bohr) of the
+            grid only.  This reduces the cost from O(natm^2) to O(1) per grid
+            for large systems.  The grids of each atom are processed in
+            spatial boxes, each with its own list of neighbouring atoms.
+
     Returns:
         grid_coord and grid_weight arrays.  grid_coord array has shape (N,3);
         weight 1D array has N elements.
@@ -296,51 +306,111 @@ def gen_partition(mol, atom_grids_tab,
          radii_adjust is radi.becke_atomic_radii_adjust or
          f_radii_adjust is None)):
         if f_radii_adjust is None:
-            p_radii_table = lib.c_null_ptr()
+            f_radii_table = None
         else:
             f_radii_table = numpy.asarray([f_radii_adjust(i, j, 0)
                                            for i in range(mol.natm)
                                            for j in range(mol.natm)])
-            p_radii_table = f_radii_table.ctypes.data_as(ctypes.c_void_p)
-        def gen_grid_partition(coords):
+            f_radii_table = f_radii_table.reshape(mol.natm,mol.natm)
+        # Small boxes for the neighbour lists since the C kernel has little
+        # overhead per call
+        box_size = becke_cutoff and becke_cutoff * .5
+        def gen_grid_partition(coords, atm_idx):
             coords = numpy.asarray(coords, order='F')
             ngrids = coords.shape[0]
-            pbecke = numpy.empty((mol.natm,ngrids))
+            natm = len(atm_idx)
+            sub_coords = numpy.asarray(atm_coords[atm_idx], order='C')
+            if f_radii_table is None:
+                p_radii_table = lib.c_null_ptr()
+            else:
+                sub_table = numpy.asarray(f_radii_table[atm_idx[:,None],atm_idx],
+                                          order='C')
+                p_radii_table = sub_table.ctypes.data_as(ctypes.c_void_p)
+            pbecke = numpy.empty((natm,ngrids))
             libdft.VXCgen_grid(pbecke.ctypes.data_as(ctypes.c_void_p),
                                coords.ctypes.data_as(ctypes.c_void_p),
-                               atm_coords.ctypes.data_as(ctypes.c_void_p),
+                               sub_coords.ctypes.data_as(ctypes.c_void_p),
                                p_radii_table,
-                               ctypes.c_int(mol.natm), ctypes.c_int(ngrids))
+                               ctypes.c_int(natm), ctypes.c_int(ngrids))
             return pbecke
     else:
-        def gen_grid_partition(coords):
+        # One neighbour list for all grids of an atom.  The python loops over
+        # atom pairs are too expensive to be repeated for many boxes.
+        box_size = numpy.inf
+        def gen_grid_partition(coords, atm_idx):
             ngrids = coords.shape[0]
-            grid_dist = numpy.empty((mol.natm,ngrids))
-            for ia in range(mol.natm):
+            natm = len(atm_idx)
+            grid_dist = numpy.empty((natm,ngrids))
+            for i, ia in enumerate(atm_idx):
                 dc = coords - atm_coords[ia]
-                grid_dist[ia] = numpy.sqrt(numpy.einsum('ij,ij->i',dc,dc))
-            pbecke = numpy.ones((mol.natm,ngrids))
-            for i in range(mol.natm):
-                for j in range(i):
-                    g = 1/atm_dist[i,j] * (grid_dist[i]-grid_dist[j])
+                grid_dist[i] = numpy.sqrt(numpy.einsum('ij,ij->i',dc,dc))
+            pbecke = numpy.ones((natm,ngrids))
+            for i, ia in enumerate(atm_idx):
+                for j, ja in enumerate(atm_idx[:i]):
+                    g = 1/atm_dist[ia,ja] * (grid_dist[i]-grid_dist[j])
                     if f_radii_adjust is not None:
-                        g = f_radii_adjust(i, j, g)
+                        g = f_radii_adjust(ia, ja, g)
                     g = becke_scheme(g)
                     pbecke[i] *= .5 * (1-g)
                     pbecke[j] *= .5 * (1+g)
             return pbecke
 
+    all_atoms = numpy.arange(mol.natm)
     coords_all = []
     weights_all = []
     for ia in range(mol.natm):
         coords, vol = atom_grids_tab[mol.atom_symbol(ia)]
         coords = coords + atm_coords[ia]
-        pbecke = gen_grid_partition(coords)
-        weights = vol * pbecke[ia] * (1./pbecke.sum(axis=0))
+        if becke_cutoff is None:
+            pbecke = gen_grid_partition(coords, all_atoms)
+            weights = vol * pbecke[ia] * (1./pbecke.sum(axis=0))
+        else:
+            weights = numpy.empty_like(vol)
+            for idx, center, radius in _grid_boxes(coords, box_size):
+                # Atoms which are within becke_cutoff of any grid of the box
+                dr = atm_coords - center
+                mask = numpy.einsum('ij,ij->i', dr, dr) < (radius + becke_cutoff)**2
+                mask[ia] = True
+                atm_idx = numpy.where(mask)[0]
+                pbecke = gen_grid_partition(coords[idx], atm_idx)
+                i = numpy.searchsorted(atm_idx, ia)
+                weights[idx] = vol[idx] * pbecke[i] * (1./pbecke.sum(axis=0))
         coords_all.append(coords)
         weights_all.append(weights)
     return numpy.vstack(coords_all), numpy.hstack(weights_all)
 
+def _grid_boxes(coords, box_size):
+    '''Split the grids into cubic boxes.  Yield the indices of the grids, the
+    center and the radius of each box.'''
+    box_ids = numpy.floor(coords / box_size).astype(numpy.int64)
+    box_ids -= box_ids.min(axis=0)
+    nbox = box_ids.max(axis=0) + 1
+    box_ids = (box_ids[:,0] * nbox[1] + box_ids[:,1]) * nbox[2] + box_ids[:,2]
+    idx = numpy.argsort(box_ids, kind='mergesort')
+    bounds = numpy.where(numpy.diff(box_ids[idx]) != 0)[0] + 1
+    for sub in numpy.split(idx, bounds):
+        c = coords[sub]
+        center = (c.max(axis=0) + c.min(axis=0)) * .5
+        dr = c - center
+        yield sub, center, numpy.sqrt(numpy.einsum('ij,ij->i', dr, dr).max())
+
+def arg_group_grids(mol, coords, box_size=GROUP_BOX_SIZE):
+    '''Order the grids so that the grids in the same box of size box_size are
+    adjacent.  Grid blocks of spatially compact grids have fewer non-zero AOs
+    which can be exploited by the screening in numerical integration.
+
+    Returns:
+        1D array of indices which sorts the grids
+    '''
+    coords = numpy.asarray(coords)
+    if coords.size == 0:
+        return numpy.arange(0)
+    lo = coords.min(axis=0)
+    box_ids = numpy.floor((coords - lo) / box_size).astype(numpy.int64)
+    nbox = box_ids.max(axis=0) + 1
+    box_ids = (box_ids[:,0] * nbox[1] + box_ids[:,1]) * nbox[2] + box_ids[:,2]
+    return numpy.argsort(box_ids, kind='mergesort')
+
 def make_mask(mol, coords, relativity=0, shls_slice=None, verbose=None):
     '''Mask to indicate whether a shell is zero on grid
 
@@ -436,6 +506,17 @@ class Grids(lib.StreamObject):
             (75,302) for second row;
             (80~105,434) for rest.
 
+        sort_grids : bool
+            Whether to group the grids spatially in boxes (see
+            :func:`arg_group_grids`).  Sorted grids improve the screening of
+            AOs on each grid block for large molecules.  Default is False.
+
+        becke_cutoff : float
+            Only the atoms within becke_cutoff (in Bohr) of a grid are
+            included in the Becke partition function of that grid.  The
+            resultant weights are approximate.  15 - 20 Bohr is sufficient
+            for most systems.  Default is None, to include all atoms.
+
         Examples:
 
         >>> mol = gto.M(atom='H 0 0 0; H 0 0 1.1')
@@ -486,6 +567,8 @@ class Grids(lib.StreamObject):
         self.prune = _load_conf(None, 'dft_gen_grid_Grids_prune', nwchem_prune)
 
         self.level = getattr(__config__, 'dft_gen_grid_Grids_level', 3)
+        self.sort_grids = getattr(__config__, 'dft_gen_grid_Grids_sort_grids', False)
+        self.becke_cutoff = getattr(__config__, 'dft_gen_grid_Grids_becke_cutoff', None)
 
 ##################################################
 # don't modify the following attributes, they are not input options
@@ -499,7 +582,8 @@ class Grids(lib.StreamObject):
 
     def __setattr__(self, key, val):
         if key in ('atom_grid', 'atomic_radii', 'radii_adjust', 'radi_method',
-                   'becke_scheme', 'prune', 'level'):
+                   'becke_scheme', 'prune', 'level', 'sort_grids',
+                   'becke_cutoff'):
             self.coords = None
             self.weights = None
             self.non0tab = None
@@ -511,6 +595,9 @@ class Grids(lib.StreamObject):
         logger.info(self, 'pruning grids: %s', self.prune)
         logger.info(self, 'grids dens level: %d', self.level)
         logger.info(self, 'symmetrized grids: %s', self.symmetry)
+        logger.info(self, 'sort grids: %s', self.sort_grids)
+        if self.becke_cutoff is not None:
+            logger.info(self, 'becke partition cutoff: %g', self.becke_cutoff)
         if self.radii_adjust is not None:
             logger.info(self, 'atomic radii adjust function: %s',
                         self.radii_adjust)
@@ -530,6 +617,10 @@ class Grids(lib.StreamObject):
                 self.gen_partition(mol, atom_grids_tab,
                                    self.radii_adjust, self.atomic_radii,
                                    self.becke_scheme)
+        if self.sort_grids:
+            idx = arg_group_grids(mol, self.coords)
+            self.coords = self.coords[idx]
+            self.weights = self.weights[idx]
         if with_non0tab:
             self.non0tab = self.make_mask(mol, self.coords)
         else:
@@ -554,10 +645,11 @@ class Grids(lib.StreamObject):
     @lib.with_doc(gen_partition.__doc__)
     def gen_partition(self, mol, atom_grids_tab,
                       radii_adjust=None, atomic_radii=radi.BRAGG_RADII,
-                      becke_scheme=original_becke):
+                      becke_scheme=original_becke, becke_cutoff=None):
         ''' See gen_grid.gen_partition function'''
+        if becke_cutoff is None: becke_cutoff = self.becke_cutoff
         return gen_partition(mol, atom_grids_tab, radii_adjust, atomic_radii,
-                             becke_scheme)
+                             becke_scheme, becke_cutoff)
 
     @lib.with_doc(make_mask.__doc__)
     def make_mask(self, mol=None, coords=None, relativity=0, shls_slice=None,
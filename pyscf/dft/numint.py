@@ -22,6 +22,7 @@ import numpy
 import scipy.linalg
 from pyscf import lib
 from pyscf.lib import logger
+from pyscf.lib import profiler
 try:
     from pyscf.dft import libxc
 except (ImportError, OSError):
@@ -43,6 +44,11 @@ OCCDROP = getattr(__config__, 'dft_numint_OCCDROP', 1e-12)
 # If the number of AOs in the system is less than this value, all tensors are
 # treated as dense quantities and contracted by dgemm directly.
 SWITCH_SIZE = getattr(__config__, 'dft_numint_SWITCH_SIZE', 800)
+# The system size above which nr_rks compresses the AO values, density matrix
+# and XC potential to the AOs which are non-zero on a grid block, if the
+# fraction of these AOs is smaller than SPARSE_RATIO.
+SPARSE_SWITCH_SIZE = getattr(__config__, 'dft_numint_SPARSE_SWITCH_SIZE', 800)
+SPARSE_RATIO = getattr(__config__, 'dft_numint_SPARSE_RATIO', .5)
 
 def eval_ao(mol, coords, deriv=0, shls_slice=None,
             non0tab=None, out=None, verbose=None):
@@ -153,16 +159,17 @@ def eval_rho(mol, ao, dm, non0tab=None, xctype='LDA', hermi=0, verbose=None):
     else:
         ngrids, nao = ao[0].shape
 
-    if non0tab is None:
-        non0tab = numpy.ones(((ngrids+BLKSIZE-1)//BLKSIZE,mol.nbas),
-                             dtype=numpy.uint8)
     if not hermi:
         # (D + D.T)/2 because eval_rho computes 2*(|\nabla i> D_ij <j|) instead of
         # |\nabla i> D_ij <j| + |i> D_ij <\nabla j| for efficiency
         dm = (dm + dm.conj().T) * .5
 
-    shls_slice = (0, mol.nbas)
-    ao_loc = mol.ao_loc_nr()
+    if non0tab is None:
+        # No screening.  The AO values can be a compressed subset of the AOs
+        shls_slice = ao_loc = None
+    else:
+        shls_slice = (0, mol.nbas)
+        ao_loc = mol.ao_loc_nr()
     if xctype == 'LDA' or xctype == 'HF':
         c0 = _dot_ao_dm(mol, ao, dm, non0tab, shls_slice, ao_loc)
         #:rho = numpy.einsum('pi,pi->p', ao, c0)
@@ -241,10 +248,11 @@ def eval_rho2(mol, ao, mo_coeff, mo_occ, non0tab=None, xctype='LDA',
         ngrids, nao = ao[0].shape
 
     if non0tab is None:
-        non0tab = numpy.ones(((ngrids+BLKSIZE-1)//BLKSIZE,mol.nbas),
-                             dtype=numpy.uint8)
-    shls_slice = (0, mol.nbas)
-    ao_loc = mol.ao_loc_nr()
+        # No screening.  The AO values can be a compressed subset of the AOs
+        shls_slice = ao_loc = None
+    else:
+        shls_slice = (0, mol.nbas)
+        ao_loc = mol.ao_loc_nr()
     pos = mo_occ > OCCDROP
     if pos.sum() > 0:
         cpos = numpy.einsum('ij,j->ij', mo_coeff[:,pos], numpy.sqrt(mo_occ[pos]))
@@ -704,6 +712,7 @@ def nr_vxc(mol, grids, xc_code, dms, spin=0, relativity=0, hermi=0,
     return ni.nr_vxc(mol, grids, xc_code, dms, spin, relativity,
                      hermi, max_memory, verbose)
 
+@profiler.profile('nr_rks')
 def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
            max_memory=2000, verbose=None):
     '''Calculate RKS XC functional and potential matrix on given meshgrids
@@ -747,6 +756,10 @@ def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
     >>> nelec, exc, vxc = ni.nr_rks(mol, grids, 'lda,vwn', dm)
     '''
     xctype = ni._xc_type(xc_code)
+    if xctype in ('LDA', 'GGA', 'MGGA') and mol.nao_nr() >= SPARSE_SWITCH_SIZE:
+        return _nr_rks_sparse(ni, mol, grids, xc_code, dms, relativity, hermi,
+                              max_memory, verbose)
+
     make_rho, nset, nao = ni._gen_rho_evaluator(mol, dms, hermi)
 
     shls_slice = (0, mol.nbas)
@@ -872,6 +885,124 @@ def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
         vmat = vmat.reshape(nao,nao)
     return nelec, excsum, vmat
 
+def _nr_rks_sparse(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
+                   max_memory=2000, verbose=None):
+    '''nr_rks for large systems.  On each grid block, the AO values, the
+    density matrices and the XC potential are compressed to the AOs which are
+    non-zero on the block.  The cost of the contractions scales with the
+    number of significant AOs per block rather than the total number of AOs.
+    '''
+    xctype = ni._xc_type(xc_code)
+    if xctype == 'MGGA' and (any(x in xc_code.upper()
+                                 for x in ('CC06', 'CS', 'BR89', 'MK00'))):
+        raise NotImplementedError('laplacian in meta-GGA method')
+    make_rho, nset, nao = _gen_sparse_rho_evaluator(ni, mol, dms, hermi)
+    shls_slice = (0, mol.nbas)
+    ao_loc = mol.ao_loc_nr()
+
+    nelec = numpy.zeros(nset)
+    excsum = numpy.zeros(nset)
+    vmat = numpy.zeros((nset,nao,nao))
+    ao_deriv = {'LDA': 0, 'GGA': 1, 'MGGA': 2}[xctype]
+    for ao, mask, weight, coords \
+            in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
+        idx = _sparse_ao_index(mask, weight.size, ao_loc)
+        if idx is not None:
+            if idx.size == 0:
+                continue
+            ao = _compress_ao(ao, idx)
+            # The compressed AOs are all non-zero on the block
+            mask = None
+
+        for idm in range(nset):
+            rho = make_rho(idm, ao, idx, mask, xctype)
+            exc, vxc = ni.eval_xc(xc_code, rho, 0, relativity, 1, verbose)[:2]
+            if xctype == 'LDA':
+                den = rho * weight
+                # *.5 because vmat + vmat.T
+                aow = _scale_ao(ao, .5*weight*vxc[0])
+                v = _dot_ao_ao(mol, ao, aow, mask, shls_slice, ao_loc)
+            else:
+                den = rho[0] * weight
+                wv = _rks_gga_wv0(rho, vxc, weight)
+                aow = _scale_ao(ao[:4], wv)
+                v = _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
+                if xctype == 'MGGA':
+# .5 * .5 for v+v.T symmetrization and the convention tau = 1/2 \nabla\phi\dot\nabla\phi
+                    wv = (.5 * .5 * weight * vxc[3]).reshape(-1,1)
+                    for i in range(1, 4):
+                        v += _dot_ao_ao(mol, ao[i], wv*ao[i], mask,
+                                        shls_slice, ao_loc)
+            nelec[idm] += den.sum()
+            excsum[idm] += numpy.dot(den, exc)
+            if idx is None:
+                vmat[idm] += v
+            else:
+                vmat[idm][idx[:,None],idx] += v
+            rho = exc = vxc = wv = aow = v = None
+
+    for i in range(nset):
+        vmat[i] = vmat[i] + vmat[i].T
+    if nset == 1:
+        nelec = nelec[0]
+        excsum = excsum[0]
+        vmat = vmat.reshape(nao,nao)
+    return nelec, excsum, vmat
+
+def _sparse_ao_index(non0tab, ngrids, ao_loc):
+    '''Indices of the AOs which are non-zero on the grid block.  None is
+    returned if the fraction of non-zero AOs is larger than SPARSE_RATIO.'''
+    nblk = (ngrids+BLKSIZE-1) // BLKSIZE
+    shl_mask = non0tab[:nblk].any(axis=0)
+    nao = ao_loc[-1]
+    ao_mask = numpy.repeat(shl_mask, ao_loc[1:]-ao_loc[:-1])
+    idx = numpy.where(ao_mask)[0]
+    if idx.size > nao * SPARSE_RATIO:
+        return None
+    return idx
+
+def _compress_ao(ao, idx):
+    '''Gather the values of AOs idx.  The output has the same memory layout
+    as the output of eval_ao.'''
+    if ao.ndim == 2:
+        return ao.T[idx].T
+    else:
+        return ao.transpose(0,2,1)[:,idx].transpose(0,2,1)
+
+def _gen_sparse_rho_evaluator(ni, mol, dms, hermi=0):
+    '''Similar to NumInt._gen_rho_evaluator.  The returned function
+    make_rho(idm, ao, idx, non0tab, xctype) evaluates the density with the AO
+    values compressed to the AOs idx.'''
+    if getattr(dms, 'mo_coeff', None) is not None:
+        mo_coeff = dms.mo_coeff
+        mo_occ = dms.mo_occ
+        if isinstance(dms, numpy.ndarray) and dms.ndim == 2:
+            mo_coeff = [mo_coeff]
+            mo_occ = [mo_occ]
+        nao = mo_coeff[0].shape[0]
+        ndms = len(mo_occ)
+        def make_rho(idm, ao, idx, non0tab, xctype):
+            if idx is None:
+                c = mo_coeff[idm]
+            else:
+                c = mo_coeff[idm][idx]
+            return ni.eval_rho2(mol, ao, c, mo_occ[idm], non0tab, xctype)
+    else:
+        if isinstance(dms, numpy.ndarray) and dms.ndim == 2:
+            dms = [dms]
+        if not hermi:
+            dms = [(dm+dm.conj().T)*.5 for dm in dms]
+        nao = dms[0].shape[0]
+        ndms = len(dms)
+        def make_rho(idm, ao, idx, non0tab, xctype):
+            if idx is None:
+                dm = dms[idm]
+            else:
+                dm = dms[idm][idx[:,None],idx]
+            return ni.eval_rho(mol, ao, dm, non0tab, xctype, hermi=1)
+    return make_rho, ndms, nao
+
+@profiler.profile('nr_uks')
 def nr_uks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
            max_memory=2000, verbose=None):
     '''Calculate UKS XC functional and potential matrix on given meshgrids
@@ -1832,9 +1963,69 @@ def get_rho(ni, mol, dm, grids, max_memory=2000):
     return rho
 
 
+class _AOCache(object):
+    '''AO values of the grid blocks.  The first max_memory (in MB) of AO
+    values are held in memory.  The rest are stored in a temporary HDF5 file.
+    The loaded AO values are read-only.
+    '''
+    def __init__(self, key, grids, max_memory):
+        self.key = key
+        # grids.build always creates new coords and non0tab arrays.  Holding
+        # them ensures that their ids are not reused.
+        self.coords = grids.coords
+        self.non0tab = grids.non0tab
+        self.max_memory = max_memory
+        self.mem_size = 0
+        self.blocks = {}
+        self._h5 = None
+
+    def load(self, key):
+        ao = self.blocks.get(key)
+        if isinstance(ao, str):
+            ao = self._h5[ao][:]
+            ao.flags.writeable = False
+        if ao is not None:
+            # The AO values were saved in the memory layout of eval_ao output
+            ao = ao.swapaxes(-1,-2)
+        return ao
+
+    def save(self, key, ao):
+        # eval_ao returns (comp,ngrids,nao) arrays with F-contiguous components
+        ao = numpy.array(ao.swapaxes(-1,-2), order='C')
+        size = ao.nbytes / 1e6
+        if self.mem_size + size <= self.max_memory:
+            ao.flags.writeable = False
+            self.blocks[key] = ao
+            self.mem_size += size
+        else:
+            if self._h5 is None:
+                self._h5 = lib.H5TmpFile()
+            dataname = 'ao/%d-%d-%d' % key
+            self._h5[dataname] = ao
+            self.blocks[key] = dataname
+
+
 class NumInt(object):
+    '''Numerical integration for XC functional
+
+    Attributes:
+        cache_ao : bool
+            Whether to keep the AO values of the grid blocks for the next
+            call of block_loop.  The cache is kept across SCF iterations and
+            dropped when the molecule (geometry or basis) or the grids are
+            changed.  Default is False.
+        cache_ao_max_memory : float
+            Memory (in MB) for the cached AO values.  This memory is not
+            counted in the max_memory argument of block_loop.  The AO values
+            beyond this budget are stored in a temporary HDF5 file.
+    '''
     def __init__(self):
         self.libxc = libxc
+        self.cache_ao = getattr(__config__, 'dft_numint_NumInt_cache_ao', False)
+        self.cache_ao_max_memory = getattr(__config__,
+                                           'dft_numint_NumInt_cache_ao_max_memory',
+                                           4000)
+        self._ao_cache = None
 
     @lib.with_doc(nr_vxc.__doc__)
     def nr_vxc(self, mol, grids, xc_code, dms, spin=0, relativity=0, hermi=0,
@@ -1894,6 +2085,11 @@ class NumInt(object):
         if blksize is None:
             blksize = int(max_memory*1e6/(comp*2*nao*8*BLKSIZE))*BLKSIZE
             blksize = max(BLKSIZE, min(blksize, ngrids, BLKSIZE*1200))
+        # AO values are cached only for the default mask of the grids
+        if getattr(self, 'cache_ao', False) and non0tab is None:
+            cache = self._get_ao_cache(mol, grids)
+        else:
+            cache = None
         if non0tab is None:
             non0tab = grids.non0tab
         if non0tab is None:
@@ -1906,9 +2102,33 @@ class NumInt(object):
             coords = grids.coords[ip0:ip1]
             weight = grids.weights[ip0:ip1]
             non0 = non0tab[ip0//BLKSIZE:]
-            ao = self.eval_ao(mol, coords, deriv=deriv, non0tab=non0, out=buf)
+            if cache is None:
+                ao = self.eval_ao(mol, coords, deriv=deriv, non0tab=non0, out=buf)
+            else:
+                ao = cache.load((deriv, ip0, ip1))
+                if ao is None:
+                    ao = self.eval_ao(mol, coords, deriv=deriv, non0tab=non0, out=buf)
+                    cache.save((deriv, ip0, ip1), ao)
             yield ao, non0, weight, coords
 
+    def _get_ao_cache(self, mol, grids):
+        '''The AO cache of the given molecule and grids.  A new cache is
+        created if the geometry, basis or grids are changed.'''
+        from pyscf.lib import intcache
+        # The grids are identified by the object and the arrays of its last
+        # build rather than by their contents
+        key = (intcache.fingerprint(mol, mol.cart), id(grids))
+        cache = getattr(self, '_ao_cache', None)
+        if (cache is None or cache.key != key or
+            cache.coords is not grids.coords or cache.non0tab is not grids.non0tab):
+            cache = self._ao_cache = _AOCache(key, grids, self.cache_ao_max_memory)
+        return cache
+
+    def reset_ao_cache(self):
+        '''Release the cached AO values'''
+        self._ao_cache = None
+        return self
+
     def _gen_rho_evaluator(self, mol, dms, hermi=0):
         if getattr(dms, 'mo_coeff', None) is not None:
 #TODO: test whether dm.mo_coeff matching dm
@@ -132,6 +132,42 @@ class KnownValues(unittest.TestCase):
         g.atom_grid = {"H": (10, 110), "O": (10, 110),}
         self.assertTrue(g.weights is None)
 
+    def test_sort_grids(self):
+        grid0 = gen_grid.Grids(h2o)
+        grid0.atom_grid = {"H": (10, 50), "O": (10, 50),}
+        grid0.build(with_non0tab=False)
+        grid1 = gen_grid.Grids(h2o)
+        grid1.atom_grid = {"H": (10, 50), "O": (10, 50),}
+        grid1.sort_grids = True
+        grid1.build(with_non0tab=True)
+        idx = gen_grid.arg_group_grids(h2o, grid0.coords)
+        self.assertAlmostEqual(abs(grid1.coords - grid0.coords[idx]).max(), 0, 12)
+        self.assertAlmostEqual(abs(grid1.weights - grid0.weights[idx]).max(), 0, 12)
+        self.assertAlmostEqual(grid1.weights.sum(), grid0.weights.sum(), 9)
+
+        box_ids = numpy.floor((grid1.coords - grid1.coords.min(axis=0)) /
+                              gen_grid.GROUP_BOX_SIZE)
+        changes = abs(numpy.diff(box_ids, axis=0)).sum(axis=1) > 0
+        self.assertEqual(changes.sum() + 1, len(numpy.unique(box_ids, axis=0)))
+
+    def test_becke_cutoff(self):
+        mol = gto.M(atom=[['He', (0, 0, 1.5*i)] for i in range(12)], basis='sto3g')
+        grids = gen_grid.Grids(mol)
+        grids.atom_grid = (20, 50)
+        w0 = grids.build().weights
+        grids.becke_cutoff = 1e3
+        self.assertAlmostEqual(abs(grids.build().weights - w0).max(), 0, 12)
+
+        grids.becke_scheme = gen_grid.stratmann
+        grids.becke_cutoff = None
+        w0 = grids.build().weights
+        grids.becke_cutoff = 10
+        grids.build()
+        # Stratmann's switch function vanishes for distant atoms
+        coords = grids.coords - mol.atom_coord(5)
+        rho = numpy.exp(-.5 * numpy.einsum('ij,ij->i', coords, coords))
+        self.assertAlmostEqual(numpy.dot(rho, grids.weights - w0), 0, 7)
+
 
 if __name__ == "__main__":
     print("Test Grids")
@@ -209,6 +209,75 @@ class KnownValues(unittest.TestCase):
         v = mf._numint.nr_vxc(mol, mf.grids, '', dms, spin=0, hermi=0)[2]
         self.assertAlmostEqual(abs(v).max(), 0, 9)
 
+    def test_rks_vxc_sparse(self):
+        numpy.random.seed(10)
+        nao = h4.nao_nr()
+        dms = numpy.random.random((2,nao,nao))
+        ni = dft.numint.NumInt()
+        switch_size_bak = dft.numint.SPARSE_SWITCH_SIZE
+        ratio_bak = dft.numint.SPARSE_RATIO
+        try:
+            for xc in ('LDA,', 'B88,', 'M06L'):
+                # The dense algorithm as the reference
+                dft.numint.SPARSE_SWITCH_SIZE = 10000
+                ref = ni.nr_vxc(h4, mf_h4.grids, xc, dms, spin=0, hermi=0)
+                dft.numint.SPARSE_SWITCH_SIZE = 0
+                for ratio in (1, 0):
+                    dft.numint.SPARSE_RATIO = ratio
+                    v = ni.nr_vxc(h4, mf_h4.grids, xc, dms, spin=0, hermi=0)
+                    self.assertAlmostEqual(abs(v[0] - ref[0]).max(), 0, 9)
+                    self.assertAlmostEqual(abs(v[1] - ref[1]).max(), 0, 9)
+                    # M06L potential is huge for the random (non-positive) density
+                    self.assertAlmostEqual(abs(v[2] - ref[2]).max() / abs(ref[2]).max(), 0, 12)
+
+            mo_coeff = numpy.random.random((nao,nao))
+            mo_occ = numpy.zeros(nao)
+            mo_occ[:2] = 2
+            dm = numpy.dot(mo_coeff*mo_occ, mo_coeff.T)
+            v0 = ni.nr_vxc(h4, mf_h4.grids, 'B88,', dm)[2]
+            dm = lib.tag_array(dm, mo_coeff=mo_coeff, mo_occ=mo_occ)
+            v1 = ni.nr_vxc(h4, mf_h4.grids, 'B88,', dm)[2]
+            self.assertAlmostEqual(abs(v1 - v0).max(), 0, 9)
+        finally:
+            dft.numint.SPARSE_SWITCH_SIZE = switch_size_bak
+            dft.numint.SPARSE_RATIO = ratio_bak
+
+    def test_cache_ao(self):
+        numpy.random.seed(10)
+        nao = h4.nao_nr()
+        dms = numpy.random.random((2,nao,nao))
+        ni = dft.numint.NumInt()
+        v0 = ni.nr_vxc(h4, mf_h4.grids, 'B88,', dms, spin=0, hermi=0)[2]
+
+        ni.cache_ao = True
+        ni.cache_ao_max_memory = .5
+        v1 = ni.nr_vxc(h4, mf_h4.grids, 'B88,', dms, spin=0, hermi=0, max_memory=1)[2]
+        cache = ni._ao_cache
+        self.assertTrue(cache._h5 is not None)
+        self.assertTrue(cache.mem_size > 0)
+        v2 = ni.nr_vxc(h4, mf_h4.grids, 'B88,', dms, spin=0, hermi=0, max_memory=1)[2]
+        self.assertTrue(ni._ao_cache is cache)
+        for key, ao in cache.blocks.items():
+            self.assertFalse(cache.load(key).flags.writeable)
+        self.assertTrue(any(isinstance(ao, str) for ao in cache.blocks.values()))
+        self.assertAlmostEqual(abs(v1 - v0).max(), 0, 12)
+        self.assertAlmostEqual(abs(v2 - v0).max(), 0, 12)
+
+        h4_1 = h4.set_geom_('H 0 0 0; H 0 0 9; H 0 9 0; H 0 9 9.1', inplace=False)
+        grids = dft.gen_grid.Grids(h4_1)
+        grids.atom_grid = {"H": (50, 110)}
+        v0 = dft.numint.NumInt().nr_vxc(h4_1, grids, 'B88,', dms, spin=0, hermi=0)[2]
+        v1 = ni.nr_vxc(h4_1, grids, 'B88,', dms, spin=0, hermi=0)[2]
+        self.assertTrue(ni._ao_cache is not cache)
+        self.assertAlmostEqual(abs(v1 - v0).max(), 0, 12)
+
+        # Rebuilding the grids drops the cache
+        cache = ni._ao_cache
+        grids.build(with_non0tab=True)
+        v1 = ni.nr_vxc(h4_1, grids, 'B88,', dms, spin=0, hermi=0)[2]
+        self.assertTrue(ni._ao_cache is not cache)
+        self.assertAlmostEqual(abs(v1 - v0).max(), 0, 12)
+
     def test_uks_vxc(self):
         numpy.random.seed(10)
         nao = h2o.nao_nr()
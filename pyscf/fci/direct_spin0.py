@@ -93,6 +93,35 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None):
 # no *.5 because FCIcontract_2e_spin0 only compute half of the contraction
     return lib.transpose_sum(ci1, inplace=True).reshape(fcivec.shape)
 
+# contract_2e may be replaced by fci.addons.fix_spin_(module)
+_contract_2e = contract_2e
+
+def contract_2e_multi(eri, fcivecs, norb, nelec, link_index=None):
+    '''Contract the 2-electron Hamiltonian with a list of singlet FCI vectors.
+    See also :func:`direct_spin1.contract_2e_multi`
+    '''
+    eri = ao2mo.restore(4, eri, norb)
+    lib.transpose_sum(eri, inplace=True)
+    eri *= .5
+    link_index = _unpack(norb, nelec, link_index)
+    na, nlink = link_index.shape[:2]
+    nvec = len(fcivecs)
+    if nvec == 0:
+        return []
+    ci0 = numpy.empty((na,na,nvec))
+    for i, c in enumerate(fcivecs):
+        ci0[:,:,i] = numpy.reshape(c, (na,na))
+    ci1 = numpy.empty_like(ci0)
+
+    libfci.FCIcontract_2e_spin0_multi(eri.ctypes.data_as(ctypes.c_void_p),
+                                      ci0.ctypes.data_as(ctypes.c_void_p),
+                                      ci1.ctypes.data_as(ctypes.c_void_p),
+                                      ctypes.c_int(nvec), ctypes.c_int(norb),
+                                      ctypes.c_int(na), ctypes.c_int(nlink),
+                                      link_index.ctypes.data_as(ctypes.c_void_p))
+    return [lib.transpose_sum(ci1[:,:,i].copy(), inplace=True).reshape(numpy.shape(c))
+            for i, c in enumerate(fcivecs)]
+
 absorb_h1e = direct_spin1.absorb_h1e
 
 @lib.with_doc(direct_spin1.make_hdiag.__doc__)
@@ -277,6 +306,12 @@ def kernel_ms0(fci, h1e, eri, norb, nelec, ci0=None, link_index=None,
     def hop(c):
         hc = fci.contract_2e(h2e, c.reshape(na,na), norb, nelec, link_index)
         return hc.ravel()
+    if getattr(fci, 'contract_2e_multi', None):
+        def hop_multi(cs):
+            hcs = fci.contract_2e_multi(h2e, [c.reshape(na,na) for c in cs],
+                                        norb, nelec, link_index)
+            return [hc.ravel() for hc in hcs]
+        hop.multi = hop_multi
 
 #TODO: check spin of initial guess
     if ci0 is None:
@@ -340,6 +375,15 @@ class FCISolver(direct_spin1.FCISolver):
     def contract_2e(self, eri, fcivec, norb, nelec, link_index=None, **kwargs):
         return contract_2e(eri, fcivec, norb, nelec, link_index, **kwargs)
 
+    def contract_2e_multi(self, eri, fcivecs, norb, nelec, link_index=None,
+                          **kwargs):
+        if (direct_spin1._is_default_method(self, FCISolver, 'contract_2e') and
+            contract_2e is _contract_2e):
+            return contract_2e_multi(eri, fcivecs, norb, nelec, link_index)
+        else:
+            return [self.contract_2e(eri, c, norb, nelec, link_index, **kwargs)
+                    for c in fcivecs]
+
     def get_init_guess(self, norb, nelec, nroots, hdiag):
         return get_init_guess(norb, nelec, nroots, hdiag)
 
@@ -45,6 +45,7 @@ import scipy.linalg
 from pyscf import lib
 from pyscf import ao2mo
 from pyscf.lib import logger
+from pyscf.lib import checkpoint
 from pyscf.fci import cistring
 from pyscf.fci import rdm
 from pyscf.fci import spin_op
@@ -125,6 +126,41 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None):
                                 link_indexb.ctypes.data_as(ctypes.c_void_p))
     return ci1
 
+# contract_2e may be replaced by fci.addons.fix_spin_(module)
+_contract_2e = contract_2e
+
+def contract_2e_multi(eri, fcivecs, norb, nelec, link_index=None):
+    '''Contract the 2-electron Hamiltonian with a list of FCI vectors.  The
+    results are the same to [contract_2e(eri, c, ...) for c in fcivecs].  The
+    string links and the integrals are shared by all vectors in one pass.
+
+    Returns:
+        A list of FCI vectors which have the same shapes as the input vectors
+    '''
+    eri = ao2mo.restore(4, eri, norb)
+    link_indexa, link_indexb = _unpack(norb, nelec, link_index)
+    na, nlinka = link_indexa.shape[:2]
+    nb, nlinkb = link_indexb.shape[:2]
+    nvec = len(fcivecs)
+    if nvec == 0:
+        return []
+    # The C kernel takes the interleaved vectors ci0[na,nb,nvec]
+    ci0 = numpy.empty((na,nb,nvec))
+    for i, c in enumerate(fcivecs):
+        ci0[:,:,i] = numpy.reshape(c, (na,nb))
+    ci1 = numpy.empty_like(ci0)
+
+    libfci.FCIcontract_2e_spin1_multi(eri.ctypes.data_as(ctypes.c_void_p),
+                                      ci0.ctypes.data_as(ctypes.c_void_p),
+                                      ci1.ctypes.data_as(ctypes.c_void_p),
+                                      ctypes.c_int(nvec), ctypes.c_int(norb),
+                                      ctypes.c_int(na), ctypes.c_int(nb),
+                                      ctypes.c_int(nlinka), ctypes.c_int(nlinkb),
+                                      link_indexa.ctypes.data_as(ctypes.c_void_p),
+                                      link_indexb.ctypes.data_as(ctypes.c_void_p))
+    return [ci1[:,:,i].copy().reshape(numpy.shape(c))
+            for i, c in enumerate(fcivecs)]
+
 def make_hdiag(h1e, eri, norb, nelec):
     '''Diagonal Hamiltonian for Davidson preconditioner
     '''
@@ -482,6 +518,12 @@ def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, link_index=None,
     def hop(c):
         hc = fci.contract_2e(h2e, c, norb, nelec, (link_indexa,link_indexb))
         return hc.ravel()
+    if getattr(fci, 'contract_2e_multi', None):
+        def hop_multi(cs):
+            hcs = fci.contract_2e_multi(h2e, cs, norb, nelec,
+                                        (link_indexa,link_indexb))
+            return [hc.ravel() for hc in hcs]
+        hop.multi = hop_multi
 
     if ci0 is None:
         if callable(getattr(fci, 'get_init_guess', None)):
@@ -507,6 +549,10 @@ def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, link_index=None,
     if max_memory is None: max_memory = fci.max_memory
     if verbose is None: verbose = logger.Logger(fci.stdout, fci.verbose)
     tol_residual = getattr(fci, 'conv_tol_residual', None)
+    if 'checkpoint' not in kwargs:
+        ckpt = checkpoint.new(fci, 'fci', tag=lib.finger(hdiag))
+        if ckpt is not None:
+            kwargs['checkpoint'] = ckpt
 
     with lib.with_omp_threads(fci.threads):
         #e, c = lib.davidson(hop, ci0, precond, tol=fci.conv_tol, lindep=fci.lindep)
@@ -581,6 +627,10 @@ class FCISolver(lib.StreamObject):
         wfnsym : str or int
             Symmetry of wavefunction.  It is used only in direct_spin1_symm
             and direct_spin0_symm solver.
+        checkpoint : str
+            File to save the Davidson subspace of each iteration.  An
+            interrupted diagonalization restarts from the last saved
+            iteration.  See :mod:`lib.checkpoint`.
 
     Saved results
 
@@ -645,6 +695,7 @@ class FCISolver(lib.StreamObject):
         self.nelec = None
         self.eci = None
         self.ci = None
+        self.checkpoint = None
 
         keys = set(('max_cycle', 'max_space', 'conv_tol', 'lindep',
                     'level_shift', 'davidson_only', 'pspace_size', 'threads',
@@ -698,14 +749,33 @@ class FCISolver(lib.StreamObject):
     def contract_2e(self, eri, fcivec, norb, nelec, link_index=None, **kwargs):
         return contract_2e(eri, fcivec, norb, nelec, link_index, **kwargs)
 
+    def contract_2e_multi(self, eri, fcivecs, norb, nelec, link_index=None,
+                          **kwargs):
+        '''Contract the 2-electron Hamiltonian with a list of FCI vectors.
+        The batched kernel :func:`contract_2e_multi` is called unless the
+        method contract_2e is overloaded.
+        '''
+        if (_is_default_method(self, FCISolver, 'contract_2e') and
+            contract_2e is _contract_2e):
+            return contract_2e_multi(eri, fcivecs, norb, nelec, link_index)
+        else:
+            return [self.contract_2e(eri, c, norb, nelec, link_index, **kwargs)
+                    for c in fcivecs]
+
     def eig(self, op, x0=None, precond=None, **kwargs):
+        '''Diagonalize op by Davidson method.  If op has the attribute multi,
+        op.multi(xs) is called to apply op to several vectors at once.
+        '''
         if isinstance(op, numpy.ndarray):
             self.converged = True
             return scipy.linalg.eigh(op)
 
+        if callable(getattr(op, 'multi', None)):
+            aop = op.multi
+        else:
+            aop = lambda xs: [op(x) for x in xs]
         self.converged, e, ci = \
-                lib.davidson1(lambda xs: [op(x) for x in xs],
-                              x0, precond, lessio=self.lessio, **kwargs)
+                lib.davidson1(aop, x0, precond, lessio=self.lessio, **kwargs)
         if kwargs['nroots'] == 1:
             self.converged = self.converged[0]
             e = e[0]
@@ -826,6 +896,12 @@ class FCISolver(lib.StreamObject):
 FCI = FCISolver
 
 
+def _is_default_method(obj, cls, name):
+    '''Whether the method of obj is the one defined in class cls'''
+    fn = getattr(getattr(obj, name), '__func__', None)
+    fn_ref = getattr(cls, name)
+    return fn is getattr(fn_ref, '__func__', fn_ref)
+
 def _unpack_nelec(nelec, spin=None):
     if spin is None:
         spin = 0
@@ -75,6 +75,26 @@ class KnownValues(unittest.TestCase):
         ci3 = fci.direct_spin1.contract_2e(g2e, ci2, norb, neleci)
         self.assertAlmostEqual(numpy.linalg.norm(ci3), 127.49780293866368, 6)
 
+    def test_contract_multi(self):
+        hcref = [fci.direct_spin1.contract_2e(g2e, c, norb, neleci) for c in (ci2, ci3)]
+        hc = fci.direct_spin1.contract_2e_multi(g2e, [ci2, ci3], norb, neleci)
+        self.assertAlmostEqual(abs(hc[0] - hcref[0]).max(), 0, 10)
+        self.assertAlmostEqual(abs(hc[1] - hcref[1]).max(), 0, 10)
+        cis = [ci0, (ci0*ci0).ravel(), ci0*2+1]
+        hcref = [fci.direct_spin0.contract_2e(g2e, c.reshape(ci0.shape), norb, nelec)
+                 for c in cis]
+        hc = fci.direct_spin0.contract_2e_multi(g2e, cis, norb, nelec)
+        for i in range(3):
+            self.assertEqual(hc[i].shape, cis[i].shape)
+            self.assertAlmostEqual(abs(hc[i].reshape(ci0.shape) - hcref[i]).max(), 0, 10)
+
+        myci = fci.direct_spin1.FCI()
+        myci.nroots = 3
+        myci.davidson_only = True
+        e = myci.kernel(h1e, g2e, norb, nelec)[0]
+        myci.contract_2e = lambda *args: fci.direct_spin1.contract_2e(*args)
+        self.assertAlmostEqual(abs(myci.kernel(h1e, g2e, norb, nelec)[0] - e).max(), 0, 8)
+
     def test_kernel(self):
         eref, cref = fci.direct_spin0.kernel(h1e, g2e, norb, mol.nelectron)
         e, c = fci.direct_spin1.kernel(h1e, g2e, norb, nelec)
@@ -32,6 +32,7 @@ from pyscf import lib
 from pyscf.lib import param
 from pyscf.data import elements
 from pyscf.lib import logger
+from pyscf.lib import intcache
 from pyscf.gto import cmd_args
 from pyscf.gto import basis
 from pyscf.gto import moleintor
@@ -2854,6 +2855,9 @@ Note when symmetry attributes is assigned, the molecule needs to be placed in a
         Returns:
             ndarray of 1-electron integrals, can be either 2-dim or 3-dim, depending on comp
 
+        If :data:`lib.intcache.ENABLED` is set, the integrals are loaded from
+        (or saved to) the on-disk integral cache :mod:`lib.intcache`.
+
         Examples:
 
         >>> mol.build(atom='H 0 0 0; H 0 0 1.1', basis='sto-3g')
@@ -2885,6 +2889,17 @@ Note when symmetry attributes is assigned, the molecule needs to be placed in a
                 shls_slice = (0, self.nbas, 0, self.nbas)
         else:
             bas = self._bas
+
+        if intcache.ENABLED and out is None:
+            key = intcache.fingerprint(intor, self._atm, bas, self._env,
+                                       shls_slice, comp, hermi, aosym)
+            ints = intcache.load(key)
+            if ints is None:
+                ints = moleintor.getints(intor, self._atm, bas, self._env,
+                                         shls_slice, comp, hermi, aosym)
+                intcache.save(key, ints)
+            return ints
+
         return moleintor.getints(intor, self._atm, bas, self._env,
                                  shls_slice, comp, hermi, aosym, out=out)
 
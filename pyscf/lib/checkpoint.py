@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Iteration-level checkpoint/restart
+
+The iterative solvers (SCF, CCSD, CASSCF and the Davidson diagonalization of
+FCI) save their complete iteration state, including the DIIS subspace and
+the Davidson trial vectors, in a checkpoint file when the attribute
+``checkpoint`` of the method object is set to a filename::
+
+    mycc = cc.CCSD(mf)
+    mycc.checkpoint = 'ccsd.ckpt'
+    mycc.kernel()
+
+When the job is killed and restarted with the same input, the solver picks
+up the state from the checkpoint file and continues from the iteration
+after the last saved one.  The state of each solver is saved under its own
+key, so one checkpoint file can be shared by the solvers of a calculation.
+The state is removed from the file when the solver finishes.
+
+The checkpoint file is updated with :func:`lib.chkfile.dump`, which writes
+a new file and renames it to the checkpoint file.  An interrupted write
+never corrupts the previous checkpoint.  With ``async_flush`` (default
+:data:`ASYNC_FLUSH`) the file is written in a background thread while the
+next iteration is running.
+'''
+
+import threading
+import numpy
+import h5py
+from pyscf.lib import chkfile
+from pyscf import __config__
+
+# Save the state every INTERVAL iterations
+INTERVAL = getattr(__config__, 'lib_checkpoint_interval', 1)
+ASYNC_FLUSH = getattr(__config__, 'lib_checkpoint_async_flush', True)
+
+# Serialize the writes of all checkpoints and chkfiles.  Different solvers
+# may share the same checkpoint file
+_lock = chkfile._lock
+
+
+class Checkpoint(object):
+    '''Checkpoint of an iterative solver
+
+    Attributes:
+        filename : str
+            The checkpoint file.
+        key : str
+            The HDF5 group to hold the state of the solver.
+        tag : float
+            A fingerprint of the problem.  A saved state with a different tag
+            is ignored by :meth:`load`.
+        interval : int
+            Save the state every interval iterations.
+        async_flush : bool
+            Whether to write the checkpoint file in a background thread.
+    '''
+    def __init__(self, filename, key='checkpoint', tag=None,
+                 interval=None, async_flush=None):
+        if interval is None:
+            interval = INTERVAL
+        if async_flush is None:
+            async_flush = ASYNC_FLUSH
+        self.filename = filename
+        self.key = key
+        self.tag = tag
+        self.interval = interval
+        self.async_flush = async_flush
+        self._thread = None
+        self._error = None
+
+    def load(self):
+        '''The state saved in the checkpoint file, or None if the file does
+        not hold a state (of the same tag).'''
+        self.wait()
+        with _lock:
+            if not h5py.is_hdf5(self.filename):
+                return None
+            with h5py.File(self.filename, 'r') as f:
+                if self.key not in f:
+                    return None
+            state = chkfile.load(self.filename, self.key)
+        if self.tag is not None and ('tag' not in state or
+                                     not numpy.allclose(state['tag'], self.tag)):
+            return None
+        return state
+
+    def save(self, state, cycle=None):
+        '''Save the state dict.  If cycle is given, the state is saved only at
+        every interval iterations.'''
+        if (cycle is not None and self.interval > 1 and
+            (cycle+1) % self.interval != 0):
+            return self
+        self.wait()
+        state = dict(state)
+        if self.tag is not None:
+            state['tag'] = self.tag
+        if self.async_flush:
+            # The arrays may be modified in place by the solver
+            state = _snapshot(state)
+            self._thread = threading.Thread(target=self._dump, args=(state,))
+            self._thread.start()
+        else:
+            self._dump(state)
+            self._raise()
+        return self
+
+    def _dump(self, state):
+        try:
+            with _lock:
+                chkfile.dump(self.filename, self.key, state, atomic=True)
+        except Exception as e:
+            self._error = e
+
+    def wait(self):
+        '''Wait for the background write to finish'''
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._raise()
+
+    def _raise(self):
+        if self._error is not None:
+            e, self._error = self._error, None
+            raise e
+
+    def clear(self):
+        '''Remove the state from the checkpoint file'''
+        self.wait()
+        with _lock:
+            chkfile.delete(self.filename, self.key, atomic=True)
+        return self
+
+
+def new(obj, key, tag=None):
+    '''The Checkpoint for the solver obj if obj.checkpoint is set, otherwise
+    None.  obj.checkpoint can be a filename or a :class:`Checkpoint` object
+    which provides the filename and the options.'''
+    ckpt = getattr(obj, 'checkpoint', None)
+    if not ckpt:
+        return None
+    elif isinstance(ckpt, Checkpoint):
+        return Checkpoint(ckpt.filename, key, tag, ckpt.interval,
+                          ckpt.async_flush)
+    else:
+        return Checkpoint(ckpt, key, tag)
+
+
+def _snapshot(obj):
+    if isinstance(obj, numpy.ndarray):
+        return obj.copy()
+    elif isinstance(obj, dict):
+        return dict((k, _snapshot(v)) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        return [_snapshot(v) for v in obj]
+    else:
+        return obj
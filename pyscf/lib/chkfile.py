@@ -16,8 +16,25 @@
 # Author: Qiming Sun <osirpt.sun@gmail.com>
 #
 
+import os
 import json
+import contextlib
+import shutil
+import threading
 import h5py
+from pyscf import __config__
+
+# Write the updated chkfile to a temporary file then rename it to chkfile.  A
+# job killed during dump leaves the old chkfile intact.  It copies the rest of
+# the file for every dump.  By default it is only used by lib.checkpoint and
+# the SCF/MCSCF results (scf.chkfile.dump_scf, mcscf.chkfile.dump_mcscf).
+ATOMIC_DUMP = getattr(__config__, 'lib_chkfile_atomic_dump', False)
+
+# Serialize the updates of chkfiles.  A chkfile may be shared by the
+# background writer of lib.checkpoint and the solver.
+_lock = threading.RLock()
+
+_replace = getattr(os, 'replace', os.rename)
 
 def load(chkfile, key):
     '''Load array(s) from chkfile
@@ -68,7 +85,7 @@ def load(chkfile, key):
         return load_as_dic(key, fh5)
 load_chkfile_key = load
 
-def dump(chkfile, key, value):
+def dump(chkfile, key, value, atomic=None):
     '''Save array(s) in chkfile
     
     Args:
@@ -81,6 +98,11 @@ def dump(chkfile, key, value):
             If value is a python dict or list, the key/value of the dict will
             be saved recursively as the HDF5 group/dataset structure.
 
+    Kwargs:
+        atomic : bool
+            Whether to write the updated chkfile to a temporary file and
+            rename it to chkfile.  Default is ATOMIC_DUMP.
+
     Returns:
         No return value
 
@@ -100,37 +122,107 @@ def dump(chkfile, key, value):
     >>> f['symm/Ci/op']
     <HDF5 dataset "op": shape (2,), type "|S1">
     '''
-    def save_as_group(key, value, root):
-        if isinstance(value, dict):
-            root1 = root.create_group(key)
-            for k in value:
-                save_as_group(k, value[k], root1)
-        elif isinstance(value, (tuple, list)):
+    if atomic is None:
+        atomic = ATOMIC_DUMP
+    with _update(chkfile, (key,), atomic) as fh5:
+        _save_as_group(key, value, fh5)
+dump_chkfile_key = save = dump
+
+def delete(chkfile, key, atomic=None):
+    '''Remove the dataset or group key from chkfile'''
+    if atomic is None:
+        atomic = ATOMIC_DUMP
+    with _lock:
+        if h5py.is_hdf5(chkfile):
+            with _update(chkfile, (key,), atomic):
+                pass
+
+def _save_as_group(key, value, root):
+    if isinstance(value, dict):
+        root1 = root.create_group(key)
+        for k in value:
+            _save_as_group(k, value[k], root1)
+    elif isinstance(value, (tuple, list)):
+        root1 = root.create_group(key + '__from_list__')
+        for k, v in enumerate(value):
+            _save_as_group('%06d'%k, v, root1)
+    else:
+        try:
+            root[key] = value
+        except (TypeError, ValueError) as e:
+            if not (e.args[0] == "Object dtype dtype('O') has no native HDF5 equivalent" or
+                    e.args[0].startswith('could not broadcast input array')):
+                raise e
             root1 = root.create_group(key + '__from_list__')
             for k, v in enumerate(value):
-                save_as_group('%06d'%k, v, root1)
+                _save_as_group('%06d'%k, v, root1)
+
+def _delete_key(fh5, key):
+    if key in fh5:
+        del(fh5[key])
+    elif key + '__from_list__' in fh5:
+        del(fh5[key+'__from_list__'])
+
+@contextlib.contextmanager
+def _update(chkfile, keys=(), atomic=None):
+    '''Open chkfile to update the entries keys.  The entries keys are removed
+    from the file before it is handed over.
+
+    If atomic is set, the file opened is a temporary copy of chkfile which
+    replaces chkfile when the context exits normally.  The entries keys are
+    not copied.  Unlike the in-place update, a job killed in the middle
+    leaves chkfile intact, and the space of the removed data is released.
+    '''
+    if atomic is None:
+        atomic = ATOMIC_DUMP
+    with _lock:
+        if not h5py.is_hdf5(chkfile):
+            with h5py.File(chkfile, 'w') as fh5:
+                yield fh5
+        elif not atomic:
+            with h5py.File(chkfile, 'r+') as fh5:
+                for key in keys:
+                    _delete_key(fh5, key)
+                yield fh5
         else:
+            tmpfile = '%s.%d.%d.tmp' % (chkfile, os.getpid(),
+                                        threading.current_thread().ident)
+            skip = set()
+            for key in keys:
+                skip.add('/' + key.strip('/'))
+                skip.add('/' + key.strip('/') + '__from_list__')
             try:
-                root[key] = value
-            except (TypeError, ValueError) as e:
-                if not (e.args[0] == "Object dtype dtype('O') has no native HDF5 equivalent" or
-                        e.args[0].startswith('could not broadcast input array')):
-                    raise e
-                root1 = root.create_group(key + '__from_list__')
-                for k, v in enumerate(value):
-                    save_as_group('%06d'%k, v, root1)
-
-    if h5py.is_hdf5(chkfile):
-        with h5py.File(chkfile, 'r+') as fh5:
-            if key in fh5:
-                del(fh5[key])
-            elif key + '__from_list__' in fh5:
-                del(fh5[key+'__from_list__'])
-            save_as_group(key, value, fh5)
-    else:
-        with h5py.File(chkfile, 'w') as fh5:
-            save_as_group(key, value, fh5)
-dump_chkfile_key = save = dump
+                with h5py.File(chkfile, 'r') as fin:
+                    with h5py.File(tmpfile, 'w') as fout:
+                        _copy_group(fin, fout, skip)
+                        yield fout
+                shutil.copymode(chkfile, tmpfile)
+                _fsync(tmpfile)
+                _replace(tmpfile, chkfile)
+            except BaseException:
+                if os.path.exists(tmpfile):
+                    os.remove(tmpfile)
+                raise
+
+def _copy_group(gin, gout, skip):
+    '''Copy the members of HDF5 group gin to gout, excluding the paths skip'''
+    for k in gin:
+        path = gin[k].name
+        if path in skip:
+            continue
+        elif (isinstance(gin[k], h5py.Group) and
+              any(p.startswith(path + '/') for p in skip)):
+            # Only part of the group is replaced
+            _copy_group(gin[k], gout.require_group(k), skip)
+        else:
+            gin.copy(k, gout)
+
+def _fsync(filename):
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
 
 def load_mol(chkfile):
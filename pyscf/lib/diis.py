@@ -337,6 +337,39 @@ class DIIS(object):
         self._H[1:nd+1,1:nd+1] = e_mat
         return self
 
+    def dump_state(self):
+        '''The complete DIIS state (subspace vectors, error vectors and the
+        overlap matrix) as a dict which can be saved in a checkpoint and
+        restored by :meth:`load_state`.'''
+        if self._buffer:
+            vecs = dict(self._buffer)
+        elif self._diisfile is not None:
+            vecs = dict((k, numpy.asarray(v)) for k, v in self._diisfile.items())
+        else:
+            vecs = {}
+        state = {'vecs': vecs,
+                 'bookkeep': numpy.asarray(self._bookkeep, dtype=int),
+                 'head': self._head,
+                 'err_vec_touched': self._err_vec_touched}
+        if self._H is not None:
+            state['H'] = self._H
+        return state
+
+    def load_state(self, state):
+        '''Restore the DIIS state generated by :meth:`dump_state`'''
+        for key, val in state['vecs'].items():
+            self._store(key, numpy.asarray(val))
+        self._bookkeep = [int(i) for i in state['bookkeep']]
+        self._head = int(state['head'])
+        self._err_vec_touched = bool(state['err_vec_touched'])
+        if 'H' in state:
+            self._H = numpy.array(state['H'])
+        if 'xprev' in self._buffer:
+            self._xprev = self._buffer['xprev']
+        elif self._diisfile is not None and 'xprev' in self._diisfile:
+            self._xprev = self._diisfile['xprev']
+        return self
+
 
 def restore(filename):
     '''Restore/construct diis object based on a diis file'''
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Persistent on-disk cache for AO integrals
+
+The integral tensors are stored under the directory :data:`CACHE_DIR` (default
+is ``lib.param.TMPDIR/pyscf_intcache``).  Each entry is addressed by the
+fingerprint of the integral environment (``_atm``, ``_bas``, ``_env``) and the
+integral name.  Entries are written to a temporary file then renamed in place
+so that the cache can be shared between concurrent processes.  When the total
+size of the cache exceeds :data:`MAX_SIZE` (in MB), the least recently used
+entries are removed.
+
+The cache is disabled by default.  It can be switched on in the global
+configuration file::
+
+    lib_intcache_enabled = True
+    lib_intcache_dir = '/scratch/pyscf_intcache'
+    lib_intcache_max_size = 20000  # MB
+
+or at runtime by setting ``lib.intcache.ENABLED = True``.
+'''
+
+import os
+import hashlib
+import tempfile
+import numpy
+from pyscf.lib import param
+from pyscf import __config__
+
+ENABLED = getattr(__config__, 'lib_intcache_enabled', False)
+CACHE_DIR = getattr(__config__, 'lib_intcache_dir', None)
+MAX_SIZE = getattr(__config__, 'lib_intcache_max_size', 10000)  # MB
+
+
+def cache_dir():
+    '''The directory to hold the cached integrals'''
+    if CACHE_DIR is None:
+        path = os.path.join(param.TMPDIR, 'pyscf_intcache')
+    else:
+        path = CACHE_DIR
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:  # created by another process
+            pass
+    return path
+
+def fingerprint(*args):
+    '''The content-addressed key of the given integral arguments.
+
+    Objects which carry the integral environment (e.g. Mole, Cell) are
+    represented by their ``_atm``, ``_bas``, ``_env`` (and ``_ecpbas``).
+    numpy arrays are hashed over their contents.  Other arguments are hashed
+    over their repr.
+
+    Examples:
+
+    >>> key = intcache.fingerprint('int1e_ovlp_sph', mol)
+    '''
+    sha = hashlib.sha1()
+    for x in args:
+        if hasattr(x, '_atm') and hasattr(x, '_bas') and hasattr(x, '_env'):
+            for a in (x._atm, x._bas, x._env, getattr(x, '_ecpbas', None)):
+                _hash_obj(sha, a)
+        else:
+            _hash_obj(sha, x)
+    return sha.hexdigest()
+
+def _hash_obj(sha, x):
+    if isinstance(x, numpy.ndarray):
+        x = numpy.ascontiguousarray(x)
+        sha.update(str((x.dtype, x.shape)).encode())
+        sha.update(x.data)
+    else:
+        sha.update(repr(x).encode())
+
+def load(key):
+    '''Load the cached array.  The array is memory-mapped in copy-on-write
+    mode.  None is returned if the key is not found in the cache.'''
+    path = os.path.join(cache_dir(), key + '.npy')
+    try:
+        dat = numpy.load(path, mmap_mode='c')
+        _touch(path)
+    except (IOError, OSError, ValueError):
+        # Not cached, or removed by another process
+        return None
+    return dat
+
+def save(key, dat):
+    '''Save the array in the cache then return the input array'''
+    path = os.path.join(cache_dir(), key + '.npy')
+    fd, tmpfile = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            numpy.save(f, numpy.asarray(dat))
+        os.rename(tmpfile, path)
+    except (IOError, OSError):
+        _remove(tmpfile)
+        return dat
+    evict()
+    return dat
+
+def h5file(key):
+    '''Filename of the cached HDF5 file.  None is returned if the key is not
+    found in the cache.'''
+    path = os.path.join(cache_dir(), key + '.h5')
+    if os.path.isfile(path):
+        _touch(path)
+        return path
+    else:
+        return None
+
+def save_h5(key, h5obj, dataname):
+    '''Copy the dataset (or group) dataname of the given HDF5 file (or HDF5
+    group) to the cache'''
+    import h5py
+    path = os.path.join(cache_dir(), key + '.h5')
+    fd, tmpfile = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        with h5py.File(tmpfile, 'w') as fcache:
+            if isinstance(h5obj, h5py.Group):
+                fcache.copy(h5obj[dataname], dataname)
+            else:
+                with h5py.File(h5obj, 'r') as fsrc:
+                    fcache.copy(fsrc[dataname], dataname)
+        os.rename(tmpfile, path)
+    except (IOError, OSError):
+        _remove(tmpfile)
+        return h5obj
+    evict()
+    return h5obj
+
+def evict(max_size=None):
+    '''Remove the least recently used entries until the cache size is below
+    max_size (in MB)'''
+    if max_size is None:
+        max_size = MAX_SIZE
+    path = cache_dir()
+    entries = []
+    for f in os.listdir(path):
+        if f.endswith(('.npy', '.h5')):
+            f = os.path.join(path, f)
+            try:
+                st = os.stat(f)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, f))
+
+    size = sum(x[1] for x in entries)
+    for mtime, fsize, f in sorted(entries):
+        if size <= max_size * 1e6:
+            break
+        _remove(f)
+        size -= fsize
+
+def clear():
+    '''Remove all entries of the cache'''
+    evict(0)
+
+def _touch(path):
+    # Entries are evicted based on mtime.  atime is not reliable on file
+    # systems mounted with noatime/relatime.
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -53,6 +53,12 @@ PROJECT_OUT_CONV_EIGS = \
 
 FOLLOW_STATE = getattr(__config__, 'lib_linalg_helper_davidson_follow_state', False)
 
+# Where to hold the trial vectors when they do not fit in max_memory.  'h5'
+# for an HDF5 scratch file, 'memmap' for a numpy.memmap on the scratch disk.
+# A class which provides the interface of _Xlist can be assigned to plug in
+# other storage.
+DAVIDSON_STORE = getattr(__config__, 'lib_linalg_helper_davidson_store', 'h5')
+
 
 def safe_eigh(h, s, lindep=SAFE_EIGH_LINDEP):
     '''Solve generalized eigenvalue problem  h v = w s v.
@@ -258,7 +264,7 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
              lindep=DAVIDSON_LINDEP, max_memory=MAX_MEMORY,
              dot=numpy.dot, callback=None,
              nroots=1, lessio=False, pick=None, verbose=logger.WARN,
-             follow_state=FOLLOW_STATE, tol_residual=None):
+             follow_state=FOLLOW_STATE, tol_residual=None, checkpoint=None):
     '''Davidson diagonalization method to solve  a c = e c.  Ref
     [1] E.R. Davidson, J. Comput. Phys. 17 (1), 87-94 (1975).
     [2] http://people.inf.ethz.ch/arbenz/ewp/Lnotes/chapter11.pdf
@@ -313,6 +319,10 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
             If the solution dramatically changes in two iterations, clean the
             subspace and restart the iteration with the old solution.  It can
             help to improve numerical stability.  Default is False.
+        checkpoint : :class:`lib.checkpoint.Checkpoint`
+            To save the subspace and the trial vectors of each iteration.  If
+            the checkpoint holds the state of an interrupted run, the
+            iterations are continued from the saved state.
 
     Returns:
         conv : bool
@@ -357,8 +367,9 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
     # max_space*2 for holding ax and xs, nroots*2 for holding axt and xt
     _incore = max_memory*1e6/x0[0].nbytes > max_space*2+nroots*3
     lessio = lessio and not _incore
-    log.debug1('max_cycle %d  max_space %d  max_memory %d  incore %s',
-               max_cycle, max_space, max_memory, _incore)
+    blksize = _block_size(max_memory, x0[0].nbytes, max_space, nroots, _incore)
+    log.debug1('max_cycle %d  max_space %d  max_memory %d  incore %s  blksize %d',
+               max_cycle, max_space, max_memory, _incore, blksize)
     dtype = None
     heff = None
     fresh_start = True
@@ -366,15 +377,47 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
     v = None
     conv = [False] * nroots
     emin = None
-
-    for icyc in range(max_cycle):
+    icyc0 = 0
+
+    if checkpoint is not None:
+        state = checkpoint.load()
+        if state is not None and len(state['x0'][0]) == x0[0].size:
+            icyc0 = int(state['icyc']) + 1
+            log.debug('Restart davidson from checkpoint %s after cycle %d',
+                      checkpoint.filename, icyc0)
+            x0 = [numpy.asarray(x) for x in state['x0']]
+            e = numpy.asarray(state['e'])
+            v = numpy.asarray(state['v'])
+            conv = [bool(x) for x in state['conv']]
+            max_dx_last = state['max_dx_last']
+            fresh_start = bool(state['fresh_start'])
+            if 'emin' in state:
+                emin = state['emin']
+            if not fresh_start:
+                if _incore:
+                    xs = []
+                    ax = []
+                else:
+                    xs = _new_xlist()
+                    ax = _new_xlist()
+                for xi, axi in zip(state['xs'], state['ax']):
+                    xs.append(numpy.asarray(xi))
+                    ax.append(numpy.asarray(axi))
+                space = len(xs)
+                xt = [numpy.asarray(x) for x in state['xt']]
+                dtype = numpy.result_type(ax[0], xs[0])
+                heff = numpy.empty((max_space+nroots,max_space+nroots), dtype=dtype)
+                heff[:space,:space] = state['heff']
+        state = None
+
+    for icyc in range(icyc0, max_cycle):
         if fresh_start:
             if _incore:
                 xs = []
                 ax = []
             else:
-                xs = _Xlist()
-                ax = _Xlist()
+                xs = _new_xlist()
+                ax = _new_xlist()
             space = 0
 # Orthogonalize xt space because the basis of subspace xs must be orthogonal
 # but the eigenvectors x0 might not be strictly orthogonal
@@ -407,17 +450,7 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
         elast = e
         vlast = v
         conv_last = conv
-        for i in range(space):
-            if head <= i < head+rnow:
-                for k in range(i-head+1):
-                    heff[head+k,i] = dot(xt[k].conj(), axt[i-head])
-                    heff[i,head+k] = heff[head+k,i].conj()
-            else:
-                axi = numpy.asarray(ax[i])
-                for k in range(rnow):
-                    heff[head+k,i] = dot(xt[k].conj(), axi)
-                    heff[i,head+k] = heff[head+k,i].conj()
-                axi = None
+        _fill_heff(heff, xt, axt, ax, head, dot, blksize)
         axt = None
 
         w, v = scipy.linalg.eigh(heff[:space,:space])
@@ -434,11 +467,11 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
             v = v[:,:nroots]
 
         x0 = None
-        x0 = _gen_x0(v, xs)
+        x0 = _gen_x0(v, xs, blksize)
         if lessio:
             ax0 = aop(x0)
         else:
-            ax0 = _gen_x0(v, ax)
+            ax0 = _gen_x0(v, ax, blksize)
 
         if SORT_EIG_BY_SIMILARITY:
             dx_norm = [0] * nroots
@@ -477,7 +510,7 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
             log.debug('davidson %d %d  |r|= %4.3g  e= %s  max|de|= %4.3g  lindep= %4.3g',
                       icyc, space, max_dx_norm, e, de[ide], norm_min)
             log.debug('Large |r| detected, restore to previous x0')
-            x0 = _gen_x0(vlast, xs)
+            x0 = _gen_x0(vlast, xs, blksize)
             fresh_start = True
             continue
 
@@ -502,11 +535,7 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
                     xt[k] = None
         xt = [xi for xi in xt if xi is not None]
 
-        for i in range(space):
-            xsi = numpy.asarray(xs[i])
-            for xi in xt:
-                xi -= xsi * dot(xsi.conj(), xi)
-            xsi = None
+        _project_out(xt, xs, dot, blksize)
         norm_min = 1
         for i,xi in enumerate(xt):
             norm = numpy.sqrt(dot(xi.conj(), xi).real)
@@ -528,9 +557,25 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
         max_dx_last = max_dx_norm
         fresh_start = space+nroots > max_space
 
+        if checkpoint is not None:
+            state = {'icyc': icyc, 'x0': list(x0), 'e': e, 'v': v,
+                     'conv': numpy.asarray(conv), 'max_dx_last': max_dx_last,
+                     'fresh_start': fresh_start}
+            if emin is not None:
+                state['emin'] = emin
+            if not fresh_start:
+                state['xs'] = [numpy.asarray(x) for x in xs]
+                state['ax'] = [numpy.asarray(x) for x in ax]
+                state['xt'] = xt
+                state['heff'] = heff[:space,:space]
+            checkpoint.save(state, icyc)
+            state = None
+
         if callable(callback):
             callback(locals())
 
+    if checkpoint is not None:
+        checkpoint.clear()
     x0 = [x for x in x0]  # nparray -> list
     return numpy.asarray(conv), e, x0
 
@@ -732,8 +777,8 @@ def davidson_nosym1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
                 xs = []
                 ax = []
             else:
-                xs = _Xlist()
-                ax = _Xlist()
+                xs = _new_xlist()
+                ax = _new_xlist()
             space = 0
 # Orthogonalize xt space because the basis of subspace xs must be orthogonal
 # but the eigenvectors x0 might not be strictly orthogonal
@@ -1050,9 +1095,9 @@ def dgeev1(abop, x0, precond, type=1, tol=1e-12, max_cycle=50, max_space=12,
                 ax = []
                 bx = []
             else:
-                xs = _Xlist()
-                ax = _Xlist()
-                bx = _Xlist()
+                xs = _new_xlist()
+                ax = _new_xlist()
+                bx = _new_xlist()
             space = 0
 # Orthogonalize xt space because the basis of subspace xs must be orthogonal
 # but the eigenvectors x0 are very likely non-orthogonal when A is non-Hermitian.
@@ -1274,8 +1319,8 @@ def krylov(aop, b, x0=None, tol=1e-10, max_cycle=30, dot=numpy.dot,
         xs = []
         ax = []
     else:
-        xs = _Xlist()
-        ax = _Xlist()
+        xs = _new_xlist()
+        ax = _new_xlist()
 
     max_cycle = min(max_cycle, ndim)
     for cycle in range(max_cycle):
@@ -1420,15 +1465,97 @@ def _qr(xs, dot, lindep=1e-14):
             nv += 1
     return qs[:nv], numpy.linalg.inv(rmat[:nv,:nv])
 
-def _gen_x0(v, xs):
+def _gen_x0(v, xs, blksize=1):
     space, nroots = v.shape
-    x0 = numpy.einsum('c,x->cx', v[space-1], numpy.asarray(xs[space-1]))
-    for i in reversed(range(space-1)):
-        xsi = numpy.asarray(xs[i])
-        for k in range(nroots):
-            x0[k] += v[i,k] * xsi
+    x0 = None
+    for p0, p1, xsblk in _iter_blocks(xs, blksize, space):
+        if x0 is None:
+            x0 = numpy.dot(v[p0:p1].T, xsblk)
+        else:
+            x0 += numpy.dot(v[p0:p1].T, xsblk)
     return x0
 
+def _block_size(max_memory, vec_nbytes, max_space, nroots, incore):
+    '''Number of trial vectors to be loaded at once in the blocked
+    operations of the Davidson solver'''
+    # nroots*4 for x0, ax0, xt and the temporary copy of xt
+    nvec = max_memory*1e6/vec_nbytes - nroots*4
+    if incore:
+        nvec -= max_space * 2
+    else:
+        # Two buffers when prefetching blocks from disk
+        nvec *= .5
+    return max(1, int(nvec))
+
+def _iter_blocks(xs, blksize, nvec=None):
+    '''Iterate over the first nvec vectors of xs block by block.  Each block
+    is returned as a 2D array.  For the vectors stored on disk, the next
+    block is read in background while the current block is being used.
+    The buffer of the block is reused in the next iteration.
+    '''
+    if nvec is None:
+        nvec = len(xs)
+    if nvec == 0:
+        return
+    blksize = max(1, min(blksize, nvec))
+    if not hasattr(xs, 'read_block'):
+        for p0, p1 in misc.prange(0, nvec, blksize):
+            if p1 - p0 == 1:
+                yield p0, p1, numpy.asarray(xs[p0]).reshape(1,-1)
+            else:
+                yield p0, p1, numpy.asarray(xs[p0:p1])
+        return
+
+    x = xs[0]
+    buf = numpy.empty((blksize,x.size), dtype=x.dtype)
+    buf_prefetch = numpy.empty_like(buf)
+    # An empty block at the end to synchronize the last prefetch
+    blocks = list(misc.prange(0, nvec, blksize)) + [(nvec, nvec)]
+    with misc.call_in_background(xs.read_block) as prefetch:
+        prefetch(blocks[0][0], blocks[0][1], buf_prefetch)
+        for i, (p0, p1) in enumerate(blocks[:-1]):
+            buf, buf_prefetch = buf_prefetch, buf
+            # Launching the next prefetch waits for the current block
+            prefetch(blocks[i+1][0], blocks[i+1][1], buf_prefetch)
+            yield p0, p1, buf[:p1-p0]
+
+def _dot_blocks(xs, ys, dot):
+    '''Matrix of the inner products dot(xs[i].conj(), ys[j])'''
+    if dot is numpy.dot:
+        return numpy.dot(numpy.asarray(xs).conj(), numpy.asarray(ys).T)
+    else:
+        return numpy.array([[dot(xi.conj(), yj) for yj in ys] for xi in xs])
+
+def _fill_heff(heff, xt, axt, ax, head, dot, blksize):
+    '''Compute the elements of the subspace matrix associated to the new
+    trial vectors xt (the columns head:head+len(xt) of heff)'''
+    rnow = len(xt)
+    space = head + rnow
+    for i in range(rnow):
+        for k in range(i+1):
+            heff[head+k,head+i] = dot(xt[k].conj(), axt[i])
+            heff[head+i,head+k] = heff[head+k,head+i].conj()
+    for p0, p1, axblk in _iter_blocks(ax, blksize, head):
+        h = _dot_blocks(xt, axblk, dot)
+        heff[head:space,p0:p1] = h
+        heff[p0:p1,head:space] = h.T.conj()
+
+def _project_out(xt, xs, dot, blksize):
+    '''Remove from xt the components in the (orthonormal) space xs.
+
+    The projection is applied twice (CGS2).  One pass of classical
+    Gram-Schmidt loses the orthogonality when xt is nearly linearly dependent
+    on xs.
+    '''
+    if len(xt) == 0:
+        return xt
+    for i in range(2):
+        for p0, p1, xsblk in _iter_blocks(xs, blksize):
+            ovlp = _dot_blocks(xsblk, xt, dot)
+            for k, xi in enumerate(xt):
+                xi -= numpy.dot(ovlp[:,k], xsblk)
+    return xt
+
 def _sort_by_similarity(w, v, nroots, conv, vlast, emin=None, heff=None):
     if not any(conv) or vlast is None:
         return w[:nroots], v[:,:nroots]
@@ -1506,6 +1633,70 @@ class _Xlist(list):
         key = self.index.pop(index)
         del(self.scr_h5[str(key)])
 
+    def read_block(self, p0, p1, out):
+        '''Load vectors p0:p1 into the rows of the 2D array out'''
+        for i in range(p0, p1):
+            self.scr_h5[str(self.index[i])].read_direct(out[i-p0])
+        return out
+
+class _XlistMemmap(list):
+    '''Trial vectors held in a numpy.memmap on the scratch disk.  The memmap
+    grows when more vectors are appended.'''
+    def __init__(self):
+        self._tmpfile = tempfile.NamedTemporaryFile(dir=parameters.TMPDIR)
+        self._buf = None
+        self.index = []
+
+    def _reserve(self, x):
+        nslots = len(self.index) + 1
+        if self._buf is None:
+            self._buf = numpy.memmap(self._tmpfile, dtype=x.dtype, mode='w+',
+                                     shape=(max(nslots, 8), x.size))
+        elif nslots > self._buf.shape[0]:
+            self._buf.flush()
+            shape = (self._buf.shape[0]*2, x.size)
+            self._tmpfile.truncate(self._buf.itemsize * shape[0] * shape[1])
+            self._buf = numpy.memmap(self._tmpfile, dtype=self._buf.dtype,
+                                     mode='r+', shape=shape)
+
+    def __getitem__(self, n):
+        return self._buf[self.index[n]]
+
+    def append(self, x):
+        x = numpy.asarray(x)
+        self._reserve(x)
+        slot = set(range(len(self.index)+1)).difference(self.index).pop()
+        self.index.append(slot)
+        self._buf[slot] = x.ravel()
+
+    def extend(self, x):
+        for xi in x:
+            self.append(xi)
+
+    def __setitem__(self, n, x):
+        self._buf[self.index[n]] = numpy.asarray(x).ravel()
+
+    def __len__(self):
+        return len(self.index)
+
+    def pop(self, index):
+        self.index.pop(index)
+
+    def read_block(self, p0, p1, out):
+        '''Load vectors p0:p1 into the rows of the 2D array out'''
+        for i in range(p0, p1):
+            out[i-p0] = self._buf[self.index[i]]
+        return out
+
+def _new_xlist():
+    '''Create the on-disk storage for trial vectors'''
+    if callable(DAVIDSON_STORE):
+        return DAVIDSON_STORE()
+    elif DAVIDSON_STORE == 'memmap':
+        return _XlistMemmap()
+    else:
+        return _Xlist()
+
 del(SAFE_EIGH_LINDEP, DAVIDSON_LINDEP, DSOLVE_LINDEP, MAX_MEMORY)
 
 
@@ -81,6 +81,7 @@ import sys
 import time
 
 from pyscf.lib import parameters as param
+from pyscf.lib import profiler
 import pyscf.__config__
 
 DEBUG4 = param.VERBOSE_DEBUG + 4
@@ -158,28 +159,38 @@ def stdout(rec, msg, *args):
     sys.stdout.write('>>> %s\n' % msg)
 
 def timer(rec, msg, cpu0=None, wall0=None):
-    if cpu0 is None:
-        cpu0 = rec._t0
-    if wall0:
+    return _timer(rec, msg, cpu0, wall0, rec.verbose >= TIMER_LEVEL)
+
+def timer_debug1(rec, msg, cpu0=None, wall0=None):
+    if rec.verbose >= DEBUG1:
+        return timer(rec, msg, cpu0, wall0)
+    elif profiler._active is not None:
+        # Record the timing in profiler without printing
+        return _timer(rec, msg, cpu0, wall0, False)
+    elif wall0:
         rec._t0, rec._w0 = time.clock(), time.time()
-        if rec.verbose >= TIMER_LEVEL:
-            flush(rec, '    CPU time for %s %9.2f sec, wall time %9.2f sec'
-                  % (msg, rec._t0-cpu0, rec._w0-wall0))
         return rec._t0, rec._w0
     else:
         rec._t0 = time.clock()
-        if rec.verbose >= TIMER_LEVEL:
-            flush(rec, '    CPU time for %s %9.2f sec' % (msg, rec._t0-cpu0))
         return rec._t0
 
-def timer_debug1(rec, msg, cpu0=None, wall0=None):
-    if rec.verbose >= DEBUG1:
-        return timer(rec, msg, cpu0, wall0)
-    elif wall0:
+def _timer(rec, msg, cpu0, wall0, output):
+    if cpu0 is None:
+        cpu0 = rec._t0
+    if wall0:
         rec._t0, rec._w0 = time.clock(), time.time()
+        if output:
+            flush(rec, '    CPU time for %s %9.2f sec, wall time %9.2f sec'
+                  % (msg, rec._t0-cpu0, rec._w0-wall0))
+        if profiler._active is not None:
+            profiler._active.record(msg, rec._t0-cpu0, rec._w0-wall0, wall0)
         return rec._t0, rec._w0
     else:
         rec._t0 = time.clock()
+        if output:
+            flush(rec, '    CPU time for %s %9.2f sec' % (msg, rec._t0-cpu0))
+        if profiler._active is not None:
+            profiler._active.record(msg, rec._t0-cpu0)
         return rec._t0
 
 class Logger(object):
@@ -28,6 +28,8 @@
 #include "fci.h"
 // for (16e,16o) ~ 11 MB buffer = 120 * 12870 * 8
 #define STRB_BLKSIZE    112
+// total number of columns of the intermediates in the multi-vector contraction
+#define STRB_MULTI_BLKSIZE      448
 
 /*
  * CPU timing of single thread can be estimated:
@@ -426,6 +428,211 @@ void FCIcontract_2e_spin1(double *eri, double *ci0, double *ci1,
 }
 
 
+/*
+ * Multiple CI vectors are contracted in one pass.  The vectors are
+ * interleaved, ci0[na,nb,nvec], so that the index of vectors is the
+ * innermost dimension of the intermediates t1[nnorb,bcount,nvec].  Each
+ * entry of the string links is decoded once for all vectors, and the
+ * contraction with eri is a single dgemm.
+ */
+static void prog_b_t1_multi(double *ci0, double *t1, int nvec,
+                            int bcount, int stra_id, int strb_id,
+                            int norb, int nstrb, int nlinkb, _LinkTrilT *clink_indexb)
+{
+        int i, j, ia, str0, str1, sign;
+        const _LinkTrilT *tab = clink_indexb + strb_id * nlinkb;
+        const size_t ldt1 = (size_t)bcount * nvec;
+        double *pci = ci0 + stra_id*(size_t)nstrb*nvec;
+        double *pt1, *pc;
+
+        for (str0 = 0; str0 < bcount; str0++) {
+                for (j = 0; j < nlinkb; j++) {
+                        ia   = EXTRACT_IA  (tab[j]);
+                        str1 = EXTRACT_ADDR(tab[j]);
+                        sign = EXTRACT_SIGN(tab[j]);
+                        pt1 = t1 + ia*ldt1 + str0*nvec;
+                        pc = pci + str1*(size_t)nvec;
+                        if (sign == 0) {
+                                break;
+                        } else if (sign > 0) {
+                                for (i = 0; i < nvec; i++) {
+                                        pt1[i] += pc[i];
+                                }
+                        } else {
+                                for (i = 0; i < nvec; i++) {
+                                        pt1[i] -= pc[i];
+                                }
+                        }
+                }
+                tab += nlinkb;
+        }
+}
+
+static void spread_b_t1_multi(double *ci1, double *t1, int nvec,
+                              int bcount, int stra_id, int strb_id,
+                              int norb, int nstrb, int nlinkb, _LinkTrilT *clink_indexb)
+{
+        int i, j, ia, str0, str1, sign;
+        const _LinkTrilT *tab = clink_indexb + strb_id * nlinkb;
+        const size_t ldt1 = (size_t)bcount * nvec;
+        double *pci = ci1 + stra_id*(size_t)nstrb*nvec;
+        double *pt1, *pc;
+
+        for (str0 = 0; str0 < bcount; str0++) {
+                for (j = 0; j < nlinkb; j++) {
+                        ia   = EXTRACT_IA  (tab[j]);
+                        str1 = EXTRACT_ADDR(tab[j]);
+                        sign = EXTRACT_SIGN(tab[j]);
+                        pt1 = t1 + ia*ldt1 + str0*nvec;
+                        pc = pci + str1*(size_t)nvec;
+                        if (sign == 0) {
+                                break;
+                        } else if (sign > 0) {
+                                for (i = 0; i < nvec; i++) {
+                                        pc[i] += pt1[i];
+                                }
+                        } else {
+                                for (i = 0; i < nvec; i++) {
+                                        pc[i] -= pt1[i];
+                                }
+                        }
+                }
+                tab += nlinkb;
+        }
+}
+
+static void ctr_rhf2e_kern_multi(double *eri, double *ci0, double *ci1,
+                                 double *ci1buf, double *t1buf, int nvec,
+                                 int bcount_for_spread_a, int ncol_ci1buf,
+                                 int bcount, int stra_id, int strb_id,
+                                 int norb, int na, int nb, int nlinka, int nlinkb,
+                                 _LinkTrilT *clink_indexa, _LinkTrilT *clink_indexb)
+{
+        const char TRANS_N = 'N';
+        const double D0 = 0;
+        const double D1 = 1;
+        const int nnorb = norb * (norb+1)/2;
+        const int mcount = bcount * nvec;
+        double *t1 = t1buf;
+        double *vt1 = t1buf + (size_t)nnorb*mcount;
+
+        memset(t1, 0, sizeof(double)*nnorb*mcount);
+        // With the interleaved vectors, the alpha-string part is the same to
+        // the single vector code on a CI vector of nb*nvec columns
+        FCIprog_a_t1(ci0, t1, mcount, stra_id, strb_id*nvec,
+                     norb, nb*nvec, nlinka, clink_indexa);
+        prog_b_t1_multi(ci0, t1, nvec, bcount, stra_id, strb_id,
+                        norb, nb, nlinkb, clink_indexb);
+
+        dgemm_(&TRANS_N, &TRANS_N, &mcount, &nnorb, &nnorb,
+               &D1, t1, &mcount, eri, &nnorb, &D0, vt1, &mcount);
+
+        spread_b_t1_multi(ci1, vt1, nvec, bcount, stra_id, strb_id,
+                          norb, nb, nlinkb, clink_indexb);
+        spread_bufa_t1(ci1buf, vt1, mcount, bcount_for_spread_a*nvec, stra_id, 0,
+                       norb, ncol_ci1buf*nvec, nlinka, clink_indexa);
+}
+
+/*
+ * Number of beta strings in each block for nvec vectors.  The total columns
+ * of the intermediates are kept around STRB_MULTI_BLKSIZE.
+ */
+static int multi_blksize(int nvec)
+{
+        return MAX(1, MIN(STRB_BLKSIZE, STRB_MULTI_BLKSIZE/nvec));
+}
+
+/*
+ * Same to FCIcontract_2e_spin1 for nvec interleaved CI vectors ci0[na,nb,nvec]
+ */
+void FCIcontract_2e_spin1_multi(double *eri, double *ci0, double *ci1, int nvec,
+                                int norb, int na, int nb, int nlinka, int nlinkb,
+                                int *link_indexa, int *link_indexb)
+{
+        _LinkTrilT *clinka = malloc(sizeof(_LinkTrilT) * nlinka * na);
+        _LinkTrilT *clinkb = malloc(sizeof(_LinkTrilT) * nlinkb * nb);
+        FCIcompress_link_tril(clinka, link_indexa, na, nlinka);
+        FCIcompress_link_tril(clinkb, link_indexb, nb, nlinkb);
+        int blksize = multi_blksize(nvec);
+
+        memset(ci1, 0, sizeof(double)*na*nb*nvec);
+        double *ci1bufs[MAX_THREADS];
+#pragma omp parallel default(none) \
+        shared(eri, ci0, ci1, nvec, norb, na, nb, nlinka, nlinkb, \
+               clinka, clinkb, ci1bufs, blksize)
+{
+        int strk, ib;
+        size_t blen;
+        double *t1buf = malloc(sizeof(double) * ((size_t)blksize*nvec*norb*(norb+1)+2));
+        double *ci1buf = malloc(sizeof(double) * ((size_t)na*blksize*nvec+2));
+        ci1bufs[omp_get_thread_num()] = ci1buf;
+        for (ib = 0; ib < nb; ib += blksize) {
+                blen = MIN(blksize, nb-ib);
+                memset(ci1buf, 0, sizeof(double) * na*blen*nvec);
+#pragma omp for schedule(static)
+                for (strk = 0; strk < na; strk++) {
+                        ctr_rhf2e_kern_multi(eri, ci0, ci1, ci1buf, t1buf, nvec,
+                                             blen, blen, blen, strk, ib,
+                                             norb, na, nb, nlinka, nlinkb,
+                                             clinka, clinkb);
+                }
+                NPomp_dsum_reduce_inplace(ci1bufs, blen*na*nvec);
+#pragma omp master
+                FCIaxpy2d(ci1+ib*nvec, ci1buf, na, nb*nvec, blen*nvec);
+#pragma omp barrier
+        }
+        free(ci1buf);
+        free(t1buf);
+}
+        free(clinka);
+        free(clinkb);
+}
+
+/*
+ * Same to FCIcontract_2e_spin0 for nvec interleaved CI vectors ci0[na,na,nvec].
+ * Only half of the contraction is computed for each vector.
+ */
+void FCIcontract_2e_spin0_multi(double *eri, double *ci0, double *ci1, int nvec,
+                                int norb, int na, int nlink, int *link_index)
+{
+        _LinkTrilT *clink = malloc(sizeof(_LinkTrilT) * nlink * na);
+        FCIcompress_link_tril(clink, link_index, na, nlink);
+        int blksize = multi_blksize(nvec);
+
+        memset(ci1, 0, sizeof(double)*na*na*nvec);
+        double *ci1bufs[MAX_THREADS];
+#pragma omp parallel default(none) \
+                shared(eri, ci0, ci1, nvec, norb, na, nlink, clink, ci1bufs, \
+                       blksize)
+{
+        int strk, ib;
+        size_t blen;
+        double *t1buf = malloc(sizeof(double) * ((size_t)blksize*nvec*norb*(norb+1)+2));
+        double *ci1buf = malloc(sizeof(double) * ((size_t)na*blksize*nvec+2));
+        ci1bufs[omp_get_thread_num()] = ci1buf;
+        for (ib = 0; ib < na; ib += blksize) {
+                blen = MIN(blksize, na-ib);
+                memset(ci1buf, 0, sizeof(double) * na*blen*nvec);
+#pragma omp for schedule(static, 112)
+                for (strk = ib; strk < na; strk++) {
+                        ctr_rhf2e_kern_multi(eri, ci0, ci1, ci1buf, t1buf, nvec,
+                                             MIN(blksize, strk-ib), blen,
+                                             MIN(blksize, strk+1-ib),
+                                             strk, ib, norb, na, na, nlink, nlink,
+                                             clink, clink);
+                }
+                NPomp_dsum_reduce_inplace(ci1bufs, blen*na*nvec);
+#pragma omp master
+                FCIaxpy2d(ci1+ib*nvec, ci1buf, na, na*nvec, blen*nvec);
+#pragma omp barrier
+        }
+        free(ci1buf);
+        free(t1buf);
+}
+        free(clink);
+}
+
+
 /*
  * eri_ab is mixed integrals (alpha,alpha|beta,beta), |beta,beta) in small strides
  */
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Memory planner
+
+Blocked loops ask the planner for the block size which fits in the memory
+budget (``max_memory`` of the method object, in MB)::
+
+    blksize = memplan.block_size(mycc.max_memory, unit, fixed, blkmin=4,
+                                 blkmax=nvir, rec=mycc)
+
+The available memory is the budget minus the memory which the process
+will use once the buffers registered in the planner are written.  Buffers
+created by :func:`numpy.empty` do not count in the resident memory
+(:func:`lib.current_memory`) until they are written.  Registering the large
+work buffers (:func:`empty` or :func:`register`) keeps the block sizes of
+the nested loops consistent with the memory which will be used eventually.
+Only the pages of a buffer which are not resident yet are counted on top of
+the resident memory.  A buffer which has been written, or which reuses the
+memory pages released by other arrays, is not counted twice.
+A buffer is removed from the registry when it is garbage collected.
+
+When the smallest block does not fit in the budget, a warning is issued.
+If :data:`STRICT` is set (``lib_memplan_strict = True`` in the global
+configuration), MemoryError is raised instead.  Methods which have an
+out-of-core code path use :func:`fits` to decide whether to spill the
+intermediates to disk.
+
+:func:`estimate` gives the peak memory and disk usage of a method object
+before the calculation is executed.
+'''
+
+import sys
+import ctypes
+import ctypes.util
+import weakref
+import warnings
+import numpy
+from pyscf.lib import logger
+from pyscf import __config__
+
+STRICT = getattr(__config__, 'lib_memplan_strict', False)
+
+# Registered buffers {id: (weakref, MB, label)}
+_buffers = {}
+
+
+def register(buf, label=None):
+    '''Register a buffer in the planner.  The buffer is counted as used
+    memory until it is garbage collected.  Returns the buffer.'''
+    key = id(buf)
+    def remove(ref):
+        _buffers.pop(key, None)
+    _buffers[key] = (weakref.ref(buf, remove), buf.nbytes/1e6, label)
+    return buf
+
+def empty(shape, dtype=float, order='C', label=None):
+    '''numpy.empty with the output registered in the planner'''
+    return register(numpy.empty(shape, dtype, order), label)
+
+def tracked():
+    '''Total size (in MB) of the registered buffers'''
+    return sum(x[1] for x in _buffers.values())
+
+def committed():
+    '''Memory (in MB) the process will use when all registered buffers are
+    written, i.e. the resident memory plus the pages of the registered
+    buffers which are not resident yet.'''
+    from pyscf.lib.misc import current_memory
+    mem = current_memory()[0]
+    for ref, size, label in list(_buffers.values()):
+        buf = ref()
+        if buf is not None:
+            mem += _unwritten(buf, size)
+    return mem
+
+def _unwritten(buf, size):
+    '''The size (in MB) of the pages of buf which are not resident'''
+    if _mincore is None or buf.nbytes == 0:
+        return size
+    addr = buf.ctypes.data
+    start = addr - addr % _PAGESIZE
+    npages = (addr + buf.nbytes - start + _PAGESIZE - 1) // _PAGESIZE
+    vec = numpy.empty(npages, dtype=numpy.uint8)
+    if _mincore(start, npages*_PAGESIZE, vec.ctypes.data) != 0:
+        return size
+    return min(size, numpy.count_nonzero(vec & 1 == 0) * _PAGESIZE/1e6)
+
+def _load_mincore():
+    if not (sys.platform.startswith('linux') or sys.platform == 'darwin'):
+        return None
+    try:
+        mincore = ctypes.CDLL(ctypes.util.find_library('c')).mincore
+    except (OSError, AttributeError, TypeError):
+        return None
+    mincore.restype = ctypes.c_int
+    mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+    return mincore
+# The resident pages of the buffers are queried with mincore(2).  Without
+# mincore, the registered buffers are counted in full.
+_mincore = _load_mincore()
+try:
+    import resource
+    _PAGESIZE = resource.getpagesize()
+except ImportError:
+    _PAGESIZE = 4096
+
+def available(max_memory):
+    '''Memory (in MB) which can be allocated within the budget max_memory'''
+    return max(0, max_memory - committed())
+
+def fits(mem, max_memory):
+    '''Whether mem (in MB) can be allocated within the budget max_memory'''
+    return mem < available(max_memory)
+
+def check(mem, max_memory, label='', rec=None):
+    '''Warn (or raise MemoryError in strict mode) if mem (in MB) does not fit
+    in the budget max_memory.'''
+    avail = available(max_memory)
+    if mem > avail:
+        over_budget('%s requires %.1f MB memory, %.1f MB available within '
+                    'max_memory %d MB' % (label, mem, avail, max_memory), rec)
+    return avail
+
+def over_budget(msg, rec=None):
+    '''Raise MemoryError in strict mode, otherwise issue a warning'''
+    if STRICT:
+        raise MemoryError(msg)
+    elif rec is not None:
+        logger.warn(rec, msg)
+    else:
+        warnings.warn(msg)
+
+def block_size(max_memory, unit, fixed=0, blkmin=1, blkmax=None,
+               fraction=1., label='', rec=None):
+    '''The number of rows of a blocked loop which fit in max_memory.
+
+    Args:
+        max_memory : float
+            The memory budget (in MB) of the method.
+        unit : float
+            The number of words (8 bytes) required by each row.
+
+    Kwargs:
+        fixed : float
+            The number of words allocated regardless of the block size.
+        blkmin, blkmax : int
+            The lower and upper bounds of the block size.
+        fraction : float
+            The fraction of the available memory to be used by the loop.
+        label : str
+            The name of the loop in the warning messages.
+        rec : an object or a Logger to output warnings.
+    '''
+    avail = available(max_memory) * fraction
+    blksize = int((avail*1e6/8 - fixed) / max(unit, 1))
+    if blksize < blkmin:
+        check((fixed + unit*blkmin)*8/1e6/fraction, max_memory, label, rec)
+        blksize = blkmin
+    if blkmax is not None:
+        blksize = min(blksize, blkmax)
+    return max(1, blksize)
+
+
+def estimate(method):
+    '''Estimate the peak memory and disk usage (in MB) of the method object.
+
+    Returns:
+        A dict with keys "memory" and "disk".  The memory estimate includes
+        the memory used by the process at the time of the call.
+
+    Examples:
+
+    >>> mf = scf.RHF(mol)
+    >>> memplan.estimate(cc.CCSD(mf))
+    {'memory': 1534.2, 'disk': 0}
+    '''
+    from pyscf.lib.misc import current_memory
+    mem_now = current_memory()[0]
+    mem, disk = _estimator(method)(method)
+    return {'memory': mem + mem_now, 'disk': disk}
+
+def _estimator(method):
+    from pyscf import scf, mp, cc, mcscf
+    if isinstance(method, mcscf.casci.CASCI):
+        return _estimate_casscf
+    elif isinstance(method, cc.ccsd.CCSD):
+        return _estimate_ccsd
+    elif isinstance(method, mp.mp2.MP2):
+        return _estimate_mp2
+    elif isinstance(method, scf.hf.SCF):
+        return _estimate_scf
+    else:
+        raise NotImplementedError('Memory estimate for %s' % method.__class__)
+
+def _estimate_scf(mf):
+    mol = mf.mol
+    nao = mol.nao_nr()
+    nao_pair = nao * (nao+1) // 2
+    # Fock, density, overlap, hcore, orbitals and DIIS vectors
+    basic = nao**2 * (8 + getattr(mf, 'diis_space', 8)*2) * 8/1e6
+    with_df = getattr(mf, 'with_df', None)
+    if with_df is not None:
+        naux = getattr(getattr(with_df, 'auxmol', None), 'nao_nr', lambda: nao*3)()
+        mem_df = naux * nao_pair * 8/1e6
+        if fits(mem_df, mf.max_memory):
+            return basic + mem_df, 0
+        else:
+            return basic + with_df.blockdim*nao_pair*8/1e6, mem_df
+    mem_eri = nao_pair*(nao_pair+1)//2 * 8/1e6
+    if mol.incore_anyway or fits(mem_eri, mf.max_memory):
+        return basic + mem_eri, 0
+    else:
+        return basic, 0
+
+def _estimate_mp2(mp):
+    from pyscf.mp import mp2
+    nocc = mp.nocc
+    nvir = mp.nmo - nocc
+    mem_incore, mem_outcore, mem_basic = mp2._mem_usage(nocc, nvir)
+    if mp._scf._eri is not None and fits(mem_incore, mp.max_memory):
+        return mem_incore, 0
+    else:
+        return mem_outcore, (nocc*nvir)**2 * 8/1e6
+
+def _estimate_ccsd(mycc):
+    from pyscf.cc import ccsd
+    nocc = mycc.nocc
+    nvir = mycc.nmo - nocc
+    nao = mycc.mo_coeff.shape[0]
+    mem_incore, mem_outcore, mem_basic = ccsd._mem_usage(nocc, nvir, nao)
+    if mycc._scf._eri is not None and fits(mem_incore, mycc.max_memory):
+        return mem_incore, 0
+    else:
+        nvir_pair = nvir * (nvir+1) // 2
+        disk = (nocc**2*nvir**2*3 + nocc*nvir*nvir_pair + nvir_pair**2 +
+                nocc**3*nvir + nocc**4) * 8/1e6
+        if not mycc.incore_complete:
+            # DIIS vectors and swap files of update_amps
+            disk += (nocc*nvir)**2 * (mycc.diis_space+2) * 8/1e6
+        return mem_outcore, disk
+
+def _estimate_casscf(mc):
+    from pyscf.mcscf import mc_ao2mo
+    from pyscf.fci import cistring
+    ncore = mc.ncore
+    ncas = mc.ncas
+    nmo = mc.mo_coeff.shape[1]
+    if isinstance(mc.nelecas, (int, numpy.integer)):
+        neleca = mc.nelecas - mc.nelecas // 2
+        nelecb = mc.nelecas // 2
+    else:
+        neleca, nelecb = mc.nelecas
+    # CI vectors of the Davidson subspace
+    ci_size = (cistring.num_strings(ncas, neleca) *
+               cistring.num_strings(ncas, nelecb))
+    mem_ci = ci_size * getattr(mc.fcisolver, 'max_space', 12) * 2 * 8/1e6
+    mem_incore, mem_outcore, mem_basic = mc_ao2mo._mem_usage(ncore, ncas, nmo)
+    if getattr(mc, 'ao2mo_method', 'incore') == 'direct':
+        return mem_basic + mem_ci, 0
+    elif mc._scf._eri is not None and fits(mem_incore, mc.max_memory*.9):
+        return mem_incore + mem_ci, 0
+    else:
+        return mem_outcore + mem_ci, ncas**2*nmo**2*2 * 8/1e6
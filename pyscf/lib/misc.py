@@ -433,7 +433,10 @@ class StreamObject(object):
 
     verbose = 0
     stdout = sys.stdout
-    _keys = set(['verbose', 'stdout'])
+    # An instance of lib.profiler.Profiler to record the timings of the
+    # methods of this object (and the objects it calls).
+    profiler = None
+    _keys = set(['verbose', 'stdout', 'profiler'])
 
     def kernel(self, *args, **kwargs):
         '''
@@ -511,7 +514,7 @@ class StreamObject(object):
         '''
         if (self.verbose > 0 and  # logger.QUIET
             getattr(self, '_keys', None)):
-            check_sanity(self, self._keys, self.stdout)
+            check_sanity(self, self._keys.union(StreamObject._keys), self.stdout)
         return self
 
     def view(self, cls):
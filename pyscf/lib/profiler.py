@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Structured profiler
+
+A :class:`Profiler` records a tree of labelled regions.  For each region,
+the CPU time, the wall time, the peak RSS (sampled by
+:func:`lib.current_memory` when entering and leaving the region and its
+sub-regions) and the bytes read/written by the process (from
+``/proc/self/io``) are recorded.  The timings reported by
+:func:`lib.logger.timer` while a profiler is active are recorded as leaf
+regions of the innermost open region.
+
+The profiler can be attached to any :class:`StreamObject`::
+
+    mf = scf.RHF(mol)
+    mf.profiler = lib.profiler.Profiler()
+    mf.kernel()
+    mf.profiler.dump_json('scf_profile.json')
+    mf.profiler.dump_chrome_trace('scf_trace.json')  # for chrome://tracing
+
+or be activated for a block of code, which collects the regions of all
+objects::
+
+    with lib.profiler.Profiler() as prof:
+        mycc = cc.CCSD(scf.RHF(mol).run()).run()
+    print(prof.summary())
+
+Regions are opened in the code by::
+
+    with profiler.region(obj, 'label'):
+        ...
+
+or, to avoid reindenting a long block (e.g. the body of a loop), by::
+
+    region = profiler.region(obj, 'label').enter()
+    ...
+    region.exit()
+
+A region which is not closed due to an exception is closed when its parent
+region is closed.  Functions are recorded by the decorator::
+
+    @profiler.profile('label')
+    def fn(...):
+
+When no profiler is active, :func:`region` returns a shared no-op context
+manager and logger.timer skips the profiler entirely.
+'''
+
+import os
+import sys
+import time
+import json
+import functools
+
+# The profiler which is currently collecting data
+_active = None
+
+
+class Region(object):
+    '''A node of the profiling tree'''
+    __slots__ = ('label', 'start', 'cpu', 'wall', 'peak_rss',
+                 'bytes_read', 'bytes_written', 'children')
+    def __init__(self, label, start=0):
+        self.label = label
+        self.start = start
+        self.cpu = 0
+        self.wall = 0
+        self.peak_rss = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.children = []
+
+    def to_dict(self):
+        return {'label': self.label,
+                'start': self.start,
+                'cpu': self.cpu,
+                'wall': self.wall,
+                'peak_rss': self.peak_rss,
+                'bytes_read': self.bytes_read,
+                'bytes_written': self.bytes_written,
+                'children': [x.to_dict() for x in self.children]}
+
+
+class _RegionContext(object):
+    def __init__(self, prof, label):
+        self.prof = prof
+        self.label = label
+        self.node = None
+
+    def __enter__(self):
+        self.enter()
+        return self.prof
+
+    def __exit__(self, type, value, traceback):
+        self.exit()
+
+    def enter(self):
+        self.node = self.prof._push(self.label)
+        return self
+
+    def exit(self):
+        self.prof._pop(self.node)
+
+
+class _NullContext(object):
+    def __enter__(self):
+        return None
+    def __exit__(self, type, value, traceback):
+        pass
+    def enter(self):
+        return self
+    def exit(self):
+        pass
+_NULL_CONTEXT = _NullContext()
+
+
+class Profiler(object):
+    '''Hierarchical profiler.
+
+    Attributes:
+        root : :class:`Region`
+            The root of the profiling tree.  The top level regions are the
+            children of root.
+    '''
+    def __init__(self):
+        self.root = Region('root', time.time())
+        self._stack = []
+        self._io_stack = []
+        self._prev = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def start(self):
+        '''Activate the profiler.  The regions of all objects are recorded
+        until :meth:`stop` is called.'''
+        global _active
+        self._prev.append(_active)
+        _active = self
+
+    def stop(self):
+        global _active
+        _active = self._prev.pop()
+
+    def region(self, label):
+        '''Context manager to record a region'''
+        return _RegionContext(self, label)
+
+    def _push(self, label):
+        global _active
+        self._prev.append(_active)
+        _active = self
+        node = Region(label, time.time())
+        node.cpu = time.clock()
+        node.peak_rss = _current_rss()
+        if self._stack:
+            self._stack[-1].children.append(node)
+        else:
+            self.root.children.append(node)
+        self._stack.append(node)
+        self._io_stack.append(_io_counters())
+        return node
+
+    def _pop(self, node=None):
+        '''Close the innermost region, or the given region and all regions
+        opened inside it'''
+        global _active
+        if node is not None and not any(x is node for x in self._stack):
+            return  # closed by its parent
+        while True:
+            top = self._stack.pop()
+            rchar0, wchar0 = self._io_stack.pop()
+            rchar1, wchar1 = _io_counters()
+            top.cpu = time.clock() - top.cpu
+            top.wall = time.time() - top.start
+            top.bytes_read = rchar1 - rchar0
+            top.bytes_written = wchar1 - wchar0
+            top.peak_rss = max([top.peak_rss, _current_rss()] +
+                               [x.peak_rss for x in top.children])
+            _active = self._prev.pop()
+            if node is None or top is node:
+                break
+
+    def record(self, label, cpu, wall=None, start=None):
+        '''Add a leaf region of the given timings to the innermost open
+        region.  This is called by :func:`lib.logger.timer`.'''
+        now = time.time()
+        if wall is None:
+            wall = cpu
+        if start is None:
+            start = now - wall
+        node = Region(label, start)
+        node.cpu = cpu
+        node.wall = wall
+        if self._stack:
+            self._stack[-1].children.append(node)
+        else:
+            self.root.children.append(node)
+
+    def to_dict(self):
+        return self.root.to_dict()
+
+    def dump_json(self, filename=None):
+        '''The profiling tree in JSON format.  If filename is given, the
+        JSON document is written to the file.'''
+        s = json.dumps(self.to_dict())
+        if filename is not None:
+            with open(filename, 'w') as f:
+                f.write(s)
+        return s
+
+    def chrome_trace(self):
+        '''Profiling events in the Chrome trace event format'''
+        pid = os.getpid()
+        t0 = self.root.start
+        events = []
+        def walk(node):
+            events.append({'name': node.label, 'ph': 'X', 'pid': pid, 'tid': 0,
+                           'ts': (node.start - t0) * 1e6,
+                           'dur': node.wall * 1e6,
+                           'args': {'cpu': node.cpu,
+                                    'peak_rss': node.peak_rss,
+                                    'bytes_read': node.bytes_read,
+                                    'bytes_written': node.bytes_written}})
+            for x in node.children:
+                walk(x)
+        for x in self.root.children:
+            walk(x)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump_chrome_trace(self, filename=None):
+        '''Profiling events in the Chrome trace event format (JSON).  If
+        filename is given, the JSON document is written to the file.'''
+        s = json.dumps(self.chrome_trace())
+        if filename is not None:
+            with open(filename, 'w') as f:
+                f.write(s)
+        return s
+
+    def summary(self):
+        '''Accumulated count, CPU time, wall time and I/O bytes of the regions
+        grouped by their paths (the labels joined by "/").'''
+        stat = {}
+        def walk(node, prefix):
+            path = prefix + node.label
+            if path in stat:
+                rec = stat[path]
+            else:
+                rec = stat[path] = {'count': 0, 'cpu': 0, 'wall': 0,
+                                    'peak_rss': 0, 'bytes_read': 0,
+                                    'bytes_written': 0}
+            rec['count'] += 1
+            rec['cpu'] += node.cpu
+            rec['wall'] += node.wall
+            rec['peak_rss'] = max(rec['peak_rss'], node.peak_rss)
+            rec['bytes_read'] += node.bytes_read
+            rec['bytes_written'] += node.bytes_written
+            for x in node.children:
+                walk(x, path + '/')
+        for x in self.root.children:
+            walk(x, '')
+        return stat
+
+
+def region(rec, label):
+    '''Context manager to record a region in the active profiler or the
+    profiler attached to rec (rec.profiler).  A no-op if neither exists.
+    '''
+    prof = _active
+    if prof is None:
+        prof = getattr(rec, 'profiler', None)
+        if prof is None:
+            return _NULL_CONTEXT
+    return prof.region(label)
+
+def profile(label):
+    '''Decorator to record the calls of a function as regions of the active
+    profiler'''
+    def decorate(fn):
+        @functools.wraps(fn)
+        def profiled_fn(*args, **kwargs):
+            if _active is None:
+                return fn(*args, **kwargs)
+            with _active.region(label):
+                return fn(*args, **kwargs)
+        return profiled_fn
+    return decorate
+
+def active():
+    '''The profiler which is currently collecting data, or None'''
+    return _active
+
+
+def _current_rss():
+    from pyscf.lib.misc import current_memory
+    return current_memory()[0]
+
+if sys.platform.startswith('linux'):
+    def _io_counters():
+        '''Bytes read and written by the process'''
+        try:
+            with open('/proc/self/io') as f:
+                dat = dict(line.split(':') for line in f)
+            return int(dat['rchar']), int(dat['wchar'])
+        except (IOError, OSError, KeyError, ValueError):
+            return 0, 0
+else:
+    def _io_counters():
+        return 0, 0
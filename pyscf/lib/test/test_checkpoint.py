@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tempfile
+import unittest
+import numpy
+from pyscf import lib, gto, scf, dft, cc, mcscf
+from pyscf.lib import checkpoint
+
+mol = gto.M(atom='O 0 0 0; H 0 -0.757 0.587; H 0 0.757 0.587',
+            basis='6-31g', verbose=0)
+mf = scf.RHF(mol).run()
+
+def tearDownModule():
+    global mol, mf
+    del mol, mf
+
+class Interrupt(Exception):
+    pass
+
+def new_checkpoint():
+    ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+    return ftmp, checkpoint.Checkpoint(ftmp.name, async_flush=False)
+
+class KnownValues(unittest.TestCase):
+    def test_save_load(self):
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        ckpt = checkpoint.Checkpoint(ftmp.name, 'a', tag=1.5, async_flush=True)
+        a = numpy.arange(4.)
+        ckpt.save({'a': a, 'cycle': 2, 'l': [a, a+1]})
+        a[:] = 0  # the saved state is a snapshot
+        state = ckpt.load()
+        self.assertEqual(state['cycle'], 2)
+        self.assertAlmostEqual(abs(state['a'] - numpy.arange(4.)).max(), 0, 12)
+        self.assertAlmostEqual(abs(state['l'][1] - numpy.arange(1., 5)).max(), 0, 12)
+        self.assertTrue(checkpoint.Checkpoint(ftmp.name, 'a', tag=2.).load() is None)
+        self.assertTrue(checkpoint.Checkpoint(ftmp.name, 'b').load() is None)
+        ckpt.clear()
+        self.assertTrue(ckpt.load() is None)
+
+    def test_diis_state(self):
+        adiis = lib.diis.DIIS()
+        adiis.space = 4
+        numpy.random.seed(1)
+        xs = numpy.random.random((7,10))
+        for x in xs[:5]:
+            adiis.update(x)
+        adiis1 = lib.diis.DIIS()
+        adiis1.space = 4
+        adiis1.load_state(adiis.dump_state())
+        self.assertAlmostEqual(abs(adiis.update(xs[5]) - adiis1.update(xs[5])).max(), 0, 12)
+        self.assertAlmostEqual(abs(adiis.update(xs[6]) - adiis1.update(xs[6])).max(), 0, 12)
+
+    def test_scf(self):
+        ftmp, ckpt = new_checkpoint()
+        mf1 = scf.RHF(mol)
+        mf1.checkpoint = ckpt
+        def interrupt(envs):
+            if envs['cycle'] == 3:
+                raise Interrupt
+        mf1.callback = interrupt
+        self.assertRaises(Interrupt, mf1.kernel)
+        self.assertEqual(checkpoint.Checkpoint(ftmp.name, 'scf').load()['cycle'], 3)
+
+        cycles = []
+        mf1.callback = lambda envs: cycles.append(envs['cycle'])
+        mf1.kernel()
+        self.assertEqual(cycles[0], 4)
+        self.assertAlmostEqual(mf1.e_tot, mf.e_tot, 9)
+        self.assertTrue(checkpoint.Checkpoint(ftmp.name, 'scf').load() is None)
+
+    def test_scf_other_method(self):
+        ftmp, ckpt = new_checkpoint()
+        mf1 = scf.RHF(mol)
+        mf1.checkpoint = ckpt
+        def interrupt(envs):
+            if envs['cycle'] == 3:
+                raise Interrupt
+        mf1.callback = interrupt
+        self.assertRaises(Interrupt, mf1.kernel)
+
+        # The state of RHF is not restored by UHF or RKS
+        for mf2 in (scf.UHF(mol), dft.RKS(mol).set(xc='b3lyp')):
+            cycles = []
+            mf2.checkpoint = ckpt
+            mf2.callback = lambda envs: cycles.append(envs['cycle'])
+            mf2.kernel()
+            self.assertEqual(cycles[0], 0)
+        self.assertAlmostEqual(mf2.e_tot, dft.RKS(mol).set(xc='b3lyp').kernel(), 9)
+
+    def test_ccsd(self):
+        ftmp, ckpt = new_checkpoint()
+        mycc = cc.CCSD(mf)
+        mycc.checkpoint = ckpt
+        count = [0]
+        interrupt = [True]
+        def update_amps(t1, t2, eris):
+            count[0] += 1
+            if count[0] == 5 and interrupt[0]:
+                interrupt[0] = False
+                raise Interrupt
+            return cc.ccsd.update_amps(mycc, t1, t2, eris)
+        mycc.update_amps = update_amps
+        self.assertRaises(Interrupt, mycc.kernel)
+        self.assertEqual(checkpoint.Checkpoint(ftmp.name, 'ccsd').load()['istep'], 3)
+
+        count[0] = 0
+        mycc.kernel()
+        ncycle = count[0]
+
+        count[0] = 0
+        mycc.checkpoint = None
+        mycc.kernel()
+        # The restarted run continues the iterations of the interrupted run
+        self.assertEqual(ncycle + 4, count[0])
+        self.assertAlmostEqual(mycc.e_corr, cc.CCSD(mf).kernel()[0], 9)
+        self.assertTrue(checkpoint.Checkpoint(ftmp.name, 'ccsd').load() is None)
+
+    def test_casscf(self):
+        ftmp, ckpt = new_checkpoint()
+        mc = mcscf.CASSCF(mf, 4, 4)
+        mc.checkpoint = ckpt
+        def interrupt(envs):
+            if envs['imacro'] == 2 and envs.get('rota', 1) is None:
+                raise Interrupt
+        mc.callback = interrupt
+        self.assertRaises(Interrupt, mc.kernel)
+        self.assertEqual(checkpoint.Checkpoint(ftmp.name, 'casscf').load()['imacro'], 2)
+
+        imacros = []
+        mc.callback = lambda envs: imacros.append(envs['imacro'])
+        mc.kernel()
+        self.assertEqual(imacros[0], 3)
+        self.assertAlmostEqual(mc.e_tot, mcscf.CASSCF(mf, 4, 4).kernel()[0], 8)
+
+    def test_davidson(self):
+        numpy.random.seed(12)
+        n = 200
+        a = numpy.random.random((n,n)) * .1
+        a = a + a.T + numpy.diag(numpy.arange(n) * 1.)
+        aop = lambda xs: [a.dot(x) for x in xs]
+        x0 = numpy.random.random(n)
+        e_ref, c_ref = lib.davidson1(aop, x0, a.diagonal(), nroots=2, tol=1e-10,
+                                     max_space=8)[1:]
+
+        ftmp, ckpt = new_checkpoint()
+        def interrupt(envs):
+            if envs['icyc'] == 4:
+                raise Interrupt
+        self.assertRaises(Interrupt, lib.davidson1, aop, x0, a.diagonal(),
+                          nroots=2, tol=1e-10, max_space=8, checkpoint=ckpt,
+                          callback=interrupt)
+        cycles = []
+        e, c = lib.davidson1(aop, x0, a.diagonal(), nroots=2, tol=1e-10,
+                             max_space=8, checkpoint=ckpt,
+                             callback=lambda envs: cycles.append(envs['icyc']))[1:]
+        self.assertEqual(cycles[0], 5)
+        self.assertAlmostEqual(abs(e - e_ref).max(), 0, 12)
+        self.assertAlmostEqual(abs(abs(numpy.dot(c[0], c_ref[0])) - 1), 0, 9)
+
+
+if __name__ == "__main__":
+    print("Full Tests for checkpoint")
+    unittest.main()
@@ -60,6 +60,47 @@ class KnownValues(unittest.TestCase):
         self.assertTrue(numpy.all(a['x'][1] == dat['x'][1]))
         self.assertTrue(numpy.all(a['y'][0] == dat['y'][0]))
 
+    def test_atomic_dump(self):
+        fchk = tempfile.NamedTemporaryFile()
+        a = numpy.eye(3)
+        lib.chkfile.save(fchk.name, 'a', a, atomic=True)
+        lib.chkfile.save(fchk.name, 'b', a, atomic=True)
+        # An error in the middle of dump leaves the old content untouched
+        self.assertRaises(TypeError, lib.chkfile.save, fchk.name, 'a',
+                          {'x': a, 'y': object()}, atomic=True)
+        self.assertTrue(numpy.all(a == lib.chkfile.load(fchk.name, 'a')))
+        lib.chkfile.delete(fchk.name, 'a', atomic=True)
+        self.assertTrue(lib.chkfile.load(fchk.name, 'a') is None)
+        self.assertTrue(numpy.all(a == lib.chkfile.load(fchk.name, 'b')))
+
+    def test_nested_key(self):
+        fchk = tempfile.NamedTemporaryFile()
+        a = numpy.eye(3)
+        for atomic in (False, True):
+            lib.chkfile.save(fchk.name, 'x/a', a, atomic=atomic)
+            lib.chkfile.save(fchk.name, 'x/b', a, atomic=atomic)
+            lib.chkfile.save(fchk.name, 'x/a', a+1, atomic=atomic)
+            self.assertTrue(numpy.all(a+1 == lib.chkfile.load(fchk.name, 'x/a')))
+            lib.chkfile.delete(fchk.name, 'x/a', atomic=atomic)
+            self.assertTrue(lib.chkfile.load(fchk.name, 'x/a') is None)
+            self.assertTrue(numpy.all(a == lib.chkfile.load(fchk.name, 'x/b')))
+
+    def test_dump_scf(self):
+        from pyscf.scf import chkfile
+        mol = gto.M(atom='He', basis='sto3g')
+        fchk = tempfile.NamedTemporaryFile()
+        a = numpy.eye(1)
+        chkfile.dump_scf(mol, fchk.name, -2., a[0], a, a[0])
+        lib.chkfile.save(fchk.name, 'x', a)
+        # A failed dump leaves the results of the previous dump untouched
+        self.assertRaises(TypeError, chkfile.dump_scf, mol, fchk.name, -3.,
+                          a[0], object(), a[0])
+        self.assertEqual(lib.chkfile.load(fchk.name, 'scf/e_tot'), -2.)
+        chkfile.dump_scf(mol, fchk.name, -3., a[0], a, a[0])
+        self.assertEqual(lib.chkfile.load(fchk.name, 'scf/e_tot'), -3.)
+        self.assertTrue(numpy.all(a == lib.chkfile.load(fchk.name, 'x')))
+        self.assertEqual(lib.chkfile.load_mol(fchk.name).natm, 1)
+
 
 if __name__ == "__main__":
     print("Full Tests for lib.chkfile")
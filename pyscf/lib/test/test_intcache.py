@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+import h5py
+from pyscf import lib, gto, df
+from pyscf.lib import intcache
+
+mol = gto.M(atom='O 0 0 0; H 0 -0.757 0.587; H 0 0.757 0.587',
+            basis='6-31g', verbose=0)
+
+def setUpModule():
+    global cachedir
+    cachedir = tempfile.mkdtemp()
+    intcache.CACHE_DIR = cachedir
+    intcache.ENABLED = True
+
+def tearDownModule():
+    intcache.CACHE_DIR = None
+    intcache.ENABLED = False
+    shutil.rmtree(cachedir)
+
+class KnownValues(unittest.TestCase):
+    def test_fingerprint(self):
+        key = intcache.fingerprint('int1e_ovlp_sph', mol)
+        self.assertEqual(key, intcache.fingerprint('int1e_ovlp_sph', mol.copy()))
+        self.assertNotEqual(key, intcache.fingerprint('int1e_kin_sph', mol))
+
+        mol1 = mol.copy()
+        mol1.atom = 'O 0 0 0; H 0 -0.757 0.587; H 0 0.757 0.588'
+        mol1.build()
+        self.assertNotEqual(key, intcache.fingerprint('int1e_ovlp_sph', mol1))
+
+    def test_mol_intor(self):
+        intcache.clear()
+        ref = gto.moleintor.getints('int1e_kin_sph', mol._atm, mol._bas, mol._env)
+        s1 = mol.intor('int1e_kin')
+        self.assertEqual(len(os.listdir(cachedir)), 1)
+        s2 = mol.intor('int1e_kin')
+        self.assertTrue(isinstance(s2, numpy.memmap))
+        self.assertAlmostEqual(abs(s1 - ref).max(), 0, 14)
+        self.assertAlmostEqual(abs(s2 - ref).max(), 0, 14)
+        # copy-on-write, cached data are not changed
+        s2[:] = 0
+        self.assertAlmostEqual(abs(mol.intor('int1e_kin') - ref).max(), 0, 14)
+
+    def test_evict(self):
+        intcache.clear()
+        for i in range(4):
+            intcache.save('a%d'%i, numpy.ones(125000))
+        self.assertEqual(len(os.listdir(cachedir)), 4)
+        os.utime(os.path.join(cachedir, 'a0.npy'), (0, 0))
+        intcache.evict(3.5)
+        self.assertEqual(sorted(os.listdir(cachedir)), ['a1.npy', 'a2.npy', 'a3.npy'])
+        self.assertTrue(intcache.load('a0') is None)
+
+    def test_cholesky_eri(self):
+        intcache.clear()
+        cderi0 = df.incore.cholesky_eri(mol, auxbasis='weigend')
+        cderi1 = df.incore.cholesky_eri(mol, auxbasis='weigend')
+        self.assertTrue(isinstance(cderi1, numpy.memmap))
+        self.assertAlmostEqual(abs(cderi0 - cderi1).max(), 0, 14)
+
+        ftmp = tempfile.NamedTemporaryFile()
+        df.outcore.cholesky_eri(mol, ftmp.name, auxbasis='weigend')
+        with h5py.File(ftmp.name, 'r') as f:
+            self.assertAlmostEqual(abs(f['j3c'][:] - cderi0).max(), 0, 12)
+        self.assertTrue(intcache.h5file(intcache.fingerprint(
+            'cholesky_eri', mol, df.addons.make_auxmol(mol, 'weigend'), 'j3c',
+            'int3c2e_sph', 's2ij', 'int2c2e_sph', 1,
+            df.outcore.LINEAR_DEP_THR)) is not None)
+
+        ftmp1 = tempfile.NamedTemporaryFile()
+        df.outcore.cholesky_eri(mol, ftmp1.name, auxbasis='weigend')
+        with h5py.File(ftmp1.name, 'r') as f:
+            self.assertAlmostEqual(abs(f['j3c'][:] - cderi0).max(), 0, 12)
+
+
+if __name__ == "__main__":
+    print("Full Tests for lib.intcache")
+    unittest.main()
@@ -22,6 +22,8 @@ import tempfile
 from pyscf import gto
 from pyscf import scf
 from pyscf import fci
+from pyscf import lib
+from pyscf.lib import linalg_helper
 
 class KnownValues(unittest.TestCase):
     def test_davidson(self):
@@ -38,6 +40,54 @@ class KnownValues(unittest.TestCase):
         e = myfci.kernel()[0]
         self.assertAlmostEqual(e, -11.579978414933732+mol.energy_nuc(), 9)
 
+    def test_davidson_outcore(self):
+        numpy.random.seed(3)
+        n = 2000
+        a = (numpy.random.random((n,n)) - .5) * .01
+        a = a + a.T + numpy.diag(numpy.arange(n) * .1)
+        aop = lambda xs: [a.dot(x) for x in xs]
+        x0 = numpy.eye(n)[:3] + numpy.random.random((3,n)) * .01
+        e_ref, c_ref = lib.davidson1(aop, x0, a.diagonal(), nroots=3,
+                                     tol=1e-10)[1:]
+        self.assertAlmostEqual(abs(e_ref - numpy.linalg.eigh(a)[0][:3]).max(), 0, 8)
+
+        self.assertEqual(linalg_helper._block_size(.3, n*8, 12, 3, False), 3)
+        store_bak = linalg_helper.DAVIDSON_STORE
+        try:
+            for store in ('h5', 'memmap'):
+                linalg_helper.DAVIDSON_STORE = store
+                e, c = lib.davidson1(aop, x0, a.diagonal(), nroots=3, tol=1e-10,
+                                     max_memory=.3)[1:]
+                self.assertAlmostEqual(abs(e - e_ref).max(), 0, 9)
+                for k in range(3):
+                    self.assertAlmostEqual(abs(numpy.dot(c[k], c_ref[k])), 1, 7)
+        finally:
+            linalg_helper.DAVIDSON_STORE = store_bak
+
+    def test_xlist_memmap(self):
+        xs = linalg_helper._XlistMemmap()
+        vs = numpy.random.random((20,5))
+        for v in vs:
+            xs.append(v)
+        xs.pop(3)
+        xs.append(vs[3])
+        self.assertEqual(len(xs), 20)
+        out = numpy.empty((20,5))
+        for p0, p1, blk in linalg_helper._iter_blocks(xs, 6):
+            out[p0:p1] = blk
+        self.assertAlmostEqual(abs(out[:19] - numpy.delete(vs, 3, axis=0)).max(), 0, 14)
+        self.assertAlmostEqual(abs(out[19] - vs[3]).max(), 0, 14)
+
+    def test_project_out(self):
+        numpy.random.seed(2)
+        xs = numpy.linalg.qr(numpy.random.random((50,12)))[0].T
+        # xt nearly linearly dependent on xs
+        xt = numpy.dot(numpy.random.random((3,12)), xs)
+        xt += numpy.random.random((3,50)) * 1e-9
+        xt = linalg_helper._project_out(list(xt), list(xs), numpy.dot, 5)
+        xt = numpy.asarray([x/numpy.linalg.norm(x) for x in xt])
+        self.assertAlmostEqual(abs(numpy.dot(xs, xt.T)).max(), 0, 12)
+
 if __name__ == "__main__":
     print("Full Tests for linalg_helper")
     unittest.main()
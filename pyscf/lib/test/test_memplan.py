@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import unittest
+import warnings
+import numpy
+from pyscf import lib, gto, scf, mp, cc, mcscf
+from pyscf.lib import memplan
+
+mol = gto.M(atom='O 0 0 0; H 0 -0.757 0.587; H 0 0.757 0.587',
+            basis='6-31g', verbose=0)
+mf = scf.RHF(mol).run()
+
+def tearDownModule():
+    global mol, mf
+    del mol, mf
+
+class KnownValues(unittest.TestCase):
+    def test_registry(self):
+        gc.collect()
+        mem0 = memplan.tracked()
+        a = memplan.empty((1000,1000), label='a')
+        self.assertAlmostEqual(memplan.tracked() - mem0, 8., 9)
+        # Independent of the buffers registered earlier
+        budget = memplan.committed() + 100
+        self.assertAlmostEqual(memplan.available(budget), 100, 0)
+        self.assertTrue(memplan.fits(50, budget))
+        self.assertFalse(memplan.fits(150, budget))
+
+        # The written buffer is included in the resident memory
+        a[:] = 1.
+        self.assertAlmostEqual(memplan.available(budget), 100, 0)
+        a = None
+        gc.collect()
+        self.assertAlmostEqual(memplan.tracked(), mem0, 9)
+
+    def test_unwritten_pages(self):
+        # Larger than the mmap threshold of malloc, the pages are not resident
+        a = memplan.empty((5000,1000), label='a')
+        mem0 = memplan.committed()
+        # Pages may be faulted in 2 MB huge pages
+        self.assertAlmostEqual(memplan._unwritten(a, 40.), 40, delta=4)
+        a[:2500] = 1.
+        self.assertAlmostEqual(memplan._unwritten(a, 40.), 20, delta=4)
+        self.assertAlmostEqual(memplan.committed(), mem0, delta=4)
+        a[2500:] = 1.
+        self.assertAlmostEqual(memplan._unwritten(a, 40.), 0, 9)
+
+        # A buffer on the pages which are resident already is not counted
+        # twice
+        b = memplan.register(a[1000:2000])
+        self.assertAlmostEqual(memplan._unwritten(b, 8.), 0, 9)
+
+    def test_block_size(self):
+        budget = lib.current_memory()[0] + memplan.tracked() + 80
+        blksize = memplan.block_size(budget, 1e5, blkmin=2, blkmax=1000)
+        self.assertTrue(90 <= blksize <= 100)
+        self.assertEqual(memplan.block_size(budget, 1e2, blkmax=50), 50)
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            blksize = memplan.block_size(budget, 1e8, blkmin=4)
+            self.assertEqual(blksize, 4)
+            self.assertEqual(len(w), 1)
+
+        with lib.temporary_env(memplan, STRICT=True):
+            self.assertRaises(MemoryError, memplan.block_size, budget, 1e8, blkmin=4)
+
+    def test_estimate(self):
+        est = memplan.estimate(mf)
+        self.assertTrue(est['memory'] > lib.current_memory()[0])
+        self.assertEqual(est['disk'], 0)
+
+        mycc = cc.CCSD(mf)
+        est = memplan.estimate(mycc)
+        self.assertEqual(est['disk'], 0)
+        mycc.max_memory = 1
+        est1 = memplan.estimate(mycc)
+        self.assertTrue(est1['disk'] > 0)
+        self.assertTrue(est1['memory'] < est['memory'])
+
+        est = memplan.estimate(mp.MP2(mf))
+        self.assertTrue(est['memory'] > lib.current_memory()[0])
+        est = memplan.estimate(mcscf.CASSCF(mf, 4, 4))
+        self.assertTrue(est['memory'] > lib.current_memory()[0])
+
+    def test_ccsd_outcore(self):
+        mycc = cc.CCSD(mf)
+        mycc.max_memory = 1
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            eris = mycc.ao2mo()
+        self.assertTrue(hasattr(eris, 'feri1'))
+        mycc.max_memory = 4000
+        ecc = mycc.kernel(eris=eris)[0]
+        self.assertAlmostEqual(ecc, cc.CCSD(mf).kernel()[0], 8)
+
+
+if __name__ == "__main__":
+    print("Full Tests for memplan")
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+import tempfile
+import unittest
+from pyscf import lib, gto, scf, dft, cc
+from pyscf.lib import logger
+from pyscf.lib import profiler
+
+mol = gto.M(atom='O 0 0 0; H 0 -0.757 0.587; H 0 0.757 0.587',
+            basis='6-31g', verbose=0)
+
+class KnownValues(unittest.TestCase):
+    def test_region(self):
+        prof = profiler.Profiler()
+        with prof:
+            with profiler.region(None, 'a'):
+                with profiler.region(None, 'b'):
+                    log = logger.Logger(verbose=0)
+                    log.timer('t', time.clock(), time.time())
+                with profiler.region(None, 'b'):
+                    pass
+        self.assertTrue(profiler.active() is None)
+        tree = prof.to_dict()
+        self.assertEqual(len(tree['children']), 1)
+        a = tree['children'][0]
+        self.assertEqual(a['label'], 'a')
+        self.assertEqual([x['label'] for x in a['children']], ['b', 'b'])
+        self.assertEqual(a['children'][0]['children'][0]['label'], 't')
+        self.assertTrue(a['peak_rss'] > 0)
+
+        stat = prof.summary()
+        self.assertEqual(stat['a/b']['count'], 2)
+        self.assertEqual(stat['a/b/t']['count'], 1)
+
+        trace = json.loads(prof.dump_chrome_trace())
+        self.assertEqual(len(trace['traceEvents']), 4)
+        self.assertEqual(trace['traceEvents'][0]['ph'], 'X')
+
+    def test_enter_exit(self):
+        @profiler.profile('f')
+        def f(x):
+            if x < 0:
+                raise RuntimeError
+            return x
+        prof = profiler.Profiler()
+        with prof:
+            region = profiler.region(None, 'a').enter()
+            self.assertEqual(f(1), 1)
+            region.exit()
+            try:
+                with profiler.region(None, 'b'):
+                    profiler.region(None, 'c').enter()
+                    f(-1)
+            except RuntimeError:
+                pass
+        self.assertTrue(profiler.active() is None)
+        stat = prof.summary()
+        self.assertEqual(sorted(stat), ['a', 'a/f', 'b', 'b/c', 'b/c/f'])
+        self.assertEqual(f(2), 2)
+        self.assertTrue(profiler.region(None, 'a').enter() is profiler._NULL_CONTEXT)
+
+    def test_disabled(self):
+        self.assertTrue(profiler.region(None, 'a') is profiler._NULL_CONTEXT)
+        self.assertTrue(profiler.region(mol, 'a') is profiler._NULL_CONTEXT)
+
+    def test_attached_to_object(self):
+        mf = scf.RHF(mol)
+        mf.profiler = profiler.Profiler()
+        mf.kernel()
+        self.assertTrue(profiler.active() is None)
+        stat = mf.profiler.summary()
+        self.assertEqual(stat['SCF']['count'], 1)
+        self.assertTrue(stat['SCF/cycle']['count'] > 1)
+        self.assertTrue('SCF/cycle/get_jk' in stat)
+
+        mf = dft.RKS(mol)
+        mf.profiler = profiler.Profiler()
+        mf.kernel()
+        self.assertTrue('SCF/cycle/nr_rks' in mf.profiler.summary())
+
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        mf.profiler.dump_json(ftmp.name)
+        with open(ftmp.name) as f:
+            self.assertEqual(json.load(f)['children'][0]['label'], 'SCF')
+
+    def test_ccsd(self):
+        with profiler.Profiler() as prof:
+            mf = scf.RHF(mol).run()
+            cc.CCSD(mf).run()
+        stat = prof.summary()
+        self.assertTrue(stat['CCSD/CCSD iter']['count'] > 1)
+
+
+if __name__ == "__main__":
+    print("Full Tests for profiler")
+    unittest.main()
@@ -20,10 +20,15 @@
 #
 
 import numpy
-import h5py
 from pyscf.lib.chkfile import load
 from pyscf.lib.chkfile import dump, save
 from pyscf.lib.chkfile import load_mol, save_mol
+from pyscf.lib.chkfile import _lock, _update
+from pyscf import __config__
+
+# Replace the chkfile by an updated copy in dump_mcscf.  A job killed during
+# dump_mcscf leaves the results of the previous dump intact.
+ATOMIC_DUMP = getattr(__config__, 'mcscf_chkfile_atomic_dump', True)
 
 
 def load_mcscf(chkfile):
@@ -43,30 +48,25 @@ def dump_mcscf(mc, chkfile=None, key='mcscf',
     if mo_coeff is None: mo_coeff = mc.mo_coeff
     #if ci_vector is None: ci_vector = mc.ci
 
-    if h5py.is_hdf5(chkfile):
-        fh5 = h5py.File(chkfile)
-        if key in fh5:
-            del(fh5[key])
+    if overwrite_mol:
+        keys = ('mol', key)
     else:
-        fh5 = h5py.File(chkfile, 'w')
-
-    if 'mol' not in fh5:
-        fh5['mol'] = mc.mol.dumps()
-    elif overwrite_mol:
-        del(fh5['mol'])
-        fh5['mol'] = mc.mol.dumps()
+        keys = (key,)
+    with _lock:
+        with _update(chkfile, keys, ATOMIC_DUMP) as fh5:
+            if 'mol' not in fh5:
+                fh5['mol'] = mc.mol.dumps()
 
-    fh5[key+'/mo_coeff'] = mo_coeff
+            fh5[key+'/mo_coeff'] = mo_coeff
 
-    def store(subkey, val):
-        if val is not None:
-            fh5[key+'/'+subkey] = val
-    store('e_tot', e_tot)
-    store('e_cas', e_cas)
-    store('ci', ci_vector)
-    store('ncore', ncore)
-    store('ncas', ncas)
-    store('mo_occ', mo_occ)
-    store('mo_energy', mo_energy)
-    store('casdm1', casdm1)
-    fh5.close()
+            def store(subkey, val):
+                if val is not None:
+                    fh5[key+'/'+subkey] = val
+            store('e_tot', e_tot)
+            store('e_cas', e_cas)
+            store('ci', ci_vector)
+            store('ncore', ncore)
+            store('ncas', ncas)
+            store('mo_occ', mo_occ)
+            store('mo_energy', mo_energy)
+            store('casdm1', casdm1)
@@ -24,6 +24,7 @@ import numpy
 import scipy.linalg
 from pyscf import lib
 from pyscf.lib import logger
+from pyscf.lib import checkpoint
 from pyscf.mcscf import casci
 from pyscf.mcscf.casci import get_fock, cas_natorb, canonicalize
 from pyscf.mcscf import mc_ao2mo
@@ -344,6 +345,17 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None,
     ncore = casscf.ncore
     ncas = casscf.ncas
     nocc = ncore + ncas
+    ckpt = checkpoint.new(casscf, 'casscf', tag=lib.finger(mo_coeff))
+    state = None
+    if ckpt is not None:
+        state = ckpt.load()
+        if state is not None:
+            log.note('Restart CASSCF from checkpoint %s after macro iteration %d',
+                     ckpt.filename, state['imacro'])
+            mo = state['mo']
+            if 'ci' in state:
+                ci0 = state['ci']
+
     #TODO: lazy evaluate eris, to leave enough memory for FCI solver
     eris = casscf.ao2mo(mo)
     e_tot, e_cas, fcivec = casscf.casci(mo, ci0, eris, log, locals())
@@ -374,6 +386,13 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None,
     t3m = t2m = log.timer('CAS DM', *t1m)
     imacro = 0
     dr0 = None
+    if state is not None:
+        imacro = int(state['imacro'])
+        conv = bool(state['conv'])
+        totmicro = int(state['totmicro'])
+        totinner = int(state['totinner'])
+        r0 = state.get('r0')
+        state = None
     while not conv and imacro < casscf.max_cycle_macro:
         imacro += 1
         max_cycle_micro = casscf.micro_cycle_scheduler(locals())
@@ -446,9 +465,24 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None,
         if dump_chk:
             casscf.dump_chk(locals())
 
+        if ckpt is not None:
+            state = {'imacro': imacro, 'conv': conv, 'mo': mo,
+                     'totmicro': totmicro, 'totinner': totinner}
+            if r0 is not None:
+                state['r0'] = r0
+            if (isinstance(fcivec, numpy.ndarray) or
+                (isinstance(fcivec, (list, tuple)) and
+                 all(isinstance(x, numpy.ndarray) for x in fcivec))):
+                state['ci'] = fcivec
+            ckpt.save(state, imacro-1)
+            state = None
+
         if callable(callback):
             callback(locals())
 
+    if ckpt is not None:
+        ckpt.clear()
+
     if conv:
         log.info('1-step CASSCF converged in %d macro (%d JK %d micro) steps',
                  imacro, totinner, totmicro)
@@ -585,6 +619,12 @@ class CASSCF(casci.CASCI):
         chkfile : str
             Checkpoint file to save the intermediate orbitals during the CASSCF optimization.
             Default is the checkpoint file of mean field object.
+        checkpoint : str
+            File to save the orbitals and CI vectors of each macro iteration.
+            An interrupted calculation restarts from the last saved macro
+            iteration.  See :mod:`lib.checkpoint`.  The Davidson iterations
+            of the FCI solver are checkpointed separately by
+            fcisolver.checkpoint.
         ci_response_space : int
             subspace size to solve the CI vector response.  Default is 3.
         callback : function(envs_dict) => None
@@ -668,6 +708,8 @@ class CASSCF(casci.CASCI):
     kf_trust_region = getattr(__config__, 'mcscf_mc1step_CASSCF_kf_trust_region', 3.0)
 
     ao2mo_level = getattr(__config__, 'mcscf_mc1step_CASSCF_ao2mo_level', 2)
+    # 'incore' (with outcore fallback) or 'direct' (AO-direct, no disk)
+    ao2mo_method = getattr(__config__, 'mcscf_mc1step_CASSCF_ao2mo_method', 'incore')
     natorb = getattr(__config__, 'mcscf_mc1step_CASSCF_natorb', False)
     canonicalization = getattr(__config__, 'mcscf_mc1step_CASSCF_canonicalization', True)
     sorting_mo_energy = getattr(__config__, 'mcscf_mc1step_CASSCF_sorting_mo_energy', False)
@@ -678,6 +720,7 @@ class CASSCF(casci.CASCI):
 
         self.callback = None
         self.chkfile = self._scf.chkfile
+        self.checkpoint = None
 
         self.fcisolver.max_cycle = getattr(__config__,
                                            'mcscf_mc1step_CASSCF_fcisolver_max_cycle', 50)
@@ -702,7 +745,7 @@ class CASSCF(casci.CASCI):
                     'ci_grad_trust_region', 'with_dep4', 'chk_ci',
                     'kf_interval', 'kf_trust_region', 'fcisolver_max_cycle',
                     'fcisolver_conv_tol', 'natorb', 'canonicalization',
-                    'sorting_mo_energy'))
+                    'sorting_mo_energy', 'ao2mo_method'))
         self._keys = set(self.__dict__.keys()).union(keys)
 
     def dump_flags(self, verbose=None):
@@ -738,6 +781,7 @@ class CASSCF(casci.CASCI):
         log.info('canonicalization = %s', self.canonicalization)
         log.info('sorting_mo_energy = %s', self.sorting_mo_energy)
         log.info('ao2mo_level = %d', self.ao2mo_level)
+        log.info('ao2mo_method = %s', self.ao2mo_method)
         log.info('chkfile = %s', self.chkfile)
         log.info('max_memory %d MB (current use %d MB)',
                  self.max_memory, lib.current_memory()[0])
@@ -909,7 +953,7 @@ To enable the solvent model for CASSCF, a decoration to CASSCF object as below n
 #        eris.papa = numpy.asarray(eri[:,ncore:nocc,:,ncore:nocc], order='C')
 #        return eris
 
-        return mc_ao2mo._ERIS(self, mo_coeff, method='incore',
+        return mc_ao2mo._ERIS(self, mo_coeff, method=self.ao2mo_method,
                               level=self.ao2mo_level)
 
     # Don't remove the two functions.  They are used in df.approx_hessian code
@@ -21,6 +21,7 @@ import numpy
 import h5py
 from pyscf import lib
 from pyscf.lib import logger
+from pyscf.lib import memplan
 from pyscf import ao2mo
 from pyscf.ao2mo import _ao2mo
 from pyscf.ao2mo import outcore
@@ -93,7 +94,7 @@ def trans_e1_outcore(mol, mo, ncore, ncas, erifile,
     mo_c = numpy.asarray(mo, order='C')
     mo = numpy.asarray(mo, order='F')
     pashape = (0, nmo, ncore, nocc)
-    papa_buf = numpy.zeros((nao,ncas,nmo*ncas))
+    papa_buf = memplan.register(numpy.zeros((nao,ncas,nmo*ncas)), 'papa')
     j_pc = numpy.zeros((nmo,ncore))
     k_pc = numpy.zeros((nmo,ncore))
 
@@ -237,7 +238,7 @@ def trans_e1_outcore(mol, mo, ncore, ncas, erifile,
     papa_buf = tmp = None
     time1 = log.timer('papa pass 2', *time1)
 
-    tmp = numpy.empty((ncas**2,nao_pair))
+    tmp = memplan.empty((ncas**2,nao_pair), label='aapp')
     p0 = 0
     for istep, sh_range in enumerate(shranges):
         tmp[:,p0:p0+sh_range[2]] = faapp_buf[str(istep)]
@@ -257,6 +258,81 @@ def trans_e1_outcore(mol, mo, ncore, ncas, erifile,
     return j_pc, k_pc
 
 
+def trans_e1_direct(mol, mo, ncore, ncas, max_memory=None, level=1,
+                    verbose=logger.WARN):
+    '''AO-direct construction of ppaa, papa and j_pc, k_pc.
+
+    The integrals are contracted on the fly with the density-like
+    intermediates D^{uv} = C_u C_v^T (u >= v in the active space) and
+    D^{c} = C_c C_c^T (core orbitals, level 1 only)
+
+        ppaa[p,q,u,v] = (C^T J[D^{uv}] C)[p,q]
+        papa[p,u,q,v] = (C^T K[D^{uv}] C)[p,q]
+        j_pc[p,c] = (C^T J[D^{c}] C)[p,p]
+        k_pc[p,c] = (C^T K[D^{c}] C)[p,p]
+
+    No AO integrals or half-transformed intermediates are written to disk.
+    '''
+    from pyscf.scf import _vhf
+    time0 = (time.clock(), time.time())
+    log = logger.new_logger(mol, verbose)
+    nao, nmo = mo.shape
+    nocc = ncore + ncas
+    mo = numpy.asarray(mo, order='F')
+    mo_cas = mo[:,ncore:nocc]
+
+    ppaa = memplan.empty((nmo,nmo,ncas,ncas), label='ppaa')
+    papa = memplan.empty((nmo,ncas,nmo,ncas), label='papa')
+    j_pc = numpy.zeros((nmo,ncore))
+    k_pc = numpy.zeros((nmo,ncore))
+
+    uv_idx = numpy.tril_indices(ncas)
+    tasks = [(0, u, v) for u, v in zip(*uv_idx)]
+    if level == 1:
+        tasks += [(1, c, c) for c in range(ncore)]
+
+    if mol.cart:
+        intor = 'int2e_cart'
+    else:
+        intor = 'int2e_sph'
+    vhfopt = _vhf.VHFOpt(mol, intor, 'CVHFnrs8_prescreen',
+                         'CVHFsetnr_direct_scf', 'CVHFsetnr_direct_scf_dm')
+
+    # Each density matrix requires dm, vj, vk and two nmo x nmo buffers
+    blksize = memplan.block_size(max_memory, nao**2*3+nmo**2*2, blkmin=1,
+                                 blkmax=len(tasks), fraction=.9,
+                                 label='trans_e1_direct', rec=log)
+    log.debug1('trans_e1_direct level %d  %d JK builds, blksize %d',
+               level, len(tasks), blksize)
+    time1 = time0
+    for t0, t1 in prange(0, len(tasks), blksize):
+        dms = numpy.empty((t1-t0,nao,nao))
+        for k, (kind, u, v) in enumerate(tasks[t0:t1]):
+            if kind == 0:
+                lib.dot(mo_cas[:,u:u+1], mo_cas[:,v:v+1].T, c=dms[k])
+            else:
+                lib.dot(mo[:,u:u+1], mo[:,u:u+1].T, c=dms[k])
+        vj, vk = _vhf.direct(dms, mol._atm, mol._bas, mol._env,
+                             vhfopt=vhfopt, hermi=0, cart=mol.cart)
+        dms = None
+        vj = vj.reshape(-1,nao,nao)
+        vk = vk.reshape(-1,nao,nao)
+        for k, (kind, u, v) in enumerate(tasks[t0:t1]):
+            jpq = reduce(lib.dot, (mo.T, vj[k], mo))
+            kpq = reduce(lib.dot, (mo.T, vk[k], mo))
+            if kind == 0:
+                ppaa[:,:,u,v] = ppaa[:,:,v,u] = jpq
+                papa[:,u,:,v] = kpq
+                papa[:,v,:,u] = kpq.T
+            else:
+                j_pc[:,u] = jpq.diagonal()
+                k_pc[:,u] = kpq.diagonal()
+        vj = vk = None
+        time1 = log.timer_debug1('JK builds [%d:%d]' % (t0, t1), *time1)
+    log.timer('mc_ao2mo direct', *time0)
+    return j_pc, k_pc, ppaa, papa
+
+
 # level = 1: ppaa, papa and vhf, jpc, kpc
 # level = 2: ppaa, papa, vhf,  jpc=0, kpc=0
 class _ERIS(object):
@@ -271,10 +347,15 @@ class _ERIS(object):
         self.vhf_c = reduce(numpy.dot, (mo.T, vj*2-vk, mo))
 
         mem_incore, mem_outcore, mem_basic = _mem_usage(ncore, ncas, nmo)
-        mem_now = lib.current_memory()[0]
         eri = casscf._scf._eri
-        if (method == 'incore' and eri is not None and
-            (mem_incore+mem_now < casscf.max_memory*.9) or
+        if method == 'direct':
+            log = logger.Logger(casscf.stdout, casscf.verbose)
+            self.j_pc, self.k_pc, self.ppaa, self.papa = \
+                    trans_e1_direct(mol, mo, ncore, ncas,
+                                    max_memory=casscf.max_memory,
+                                    level=level, verbose=log)
+        elif (method == 'incore' and eri is not None and
+            memplan.fits(mem_incore, casscf.max_memory*.9) or
             mol.incore_anyway):
             if eri is None:
                 eri = mol.intor('int2e', aosym='s8')
@@ -285,10 +366,9 @@ class _ERIS(object):
             gc.collect()
             log = logger.Logger(casscf.stdout, casscf.verbose)
             self.feri = lib.H5TmpFile()
-            max_memory = max(3000, casscf.max_memory*.9-mem_now)
-            if max_memory < mem_basic:
-                log.warn('Calculation needs %d MB memory, over CASSCF.max_memory (%d MB) limit',
-                         (mem_basic+mem_now)/.9, casscf.max_memory)
+            max_memory = memplan.check(mem_basic, casscf.max_memory*.9,
+                                       'CASSCF integral transformation', log)
+            max_memory = max(3000, max_memory)
             self.j_pc, self.k_pc = \
                     trans_e1_outcore(mol, mo, ncore, ncas, self.feri,
                                      max_memory=max_memory,
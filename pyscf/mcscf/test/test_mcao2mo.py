@@ -78,6 +78,28 @@ class KnownValues(unittest.TestCase):
         self.assertTrue(numpy.allclose(k_pc , eris0.k_pc ))
         self.assertTrue(numpy.allclose(ppaa , eris0.ppaa ))
         self.assertTrue(numpy.allclose(papa , eris0.papa ))
+
+        eris4 = mcscf.mc_ao2mo._ERIS(mc, mo, 'direct', level=1)
+        self.assertTrue(numpy.allclose(eris0.vhf_c, eris4.vhf_c))
+        self.assertTrue(numpy.allclose(eris0.j_pc , eris4.j_pc ))
+        self.assertTrue(numpy.allclose(eris0.k_pc , eris4.k_pc ))
+        self.assertTrue(numpy.allclose(eris0.ppaa , eris4.ppaa ))
+        self.assertTrue(numpy.allclose(eris0.papa , eris4.papa ))
+
+        mc.max_memory = 1
+        eris5 = mcscf.mc_ao2mo._ERIS(mc, mo, 'direct', level=2)
+        self.assertTrue(numpy.allclose(eris0.ppaa , eris5.ppaa ))
+        self.assertTrue(numpy.allclose(eris0.papa , eris5.papa ))
+        mol.stdout.close()
+
+    def test_casscf_direct(self):
+        mol = gto.M(atom='N 0 0 0; N 0 0 1.1', basis='631g',
+                    verbose=7, output='/dev/null')
+        m = scf.RHF(mol).run()
+        e_ref = mcscf.CASSCF(m, 4, 4).kernel()[0]
+        mc = mcscf.CASSCF(m, 4, 4)
+        mc.ao2mo_method = 'direct'
+        self.assertAlmostEqual(mc.kernel()[0], e_ref, 9)
         mol.stdout.close()
 
     def test_uhf(self):
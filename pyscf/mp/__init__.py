@@ -19,6 +19,7 @@ Moller-Plesset perturbation theory
 from pyscf import scf
 from pyscf.mp import mp2
 from pyscf.mp import dfmp2
+from pyscf.mp import lt_dfmp2
 from pyscf.mp import ump2
 from pyscf.mp import gmp2
 
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Laplace-transformed density fitting MP2
+
+The energy denominator is expanded with a numerical Laplace quadrature
+
+    1/(e_a+e_b-e_i-e_j) = \sum_k w_k exp(-t_k(e_a-e_i)) exp(-t_k(e_b-e_j))
+
+The opposite-spin energy is then obtained from the naux x naux matrices
+Z_k = \sum_{ia} L_{P,ia} L_{Q,ia} exp(-t_k(e_a-e_i)) in O(N^4) time, without
+the (ia|jb) integrals.
+
+The exchange part of the same-spin energy cannot be factorized this way.  It
+is evaluated with the exact denominators from blocks of the (ia|jb)
+integrals, which is O(N^5) as canonical DF-MP2.  The scaled opposite-spin MP2
+(SOS-MP2, class LTSOSMP2) skips the same-spin energy and is O(N^4).
+
+Ref:
+    Almlof, Chem. Phys. Lett. 181, 319 (1991)
+    Jung, Lochan, Dutoi, Head-Gordon, J. Chem. Phys. 121, 9793 (2004)
+'''
+
+import time
+import numpy
+from pyscf import lib
+from pyscf.lib import logger
+from pyscf.lib import memplan
+from pyscf.mp import mp2
+from pyscf.mp import dfmp2
+from pyscf import __config__
+
+# Number of quadrature points of the Laplace transformation
+NPOINTS = getattr(__config__, 'mp_lt_dfmp2_npoints', 8)
+# Orbital pairs with exp(-t_k(e_a-e_i)) smaller than SCREEN are skipped
+SCREEN = getattr(__config__, 'mp_lt_dfmp2_screen', 1e-12)
+# Scaling factors of the opposite-spin and same-spin energies
+OS_FACTOR = getattr(__config__, 'mp_lt_dfmp2_os_factor', 1.)
+SS_FACTOR = getattr(__config__, 'mp_lt_dfmp2_ss_factor', 1.)
+# Scaling factor of the opposite-spin energy in SOS-MP2
+SOS_FACTOR = getattr(__config__, 'mp_lt_dfmp2_sos_factor', 1.3)
+
+
+def laplace_quadrature(xmin, xmax, npoints=NPOINTS):
+    '''Weights w_k and exponents t_k for 1/x = \sum_k w_k exp(-t_k x) in the
+    range [xmin, xmax].
+
+    The exponents are distributed evenly on a logarithmic scale.  The range
+    of the exponents is optimized and the weights are fitted by least squares
+    to minimize the relative error of the quadrature.
+
+    Returns:
+        w, t, err.  err is the max relative error of the quadrature in
+        [xmin, xmax].
+    '''
+    assert(xmin > 0)
+    rmax = max(xmax / xmin, 1+1e-8)
+    x = numpy.exp(numpy.linspace(0, numpy.log(rmax), 400))
+    def fit(lo, hi):
+        t = numpy.exp(numpy.linspace(lo, hi, npoints))
+        a = numpy.exp(-x[:,None] * t) * x[:,None]
+        w = numpy.linalg.lstsq(a, numpy.ones_like(x), rcond=None)[0]
+        return w, t, abs(a.dot(w) - 1).max()
+
+    w, t, err = None, None, numpy.inf
+    for lo in numpy.linspace(-5, -1, 17) - numpy.log(rmax):
+        for hi in numpy.linspace(0, 4, 17):
+            w1, t1, err1 = fit(lo, hi)
+            if err1 < err:
+                w, t, err = w1, t1, err1
+    return w/xmin, t/xmin, err
+
+
+def kernel(mp, mo_energy=None, mo_coeff=None, eris=None, with_t2=False,
+           verbose=logger.NOTE):
+    if mo_energy is None or mo_coeff is None:
+        mo_coeff = mp2._mo_without_core(mp, mp.mo_coeff)
+        mo_energy = mp2._mo_energy_without_core(mp, mp.mo_energy)
+    else:
+        assert(mp.frozen is 0 or mp.frozen is None)
+    if with_t2:
+        logger.warn(mp, 'Laplace-transformed MP2 does not generate t2 amplitudes')
+
+    cput0 = (time.clock(), time.time())
+    log = logger.new_logger(mp, verbose)
+    nocc = mp.nocc
+    nvir = mp.nmo - nocc
+    nov = nocc * nvir
+    naux = mp.with_df.get_naoaux()
+    eia = mo_energy[nocc:] - mo_energy[:nocc,None]
+
+    w, t, err = laplace_quadrature(eia.min()*2, eia.max()*2, mp.npoints)
+    log.debug('Laplace quadrature points %d, max relative error %.3g',
+              mp.npoints, err)
+    log.debug1('weights %s', w)
+    log.debug1('exponents %s', t)
+
+    # L^T is held in the shape (nocc*nvir,naux) to load blocks of ia pairs
+    if memplan.fits(nov*naux*8e-6, mp.max_memory):
+        Lt = memplan.empty((nov,naux), label='Lov')
+        feri = None
+    else:
+        feri = lib.H5TmpFile()
+        Lt = feri.create_dataset('Lov', (nov,naux), 'f8')
+    # Squared norms of the rows of L^T, to bound the screening error
+    lnorm2 = numpy.zeros(nov)
+    p1 = 0
+    for qov in mp.loop_ao2mo(mo_coeff, nocc):
+        p0, p1 = p1, p1 + qov.shape[0]
+        Lt[:,p0:p1] = qov.T
+        lnorm2 += numpy.einsum('pq,pq->q', qov, qov)
+    cput1 = log.timer_debug1('DF integrals', *cput0)
+
+    blksize = memplan.block_size(mp.max_memory, naux*2, naux**2, nvir, nov,
+                                 .9, 'LT-DF-MP2', log)
+    blksize = max(nvir, blksize // nvir * nvir)
+    eia = eia.ravel()
+
+    e_os = 0
+    # Upper bound of the contributions of the screened pairs.  The screened
+    # rows add a matrix zd to Z_k with |zd| <= trace(zd) = d.
+    e_screen = 0
+    for k in range(len(w)):
+        z = numpy.zeros((naux,naux))
+        d = 0
+        for p0, p1 in lib.prange(0, nov, blksize):
+            s = numpy.exp(-t[k] * eia[p0:p1])
+            mask = s > SCREEN
+            d += numpy.dot(s[~mask], lnorm2[p0:p1][~mask])
+            if numpy.any(mask):
+                x = numpy.asarray(Lt[p0:p1])[mask]
+                lib.ddot(x.T * s[mask], x, 1, z, 1)
+        zz = numpy.einsum('pq,pq', z, z)
+        e_os -= w[k] * zz
+        e_screen += abs(w[k]) * (2 * numpy.sqrt(zz) * d + d**2)
+        z = None
+        cput1 = log.timer_debug1('quadrature point %d' % k, *cput1)
+
+    # Exchange-like term of the same-spin energy with exact denominators.
+    # This is the O(N^5) part.
+    e_x = 0
+    if mp.ss_factor != 0:
+        eia = eia.reshape(nocc,nvir)
+        # Two (oblk*nvir)**2 intermediates g, gd and two blocks of L
+        avail = memplan.available(mp.max_memory) * .9e6/8 / 2
+        oblk = (numpy.sqrt(naux**2 + avail) - naux) / max(nvir, 1)
+        oblk = int(min(nocc, max(1, oblk)))
+        for i0, i1 in lib.prange(0, nocc, oblk):
+            li = numpy.asarray(Lt[i0*nvir:i1*nvir])
+            for j0, j1 in lib.prange(0, nocc, oblk):
+                lj = numpy.asarray(Lt[j0*nvir:j1*nvir])
+                g = lib.ddot(li, lj.T).reshape(i1-i0,nvir,j1-j0,nvir)
+                gd = g / lib.direct_sum('ia+jb->iajb', eia[i0:i1], eia[j0:j1])
+                e_x += numpy.einsum('iajb,ibja', gd, g)
+                lj = g = gd = None
+            li = None
+        cput1 = log.timer_debug1('exchange term', *cput1)
+
+    mp.e_os = e_os
+    # The direct part of the same-spin energy is E_os.  Its errors are
+    # counted by ss_factor.  The exchange part e_x is exact.
+    mp.e_error = ((err * abs(e_os) + e_screen) *
+                  (abs(mp.os_factor) + abs(mp.ss_factor)))
+    emp2 = mp.os_factor * e_os
+    log.info('E_os = %.15g', e_os)
+    if mp.ss_factor != 0:
+        mp.e_ss = e_os + e_x
+        emp2 += mp.ss_factor * mp.e_ss
+        log.info('E_ss = %.15g', mp.e_ss)
+    else:
+        mp.e_ss = None
+    log.info('Estimated error of LT-MP2 energy = %.3g', mp.e_error)
+    Lt = feri = None
+    log.timer('LT-DF-MP2', *cput0)
+    return emp2, None
+
+
+class LTDFMP2(dfmp2.DFMP2):
+    '''Laplace-transformed DF-MP2
+
+    Attributes:
+        npoints : int
+            Number of quadrature points of the Laplace transformation.
+            Default is 8.
+        os_factor : float
+            Scaling factor of the opposite-spin energy.  Default is 1.
+        ss_factor : float
+            Scaling factor of the same-spin energy.  Default is 1.  If
+            ss_factor is not 0, the exchange part of the same-spin energy is
+            computed in O(N^5) time.  See also LTSOSMP2.
+
+    Saved results:
+        e_corr : float
+            MP2 correlation energy
+        e_os, e_ss : float
+            Opposite-spin and same-spin components of the MP2 energy.  e_ss
+            is not computed if ss_factor is 0.
+        e_error : float
+            Upper bound of the deviation of e_corr from the canonical DF-MP2
+            energy of the same os_factor and ss_factor, due to the Laplace
+            quadrature and the screening of the orbital pairs
+    '''
+    def __init__(self, mf, frozen=0, mo_coeff=None, mo_occ=None):
+        dfmp2.DFMP2.__init__(self, mf, frozen, mo_coeff, mo_occ)
+        self.npoints = NPOINTS
+        self.os_factor = OS_FACTOR
+        self.ss_factor = SS_FACTOR
+        self.e_os = None
+        self.e_ss = None
+        self.e_error = None
+        self._keys.update(['npoints', 'os_factor', 'ss_factor', 'e_os',
+                           'e_ss', 'e_error'])
+
+    def dump_flags(self):
+        dfmp2.DFMP2.dump_flags(self)
+        log = logger.Logger(self.stdout, self.verbose)
+        log.info('Laplace quadrature points = %d', self.npoints)
+        log.info('os_factor = %g  ss_factor = %g', self.os_factor, self.ss_factor)
+        return self
+
+    def kernel(self, mo_energy=None, mo_coeff=None, eris=None, with_t2=False):
+        return mp2.MP2.kernel(self, mo_energy, mo_coeff, eris, with_t2, kernel)
+
+LTMP2 = LTDFMP2
+
+
+class LTSOSMP2(LTDFMP2):
+    '''Scaled opposite-spin MP2 (SOS-MP2) in O(N^4) time with the Laplace
+    transformation.  e_corr = os_factor * e_os.  The default os_factor is
+    1.3 and ss_factor is 0.  e_error bounds the deviation from the canonical
+    DF-MP2 value of os_factor * e_os.
+    '''
+    def __init__(self, mf, frozen=0, mo_coeff=None, mo_occ=None):
+        LTDFMP2.__init__(self, mf, frozen, mo_coeff, mo_occ)
+        self.os_factor = SOS_FACTOR
+        self.ss_factor = 0
+
+from pyscf import scf
+scf.hf.RHF.LTDFMP2 = lib.class_as_method(LTDFMP2)
+scf.hf.RHF.LTSOSMP2 = lib.class_as_method(LTSOSMP2)
+scf.rohf.ROHF.LTDFMP2 = None
+scf.rohf.ROHF.LTSOSMP2 = None
+scf.uhf.UHF.LTDFMP2 = None
+scf.uhf.UHF.LTSOSMP2 = None
+
+
+if __name__ == '__main__':
+    from pyscf import gto
+    mol = gto.Mole()
+    mol.verbose = 0
+    mol.atom = [
+        [8 , (0. , 0.     , 0.)],
+        [1 , (0. , -0.757 , 0.587)],
+        [1 , (0. , 0.757  , 0.587)]]
+    mol.basis = 'cc-pvdz'
+    mol.build()
+    mf = scf.RHF(mol).run()
+    pt = LTDFMP2(mf)
+    emp2 = pt.kernel()[0]
+    print(emp2 - -0.204004830285, pt.e_error)
+
+    pt.npoints = 12
+    emp2 = pt.kernel()[0]
+    print(emp2 - -0.204004830285, pt.e_error)
+
+    emp2 = LTSOSMP2(mf).kernel()[0]
+    print(emp2)
@@ -25,6 +25,7 @@ import numpy
 from pyscf import gto
 from pyscf import lib
 from pyscf.lib import logger
+from pyscf.lib import memplan
 from pyscf import ao2mo
 from pyscf.ao2mo import _ao2mo
 from pyscf import __config__
@@ -436,17 +437,13 @@ def _make_eris(mp, mo_coeff=None, ao2mofn=None, verbose=None):
     nmo = mp.nmo
     nvir = nmo - nocc
     mem_incore, mem_outcore, mem_basic = _mem_usage(nocc, nvir)
-    mem_now = lib.current_memory()[0]
-    max_memory = max(0, mp.max_memory - mem_now)
-    if max_memory < mem_basic:
-        log.warn('Not enough memory for integral transformation. '
-                 'Available mem %s MB, required mem %s MB',
-                 max_memory, mem_basic)
+    max_memory = memplan.check(mem_basic, mp.max_memory,
+                               'MP2 integral transformation', log)
 
     co = numpy.asarray(mo_coeff[:,:nocc], order='F')
     cv = numpy.asarray(mo_coeff[:,nocc:], order='F')
     if (mp.mol.incore_anyway or
-        (mp._scf._eri is not None and mem_incore < max_memory)):
+        (mp._scf._eri is not None and memplan.fits(mem_incore, mp.max_memory))):
         log.debug('transform (ia|jb) incore')
         if callable(ao2mofn):
             eris.ovov = ao2mofn((co,cv,co,cv)).reshape(nocc*nvir,nocc*nvir)
@@ -495,14 +492,14 @@ def _ao2mo_ovov(mp, orbo, orbv, feri, max_memory=2000, verbose=None):
     dmax = max(4, min(nao/3, numpy.sqrt(max_memory*.95e6/8/(nao+nocc)**2)))
     sh_ranges = ao2mo.outcore.balance_partition(ao_loc, dmax)
     dmax = max(x[2] for x in sh_ranges)
-    eribuf = numpy.empty((nao,dmax,dmax,nao))
+    eribuf = memplan.empty((nao,dmax,dmax,nao), label='eri_ao')
     ftmp = lib.H5TmpFile()
     log.debug('max_memory %s MB (dmax = %s) required disk space %g MB',
               max_memory, dmax, nocc**2*(nao*(nao+dmax)/2+nvir**2)*8/1e6)
 
-    buf_i = numpy.empty((nocc*dmax**2*nao))
-    buf_li = numpy.empty((nocc**2*dmax**2))
-    buf1 = numpy.empty_like(buf_li)
+    buf_i = memplan.empty((nocc*dmax**2*nao), label='eri_i')
+    buf_li = memplan.empty((nocc**2*dmax**2), label='eri_li')
+    buf1 = memplan.empty((nocc**2*dmax**2), label='eri_li')
 
     fint = gto.moleintor.getints4c
     jk_blk_slices = []
@@ -549,10 +546,10 @@ def _ao2mo_ovov(mp, orbo, orbv, feri, max_memory=2000, verbose=None):
             h5dat[i*nvir:(i+1)*nvir] = dat[i-i0].reshape(nvir,nocc*nvir)
 
     orbv = numpy.asarray(orbv, order='F')
-    buf_prefecth = numpy.empty((occblk,nocc,nao,nao))
-    buf = numpy.empty_like(buf_prefecth)
-    bufw = numpy.empty((occblk*nocc,nvir**2))
-    bufw1 = numpy.empty_like(bufw)
+    buf_prefecth = memplan.empty((occblk,nocc,nao,nao), label='eri_oo')
+    buf = memplan.empty((occblk,nocc,nao,nao), label='eri_oo')
+    bufw = memplan.empty((occblk*nocc,nvir**2), label='ovov')
+    bufw1 = memplan.empty((occblk*nocc,nvir**2), label='ovov')
     with lib.call_in_background(load) as prefetch:
         with lib.call_in_background(save) as bsave:
             load(0, buf_prefecth)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import numpy
+from pyscf import gto
+from pyscf import scf
+from pyscf.mp import dfmp2, lt_dfmp2
+
+mol = gto.Mole()
+mol.verbose = 7
+mol.output = '/dev/null'
+mol.atom = [
+    [8 , (0. , 0.     , 0.)],
+    [1 , (0. , -0.757 , 0.587)],
+    [1 , (0. , 0.757  , 0.587)]]
+mol.basis = 'cc-pvdz'
+mol.build()
+mf = scf.RHF(mol)
+mf.conv_tol = 1e-12
+mf.scf()
+e_dfmp2 = dfmp2.DFMP2(mf).kernel()[0]
+
+def tearDownModule():
+    global mol, mf
+    mol.stdout.close()
+    del mol, mf
+
+
+class KnownValues(unittest.TestCase):
+    def test_laplace_quadrature(self):
+        w, t, err = lt_dfmp2.laplace_quadrature(.5, 50., 8)
+        x = numpy.linspace(.5, 50., 1000)
+        val = numpy.exp(-x[:,None] * t).dot(w)
+        self.assertAlmostEqual(abs(val*x - 1).max(), err, 6)
+        self.assertTrue(err < 1e-3)
+
+    def test_energy(self):
+        pt = lt_dfmp2.LTDFMP2(mf)
+        e = pt.kernel()[0]
+        self.assertAlmostEqual(e, e_dfmp2, 4)
+        self.assertTrue(abs(e - e_dfmp2) < pt.e_error)
+
+        pt.npoints = 12
+        e = pt.kernel()[0]
+        self.assertAlmostEqual(e, e_dfmp2, 6)
+        self.assertTrue(abs(e - e_dfmp2) < pt.e_error)
+
+        pt.max_memory = 1
+        e1 = pt.kernel()[0]
+        self.assertAlmostEqual(e1, e, 9)
+
+        pt.frozen = 1
+        e = pt.kernel()[0]
+        self.assertAlmostEqual(e, dfmp2.DFMP2(mf, frozen=1).kernel()[0], 4)
+
+    def test_sos_mp2(self):
+        pt = lt_dfmp2.LTDFMP2(mf)
+        pt.npoints = 12
+        e = pt.kernel()[0]
+        e_os = pt.e_os
+        pt = lt_dfmp2.LTSOSMP2(mf)
+        pt.npoints = 12
+        e = pt.kernel()[0]
+        self.assertAlmostEqual(e, e_os * 1.3, 9)
+        self.assertTrue(pt.e_ss is None)
+        self.assertTrue(pt.e_error < 1e-6)
+
+    def test_screening_error(self):
+        pt = lt_dfmp2.LTDFMP2(mf)
+        e0 = pt.kernel()[0]
+        e_error = pt.e_error
+        screen = lt_dfmp2.SCREEN
+        lt_dfmp2.SCREEN = 1e-3
+        try:
+            e1 = pt.kernel()[0]
+        finally:
+            lt_dfmp2.SCREEN = screen
+        self.assertTrue(pt.e_error > e_error)
+        self.assertTrue(abs(e1 - e0) < pt.e_error - e_error)
+        self.assertTrue(abs(e1 - e_dfmp2) < pt.e_error)
+
+
+if __name__ == "__main__":
+    print("Full Tests for LT-DF-MP2")
+    unittest.main()
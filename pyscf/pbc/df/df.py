@@ -57,6 +57,8 @@ from pyscf.pbc.lib.kpts_helper import (is_zero, gamma_point, member, unique,
 from pyscf import __config__
 
 LINEAR_DEP_THR = getattr(__config__, 'pbc_df_df_DF_lindep', 1e-9)
+# Number of processes to evaluate the j3c tasks
+J3C_NPROC = getattr(__config__, 'pbc_df_df_DF_j3c_nproc', 1)
 
 
 def make_modrho_basis(cell, auxbasis=None, drop_eta=None):
@@ -146,6 +148,76 @@ def _make_j3c(mydf, cell, auxcell, kptij_lst, cderi_file):
     max_memory = max(2000, mydf.max_memory-lib.current_memory()[0])
     fused_cell, fuse = fuse_auxcell(mydf, auxcell)
 
+    nao = cell.nao_nr()
+    naux = auxcell.nao_nr()
+    mesh = mydf.mesh
+    Gv, Gvbase, kws = cell.get_Gv_weights(mesh)
+    b = cell.reciprocal_vectors()
+    gxyz = lib.cartesian_prod([numpy.arange(len(x)) for x in Gvbase])
+    ngrids = gxyz.shape[0]
+
+    kptis = kptij_lst[:,0]
+    kptjs = kptij_lst[:,1]
+    kpt_ji = kptjs - kptis
+    uniq_kpts, uniq_index, uniq_inverse = unique(kpt_ji)
+    nuniq = len(uniq_kpts)
+
+    log.debug('Num uniq kpts %d', nuniq)
+    log.debug2('uniq_kpts %s', uniq_kpts)
+
+    # Wrapped around boundary and symmetry between k and -k can be used
+    # explicitly for the metric integrals.  We consider this symmetry
+    # because it is used in the df_ao2mo module when contracting two 3-index
+    # integral tensors to the 4-index 2e integral tensor. If the symmetry
+    # related k-points are treated separately, the resultant 3-index tensors
+    # may have inconsistent dimension due to the numerial noise when handling
+    # linear dependency of j2c.
+    a = cell.lattice_vectors() / (2*numpy.pi)
+    def kconserve_indices(kpt):
+        '''search which (kpts+kpt) satisfies momentum conservation'''
+        kdif = numpy.einsum('wx,ix->wi', a, uniq_kpts + kpt)
+        kdif_int = numpy.rint(kdif)
+        mask = numpy.einsum('wi->i', abs(kdif - kdif_int)) < KPT_DIFF_TOL
+        uniq_kptji_ids = numpy.where(mask)[0]
+        return uniq_kptji_ids
+
+    # groups of (uniq_kptji_id, conj) which share the metric of the first
+    # k-point.  The k-point k' which has (k - k') * a = 2n pi has the metric
+    # S = S, the k-point k' which has (k + k') * a = 2n pi has S = S*.
+    groups = []
+    done = numpy.zeros(nuniq, dtype=bool)
+    for k, kpt in enumerate(uniq_kpts):
+        if done[k]:
+            continue
+        members = []
+        for uniq_kptji_id in kconserve_indices(-kpt):
+            if not done[uniq_kptji_id]:
+                members.append((uniq_kptji_id, False))
+                done[uniq_kptji_id] = True
+        for uniq_kptji_id in kconserve_indices(kpt):
+            if not done[uniq_kptji_id]:
+                members.append((uniq_kptji_id, True))
+                done[uniq_kptji_id] = True
+        groups.append((k, members))
+        log.debug1('Metric of kpt %s is used by uniq_kptji_ids (conj) %s',
+                   k, members)
+
+    feri = _open_cderi(mydf, cderi_file, kptij_lst, fused_cell.nao_nr(),
+                       _j3c_tag(mydf, cell, auxcell), log)
+    status = feri['j3c-status']
+    pending = [k for k in range(nuniq) if not _kpt_finished(status, k)]
+    if len(pending) == 0:
+        log.info('All j3c tasks were found in %s', cderi_file)
+        feri.close()
+        return
+    elif len(pending) < nuniq:
+        log.info('Restart j3c for %d of %d k-point differences',
+                 len(pending), nuniq)
+    groups = [(k, [(uniq_kptji_id, conj) for uniq_kptji_id, conj in members
+                   if uniq_kptji_id in pending])
+              for k, members in groups]
+    groups = [(k, members) for k, members in groups if members]
+
     # The ideal way to hold the temporary integrals is to store them in the
     # cderi_file and overwrite them inplace in the second pass.  The current
     # HDF5 library does not have an efficient way to manage free space in
@@ -159,32 +231,23 @@ def _make_j3c(mydf, cell, auxcell, kptij_lst, cderi_file):
     # Unlink swapfile to avoid trash
     swapfile = None
 
+    # Only the k-point pairs of the unfinished tasks are computed
+    pending_ji = numpy.where(numpy.in1d(uniq_inverse, pending))[0]
+    junk_id = dict((ji, n) for n, ji in enumerate(pending_ji))
     outcore._aux_e2(cell, fused_cell, fswap, 'int3c2e', aosym='s2',
-                    kptij_lst=kptij_lst, dataname='j3c-junk', max_memory=max_memory)
+                    kptij_lst=kptij_lst[pending_ji], dataname='j3c-junk',
+                    max_memory=max_memory)
     t1 = log.timer_debug1('3c2e', *t1)
 
-    nao = cell.nao_nr()
-    naux = auxcell.nao_nr()
-    mesh = mydf.mesh
-    Gv, Gvbase, kws = cell.get_Gv_weights(mesh)
-    b = cell.reciprocal_vectors()
-    gxyz = lib.cartesian_prod([numpy.arange(len(x)) for x in Gvbase])
-    ngrids = gxyz.shape[0]
-
-    kptis = kptij_lst[:,0]
-    kptjs = kptij_lst[:,1]
-    kpt_ji = kptjs - kptis
-    uniq_kpts, uniq_index, uniq_inverse = unique(kpt_ji)
-
-    log.debug('Num uniq kpts %d', len(uniq_kpts))
-    log.debug2('uniq_kpts %s', uniq_kpts)
     # j2c ~ (-kpt_ji | kpt_ji)
-    j2c = fused_cell.pbc_intor('int2c2e', hermi=1, kpts=uniq_kpts)
+    j2c_kpts = [k for k, members in groups]
+    j2c = fused_cell.pbc_intor('int2c2e', hermi=1, kpts=uniq_kpts[j2c_kpts])
 
     max_memory = max(2000, mydf.max_memory - lib.current_memory()[0])
     blksize = max(2048, int(max_memory*.5e6/16/fused_cell.nao_nr()))
     log.debug2('max_memory %s (MB)  blocksize %s', max_memory, blksize)
-    for k, kpt in enumerate(uniq_kpts):
+    for n, k in enumerate(j2c_kpts):
+        kpt = uniq_kpts[k]
         coulG = mydf.weighted_coulG(kpt, False, mesh)
         for p0, p1 in lib.prange(0, ngrids, blksize):
             aoaux = ft_ao.ft_ao(fused_cell, Gv[p0:p1], None, b, gxyz[p0:p1], Gvbase, kpt).T
@@ -193,16 +256,16 @@ def _make_j3c(mydf, cell, auxcell, kptij_lst, cderi_file):
             aoaux = None
 
             if is_zero(kpt):  # kpti == kptj
-                j2c[k][naux:] -= lib.ddot(LkR[naux:]*coulG[p0:p1], LkR.T)
-                j2c[k][naux:] -= lib.ddot(LkI[naux:]*coulG[p0:p1], LkI.T)
-                j2c[k][:naux,naux:] = j2c[k][naux:,:naux].T
+                j2c[n][naux:] -= lib.ddot(LkR[naux:]*coulG[p0:p1], LkR.T)
+                j2c[n][naux:] -= lib.ddot(LkI[naux:]*coulG[p0:p1], LkI.T)
+                j2c[n][:naux,naux:] = j2c[n][naux:,:naux].T
             else:
                 j2cR, j2cI = zdotCN(LkR[naux:]*coulG[p0:p1],
                                     LkI[naux:]*coulG[p0:p1], LkR.T, LkI.T)
-                j2c[k][naux:] -= j2cR + j2cI * 1j
-                j2c[k][:naux,naux:] = j2c[k][naux:,:naux].T.conj()
+                j2c[n][naux:] -= j2cR + j2cI * 1j
+                j2c[n][:naux,naux:] = j2c[n][naux:,:naux].T.conj()
             LkR = LkI = None
-        fswap['j2c/%d'%k] = fuse(fuse(j2c[k]).T).T
+        fswap['j2c/%d'%k] = fuse(fuse(j2c[n]).T).T
     j2c = coulG = None
 
     def cholesky_decomposed_metric(uniq_kptji_id):
@@ -233,10 +296,16 @@ def _make_j3c(mydf, cell, auxcell, kptij_lst, cderi_file):
             j2ctag = 'eig'
         return j2c, j2c_negative, j2ctag
 
-    feri = h5py.File(cderi_file, 'w')
-    feri['j3c-kptij'] = kptij_lst
+    def conj_j2c(cholesky_j2c):
+        j2c, j2c_negative, j2ctag = cholesky_j2c
+        if j2c_negative is None:
+            return j2c.conj(), None, j2ctag
+        else:
+            return j2c.conj(), j2c_negative.conj(), j2ctag
+
     nsegs = len(fswap['j3c-junk/0'])
-    def make_kpt(uniq_kptji_id, cholesky_j2c):
+    def kpt_setup(uniq_kptji_id):
+        '''The intermediates shared by the tasks of one k-point difference'''
         kpt = uniq_kpts[uniq_kptji_id]  # kpt = kptj - kpti
         log.debug1('kpt = %s', kpt)
         adapted_ji_idx = numpy.where(uniq_inverse == uniq_kptji_id)[0]
@@ -244,16 +313,8 @@ def _make_j3c(mydf, cell, auxcell, kptij_lst, cderi_file):
         nkptj = len(adapted_kptjs)
         log.debug1('adapted_ji_idx = %s', adapted_ji_idx)
 
-        j2c, j2c_negative, j2ctag = cholesky_j2c
-
-        shls_slice = (auxcell.nbas, fused_cell.nbas)
-        Gaux = ft_ao.ft_ao(fused_cell, Gv, shls_slice, b, gxyz, Gvbase, kpt)
         wcoulG = mydf.weighted_coulG(kpt, False, mesh)
-        Gaux *= wcoulG.reshape(-1,1)
-        kLR = Gaux.real.copy('C')
-        kLI = Gaux.imag.copy('C')
-        Gaux = None
-
+        vbar = ovlp = None
         if is_zero(kpt):  # kpti == kptj
             aosym = 's2'
             nao_pair = nao*(nao+1)//2
@@ -269,9 +330,17 @@ def _make_j3c(mydf, cell, auxcell, kptij_lst, cderi_file):
         mem_now = lib.current_memory()[0]
         log.debug2('memory = %s', mem_now)
         max_memory = max(2000, mydf.max_memory-mem_now)
-        # nkptj for 3c-coulomb arrays plus 1 Lpq array
-        buflen = min(max(int(max_memory*.38e6/16/naux/(nkptj+1)), 1), nao_pair)
-        shranges = _guess_shell_ranges(cell, buflen, aosym)
+        key = '%d/shranges' % uniq_kptji_id
+        if key in status:
+            # The shell ranges of the previous (interrupted) run
+            shranges = [tuple(x) for x in status[key][()]]
+        else:
+            # nkptj for 3c-coulomb arrays plus 1 Lpq array
+            buflen = min(max(int(max_memory*.38e6/16/naux/(nkptj+1)), 1), nao_pair)
+            shranges = _guess_shell_ranges(cell, buflen, aosym)
+            status[key] = numpy.asarray(shranges)
+            status['%d/done' % uniq_kptji_id] = numpy.zeros(len(shranges), dtype=bool)
+            status['%d/time' % uniq_kptji_id] = numpy.zeros(len(shranges))
         buflen = max([x[2] for x in shranges])
         # +1 for a pqkbuf
         if aosym == 's2':
@@ -279,131 +348,367 @@ def _make_j3c(mydf, cell, auxcell, kptij_lst, cderi_file):
         else:
             Gblksize = max(16, int(max_memory*.2e6/16/buflen/(nkptj+1)))
         Gblksize = min(Gblksize, ngrids, 16384)
-        pqkRbuf = numpy.empty(buflen*Gblksize)
-        pqkIbuf = numpy.empty(buflen*Gblksize)
-        # buf for ft_aopair
-        buf = numpy.empty(nkptj*buflen*Gblksize, dtype=numpy.complex128)
-        def pw_contract(istep, sh_range, j3cR, j3cI):
-            bstart, bend, ncol = sh_range
-            if aosym == 's2':
-                shls_slice = (bstart, bend, 0, bend)
+        costs = _j3c_task_costs(cell, shranges, aosym, nkptj, ngrids)
+        return (kpt, adapted_ji_idx, adapted_kptjs, aosym, wcoulG, vbar, ovlp,
+                shranges, Gblksize, costs)
+
+    def load_j3c(setup, istep):
+        kpt, adapted_ji_idx, adapted_kptjs, aosym, wcoulG, vbar, ovlp = setup[:7]
+        shranges = setup[7]
+        ao_loc = cell.ao_loc_nr()
+        bstart, bend, ncol = shranges[istep]
+        if aosym == 's2':
+            col0 = ao_loc[bstart]*(ao_loc[bstart]+1)//2
+        else:
+            col0 = ao_loc[bstart]*nao
+        col1 = col0 + ncol
+        j3cR = []
+        j3cI = []
+        for k, idx in enumerate(adapted_ji_idx):
+            v = numpy.vstack([fswap['j3c-junk/%d/%d'%(junk_id[idx],i)][0,col0:col1].T
+                              for i in range(nsegs)])
+            # vbar is the interaction between the background charge
+            # and the auxiliary basis.  0D, 1D, 2D do not have vbar.
+            if is_zero(kpt) and cell.dimension == 3:
+                for i in numpy.where(vbar != 0)[0]:
+                    v[i] -= vbar[i] * ovlp[k][col0:col1]
+            j3cR.append(numpy.asarray(v.real, order='C'))
+            if is_zero(kpt) and gamma_point(adapted_kptjs[k]):
+                j3cI.append(None)
             else:
-                shls_slice = (bstart, bend, 0, cell.nbas)
-
-            for p0, p1 in lib.prange(0, ngrids, Gblksize):
-                dat = ft_ao._ft_aopair_kpts(cell, Gv[p0:p1], shls_slice, aosym,
-                                            b, gxyz[p0:p1], Gvbase, kpt,
-                                            adapted_kptjs, out=buf)
-                nG = p1 - p0
-                for k, ji in enumerate(adapted_ji_idx):
-                    aoao = dat[k].reshape(nG,ncol)
-                    pqkR = numpy.ndarray((ncol,nG), buffer=pqkRbuf)
-                    pqkI = numpy.ndarray((ncol,nG), buffer=pqkIbuf)
-                    pqkR[:] = aoao.real.T
-                    pqkI[:] = aoao.imag.T
-
-                    lib.dot(kLR[p0:p1].T, pqkR.T, -1, j3cR[k][naux:], 1)
-                    lib.dot(kLI[p0:p1].T, pqkI.T, -1, j3cR[k][naux:], 1)
-                    if not (is_zero(kpt) and gamma_point(adapted_kptjs[k])):
-                        lib.dot(kLR[p0:p1].T, pqkI.T, -1, j3cI[k][naux:], 1)
-                        lib.dot(kLI[p0:p1].T, pqkR.T,  1, j3cI[k][naux:], 1)
-
-            for k, ji in enumerate(adapted_ji_idx):
-                if is_zero(kpt) and gamma_point(adapted_kptjs[k]):
-                    v = fuse(j3cR[k])
-                else:
-                    v = fuse(j3cR[k] + j3cI[k] * 1j)
-                if j2ctag == 'CD':
-                    v = scipy.linalg.solve_triangular(j2c, v, lower=True, overwrite_b=True)
-                    feri['j3c/%d/%d'%(ji,istep)] = v
-                else:
-                    feri['j3c/%d/%d'%(ji,istep)] = lib.dot(j2c, v)
-
-                # low-dimension systems
-                if j2c_negative is not None:
-                    feri['j3c-/%d/%d'%(ji,istep)] = lib.dot(j2c_negative, v)
-
-        with lib.call_in_background(pw_contract) as compute:
-            col1 = 0
-            for istep, sh_range in enumerate(shranges):
-                log.debug1('int3c2e [%d/%d], AO [%d:%d], ncol = %d', \
-                           istep+1, len(shranges), *sh_range)
-                bstart, bend, ncol = sh_range
-                col0, col1 = col1, col1+ncol
-                j3cR = []
-                j3cI = []
-                for k, idx in enumerate(adapted_ji_idx):
-                    v = numpy.vstack([fswap['j3c-junk/%d/%d'%(idx,i)][0,col0:col1].T
-                                      for i in range(nsegs)])
-                    # vbar is the interaction between the background charge
-                    # and the auxiliary basis.  0D, 1D, 2D do not have vbar.
-                    if is_zero(kpt) and cell.dimension == 3:
-                        for i in numpy.where(vbar != 0)[0]:
-                            v[i] -= vbar[i] * ovlp[k][col0:col1]
-                    j3cR.append(numpy.asarray(v.real, order='C'))
-                    if is_zero(kpt) and gamma_point(adapted_kptjs[k]):
-                        j3cI.append(None)
-                    else:
-                        j3cI.append(numpy.asarray(v.imag, order='C'))
-                v = None
-                compute(istep, sh_range, j3cR, j3cI)
-        for ji in adapted_ji_idx:
-            del(fswap['j3c-junk/%d'%ji])
+                j3cI.append(numpy.asarray(v.imag, order='C'))
+        return j3cR, j3cI
 
-    # Wrapped around boundary and symmetry between k and -k can be used
-    # explicitly for the metric integrals.  We consider this symmetry
-    # because it is used in the df_ao2mo module when contracting two 3-index
-    # integral tensors to the 4-index 2e integral tensor. If the symmetry
-    # related k-points are treated separately, the resultant 3-index tensors
-    # may have inconsistent dimension due to the numerial noise when handling
-    # linear dependency of j2c.
-    def conj_j2c(cholesky_j2c):
+    def save_j3c(uniq_kptji_id, setup, cholesky_j2c, istep, j3cR, j3cI, wall):
+        kpt, adapted_ji_idx, adapted_kptjs = setup[:3]
         j2c, j2c_negative, j2ctag = cholesky_j2c
-        if j2c_negative is None:
-            return j2c.conj(), None, j2ctag
-        else:
-            return j2c.conj(), j2c_negative.conj(), j2ctag
-
-    a = cell.lattice_vectors() / (2*numpy.pi)
-    def kconserve_indices(kpt):
-        '''search which (kpts+kpt) satisfies momentum conservation'''
-        kdif = numpy.einsum('wx,ix->wi', a, uniq_kpts + kpt)
-        kdif_int = numpy.rint(kdif)
-        mask = numpy.einsum('wi->i', abs(kdif - kdif_int)) < KPT_DIFF_TOL
-        uniq_kptji_ids = numpy.where(mask)[0]
-        return uniq_kptji_ids
-
-    done = numpy.zeros(len(uniq_kpts), dtype=bool)
-    for k, kpt in enumerate(uniq_kpts):
-        if done[k]:
-            continue
-
-        log.debug1('Cholesky decomposition for j2c at kpt %s', k)
-        cholesky_j2c = cholesky_decomposed_metric(k)
-
-        # The k-point k' which has (k - k') * a = 2n pi. Metric integrals have the
-        # symmetry S = S
-        uniq_kptji_ids = kconserve_indices(-kpt)
-        log.debug1("Symmetry pattern (k - %s)*a= 2n pi", kpt)
-        log.debug1("    make_kpt for uniq_kptji_ids %s", uniq_kptji_ids)
-        for uniq_kptji_id in uniq_kptji_ids:
-            if not done[uniq_kptji_id]:
-                make_kpt(uniq_kptji_id, cholesky_j2c)
-        done[uniq_kptji_ids] = True
-
-        # The k-point k' which has (k + k') * a = 2n pi. Metric integrals have the
-        # symmetry S = S*
-        uniq_kptji_ids = kconserve_indices(kpt)
-        log.debug1("Symmetry pattern (k + %s)*a= 2n pi", kpt)
-        log.debug1("    make_kpt for %s", uniq_kptji_ids)
-        cholesky_j2c = conj_j2c(cholesky_j2c)
-        for uniq_kptji_id in uniq_kptji_ids:
-            if not done[uniq_kptji_id]:
-                make_kpt(uniq_kptji_id, cholesky_j2c)
-        done[uniq_kptji_ids] = True
-
+        for k, ji in enumerate(adapted_ji_idx):
+            if is_zero(kpt) and gamma_point(adapted_kptjs[k]):
+                v = fuse(j3cR[k])
+            else:
+                v = fuse(j3cR[k] + j3cI[k] * 1j)
+            if j2ctag == 'CD':
+                v = scipy.linalg.solve_triangular(j2c, v, lower=True, overwrite_b=True)
+                _create_j3c_dataset(feri, 'j3c/%d/%d'%(ji,istep), v)
+            else:
+                _create_j3c_dataset(feri, 'j3c/%d/%d'%(ji,istep), lib.dot(j2c, v))
+
+            # low-dimension systems
+            if j2c_negative is not None:
+                _create_j3c_dataset(feri, 'j3c-/%d/%d'%(ji,istep),
+                                    lib.dot(j2c_negative, v))
+        # Commit the task so that an interrupted build can be restarted
+        status['%d/time' % uniq_kptji_id][istep] = wall
+        status['%d/done' % uniq_kptji_id][istep] = True
+        feri.flush()
+        log.debug1('j3c task kpt %d [%d/%d], estimated cost %.3g, wall time %.2f s',
+                   uniq_kptji_id, istep+1, len(setup[7]), setup[9][istep], wall)
+
+    def release_swap(setup):
+        for ji in setup[1]:
+            del(fswap['j3c-junk/%d'%junk_id[ji]])
+
+    nproc = mydf.j3c_nproc
+    if nproc > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(nproc, _init_j3c_worker,
+                                    (cell.dumps(), fused_cell.dumps(), mesh))
+        log.debug('j3c tasks are executed in %d processes', nproc)
+    else:
+        pool = None
+
+    try:
+        for k, members in groups:
+            log.debug1('Cholesky decomposition for j2c at kpt %s', k)
+            cholesky_j2c = cholesky_decomposed_metric(k)
+            cholesky_j2c_conj = conj_j2c(cholesky_j2c)
+            setups = {}
+            tasks = []
+            for uniq_kptji_id, conj in members:
+                setup = setups[uniq_kptji_id] = kpt_setup(uniq_kptji_id)
+                done = status['%d/done' % uniq_kptji_id][()]
+                tasks.extend([(uniq_kptji_id, istep) for istep in range(len(done))
+                              if not done[istep]])
+            metric = dict((uniq_kptji_id, cholesky_j2c_conj if conj else cholesky_j2c)
+                          for uniq_kptji_id, conj in members)
+
+            if pool is None:
+                _run_j3c_tasks(cell, Gv, gxyz, Gvbase, fused_cell, naux, tasks,
+                               setups, metric, load_j3c, save_j3c, log)
+            else:
+                _run_j3c_tasks_pool(pool, nproc, naux, tasks, setups, metric,
+                                    load_j3c, save_j3c, log)
+            for setup in setups.values():
+                release_swap(setup)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    unfinished = [k for k in pending if not _kpt_finished(status, k)]
+    if unfinished:
+        feri.close()
+        raise RuntimeError('j3c tasks of k-point differences %s were not '
+                           'finished' % unfinished)
+
+    if log.verbose >= logger.DEBUG:
+        stored, nbytes = addons.storage_size(feri['j3c'])
+        log.debug('j3c: %.8g MB on disk, %.8g MB uncompressed',
+                  stored/1e6, nbytes/1e6)
     feri.close()
 
+def _j3c_tag(mydf, cell, auxcell):
+    '''A fingerprint of the settings which determine the j3c integrals'''
+    exp_to_discard = mydf.exp_to_discard
+    if exp_to_discard is None:
+        exp_to_discard = 0
+    return numpy.array([lib.finger(cell.lattice_vectors()),
+                        lib.finger(cell.atom_coords()),
+                        lib.finger(cell._bas), lib.finger(cell._env),
+                        lib.finger(auxcell._bas), lib.finger(auxcell._env),
+                        mydf.eta, exp_to_discard])
+
+def _open_cderi(mydf, cderi_file, kptij_lst, nauxf, tag, log):
+    '''Open the cderi file for the j3c tasks.  If mydf.j3c_restart is set,
+    the finished tasks recorded in the existing cderi file are kept.  The
+    existing file is reused only if its fingerprint tag (see _j3c_tag)
+    matches the current settings.'''
+    if mydf.j3c_restart and h5py.is_hdf5(cderi_file):
+        try:
+            feri = h5py.File(cderi_file, 'a')
+        except OSError as e:
+            # e.g. the file is locked by another process or not writable
+            log.warn('Failed to reopen %s (%s). j3c is rebuilt from scratch.',
+                     cderi_file, e)
+        else:
+            if ('j3c-status' in feri and 'j3c-kptij' in feri and
+                feri['j3c-kptij'].shape == kptij_lst.shape and
+                abs(feri['j3c-kptij'][()] - kptij_lst).max() < KPT_DIFF_TOL and
+                feri['j3c-status'].attrs.get('naux') == nauxf and
+                numpy.array_equal(feri['j3c-status'].attrs.get('mesh', []), mydf.mesh) and
+                _tag_match(feri['j3c-status'].attrs.get('tag'), tag)):
+                return feri
+            log.warn('DF integrals in %s do not match the current settings. '
+                     'j3c is rebuilt from scratch.', cderi_file)
+            feri.close()
+    feri = h5py.File(cderi_file, 'w')
+    feri['j3c-kptij'] = kptij_lst
+    status = feri.create_group('j3c-status')
+    status.attrs['naux'] = nauxf
+    status.attrs['mesh'] = numpy.asarray(mydf.mesh)
+    status.attrs['tag'] = tag
+    feri.flush()
+    return feri
+
+def _tag_match(saved_tag, tag):
+    return (saved_tag is not None and numpy.shape(saved_tag) == tag.shape and
+            numpy.allclose(saved_tag, tag))
+
+def _kpt_finished(status, uniq_kptji_id):
+    key = '%d/done' % uniq_kptji_id
+    return key in status and status[key][()].all()
+
+def _create_j3c_dataset(feri, key, data):
+    # Remove the partially written data of an interrupted task
+    if key in feri:
+        del(feri[key])
+    addons.create_cderi_dataset(feri, key, data=data)
+
+def _j3c_task_costs(cell, shranges, aosym, nkptj, ngrids):
+    '''Estimated cost of the plane-wave contraction of each shell range.
+    The number of AO pairs is weighted by the number of lattice images
+    within the range of each shell, which distinguishes the compact and the
+    diffuse shells.
+    '''
+    ao_loc = cell.ao_loc_nr()
+    nimgs = numpy.array([len(cell.get_lattice_Ls(rcut=pbcgto.cell.bas_rcut(cell, i)))
+                         for i in range(cell.nbas)])
+    nimgs = nimgs / float(nimgs.min())
+    costs = []
+    for bstart, bend, ncol in shranges:
+        dims = ao_loc[bstart+1:bend+1] - ao_loc[bstart:bend]
+        w = numpy.dot(dims, nimgs[bstart:bend]) / dims.sum()
+        costs.append(ncol * w * nkptj * ngrids)
+    return numpy.asarray(costs)
+
+def _pw_contract(cell, Gv, gxyz, Gvbase, kLR, kLI, naux, kpt, adapted_kptjs,
+                 aosym, sh_range, Gblksize, j3cR, j3cI):
+    '''Subtract the long-range part (computed in G-space) from the
+    short-range integrals j3cR and j3cI of the AO pairs in sh_range'''
+    b = cell.reciprocal_vectors()
+    ngrids = Gv.shape[0]
+    nkptj = len(adapted_kptjs)
+    bstart, bend, ncol = sh_range
+    if aosym == 's2':
+        shls_slice = (bstart, bend, 0, bend)
+    else:
+        shls_slice = (bstart, bend, 0, cell.nbas)
+
+    Gblksize = min(Gblksize, ngrids)
+    pqkRbuf = numpy.empty(ncol*Gblksize)
+    pqkIbuf = numpy.empty(ncol*Gblksize)
+    # buf for ft_aopair
+    buf = numpy.empty(nkptj*ncol*Gblksize, dtype=numpy.complex128)
+    for p0, p1 in lib.prange(0, ngrids, Gblksize):
+        dat = ft_ao._ft_aopair_kpts(cell, Gv[p0:p1], shls_slice, aosym,
+                                    b, gxyz[p0:p1], Gvbase, kpt,
+                                    adapted_kptjs, out=buf)
+        nG = p1 - p0
+        for k in range(nkptj):
+            aoao = dat[k].reshape(nG,ncol)
+            pqkR = numpy.ndarray((ncol,nG), buffer=pqkRbuf)
+            pqkI = numpy.ndarray((ncol,nG), buffer=pqkIbuf)
+            pqkR[:] = aoao.real.T
+            pqkI[:] = aoao.imag.T
+
+            lib.dot(kLR[p0:p1].T, pqkR.T, -1, j3cR[k][naux:], 1)
+            lib.dot(kLI[p0:p1].T, pqkI.T, -1, j3cR[k][naux:], 1)
+            if not (is_zero(kpt) and gamma_point(adapted_kptjs[k])):
+                lib.dot(kLR[p0:p1].T, pqkI.T, -1, j3cI[k][naux:], 1)
+                lib.dot(kLI[p0:p1].T, pqkR.T,  1, j3cI[k][naux:], 1)
+    return j3cR, j3cI
+
+def _make_kL(fused_cell, naux, Gv, gxyz, Gvbase, kpt, wcoulG):
+    '''Fourier transformed compensating charges weighted by Coulomb kernel'''
+    b = fused_cell.reciprocal_vectors()
+    # The compensating charges follow the naux auxiliary functions
+    aux_nbas = int(numpy.searchsorted(fused_cell.ao_loc_nr(), naux))
+    shls_slice = (aux_nbas, fused_cell.nbas)
+    Gaux = ft_ao.ft_ao(fused_cell, Gv, shls_slice, b, gxyz, Gvbase, kpt)
+    Gaux *= wcoulG.reshape(-1,1)
+    kLR = Gaux.real.copy('C')
+    kLI = Gaux.imag.copy('C')
+    return kLR, kLI
+
+def _run_j3c_tasks(cell, Gv, gxyz, Gvbase, fused_cell, naux, tasks,
+                   setups, metric, load_j3c, save_j3c, log):
+    '''Execute the j3c tasks in the current process.  Loading the 3c2e
+    integrals is overlapped with the computation of the previous task.'''
+    kL = {}
+    def compute(uniq_kptji_id, istep, j3cR, j3cI):
+        t0 = time.time()
+        setup = setups[uniq_kptji_id]
+        kpt, adapted_ji_idx, adapted_kptjs, aosym, wcoulG = setup[:5]
+        if uniq_kptji_id not in kL:
+            kL.clear()
+            kL[uniq_kptji_id] = _make_kL(fused_cell, naux, Gv, gxyz, Gvbase,
+                                         kpt, wcoulG)
+        kLR, kLI = kL[uniq_kptji_id]
+        _pw_contract(cell, Gv, gxyz, Gvbase, kLR, kLI, naux, kpt,
+                     adapted_kptjs, aosym, setup[7][istep], setup[8], j3cR, j3cI)
+        save_j3c(uniq_kptji_id, setup, metric[uniq_kptji_id], istep,
+                 j3cR, j3cI, time.time()-t0)
+
+    with lib.call_in_background(compute) as bg_compute:
+        for uniq_kptji_id, istep in tasks:
+            bstart, bend, ncol = setups[uniq_kptji_id][7][istep]
+            log.debug1('int3c2e [%d/%d], AO [%d:%d], ncol = %d', istep+1,
+                       len(setups[uniq_kptji_id][7]), bstart, bend, ncol)
+            j3cR, j3cI = load_j3c(setups[uniq_kptji_id], istep)
+            bg_compute(uniq_kptji_id, istep, j3cR, j3cI)
+
+def _run_j3c_tasks_pool(pool, nproc, naux, tasks, setups, metric,
+                        load_j3c, save_j3c, log):
+    '''Execute the j3c tasks in a process pool.  The tasks are dispatched in
+    the order of decreasing estimated cost.  The results are committed to the
+    cderi file in the master process as they are finished.
+
+    The j3c blocks are exchanged with the workers through memory-mapped files
+    in lib.param.TMPDIR rather than being pickled.
+    '''
+    tasks = sorted(tasks, key=lambda t: -setups[t[0]][9][t[1]])
+    # At most 2*nproc tasks are held in memory
+    pending = []
+    def commit(task, j3cfile, async_result):
+        wall = async_result.get()
+        setup = setups[task[0]]
+        j3cR, j3cI = _unpack_j3c(numpy.load(j3cfile), setup[0], setup[2])
+        os.remove(j3cfile)
+        save_j3c(task[0], setup, metric[task[0]], task[1], j3cR, j3cI, wall)
+
+    try:
+        for uniq_kptji_id, istep in tasks:
+            setup = setups[uniq_kptji_id]
+            kpt, adapted_ji_idx, adapted_kptjs, aosym, wcoulG = setup[:5]
+            fd, j3cfile = tempfile.mkstemp(suffix='.npy', dir=lib.param.TMPDIR)
+            os.close(fd)
+            try:
+                _pack_j3c(j3cfile, *load_j3c(setup, istep))
+            except BaseException:
+                os.remove(j3cfile)
+                raise
+            args = (uniq_kptji_id, naux, kpt, adapted_kptjs, aosym, wcoulG,
+                    setup[7][istep], setup[8], j3cfile)
+            pending.append(((uniq_kptji_id, istep), j3cfile,
+                            pool.apply_async(_pw_contract_remote, (args,))))
+            while len(pending) >= nproc * 2:
+                commit(*pending[0])
+                pending.pop(0)
+        while pending:
+            commit(*pending[0])
+            pending.pop(0)
+    finally:
+        for task, j3cfile, async_result in pending:
+            async_result.wait()
+            if os.path.isfile(j3cfile):
+                os.remove(j3cfile)
+
+def _pack_j3c(j3cfile, j3cR, j3cI):
+    nrow, ncol = j3cR[0].shape
+    j3c = numpy.lib.format.open_memmap(j3cfile, 'w+', numpy.double,
+                                       (len(j3cR), 2, nrow, ncol))
+    for k, v in enumerate(j3cR):
+        j3c[k,0] = v
+        if j3cI[k] is not None:
+            j3c[k,1] = j3cI[k]
+    j3c.flush()
+
+def _unpack_j3c(j3c, kpt, adapted_kptjs):
+    j3cR = [numpy.asarray(j3c[k,0]) for k in range(len(adapted_kptjs))]
+    j3cI = [None if is_zero(kpt) and gamma_point(kptj) else numpy.asarray(j3c[k,1])
+            for k, kptj in enumerate(adapted_kptjs)]
+    return j3cR, j3cI
+
+# The cells and G-vectors shared by the tasks of a worker process, and the
+# kL of the k-points which were last processed by the worker.
+_j3c_worker = {}
+
+def _init_j3c_worker(cellstr, fused_cellstr, mesh):
+    '''Initialize a worker process of the j3c process pool'''
+    lib.num_threads(1)
+    cell = pbcgto.cell.loads(cellstr)
+    fused_cell = pbcgto.cell.loads(fused_cellstr)
+    Gv, Gvbase, kws = cell.get_Gv_weights(mesh)
+    gxyz = lib.cartesian_prod([numpy.arange(len(x)) for x in Gvbase])
+    _j3c_worker.clear()
+    _j3c_worker.update(cell=cell, fused_cell=fused_cell, Gv=Gv, Gvbase=Gvbase,
+                       gxyz=gxyz, kL={})
+
+def _pw_contract_remote(args):
+    '''_pw_contract in a worker process.  The j3c block in j3cfile is
+    updated in place.'''
+    (uniq_kptji_id, naux, kpt, adapted_kptjs, aosym, wcoulG, sh_range,
+     Gblksize, j3cfile) = args
+    t0 = time.time()
+    cell = _j3c_worker['cell']
+    Gv = _j3c_worker['Gv']
+    Gvbase = _j3c_worker['Gvbase']
+    gxyz = _j3c_worker['gxyz']
+    kL = _j3c_worker['kL']
+    if uniq_kptji_id not in kL:
+        # The tasks of two k-points (k and -k) of a group are interleaved
+        if len(kL) >= 2:
+            kL.pop(next(iter(kL)))
+        kL[uniq_kptji_id] = _make_kL(_j3c_worker['fused_cell'], naux, Gv, gxyz,
+                                     Gvbase, kpt, wcoulG)
+    kLR, kLI = kL[uniq_kptji_id]
+    j3c = numpy.load(j3cfile, mmap_mode='r+')
+    j3cR, j3cI = _unpack_j3c(j3c, kpt, adapted_kptjs)
+    _pw_contract(cell, Gv, gxyz, Gvbase, kLR, kLI, naux, kpt, adapted_kptjs,
+                 aosym, sh_range, Gblksize, j3cR, j3cI)
+    j3c.flush()
+    return time.time() - t0
+
 
 class GDF(aft.AFTDF):
     '''Gaussian density fitting
@@ -451,6 +756,14 @@ class GDF(aft.AFTDF):
         # 0 since v1.5.2.
         self.exp_to_discard = cell.exp_to_discard
 
+        # The 3-index tensor is built in tasks (k-point difference, AO shell
+        # range).  They can be evaluated in a pool of j3c_nproc processes.
+        # Each finished task is committed to _cderi_to_save.  If j3c_restart
+        # is set, the finished tasks found in _cderi_to_save are not
+        # recomputed.
+        self.j3c_nproc = J3C_NPROC
+        self.j3c_restart = False
+
         # The following attributes are not input options.
         self.exxdiv = None  # to mimic KRHF/KUHF object in function get_coulG
         self.auxcell = None
@@ -636,8 +949,12 @@ class GDF(aft.AFTDF):
 
         if unpack:
             buf = numpy.empty((blksize,nao*(nao+1)//2))
+        io_stat = [0, 0]  # bytes, wall time
         def load(Lpq, b0, b1, bufR, bufI):
+            t0 = time.time()
             Lpq = numpy.asarray(Lpq[b0:b1])
+            io_stat[0] += Lpq.nbytes
+            io_stat[1] += time.time() - t0
             if is_real:
                 if unpack:
                     LpqR = lib.unpack_tril(Lpq, out=bufR).reshape(-1,nao**2)
@@ -677,6 +994,10 @@ class GDF(aft.AFTDF):
                     LpqR, LpqI = load(j3c, b0, b1, LpqR, LpqI)
                     yield LpqR, LpqI, -1
 
+        if io_stat[1] > 0:
+            logger.debug1(self, 'sr_loop read %.8g MB, %.8g MB/s',
+                          io_stat[0]/1e6, io_stat[0]/1e6/io_stat[1])
+
     weighted_coulG = aft.weighted_coulG
     _int_nuc_vloc = aft._int_nuc_vloc
     get_nuc = aft.get_nuc
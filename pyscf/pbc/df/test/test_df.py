@@ -122,6 +122,90 @@ class KnownValues(unittest.TestCase):
         self.assertAlmostEqual(abs(eri0123.imag.sum()), 0.0004956147070235284, 9)
         self.assertAlmostEqual(finger(eri0123), 0.9693838716908609-0.33172727547646297j, 9)
 
+    def test_j3c_nproc_restart(self):
+        def new_df():
+            mydf = df.DF(cell, kpts)
+            mydf.linear_dep_threshold = 1e-7
+            mydf.auxbasis = 'weigend'
+            mydf.mesh = (6,)*3
+            return mydf
+        eri0123 = kmdf.get_eri(kpts[:4])
+
+        mydf = new_df()
+        mydf.j3c_nproc = 2
+        self.assertAlmostEqual(abs(mydf.get_eri(kpts[:4]) - eri0123).max(), 0, 9)
+
+        ftmp = lib.H5TmpFile()
+        mydf = new_df()
+        mydf._cderi_to_save = ftmp.filename
+        pw_contract = df._pw_contract
+        ntasks = [0]
+        def interrupted(*args):
+            ntasks[0] += 1
+            if ntasks[0] > 4:
+                raise RuntimeError('interrupted')
+            return pw_contract(*args)
+        df._pw_contract = interrupted
+        try:
+            self.assertRaises(RuntimeError, mydf.build)
+        finally:
+            df._pw_contract = pw_contract
+
+        # The finished tasks are skipped in the restarted build
+        ntasks = [0]
+        def counted(*args):
+            ntasks[0] += 1
+            return pw_contract(*args)
+        df._pw_contract = counted
+        try:
+            mydf = new_df()
+            mydf._cderi_to_save = ftmp.filename
+            mydf.j3c_restart = True
+            mydf.build()
+            nrestart = ntasks[0]
+
+            ntasks = [0]
+            mydf = new_df()
+            mydf.build()
+            ntot = ntasks[0]
+
+            # Integrals of different settings are rebuilt from scratch
+            ntasks = [0]
+            mydf = new_df()
+            mydf._cderi_to_save = ftmp.filename
+            mydf.j3c_restart = True
+            mydf.eta = 0.3
+            mydf.build()
+            nrebuild = ntasks[0]
+        finally:
+            df._pw_contract = pw_contract
+        self.assertTrue(0 < nrestart < ntot)
+        self.assertEqual(nrebuild, ntot)
+
+        mydf = new_df()
+        mydf._cderi_to_save = ftmp.filename
+        mydf.j3c_restart = True
+        mydf.build()
+        self.assertAlmostEqual(abs(mydf.get_eri(kpts[:4]) - eri0123).max(), 0, 9)
+
+        # The cderi file which cannot be reopened is rebuilt
+        h5py_file = df.h5py.File
+        class locked(h5py_file):
+            def __init__(self, name, mode=None, *args, **kwargs):
+                if mode == 'a':
+                    raise OSError('unable to lock file')
+                h5py_file.__init__(self, name, mode, *args, **kwargs)
+        df.h5py.File = locked
+        try:
+            mydf = new_df()
+            mydf._cderi_to_save = ftmp.filename
+            mydf.j3c_restart = True
+            mydf.j3c_nproc = 2
+            mydf.build()
+        finally:
+            df.h5py.File = h5py_file
+        self.assertAlmostEqual(abs(mydf.get_eri(kpts[:4]) - eri0123).max(), 0, 9)
+
 
 
 if __name__ == '__main__':
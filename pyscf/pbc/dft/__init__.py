@@ -19,6 +19,7 @@ from pyscf.pbc.dft import roks
 from pyscf.pbc.dft import krks
 from pyscf.pbc.dft import kuks
 from pyscf.pbc.dft import kroks
+from pyscf.pbc.dft import krks_ksymm
 
 UKS = uks.UKS
 ROKS = roks.ROKS
@@ -26,6 +27,7 @@ ROKS = roks.ROKS
 KRKS = krks.KRKS
 KUKS = kuks.KUKS
 KROKS = kroks.KROKS
+KsymAdaptedKRKS = krks_ksymm.KRKS
 
 def RKS(cell, *args, **kwargs):
     if cell.spin == 0:
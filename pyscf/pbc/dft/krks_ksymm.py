@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Restricted Kohn-Sham with k-point symmetry
+
+See Also:
+    pyscf.pbc.scf.khf_ksymm
+'''
+
+import time
+import numpy as np
+from pyscf import lib
+from pyscf.lib import logger
+from pyscf.pbc.scf import khf_ksymm
+from pyscf.pbc.dft import gen_grid
+from pyscf.pbc.dft import rks
+from pyscf.pbc.dft import krks
+from pyscf.pbc.dft import multigrid
+
+
+def get_veff(ks, cell=None, dm=None, dm_last=0, vhf_last=0, hermi=1,
+             kpts=None, kpts_band=None):
+    '''Coulomb + XC functional on the IBZ k-points.
+
+    See also :func:`pyscf.pbc.dft.krks.get_veff`.  dm are the density
+    matrices of the IBZ k-points.  The density on the grids is generated by
+    the density matrices of the full k-point mesh.
+    '''
+    if cell is None: cell = ks.cell
+    if dm is None: dm = ks.make_rdm1()
+    t0 = (time.clock(), time.time())
+    if isinstance(ks.with_df, multigrid.MultiGridFFTDF):
+        raise NotImplementedError('k-point symmetry with MultiGridFFTDF')
+
+    omega, alpha, hyb = ks._numint.rsh_and_hybrid_coeff(ks.xc, spin=cell.spin)
+    hybrid = abs(hyb) > 1e-10
+
+    kpoints = ks.kpoints
+    ground_state = (isinstance(dm, np.ndarray) and dm.ndim == 3 and
+                    kpts_band is None)
+    if kpts_band is None: kpts_band = ks.kpts
+    dm_bz = kpoints.transform_dm(dm)
+
+    if ks.grids.non0tab is None:
+        ks.grids.build(with_non0tab=True)
+        if (isinstance(ks.grids, gen_grid.BeckeGrids) and
+            ks.small_rho_cutoff > 1e-20 and ground_state):
+            ks.grids = rks.prune_small_rho_grids_(ks, cell, dm_bz, ks.grids,
+                                                  kpoints.kpts)
+        t0 = logger.timer(ks, 'setting up grids', *t0)
+
+    if hermi == 2:  # because rho = 0
+        n, exc, vxc = 0, 0, 0
+    else:
+        n, exc, vxc = ks._numint.nr_rks(cell, ks.grids, ks.xc, dm_bz, 0,
+                                        kpoints.kpts, kpts_band)
+        logger.debug(ks, 'nelec by numeric integration = %s', n)
+        t0 = logger.timer(ks, 'vxc', *t0)
+
+    weights = kpoints.weights_ibz
+    if not hybrid:
+        vj = ks.get_j(cell, dm, hermi, kpts, kpts_band)
+        vxc += vj
+    else:
+        if getattr(ks.with_df, '_j_only', False):  # for GDF and MDF
+            ks.with_df._j_only = False
+        vj, vk = ks.get_jk(cell, dm, hermi, kpts, kpts_band)
+        vxc += vj - vk * (hyb * .5)
+
+        if ground_state:
+            exc -= np.einsum('K,Kij,Kji', weights, dm, vk).real * .5 * hyb*.5
+
+    if ground_state:
+        ecoul = np.einsum('K,Kij,Kji', weights, dm, vj).real * .5
+    else:
+        ecoul = None
+
+    vxc = lib.tag_array(vxc, ecoul=ecoul, exc=exc, vj=None, vk=None)
+    return vxc
+
+def get_rho(mf, dm=None, grids=None, kpts=None):
+    '''Electron density on the grids.  dm are the density matrices of the
+    IBZ k-points.  If kpts is given, dm are the density matrices of kpts
+    (e.g. the full k-point mesh kpoints.kpts).'''
+    if dm is None: dm = mf.make_rdm1()
+    if kpts is None:
+        dm = mf.kpoints.transform_dm(dm)
+        kpts = mf.kpoints.kpts
+    return krks.get_rho(mf, dm, grids, kpts)
+
+
+class KsymAdaptedKRKS(khf_ksymm.KsymAdaptedKRHF, krks.KRKS):
+    '''KRKS with k-point symmetry.
+
+    Examples:
+
+    >>> kpts = cell.make_kpts([4,4,4], space_group_symmetry=True)
+    >>> mf = pbc.dft.KsymAdaptedKRKS(cell, kpts).run()
+    '''
+    def __init__(self, cell, kpts=np.zeros((1,3))):
+        khf_ksymm.KsymAdaptedKRHF.__init__(self, cell, kpts)
+        rks._dft_common_init_(self)
+
+    def dump_flags(self):
+        khf_ksymm.KsymAdaptedKRHF.dump_flags(self)
+        logger.info(self, 'XC functionals = %s', self.xc)
+        self.grids.dump_flags()
+
+    get_veff = get_veff
+    get_rho = get_rho
+
+    def energy_elec(self, dm_kpts=None, h1e_kpts=None, vhf=None):
+        if h1e_kpts is None: h1e_kpts = self.get_hcore(self.cell, self.kpts)
+        if dm_kpts is None: dm_kpts = self.make_rdm1()
+        if vhf is None or getattr(vhf, 'ecoul', None) is None:
+            vhf = self.get_veff(self.cell, dm_kpts)
+
+        weights = self.kpoints.weights_ibz
+        e1 = np.einsum('k,kij,kji', weights, h1e_kpts, dm_kpts)
+        tot_e = e1 + vhf.ecoul + vhf.exc
+        logger.debug(self, 'E1 = %s  Ecoul = %s  Exc = %s', e1, vhf.ecoul, vhf.exc)
+        return tot_e.real, vhf.ecoul + vhf.exc
+
+    density_fit = rks._patch_df_beckegrids(khf_ksymm.KsymAdaptedKRHF.density_fit)
+    mix_density_fit = rks._patch_df_beckegrids(khf_ksymm.KsymAdaptedKRHF.mix_density_fit)
+
+    def to_khf(self):
+        '''Convert to the KRKS object of the full k-point mesh'''
+        kpts = self.kpoints
+        mf = krks.KRKS(self.cell, kpts.kpts)
+        mf.__dict__.update(dict((key, val) for key, val in self.__dict__.items()
+                                if key not in ('kpoints', 'with_df', '_numint')))
+        mf.with_df = self.with_df
+        if self.mo_coeff is not None:
+            mf.mo_coeff = kpts.transform_mo_coeff(self.mo_coeff)
+            mf.mo_energy = kpts.transform_mo_energy(self.mo_energy)
+            mf.mo_occ = kpts.transform_mo_occ(self.mo_occ)
+        return mf
+
+KRKS = KsymAdaptedKRKS
@@ -830,7 +830,8 @@ def ewald(cell, ew_eta=None, ew_cut=None):
 energy_nuc = ewald
 
 def make_kpts(cell, nks, wrap_around=WRAP_AROUND, with_gamma_point=WITH_GAMMA,
-              scaled_center=None):
+              scaled_center=None, space_group_symmetry=False,
+              time_reversal_symmetry=False):
     '''Given number of kpoints along x,y,z , generate kpoints
 
     Args:
@@ -846,10 +847,17 @@ def make_kpts(cell, nks, wrap_around=WRAP_AROUND, with_gamma_point=WITH_GAMMA,
             scaled_center, given as the zeroth index of the returned kpts.
             Scaled meaning that the k-points are scaled to a grid from 
             [-1,1] x [-1,1] x [-1,1]
+        space_group_symmetry : bool
+            Whether to reduce the k-points to the irreducible Brillouin
+            zone with the space group symmetry of the cell.
+        time_reversal_symmetry : bool
+            Whether to reduce the k-points with time reversal symmetry.
 
     Returns:
         kpts in absolute value (unit 1/Bohr).  Gamma point is placed at the
-        first place in the k-points list
+        first place in the k-points list.  If space_group_symmetry or
+        time_reversal_symmetry is set, a :class:`KPoints` object is returned
+        which holds the full k-point mesh and the irreducible k-points.
 
     Examples:
 
@@ -869,6 +877,10 @@ def make_kpts(cell, nks, wrap_around=WRAP_AROUND, with_gamma_point=WITH_GAMMA,
     scaled_kpts = lib.cartesian_prod(ks_each_axis)
     scaled_kpts += np.array(scaled_center)
     kpts = cell.get_abs_kpts(scaled_kpts)
+    if space_group_symmetry or time_reversal_symmetry:
+        from pyscf.pbc.lib import kpts_symm
+        kpts = kpts_symm.KPoints(cell, kpts, space_group_symmetry,
+                                 time_reversal_symmetry)
     return kpts
 
 def get_uniform_grids(cell, mesh=None, **kwargs):
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Space group symmetry of k-point meshes
+
+A space group operation g maps r -> R r + tau.  It maps atom A to atom
+B = g(A) up to a lattice vector L_A, g(r_A) = r_B + L_A.  The Bloch AOs
+transform as
+
+    O_g phi^k_{A mu}(r) = exp(-i k'.L_A) \sum_nu phi^{k'}_{B nu}(r) D_{nu mu}(R)
+
+with k' = R k and D(R) the rotation matrix of the (real) angular functions.
+An AO matrix M (density matrix or Fock matrix) at k' is therefore
+
+    M(k') = U M(k) U^dagger,   U_{(B nu),(A mu)} = exp(-i k'.L_A) D_{nu mu}(R)
+
+Time reversal symmetry relates M(-k) = M(k)^*.
+'''
+
+import numpy as np
+from pyscf import lib
+from pyscf.lib import logger
+from pyscf import __config__
+
+SYMPREC = getattr(__config__, 'pbc_lib_kpts_symm_symprec', 1e-6)
+KPT_DIFF_TOL = getattr(__config__, 'pbc_lib_kpts_helper_kpt_diff_tol', 1e-6)
+
+
+def get_space_group(cell, tol=SYMPREC):
+    '''Space group operations x -> W x + t of the cell in fractional
+    coordinates.
+
+    Returns:
+        rotations : (nop,3,3) int ndarray
+            Rotation matrices W acting on the fractional coordinates.  The
+            identity is the first operation.
+        translations : (nop,3) ndarray
+            Fractional translations t.
+        atom_maps : (nop,natm) int ndarray
+            The index of the atom B = g(A) for each atom A.
+        atom_shifts : (nop,natm,3) int ndarray
+            The lattice vector n_A (in fractional coordinates) in
+            W x_A + t = x_B + n_A.
+    '''
+    natm = cell.natm
+    if cell.dimension < 3:
+        # Only the identity for low-dimensional systems
+        return (np.eye(3, dtype=int)[None], np.zeros((1,3)),
+                np.arange(natm)[None], np.zeros((1,natm,3), dtype=int))
+
+    a = cell.lattice_vectors()
+    metric = a.dot(a.T)
+    # W^T G W = G for the orthogonal transformations of the lattice
+    ws = lib.cartesian_prod([(-1,0,1)]*9).reshape(-1,3,3)
+    dets = np.rint(np.linalg.det(ws)).astype(int)
+    ws = ws[abs(dets) == 1]
+    g1 = np.einsum('nji,jk,nkl->nil', ws, metric, ws)
+    ws = ws[abs(g1 - metric).max(axis=(1,2)) < tol * abs(metric).max()]
+    # Put the identity in front
+    identity = np.all(ws == np.eye(3, dtype=int), axis=(1,2))
+    ws = np.vstack((ws[identity], ws[~identity]))
+
+    coords = cell.atom_coords().dot(np.linalg.inv(a))
+    symbs = [cell.atom_symbol(i) for i in range(natm)]
+    same_species = [[j for j in range(natm) if symbs[j] == symbs[i]]
+                    for i in range(natm)]
+
+    rotations = []
+    translations = []
+    atom_maps = []
+    atom_shifts = []
+    for w in ws:
+        xnew = coords.dot(w.T)
+        for ib in same_species[0]:
+            t = coords[ib] - xnew[0]
+            t -= np.rint(t)
+            amap = []
+            shifts = []
+            for ia in range(natm):
+                for jb in same_species[ia]:
+                    dx = xnew[ia] + t - coords[jb]
+                    if abs(dx - np.rint(dx)).max() < tol:
+                        amap.append(jb)
+                        shifts.append(np.rint(dx).astype(int))
+                        break
+                else:
+                    break
+            if len(amap) == natm:
+                rotations.append(w)
+                translations.append(t)
+                atom_maps.append(amap)
+                atom_shifts.append(shifts)
+                break
+    return (np.asarray(rotations), np.asarray(translations),
+            np.asarray(atom_maps).reshape(-1,natm),
+            np.asarray(atom_shifts).reshape(-1,natm,3))
+
+def _angular_rotation_matrices(cell, rotation):
+    '''D_{nu mu}(R) for each angular momentum.  The matrices are fitted to
+    chi_mu(R^{-1} r) = \sum_nu chi_nu(r) D_{nu mu} on random points.  It
+    does not depend on the ordering conventions of the angular functions.'''
+    from pyscf import gto
+    if cell.cart:
+        eval_name = 'GTOval_cart'
+    else:
+        eval_name = 'GTOval_sph'
+    coords = np.random.RandomState(3).random_sample((60,3)) * 2 - 1
+    dmats = []
+    for l in range(cell._bas[:,gto.ANG_OF].max() + 1):
+        mol = gto.M(atom='He 0 0 0', basis={'He': [[l, (1., 1.)]]},
+                    cart=cell.cart, spin=None, verbose=0)
+        chi = mol.eval_gto(eval_name, coords)
+        chi_rot = mol.eval_gto(eval_name, coords.dot(rotation))
+        dmats.append(np.linalg.lstsq(chi, chi_rot, rcond=None)[0])
+    return dmats
+
+
+class KPoints(lib.StreamObject):
+    '''Irreducible Brillouin zone of a k-point mesh
+
+    Attributes:
+        kpts : (nkpts,3) ndarray
+            The k-points of the full Brillouin zone
+        kpts_ibz : (nkpts_ibz,3) ndarray
+            The symmetry-unique k-points
+        weights_ibz : (nkpts_ibz,) ndarray
+            Weights of the symmetry-unique k-points.  They sum to 1.
+        bz2ibz : (nkpts,) int ndarray
+            The index of the IBZ k-point which generates each k-point
+        ibz2bz : (nkpts_ibz,) int ndarray
+            The index of each IBZ k-point in the full k-point list
+        stars : list of int ndarrays
+            The k-points generated by each IBZ k-point
+        op_bz : (nkpts,) int ndarray
+            The operation (index in rotations) to generate each k-point from
+            its IBZ k-point
+        time_reversal_bz : (nkpts,) bool ndarray
+            Whether time reversal is applied to generate the k-point
+
+    Examples:
+
+    >>> kpts = cell.make_kpts([4,4,4], space_group_symmetry=True)
+    >>> print(kpts.nkpts, kpts.nkpts_ibz)
+    64 8
+    '''
+    def __init__(self, cell, kpts, space_group_symmetry=True,
+                 time_reversal_symmetry=True):
+        self.cell = cell
+        self.stdout = cell.stdout
+        self.verbose = cell.verbose
+        self.kpts = np.reshape(kpts, (-1,3))
+        self.space_group_symmetry = space_group_symmetry
+        self.time_reversal_symmetry = time_reversal_symmetry
+        self.build()
+
+    @property
+    def nkpts(self):
+        return len(self.kpts)
+
+    @property
+    def nkpts_ibz(self):
+        return len(self.kpts_ibz)
+
+    def build(self):
+        cell = self.cell
+        if self.space_group_symmetry:
+            rots, trans, maps, shifts = get_space_group(cell)
+        else:
+            natm = cell.natm
+            rots, trans, maps, shifts = (np.eye(3, dtype=int)[None],
+                                         np.zeros((1,3)), np.arange(natm)[None],
+                                         np.zeros((1,natm,3), dtype=int))
+        a = cell.lattice_vectors()
+        # R = a^T W a^{-T} in Cartesian coordinates
+        rots_cart = np.einsum('ji,njk,kl->nil', a, rots, np.linalg.inv(a.T))
+
+        nkpts = self.nkpts
+        scaled_kpts = cell.get_scaled_kpts(self.kpts)
+        def index_of(kpt):
+            dk = scaled_kpts - cell.get_scaled_kpts(kpt)
+            dk = abs(dk - np.rint(dk)).sum(axis=1)
+            idx = np.where(dk < KPT_DIFF_TOL)[0]
+            if idx.size == 0:
+                return -1
+            return idx[0]
+
+        # Keep the operations which map the k-point mesh onto itself
+        tr_flags = (False, True) if self.time_reversal_symmetry else (False,)
+        images = []
+        keep = []
+        for iop, r in enumerate(rots_cart):
+            img = [[index_of(k.dot(r.T) * (1-2*tr)) for k in self.kpts]
+                   for tr in tr_flags]
+            if all(j >= 0 for x in img for j in x):
+                keep.append(iop)
+                images.append(img)
+        self.rotations = rots[keep]
+        self.translations = trans[keep]
+        self.atom_maps = maps[keep]
+        self.atom_shifts = shifts[keep]
+        self._rots_cart = rots_cart[keep]
+
+        bz2ibz = -np.ones(nkpts, dtype=int)
+        op_bz = np.zeros(nkpts, dtype=int)
+        time_reversal_bz = np.zeros(nkpts, dtype=bool)
+        ibz2bz = []
+        for k in range(nkpts):
+            if bz2ibz[k] >= 0:
+                continue
+            ibz2bz.append(k)
+            for iop, img in enumerate(images):
+                for tr in range(len(tr_flags)):
+                    j = img[tr][k]
+                    if bz2ibz[j] < 0:
+                        bz2ibz[j] = len(ibz2bz) - 1
+                        op_bz[j] = iop
+                        time_reversal_bz[j] = tr
+        self.ibz2bz = np.asarray(ibz2bz)
+        self.bz2ibz = bz2ibz
+        self.op_bz = op_bz
+        self.time_reversal_bz = time_reversal_bz
+        self.kpts_ibz = self.kpts[self.ibz2bz]
+        self.stars = [np.where(bz2ibz == i)[0] for i in range(len(ibz2bz))]
+        self.weights_ibz = np.array([len(s) for s in self.stars]) / float(nkpts)
+        self._dmats = [None] * len(keep)
+        logger.debug(self, 'Number of space group operations %d', len(keep))
+        logger.debug(self, 'nkpts = %d  nkpts_ibz = %d', nkpts, self.nkpts_ibz)
+        return self
+
+    def ao_rotation(self, k):
+        '''The unitary matrix U to transform AO matrices from the IBZ
+        k-point of k to the k-th k-point, M(k) = U M(k_ibz) U^dagger.
+        Time reversal (complex conjugation) is not included.'''
+        cell = self.cell
+        iop = self.op_bz[k]
+        if self._dmats[iop] is None:
+            self._dmats[iop] = _angular_rotation_matrices(cell, self._rots_cart[iop])
+        dmats = self._dmats[iop]
+        kpt = self.kpts[k]
+        if self.time_reversal_bz[k]:
+            kpt = -kpt
+        a = cell.lattice_vectors()
+        phases = np.exp(-1j * self.atom_shifts[iop].dot(a).dot(kpt))
+        aoslices = cell.aoslice_by_atom()
+        ao_loc = cell.ao_loc_nr()
+        nao = ao_loc[-1]
+        u = np.zeros((nao,nao), dtype=np.complex128)
+        for ia, ib in enumerate(self.atom_maps[iop]):
+            for sha, shb in zip(range(*aoslices[ia,:2]), range(*aoslices[ib,:2])):
+                d = dmats[cell.bas_angular(sha)] * phases[ia]
+                nd = d.shape[0]
+                p0, q0 = ao_loc[sha], ao_loc[shb]
+                for i in range(cell.bas_nctr(sha)):
+                    u[q0+i*nd:q0+(i+1)*nd,p0+i*nd:p0+(i+1)*nd] = d
+        return u
+
+    def transform_dm(self, dm_ibz):
+        '''AO matrices (density or Fock matrices) in the full Brillouin zone
+        from the matrices of the IBZ k-points'''
+        dm_ibz = np.asarray(dm_ibz)
+        if dm_ibz.shape[-3] != self.nkpts_ibz:
+            raise ValueError('The input matrices are not on the IBZ k-points')
+        dm_bz = dm_ibz[...,self.bz2ibz,:,:].astype(np.complex128)
+        for k in range(self.nkpts):
+            if k not in self.ibz2bz:
+                u = self.ao_rotation(k)
+                dm_bz[...,k,:,:] = lib.einsum('pi,...ij,qj->...pq', u,
+                                              dm_bz[...,k,:,:], u.conj())
+                if self.time_reversal_bz[k]:
+                    dm_bz[...,k,:,:] = dm_bz[...,k,:,:].conj()
+        return dm_bz
+    transform_fock = transform_dm
+
+    def transform_mo_coeff(self, mo_coeff_ibz):
+        '''Orbital coefficients in the full Brillouin zone'''
+        mo_coeff_bz = []
+        for k in range(self.nkpts):
+            c = np.asarray(mo_coeff_ibz[self.bz2ibz[k]])
+            if k not in self.ibz2bz:
+                c = self.ao_rotation(k).dot(c)
+                if self.time_reversal_bz[k]:
+                    c = c.conj()
+            mo_coeff_bz.append(c)
+        return mo_coeff_bz
+
+    def transform_mo_energy(self, mo_energy_ibz):
+        '''Orbital energies (or occupations) in the full Brillouin zone'''
+        return [mo_energy_ibz[i] for i in self.bz2ibz]
+    transform_mo_occ = transform_mo_energy
+
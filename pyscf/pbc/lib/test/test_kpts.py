@@ -46,6 +46,36 @@ class KnownValues(unittest.TestCase):
         kconserve = tools.get_kconserv3(cell, kpts, kijkab)
         self.assertAlmostEqual(lib.finger(kconserve), -3.1172758206126852, 0)
 
+    def test_kpts_symm(self):
+        cell = pbcgto.Cell()
+        cell.atom = 'C 0 0 0; C 0.8917 0.8917 0.8917'
+        cell.a = '''0.      1.7834  1.7834
+                    1.7834  0.      1.7834
+                    1.7834  1.7834  0.    '''
+        cell.unit = 'A'
+        cell.basis = 'gth-szv'
+        cell.pseudo = 'gth-pade'
+        cell.build()
+        kpts = cell.make_kpts([4,4,4], space_group_symmetry=True,
+                              time_reversal_symmetry=True)
+        self.assertEqual(len(kpts.rotations), 48)
+        self.assertEqual(kpts.nkpts, 64)
+        self.assertEqual(kpts.nkpts_ibz, 8)
+        self.assertAlmostEqual(kpts.weights_ibz.sum(), 1, 12)
+        self.assertTrue(abs(kpts.kpts[kpts.ibz2bz] - kpts.kpts_ibz).max() < 1e-12)
+
+        kpts = cell.make_kpts([2,2,2], space_group_symmetry=True)
+        s = numpy.asarray(cell.pbc_intor('int1e_ovlp', kpts=kpts.kpts))
+        s_bz = kpts.transform_dm(s[kpts.ibz2bz])
+        self.assertAlmostEqual(abs(s_bz - s).max(), 0, 9)
+
+        kpts = cell.make_kpts([3,3,1], time_reversal_symmetry=True)
+        self.assertEqual(len(kpts.rotations), 1)
+        self.assertEqual(kpts.nkpts_ibz, 5)
+        s = numpy.asarray(cell.pbc_intor('int1e_ovlp', kpts=kpts.kpts))
+        s_bz = kpts.transform_dm(s[kpts.ibz2bz])
+        self.assertAlmostEqual(abs(s_bz - s).max(), 0, 9)
+
 if __name__ == "__main__":
     print("Tests for kpts_helper")
     unittest.main()
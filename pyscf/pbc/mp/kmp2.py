@@ -31,23 +31,35 @@ import numpy as np
 
 from pyscf import lib
 from pyscf.lib import logger
+from pyscf.lib import memplan
 from pyscf.mp import mp2
 from pyscf.pbc.lib import kpts_helper
 from pyscf.lib.parameters import LARGE_DENOM
+from pyscf import __config__
 
-def kernel(mp, mo_energy, mo_coeff, verbose=logger.NOTE):
+POOL_SIZE = getattr(__config__, 'pbc_mp_kmp2_pool_size', 1)
+
+def kernel(mp, mo_energy, mo_coeff, verbose=logger.NOTE, with_df_ints=None):
+    '''KMP2 correlation energy
+
+    Kwargs:
+        with_df_ints : bool
+            Whether to build the (ia|jb) integrals from the half-transformed
+            3-index tensors L_{ia} of all k-point pairs (see
+            :func:`_make_df_Lov`).  It is only available to GDF.  By default,
+            it is enabled if the SCF object uses GDF.
+    '''
     nmo = mp.nmo
     nocc = mp.nocc
     nvir = nmo - nocc
     nkpts = mp.nkpts
 
-    eia = np.zeros((nocc,nvir))
-    eijab = np.zeros((nocc,nocc,nvir,nvir))
+    with_df = mp._scf.with_df
+    if with_df_ints is None:
+        with_df_ints = _is_gdf(with_df)
 
-    fao2mo = mp._scf.with_df.ao2mo
     kconserv = mp.khelper.kconserv
-    emp2 = 0.
-    oovv_ij = np.zeros((nkpts,nocc,nocc,nvir,nvir), dtype=mo_coeff[0].dtype)
+    dtype = mo_coeff[0].dtype
 
     mo_e_o = [mo_energy[k][:nocc] for k in range(nkpts)]
     mo_e_v = [mo_energy[k][nocc:] for k in range(nkpts)]
@@ -55,17 +67,8 @@ def kernel(mp, mo_energy, mo_coeff, verbose=logger.NOTE):
     # Get location of non-zero/padded elements in occupied and virtual space
     nonzero_opadding, nonzero_vpadding = padding_k_idx(mp, kind="split")
 
-    for ki in range(nkpts):
-      for kj in range(nkpts):
-        for ka in range(nkpts):
-            kb = kconserv[ki,ka,kj]
-            orbo_i = mo_coeff[ki][:,:nocc]
-            orbo_j = mo_coeff[kj][:,:nocc]
-            orbv_a = mo_coeff[ka][:,nocc:]
-            orbv_b = mo_coeff[kb][:,nocc:]
-            oovv_ij[ka] = fao2mo((orbo_i,orbv_a,orbo_j,orbv_b),
-                            (mp.kpts[ki],mp.kpts[ka],mp.kpts[kj],mp.kpts[kb]),
-                            compact=False).reshape(nocc,nvir,nocc,nvir).transpose(0,2,1,3) / nkpts
+    def emp2_ij(oovv_ij, ki, kj):
+        emp2 = 0.
         for ka in range(nkpts):
             kb = kconserv[ki,ka,kj]
 
@@ -82,11 +85,138 @@ def kernel(mp, mo_energy, mo_coeff, verbose=logger.NOTE):
             t2_ijab = np.conj(oovv_ij[ka]/eijab)
             woovv = 2*oovv_ij[ka] - oovv_ij[kb].transpose(0,1,3,2)
             emp2 += np.einsum('ijab,ijab', t2_ijab, woovv).real
+        return emp2
+
+    if not with_df_ints:
+        fao2mo = with_df.ao2mo
+        emp2 = 0.
+        oovv_ij = np.zeros((nkpts,nocc,nocc,nvir,nvir), dtype=dtype)
+        for ki in range(nkpts):
+          for kj in range(nkpts):
+            for ka in range(nkpts):
+                kb = kconserv[ki,ka,kj]
+                orbo_i = mo_coeff[ki][:,:nocc]
+                orbo_j = mo_coeff[kj][:,:nocc]
+                orbv_a = mo_coeff[ka][:,nocc:]
+                orbv_b = mo_coeff[kb][:,nocc:]
+                oovv_ij[ka] = fao2mo((orbo_i,orbv_a,orbo_j,orbv_b),
+                                (mp.kpts[ki],mp.kpts[ka],mp.kpts[kj],mp.kpts[kb]),
+                                compact=False).reshape(nocc,nvir,nocc,nvir).transpose(0,2,1,3) / nkpts
+            emp2 += emp2_ij(oovv_ij, ki, kj)
+        emp2 /= nkpts
+        return emp2, None
+
+    log = logger.new_logger(mp, verbose)
+    Lov, naux = _make_df_Lov(mp, mo_coeff)
+    cput1 = (time.clock(), time.time())
+
+    nov = nocc * nvir
+    def task(kikj):
+        ki, kj = kikj
+        Lia = _load_Lov(Lov, ki, range(nkpts), naux, nov)
+        Ljb = _load_Lov(Lov, kj, kconserv[ki,:,kj], naux, nov)
+        # (ia|jb) of all ka for the pair (ki,kj) in one batched gemm
+        oovv_ij = np.matmul(Lia.transpose(0,2,1), Ljb)
+        Lia = Ljb = None
+        oovv_ij = oovv_ij.reshape(nkpts,nocc,nvir,nocc,nvir).transpose(0,1,3,2,4)
+        if dtype == np.double:
+            oovv_ij = oovv_ij.real
+        return emp2_ij(oovv_ij/nkpts, ki, kj)
+
+    # Different (ki,kj) pairs are independent.  They are distributed over a
+    # pool of threads.  BLAS releases the GIL during the gemm.
+    tasks = [(ki, kj) for ki in range(nkpts) for kj in range(nkpts)]
+    mem_task = nkpts * nov * (naux*2 + nov*2) * 16/1e6
+    npool = min(mp.pool_size, len(tasks),
+                max(1, int(memplan.available(mp.max_memory) // mem_task)))
+    log.debug('KMP2 (ia|jb) tasks: %d, pool size %d, %.1f MB per task',
+              len(tasks), npool, mem_task)
+    if npool > 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(npool)
+        # Share the OpenMP threads between the workers
+        nthreads = lib.num_threads()
+        nthreads = max(1, nthreads//npool) if nthreads > 1 else None
+        try:
+            with lib.with_omp_threads(nthreads):
+                emp2 = sum(pool.map(task, tasks))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        emp2 = sum(task(kikj) for kikj in tasks)
+    Lov = None
+    log.timer('KMP2 energy from DF tensors', *cput1)
 
     emp2 /= nkpts
-
     return emp2, None
 
+def _is_gdf(with_df):
+    from pyscf.pbc.df import df, mdf
+    return isinstance(with_df, df.GDF) and not isinstance(with_df, mdf.MDF)
+
+def _make_df_Lov(mp, mo_coeff, incore=None):
+    '''Half-transformed 3-index tensors L_{ia}(ki,ka) of all k-point pairs.
+
+    The tensors are held in memory if they fit in max_memory, otherwise they
+    are stored in a temporary HDF5 file.  The blocks of the negative metric
+    (PBC-2D) are scaled by 1j so that (ia|jb) = sum_L L_{ia} L_{jb}.
+
+    Returns:
+        Lov : a dict (or an HDF5 file) with the keys 'ki-ka'
+        naux : the largest auxiliary dimension of all k-point pairs
+    '''
+    from pyscf.ao2mo import _ao2mo
+    from pyscf.ao2mo.incore import _conc_mos
+    log = logger.new_logger(mp)
+    cput0 = (time.clock(), time.time())
+    with_df = mp._scf.with_df
+    nocc = mp.nocc
+    nvir = mp.nmo - nocc
+    nkpts = mp.nkpts
+    kpts = np.asarray(mp.kpts)
+
+    naux = with_df.get_naoaux()
+    mem_Lov = nkpts**2 * naux * nocc*nvir * 16/1e6
+    if incore is None:
+        incore = memplan.fits(mem_Lov, mp.max_memory*.5)
+    log.debug('KMP2 DF tensors L_ia %.1f MB, incore = %s', mem_Lov, incore)
+    if incore:
+        Lov = {}
+    else:
+        Lov = lib.H5TmpFile()
+    # sr_loop keeps at least 16 auxiliary functions in each block
+    max_memory = max(1, memplan.available(mp.max_memory) * .5)
+
+    tao = []
+    ao_loc = None
+    naux = 0
+    for ki in range(nkpts):
+        orbo = np.asarray(mo_coeff[ki][:,:nocc], dtype=np.complex128)
+        for ka in range(nkpts):
+            orbv = np.asarray(mo_coeff[ka][:,nocc:], dtype=np.complex128)
+            moia, iaslice = _conc_mos(orbo, orbv)[2:]
+            Lia = []
+            for LpqR, LpqI, sign in with_df.sr_loop(kpts[[ki,ka]], max_memory, False):
+                zia = _ao2mo.r_e2(LpqR+LpqI*1j, moia, iaslice, tao, ao_loc)
+                if sign < 0:
+                    zia *= 1j
+                Lia.append(zia)
+                LpqR = LpqI = None
+            Lia = np.vstack(Lia)
+            naux = max(naux, Lia.shape[0])
+            Lov['%d-%d' % (ki, ka)] = Lia
+    log.timer('KMP2 DF tensors L_ia', *cput0)
+    return Lov, naux
+
+def _load_Lov(Lov, k1, k2s, naux, nov):
+    '''L_{ia}(k1,k2) for all k2 in k2s, zero-padded to the same naux'''
+    out = np.zeros((len(k2s), naux, nov), dtype=np.complex128)
+    for n, k2 in enumerate(k2s):
+        dat = Lov['%d-%d' % (k1, k2)]
+        out[n,:dat.shape[0]] = dat
+    return out
+
 
 def padding_k_idx(mp, kind="split"):
     """A convention used for padding vectors, matrices and tensors in case when occupation numbers depend on the
@@ -422,6 +552,8 @@ class KMP2(mp2.MP2):
         self.max_memory = mf.max_memory
 
         self.frozen = frozen
+        # Number of threads to evaluate the (ki,kj) blocks of (ia|jb)
+        self.pool_size = POOL_SIZE
 
 ##################################################
 # don't modify the following attributes, they are not input options
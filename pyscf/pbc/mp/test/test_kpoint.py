@@ -118,6 +118,30 @@ class KnownValues(unittest.TestCase):
         emp2 /= np.prod(nmp)
         self.assertAlmostEqual(emp2, -0.022416773725207319, 6)
 
+    def test_gdf_pool(self):
+        cell = pbcgto.Cell()
+        cell.atom = 'He 0 0 0; He 1.5 1.3 1.1'
+        cell.a = np.eye(3) * 3.
+        cell.basis = [[0, (1.5, 1)], [0, (.6, 1)], [1, (.8, 1)]]
+        cell.mesh = [11] * 3
+        cell.verbose = 0
+        cell.build()
+        kmf = pbcscf.KRHF(cell, cell.make_kpts([1,2,2]), exxdiv=None)
+        kmf = kmf.density_fit().run()
+
+        mymp = pyscf.pbc.mp.kmp2.KMP2(kmf)
+        mo_coeff, mo_energy = pyscf.pbc.mp.kmp2._add_padding(
+            mymp, mymp.mo_coeff, mymp.mo_energy)
+        eref = pyscf.pbc.mp.kmp2.kernel(mymp, mo_energy, mo_coeff,
+                                        with_df_ints=False)[0]
+        self.assertAlmostEqual(eref, -0.04721485592314449, 8)
+        self.assertAlmostEqual(mymp.kernel()[0], eref, 12)
+        mymp.pool_size = 3
+        self.assertAlmostEqual(mymp.kernel()[0], eref, 12)
+        # L_ia in the temporary HDF5 file
+        mymp.max_memory = 1
+        self.assertAlmostEqual(mymp.kernel()[0], eref, 12)
+
 if __name__ == '__main__':
     print("Full kpoint test")
     unittest.main()
@@ -29,6 +29,7 @@ krhf = khf
 from pyscf.pbc.scf import kuhf
 from pyscf.pbc.scf import krohf
 from pyscf.pbc.scf import kghf
+from pyscf.pbc.scf import khf_ksymm
 from pyscf.pbc.scf import newton_ah
 from pyscf.pbc.scf import addons
 
@@ -47,6 +48,7 @@ KRHF = krhf.KRHF  # KRHF supports cell.spin != 0 if number of k-points is even
 KUHF = kuhf.KUHF
 KROHF = krohf.KROHF
 KGHF = kghf.KGHF
+KsymAdaptedKRHF = khf_ksymm.KRHF
 
 newton = newton_ah.newton
 
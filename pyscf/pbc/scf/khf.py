@@ -34,7 +34,9 @@ import h5py
 from pyscf.pbc.scf import hf as pbchf
 from pyscf import lib
 from pyscf.scf import hf as mol_hf
+from pyscf.scf.diis import get_err_vec
 from pyscf.lib import logger
+from pyscf.lib import profiler
 from pyscf.pbc.gto import ecp
 from pyscf.pbc.scf import addons
 from pyscf.pbc.scf import chkfile
@@ -45,6 +47,9 @@ from pyscf import __config__
 WITH_META_LOWDIN = getattr(__config__, 'pbc_scf_analyze_with_meta_lowdin', True)
 PRE_ORTH_METHOD = getattr(__config__, 'pbc_scf_analyze_pre_orth_method', 'ANO')
 CHECK_COULOMB_IMAG = getattr(__config__, 'pbc_scf_check_coulomb_imag', True)
+# The inner iterations of ACE are stopped when the orbital gradients are
+# reduced by this factor
+ACE_INNER_GRAD_RATIO = getattr(__config__, 'pbc_scf_ace_inner_grad_ratio', .1)
 
 
 def get_ovlp(mf, cell=None, kpts=None):
@@ -380,6 +385,132 @@ def get_rho(mf, dm=None, grids=None, kpts=None):
     return ni.get_rho(mf.cell, dm, grids, kpts, mf.max_memory)
 
 
+def ace_kernel(mf, conv_tol=1e-10, conv_tol_grad=None,
+               dm0=None, callback=None, conv_check=True, **kwargs):
+    '''SCF with the exact exchange evaluated in the outer iterations only
+    (adaptively compressed exchange, ACE).
+
+    In each outer iteration, the exact exchange matrices are evaluated once
+    for the current orbitals.  The total energy and the orbital gradients of
+    the exact Fock matrix are used to check the convergence.  The exchange
+    matrices of the outer iterations are extrapolated with DIIS (the error
+    vectors being the gradients of the exact Fock matrices) and kept fixed
+    in the inner iterations, which update the Coulomb (and XC) potential
+    only.  The inner iterations are stopped after mf.ace_inner_cycle cycles
+    or when the orbital gradients are reduced by ACE_INNER_GRAD_RATIO.  The
+    inner iterations thus become tighter when the outer loop converges.
+
+    In the AO basis the exchange matrices are stored in full.  The
+    compressed operator K C (C^+ K C)^{-1} C^+ K of the plane-wave ACE method
+    is exact on the occupied space only.  Its virtual-virtual block slows
+    down the inner iterations, therefore it is not used here.
+
+    Returns:
+        A list :   scf_conv, e_tot, mo_energy, mo_coeff, mo_occ
+    '''
+    log = logger.new_logger(mf)
+    cell = mf.cell
+    if conv_tol_grad is None:
+        conv_tol_grad = np.sqrt(conv_tol)
+        log.info('Set gradient conv threshold to %g', conv_tol_grad)
+    ace_conv_tol = mf.ace_conv_tol
+    if ace_conv_tol is None:
+        ace_conv_tol = conv_tol
+
+    mf._ace_vk = None
+    if dm0 is None:
+        dm = mf.get_init_guess(cell, mf.init_guess)
+    else:
+        dm = dm0
+    h1e = mf.get_hcore(cell)
+    s1e = mf.get_ovlp(cell)
+
+    def new_diis():
+        if mf.diis:
+            mf_diis = mf.DIIS(mf, None)
+            mf_diis.space = mf.diis_space
+            mf_diis.rollback = mf.diis_space_rollback
+        else:
+            mf_diis = None
+        return mf_diis
+    # DIIS for the exchange matrices of the outer iterations
+    if mf.diis:
+        ace_diis = lib.diis.DIIS(mf)
+        ace_diis.space = mf.diis_space
+    else:
+        ace_diis = None
+
+    def grad_norm(mo_coeff, mo_occ, fock):
+        norm_gorb = np.linalg.norm(mf.get_grad(mo_coeff, mo_occ, fock))
+        if not mol_hf.TIGHT_GRAD_CONV_TOL:
+            norm_gorb = norm_gorb / np.sqrt(norm_gorb.size)
+        return norm_gorb
+
+    vhf = mf.get_veff(cell, dm)
+    e_tot = mf.energy_tot(dm, h1e, vhf)
+    log.info('init E= %.15g', e_tot)
+    fock = mf.get_fock(h1e, s1e, vhf, dm)
+    mo_energy, mo_coeff = mf.eig(fock, s1e)
+    mo_occ = mf.get_occ(mo_energy, mo_coeff)
+
+    scf_conv = False
+    e_last = e_tot
+    cycle = 1
+    try:
+        for outer in range(mf.ace_max_cycle):
+            cput1 = (time.clock(), time.time())
+            dm = mf.make_rdm1(mo_coeff, mo_occ)
+            mf._ace_vk = None
+            vk = mf.get_k(cell, dm)
+            # The exact Fock matrix of the current orbitals
+            mf._ace_vk = vk
+            vhf = mf.get_veff(cell, dm)
+            e_tot = mf.energy_tot(dm, h1e, vhf)
+            fock = mf.get_fock(h1e, s1e, vhf, dm)
+            norm_gorb = grad_norm(mo_coeff, mo_occ, fock)
+            log.info('ACE outer cycle= %d E= %.15g  delta_E= %4.3g  |g|= %4.3g',
+                     outer+1, e_tot, e_tot-e_last, norm_gorb)
+            if abs(e_tot - e_last) < ace_conv_tol and norm_gorb < conv_tol_grad:
+                scf_conv = True
+                break
+            e_last = e_tot
+
+            if ace_diis is not None:
+                mf._ace_vk = ace_diis.update(vk, xerr=get_err_vec(s1e, dm, fock))
+                vhf = mf.get_veff(cell, dm)
+            vk = None
+            cput1 = log.timer('ACE exchange', *cput1)
+
+            # Inner iterations with the exchange matrices fixed
+            gtol = max(conv_tol_grad, norm_gorb * ACE_INNER_GRAD_RATIO)
+            mf_diis = new_diis()
+            for inner in range(mf.ace_inner_cycle):
+                fock = mf.get_fock(h1e, s1e, vhf, dm, cycle, mf_diis)
+                mo_energy, mo_coeff = mf.eig(fock, s1e)
+                mo_occ = mf.get_occ(mo_energy, mo_coeff)
+                dm = mf.make_rdm1(mo_coeff, mo_occ)
+                vhf = mf.get_veff(cell, dm)
+                fock = mf.get_fock(h1e, s1e, vhf, dm)
+                norm_gorb = grad_norm(mo_coeff, mo_occ, fock)
+                log.debug('    inner cycle= %d E= %.15g  |g|= %4.3g', cycle,
+                          mf.energy_tot(dm, h1e, vhf), norm_gorb)
+                if callable(callback):
+                    callback(locals())
+                cycle += 1
+                if norm_gorb < gtol:
+                    break
+            cput1 = log.timer('ACE outer cycle= %d' % (outer+1), *cput1)
+
+        if scf_conv and conv_check:
+            # An extra diagonalization of the exact Fock matrix to remove the
+            # level shift
+            mo_energy, mo_coeff = mf.eig(fock, s1e)
+            mo_occ = mf.get_occ(mo_energy, mo_coeff)
+    finally:
+        mf._ace_vk = None
+    return scf_conv, e_tot, mo_energy, mo_coeff, mo_occ
+
+
 class KSCF(pbchf.SCF):
     '''SCF base class with k-point sampling.
 
@@ -390,9 +521,24 @@ class KSCF(pbchf.SCF):
     Attributes:
         kpts : (nks,3) ndarray
             The sampling k-points in Cartesian coordinates, in units of 1/Bohr.
+        ace_exchange : bool
+            Whether to use the adaptively compressed exchange (ACE).  The
+            exact exchange matrices are computed once per outer iteration.
+            See :func:`ace_kernel`.  Default is False.
+        ace_max_cycle : int
+            Max. number of ACE outer iterations.
+        ace_inner_cycle : int
+            Max. number of SCF iterations for each set of ACE operators.
+        ace_conv_tol : float
+            Convergence threshold of the total energy of ACE outer
+            iterations.  If not given, conv_tol is used.
     '''
     conv_tol_grad = getattr(__config__, 'pbc_scf_KSCF_conv_tol_grad', None)
     direct_scf = getattr(__config__, 'pbc_scf_SCF_direct_scf', False)
+    ace_exchange = getattr(__config__, 'pbc_scf_KSCF_ace_exchange', False)
+    ace_max_cycle = getattr(__config__, 'pbc_scf_KSCF_ace_max_cycle', 20)
+    ace_inner_cycle = getattr(__config__, 'pbc_scf_KSCF_ace_inner_cycle', 4)
+    ace_conv_tol = getattr(__config__, 'pbc_scf_KSCF_ace_conv_tol', None)
 
     def __init__(self, cell, kpts=np.zeros((1,3)),
                  exxdiv=getattr(__config__, 'pbc_scf_SCF_exxdiv', 'ewald')):
@@ -408,7 +554,10 @@ class KSCF(pbchf.SCF):
         self.conv_tol = cell.precision * 10
 
         self.exx_built = False
-        self._keys = self._keys.union(['cell', 'exx_built', 'exxdiv', 'with_df'])
+        self._ace_vk = None
+        self._keys = self._keys.union(['cell', 'exx_built', 'exxdiv', 'with_df',
+                                       'ace_exchange', 'ace_max_cycle',
+                                       'ace_inner_cycle', 'ace_conv_tol'])
 
     @property
     def kpts(self):
@@ -455,6 +604,10 @@ class KSCF(pbchf.SCF):
             logger.info(self, '    Total energy shift due to Ewald probe charge'
                         ' = -1/2 * Nelec*madelung = %.12g',
                         madelung*nelectron * -.5)
+        if self.ace_exchange:
+            logger.info(self, 'ACE exchange max_cycle = %d  inner_cycle = %d  '
+                        'conv_tol = %s', self.ace_max_cycle,
+                        self.ace_inner_cycle, self.ace_conv_tol)
         logger.info(self, 'DF object = %s', self.with_df)
         if not getattr(self.with_df, 'build', None):
             # .dump_flags() is called in pbc.df.build function
@@ -551,12 +704,20 @@ class KSCF(pbchf.SCF):
         if cell is None: cell = self.cell
         if kpts is None: kpts = self.kpts
         if dm_kpts is None: dm_kpts = self.make_rdm1()
+        if self._use_ace(dm_kpts, hermi, kpts_band):
+            return self.get_j(cell, dm_kpts, hermi, kpts, kpts_band), self._ace_vk
         cpu0 = (time.clock(), time.time())
         vj, vk = self.with_df.get_jk(dm_kpts, hermi, kpts, kpts_band,
                                      exxdiv=self.exxdiv)
         logger.timer(self, 'vj and vk', *cpu0)
         return vj, vk
 
+    def _use_ace(self, dm_kpts, hermi=1, kpts_band=None):
+        '''Whether the ACE operators of the outer iteration can be used as
+        the exchange matrices of dm_kpts'''
+        return (self._ace_vk is not None and hermi == 1 and kpts_band is None
+                and np.shape(dm_kpts) == self._ace_vk.shape)
+
     def get_veff(self, cell=None, dm_kpts=None, dm_last=0, vhf_last=0, hermi=1,
                  kpts=None, kpts_band=None):
         '''Hartree-Fock potential matrix for the given density matrix.
@@ -565,6 +726,23 @@ class KSCF(pbchf.SCF):
         vj, vk = self.get_jk(cell, dm_kpts, hermi, kpts, kpts_band)
         return vj - vk * .5
 
+    def scf(self, dm0=None, **kwargs):
+        if not self.ace_exchange:
+            return pbchf.SCF.scf(self, dm0, **kwargs)
+
+        cput0 = (time.clock(), time.time())
+        with profiler.region(self, 'SCF'):
+            self.dump_flags()
+            self.build(self.cell)
+            self.converged, self.e_tot, \
+                    self.mo_energy, self.mo_coeff, self.mo_occ = \
+                    ace_kernel(self, self.conv_tol, self.conv_tol_grad,
+                               dm0=dm0, callback=self.callback,
+                               conv_check=self.conv_check, **kwargs)
+        logger.timer(self, 'SCF', *cput0)
+        self._finalize()
+        return self.e_tot
+
     def analyze(self, verbose=None, with_meta_lowdin=WITH_META_LOWDIN,
                 **kwargs):
         if verbose is None: verbose = self.verbose
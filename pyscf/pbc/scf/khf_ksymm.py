@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Restricted Hartree-Fock with k-point symmetry
+
+Orbitals, density matrices and Fock matrices are held for the k-points in the
+irreducible Brillouin zone (IBZ) only.  The density matrices of the full
+k-point mesh are generated by the space group operations when building J/K.
+J and K matrices are evaluated on the IBZ k-points only (kpts_band of the DF
+objects).
+
+See Also:
+    pyscf.pbc.lib.kpts_symm
+'''
+
+import time
+import numpy as np
+from pyscf import lib
+from pyscf.lib import logger
+from pyscf.scf import hf as mol_hf
+from pyscf.pbc.scf import khf
+from pyscf.pbc import tools
+from pyscf.pbc.lib import kpts_symm
+from pyscf import __config__
+
+
+def get_occ(mf, mo_energy_kpts=None, mo_coeff_kpts=None):
+    '''Label the occupancies for the IBZ k-points.  Each k-point is counted
+    with the size of its star to determine the Fermi level.
+    '''
+    if mo_energy_kpts is None: mo_energy_kpts = mf.mo_energy
+    kpts = mf.kpoints
+    nocc = mf.cell.tot_electrons(kpts.nkpts) // 2
+
+    degen = np.rint(kpts.weights_ibz * kpts.nkpts).astype(int)
+    mo_energy = np.hstack(mo_energy_kpts)
+    degen = np.hstack([[d]*len(e) for d, e in zip(degen, mo_energy_kpts)])
+    idx = np.argsort(mo_energy, kind='mergesort')
+    mo_energy = mo_energy[idx]
+    count = np.cumsum(degen[idx])
+    homo = np.searchsorted(count, nocc)
+    fermi = mo_energy[homo]
+    if count[homo] != nocc:
+        logger.warn(mf, 'Partially occupied degenerate bands at Fermi level %.12g',
+                    fermi)
+    mo_occ_kpts = [(mo_e <= fermi).astype(np.double) * 2
+                   for mo_e in mo_energy_kpts]
+
+    if homo+1 < mo_energy.size:
+        logger.info(mf, 'HOMO = %.12g  LUMO = %.12g',
+                    mo_energy[homo], mo_energy[homo+1])
+        if mo_energy[homo]+1e-3 > mo_energy[homo+1]:
+            logger.warn(mf, 'HOMO %.12g == LUMO %.12g',
+                        mo_energy[homo], mo_energy[homo+1])
+    else:
+        logger.info(mf, 'HOMO = %.12g', mo_energy[homo])
+
+    if mf.verbose >= logger.DEBUG:
+        np.set_printoptions(threshold=len(mo_energy))
+        logger.debug(mf, '     k-point                  weight  mo_energy')
+        for k,kpt in enumerate(mf.cell.get_scaled_kpts(mf.kpts)):
+            logger.debug(mf, '  %2d (%6.3f %6.3f %6.3f)  %.4f  %s %s',
+                         k, kpt[0], kpt[1], kpt[2], kpts.weights_ibz[k],
+                         mo_energy_kpts[k][mo_occ_kpts[k]> 0],
+                         mo_energy_kpts[k][mo_occ_kpts[k]==0])
+        np.set_printoptions(threshold=1000)
+    return mo_occ_kpts
+
+def get_fermi(mf, mo_energy_kpts=None, mo_occ_kpts=None):
+    '''Fermi level'''
+    if mo_energy_kpts is None: mo_energy_kpts = mf.mo_energy
+    if mo_occ_kpts is None: mo_occ_kpts = mf.mo_occ
+    return max(e[occ > 0].max() for e, occ in zip(mo_energy_kpts, mo_occ_kpts)
+               if np.any(occ > 0))
+
+def energy_elec(mf, dm_kpts=None, h1e_kpts=None, vhf_kpts=None):
+    '''Following pyscf.pbc.scf.khf.energy_elec().  The IBZ k-points are
+    weighted by the sizes of their stars.'''
+    if dm_kpts is None: dm_kpts = mf.make_rdm1()
+    if h1e_kpts is None: h1e_kpts = mf.get_hcore()
+    if vhf_kpts is None: vhf_kpts = mf.get_veff(mf.cell, dm_kpts)
+
+    weights = mf.kpoints.weights_ibz
+    e1 = np.einsum('k,kij,kji', weights, dm_kpts, h1e_kpts)
+    e_coul = np.einsum('k,kij,kji', weights, dm_kpts, vhf_kpts) * 0.5
+    logger.debug(mf, 'E1 = %s  E_coul = %s', e1, e_coul)
+    if khf.CHECK_COULOMB_IMAG and abs(e_coul.imag > mf.cell.precision*10):
+        logger.warn(mf, "Coulomb energy has imaginary part %s. "
+                    "Coulomb integrals (e-e, e-N) may not converge !",
+                    e_coul.imag)
+    return (e1+e_coul).real, e_coul.real
+
+
+class KsymAdaptedKSCF(khf.KSCF):
+    '''KSCF with k-point symmetry.
+
+    Attributes:
+        kpts : (nkpts_ibz,3) ndarray
+            The IBZ k-points.  It can be assigned with the full k-point mesh
+            (an array) or a :class:`KPoints` object.
+        kpoints : :class:`KPoints`
+            The full k-point mesh and the symmetry operations.  The DF
+            object (with_df) is built on the full k-point mesh.
+    '''
+    def __init__(self, cell, kpts=np.zeros((1,3)),
+                 exxdiv=getattr(__config__, 'pbc_scf_SCF_exxdiv', 'ewald')):
+        khf.KSCF.__init__(self, cell, kpts, exxdiv)
+        self._keys = self._keys.union(['kpoints'])
+
+    @property
+    def kpts(self):
+        if 'kpts' in self.__dict__:
+            # To handle the attribute kpts loaded from chkfile
+            self.kpts = self.__dict__.pop('kpts')
+        return self.kpoints.kpts_ibz
+    @kpts.setter
+    def kpts(self, x):
+        if isinstance(x, kpts_symm.KPoints):
+            self.kpoints = x
+        else:
+            self.kpoints = kpts_symm.KPoints(self.cell, x)
+        self.with_df.kpts = self.kpoints.kpts
+
+    def dump_flags(self):
+        # Same as KSCF.dump_flags except that the madelung constant is
+        # evaluated on the full k-point mesh rather than the IBZ k-points
+        mol_hf.SCF.dump_flags(self)
+        logger.info(self, '\n')
+        logger.info(self, '******** PBC SCF flags ********')
+        kpts = self.kpoints
+        logger.info(self, 'N kpts = %d', kpts.nkpts_ibz)
+        logger.debug(self, 'kpts = %s', kpts.kpts_ibz)
+        logger.info(self, 'k-point symmetry: %d operations, N kpts in '
+                    'full BZ = %d, N kpts in IBZ = %d', len(kpts.rotations),
+                    kpts.nkpts, kpts.nkpts_ibz)
+        logger.debug(self, 'IBZ weights = %s', kpts.weights_ibz)
+        logger.info(self, 'Exchange divergence treatment (exxdiv) = %s', self.exxdiv)
+        cell = self.cell
+        if ((cell.dimension >= 2 and cell.low_dim_ft_type != 'inf_vacuum') and
+            isinstance(self.exxdiv, str) and self.exxdiv.lower() == 'ewald'):
+            madelung = tools.pbc.madelung(cell, [kpts.kpts])
+            logger.info(self, '    madelung (= occupied orbital energy shift) = %s', madelung)
+            nelectron = float(cell.tot_electrons(kpts.nkpts)) / kpts.nkpts
+            logger.info(self, '    Total energy shift due to Ewald probe charge'
+                        ' = -1/2 * Nelec*madelung = %.12g',
+                        madelung*nelectron * -.5)
+        if self.ace_exchange:
+            logger.info(self, 'ACE exchange max_cycle = %d  inner_cycle = %d  '
+                        'conv_tol = %s', self.ace_max_cycle,
+                        self.ace_inner_cycle, self.ace_conv_tol)
+        logger.info(self, 'DF object = %s', self.with_df)
+        if not getattr(self.with_df, 'build', None):
+            # .dump_flags() is called in pbc.df.build function
+            self.with_df.dump_flags()
+        return self
+
+    get_occ = get_occ
+    get_fermi = get_fermi
+    energy_elec = energy_elec
+
+    def get_j(self, cell=None, dm_kpts=None, hermi=1, kpts=None, kpts_band=None):
+        '''J matrices on the IBZ k-points (or kpts_band).  dm_kpts are the
+        density matrices of the IBZ k-points.'''
+        if cell is None: cell = self.cell
+        if dm_kpts is None: dm_kpts = self.make_rdm1()
+        if kpts_band is None: kpts_band = self.kpts
+        cpu0 = (time.clock(), time.time())
+        dm_bz = self.kpoints.transform_dm(dm_kpts)
+        vj = self.with_df.get_jk(dm_bz, hermi, self.kpoints.kpts, kpts_band,
+                                 with_k=False)[0]
+        logger.timer(self, 'vj', *cpu0)
+        return vj
+
+    def get_jk(self, cell=None, dm_kpts=None, hermi=1, kpts=None, kpts_band=None):
+        '''J and K matrices on the IBZ k-points (or kpts_band).  dm_kpts are
+        the density matrices of the IBZ k-points.'''
+        if cell is None: cell = self.cell
+        if dm_kpts is None: dm_kpts = self.make_rdm1()
+        if self._use_ace(dm_kpts, hermi, kpts_band):
+            return self.get_j(cell, dm_kpts, hermi, kpts, kpts_band), self._ace_vk
+        if kpts_band is None: kpts_band = self.kpts
+        cpu0 = (time.clock(), time.time())
+        dm_bz = self.kpoints.transform_dm(dm_kpts)
+        vj, vk = self.with_df.get_jk(dm_bz, hermi, self.kpoints.kpts, kpts_band,
+                                     exxdiv=self.exxdiv)
+        logger.timer(self, 'vj and vk', *cpu0)
+        return vj, vk
+
+    def density_fit(self, auxbasis=None, with_df=None):
+        mf = khf.KSCF.density_fit(self, auxbasis, with_df)
+        mf.with_df.kpts = self.kpoints.kpts
+        return mf
+
+    def mix_density_fit(self, auxbasis=None, with_df=None):
+        mf = khf.KSCF.mix_density_fit(self, auxbasis, with_df)
+        mf.with_df.kpts = self.kpoints.kpts
+        return mf
+
+    def stability(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def newton(self):
+        raise NotImplementedError
+
+
+class KsymAdaptedKRHF(KsymAdaptedKSCF, khf.KRHF):
+    '''KRHF with k-point symmetry.
+
+    Examples:
+
+    >>> kpts = cell.make_kpts([4,4,4], space_group_symmetry=True)
+    >>> mf = pbc.scf.KsymAdaptedKRHF(cell, kpts).run()
+    '''
+    def to_khf(self):
+        '''Convert to the KRHF object of the full k-point mesh'''
+        kpts = self.kpoints
+        mf = khf.KRHF(self.cell, kpts.kpts, exxdiv=self.exxdiv)
+        mf.__dict__.update(dict((key, val) for key, val in self.__dict__.items()
+                                if key not in ('kpoints', 'with_df')))
+        mf.with_df = self.with_df
+        if self.mo_coeff is not None:
+            mf.mo_coeff = kpts.transform_mo_coeff(self.mo_coeff)
+            mf.mo_energy = kpts.transform_mo_energy(self.mo_energy)
+            mf.mo_occ = kpts.transform_mo_occ(self.mo_occ)
+        return mf
+
+KRHF = KsymAdaptedKRHF
@@ -272,6 +272,37 @@ class KnownValues(unittest.TestCase):
         self.assertAlmostEqual(e1, e2, 9)
         self.assertAlmostEqual(e1, -11.451118801956275, 9)
 
+    def test_ace_exchange(self):
+        def count_k(mf):
+            nk = [0]
+            get_jk = mf.with_df.get_jk
+            def get_jk_counted(*args, **kwargs):
+                if kwargs.get('with_k', True):
+                    nk[0] += 1
+                return get_jk(*args, **kwargs)
+            mf.with_df.get_jk = get_jk_counted
+            return nk
+
+        mf = khf.KRHF(cell, kpts, exxdiv='vcut_sph')
+        mf.conv_tol = 1e-9
+        nk_ref = count_k(mf)
+        mf.kernel()
+
+        mf = khf.KRHF(cell, kpts, exxdiv='vcut_sph')
+        mf.ace_exchange = True
+        mf.conv_tol = 1e-9
+        nk = count_k(mf)
+        e = mf.kernel()
+        self.assertTrue(mf.converged)
+        self.assertAlmostEqual(e, kmf.e_tot, 7)
+        self.assertTrue(mf._ace_vk is None)
+        self.assertTrue(nk[0] < nk_ref[0])
+
+        mf = kuhf.KUHF(cell, kpts, exxdiv='vcut_sph')
+        mf.ace_exchange = True
+        mf.conv_tol = 1e-9
+        self.assertAlmostEqual(mf.kernel(), kumf.e_tot, 7)
+
 
 if __name__ == '__main__':
     print("Full Tests for pbc.scf.khf")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import unittest
+import numpy as np
+from pyscf.pbc import gto as pbcgto
+from pyscf.pbc import scf as pscf
+from pyscf.pbc import dft as pdft
+
+cell = pbcgto.Cell()
+cell.atom = 'He 0 0 0; He 1.5 1.5 1.5'
+cell.a = np.eye(3) * 3.
+cell.basis = [[0, (1.5, 1)], [1, (.8, 1)]]
+cell.mesh = [11] * 3
+cell.verbose = 7
+cell.output = '/dev/null'
+cell.build()
+kpts = cell.make_kpts([2,2,2], space_group_symmetry=True,
+                      time_reversal_symmetry=True)
+
+def tearDownModule():
+    global cell, kpts
+    cell.stdout.close()
+    del cell, kpts
+
+class KnownValues(unittest.TestCase):
+    def test_krhf(self):
+        mf0 = pscf.KRHF(cell, kpts.kpts).run(conv_tol=1e-10)
+        mf = pscf.KsymAdaptedKRHF(cell, kpts).run(conv_tol=1e-10)
+        self.assertEqual(len(mf.kpts), 4)
+        self.assertAlmostEqual(mf.e_tot, mf0.e_tot, 9)
+
+        mf1 = mf.to_khf()
+        self.assertAlmostEqual(abs(mf1.make_rdm1() - mf0.make_rdm1()).max(), 0, 6)
+        self.assertAlmostEqual(mf1.energy_tot(), mf0.e_tot, 9)
+
+    def test_dump_flags(self):
+        def madelung_in_log(mf):
+            mf.stdout = io.StringIO()
+            mf.verbose = 4
+            mf.dump_flags()
+            line = [l for l in mf.stdout.getvalue().splitlines() if 'madelung (' in l]
+            return float(line[0].split('=')[-1])
+        mf0 = pscf.KRHF(cell, kpts.kpts)
+        mf = pscf.KsymAdaptedKRHF(cell, kpts)
+        self.assertAlmostEqual(madelung_in_log(mf), madelung_in_log(mf0), 9)
+
+    def test_krhf_gdf(self):
+        mf0 = pscf.KRHF(cell, kpts.kpts).density_fit().run(conv_tol=1e-10)
+        mf = pscf.KsymAdaptedKRHF(cell, kpts).density_fit().run(conv_tol=1e-10)
+        self.assertAlmostEqual(mf.e_tot, mf0.e_tot, 9)
+
+    def test_krks(self):
+        mf0 = pdft.KRKS(cell, kpts.kpts)
+        mf0.xc = 'b3lyp'
+        mf0.run(conv_tol=1e-10)
+        mf = pdft.KsymAdaptedKRKS(cell, kpts)
+        mf.xc = 'b3lyp'
+        mf.run(conv_tol=1e-10)
+        self.assertAlmostEqual(mf.e_tot, mf0.e_tot, 9)
+
+    def test_krks_prune_grids(self):
+        def becke_grids():
+            grids = pdft.gen_grid.BeckeGrids(cell)
+            grids.level = 1
+            return grids
+        mf = pdft.KsymAdaptedKRKS(cell, kpts)
+        mf.grids = becke_grids()
+        mf.small_rho_cutoff = 1e-5
+        dm = mf.get_init_guess()
+        v = mf.get_veff(cell, dm)
+        mf0 = pdft.KRKS(cell, kpts.kpts)
+        mf0.grids = becke_grids()
+        mf0.small_rho_cutoff = 1e-5
+        v0 = mf0.get_veff(cell, kpts.transform_dm(dm))
+        grids = becke_grids()
+        grids.build()
+        self.assertTrue(mf.grids.weights.size < grids.weights.size)
+        self.assertAlmostEqual(abs(mf.grids.weights - mf0.grids.weights).max(), 0, 12)
+        self.assertAlmostEqual(v.exc, v0.exc, 9)
+
+
+if __name__ == '__main__':
+    print("Full Tests for KRHF with k-point symmetry")
+    unittest.main()
@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import time
 import warnings
 import copy
 import numpy as np
@@ -21,7 +22,13 @@ from pyscf import lib
 from pyscf.pbc.lib.kpts_helper import get_kconserv, get_kconserv3
 from pyscf import __config__
 
+# FFT backend of fft and ifft.  'AUTO' measures the registered backends and
+# selects the fastest one for each mesh.
 FFT_ENGINE = getattr(__config__, 'pbc_tools_pbc_fft_engine', 'BLAS')
+FFT_AUTO_NREPEAT = getattr(__config__, 'pbc_tools_pbc_fft_auto_nrepeat', 3)
+FFTW_PLANNER_EFFORT = getattr(__config__, 'pbc_tools_pbc_fftw_planner_effort',
+                              'FFTW_MEASURE')
+FFTW_MAX_PLANS = getattr(__config__, 'pbc_tools_pbc_fftw_max_plans', 32)
 
 def _fftn_blas(f, mesh):
     Gx = np.fft.fftfreq(mesh[0])
@@ -55,55 +62,150 @@ def _ifftn_blas(g, mesh):
         f = lib.dot(f.reshape(mesh[2],-1).T, expRGz, 1./mesh[2], c=out[i].reshape(-1,mesh[2]))
     return out.reshape(-1, *mesh)
 
-if FFT_ENGINE == 'FFTW':
-    # pyfftw is slower than np.fft in most cases
-    try:
-        import pyfftw
-        pyfftw.interfaces.cache.enable()
-        nproc = lib.num_threads()
-        def _fftn_wrapper(a):
-            return pyfftw.interfaces.numpy_fft.fftn(a, axes=(1,2,3), threads=nproc)
-        def _ifftn_wrapper(a):
-            return pyfftw.interfaces.numpy_fft.ifftn(a, axes=(1,2,3), threads=nproc)
-    except ImportError:
-        def _fftn_wrapper(a):
-            return np.fft.fftn(a, axes=(1,2,3))
-        def _ifftn_wrapper(a):
-            return np.fft.ifftn(a, axes=(1,2,3))
-
-elif FFT_ENGINE == 'NUMPY':
-    def _fftn_wrapper(a):
-        return np.fft.fftn(a, axes=(1,2,3))
-    def _ifftn_wrapper(a):
-        return np.fft.ifftn(a, axes=(1,2,3))
-
-elif FFT_ENGINE == 'NUMPY+BLAS':
-    _EXCLUDE = [17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79,
-                83, 89, 97,101,103,107,109,113,127,131,137,139,149,151,157,163,
-                167,173,179,181,191,193,197,199,211,223,227,229,233,239,241,251,
-                257,263,269,271,277,281,283,293]
-    _EXCLUDE = set(_EXCLUDE + [n*2 for n in _EXCLUDE] + [n*3 for n in _EXCLUDE])
-    def _fftn_wrapper(a):
-        mesh = a.shape[1:]
-        if mesh[0] in _EXCLUDE and mesh[1] in _EXCLUDE and mesh[2] in _EXCLUDE:
-            return _fftn_blas(a, mesh)
-        else:
-            return np.fft.fftn(a, axes=(1,2,3))
-    def _ifftn_wrapper(a):
-        mesh = a.shape[1:]
-        if mesh[0] in _EXCLUDE and mesh[1] in _EXCLUDE and mesh[2] in _EXCLUDE:
-            return _ifftn_blas(a, mesh)
-        else:
-            return np.fft.ifftn(a, axes=(1,2,3))
-
-#?elif:  # 'FFTW+BLAS'
-else:  # 'BLAS'
-    def _fftn_wrapper(a):
-        mesh = a.shape[1:]
+def _complete_rfftn(gh, mesh):
+    '''The FFT of real functions on the full mesh from the output of rfftn.
+    The negative frequencies of the last axis are obtained from g(-G) = g(G)^*
+    '''
+    nx, ny, nz = mesh
+    nh = nz // 2 + 1
+    g = np.empty((gh.shape[0], nx, ny, nz), dtype=np.complex128)
+    g[:,:,:,:nh] = gh
+    if nz > nh:
+        idx = (-np.arange(nx)) % nx
+        idy = (-np.arange(ny)) % ny
+        g[:,:,:,nh:] = gh[:,idx][:,:,idy][:,:,:,nz-nh:0:-1].conj()
+    return g
+
+# FFT backends for fft and ifft.  Each backend is a tuple (fftn, ifftn, rfftn)
+# of functions which transform the last three axes of (nbatch,nx,ny,nz)
+# arrays.  rfftn (for real functions) can be None.
+_FFT_BACKENDS = {}
+# The backends selected for the meshes when FFT_ENGINE = 'AUTO'
+_FFT_AUTO_CHOICE = {}
+
+def register_fft_backend(name, fftn, ifftn, rfftn=None):
+    '''Register an FFT backend for :func:`fft` and :func:`ifft`.
+
+    Args:
+        name : str
+            The value of FFT_ENGINE (or the config key
+            pbc_tools_pbc_fft_engine) to select the backend.
+        fftn, ifftn : functions
+            The forward and the inverse FFT of the last three axes of an
+            (nbatch,nx,ny,nz) array.  ifftn includes the normalization
+            factor 1/N.
+
+    Kwargs:
+        rfftn : function
+            The forward FFT of real arrays which returns the non-negative
+            frequencies of the last axis, as numpy.fft.rfftn.
+    '''
+    _FFT_BACKENDS[name.upper()] = (fftn, ifftn, rfftn)
+    _FFT_AUTO_CHOICE.clear()
+
+def _fftn_numpy(a):
+    return np.fft.fftn(a, axes=(1,2,3))
+def _ifftn_numpy(a):
+    return np.fft.ifftn(a, axes=(1,2,3))
+def _rfftn_numpy(a):
+    return np.fft.rfftn(a, axes=(1,2,3))
+register_fft_backend('NUMPY', _fftn_numpy, _ifftn_numpy, _rfftn_numpy)
+
+def _fftn_blas_wrapper(a):
+    return _fftn_blas(a, a.shape[1:])
+def _ifftn_blas_wrapper(a):
+    return _ifftn_blas(a, a.shape[1:])
+register_fft_backend('BLAS', _fftn_blas_wrapper, _ifftn_blas_wrapper)
+
+_EXCLUDE = [17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79,
+            83, 89, 97,101,103,107,109,113,127,131,137,139,149,151,157,163,
+            167,173,179,181,191,193,197,199,211,223,227,229,233,239,241,251,
+            257,263,269,271,277,281,283,293]
+_EXCLUDE = set(_EXCLUDE + [n*2 for n in _EXCLUDE] + [n*3 for n in _EXCLUDE])
+def _fftn_numpy_blas(a):
+    mesh = a.shape[1:]
+    if mesh[0] in _EXCLUDE and mesh[1] in _EXCLUDE and mesh[2] in _EXCLUDE:
         return _fftn_blas(a, mesh)
-    def _ifftn_wrapper(a):
-        mesh = a.shape[1:]
+    else:
+        return _fftn_numpy(a)
+def _ifftn_numpy_blas(a):
+    mesh = a.shape[1:]
+    if mesh[0] in _EXCLUDE and mesh[1] in _EXCLUDE and mesh[2] in _EXCLUDE:
         return _ifftn_blas(a, mesh)
+    else:
+        return _ifftn_numpy(a)
+register_fft_backend('NUMPY+BLAS', _fftn_numpy_blas, _ifftn_numpy_blas)
+
+try:
+    import scipy.fft
+except ImportError:
+    pass
+else:
+    def _fftn_scipy(a):
+        return scipy.fft.fftn(a, axes=(1,2,3), workers=lib.num_threads())
+    def _ifftn_scipy(a):
+        return scipy.fft.ifftn(a, axes=(1,2,3), workers=lib.num_threads())
+    def _rfftn_scipy(a):
+        return scipy.fft.rfftn(a, axes=(1,2,3), workers=lib.num_threads())
+    register_fft_backend('SCIPY', _fftn_scipy, _ifftn_scipy, _rfftn_scipy)
+
+try:
+    import pyfftw
+except ImportError:
+    pass
+else:
+    import threading
+    # FFTW plans keyed by the transform, the array shape (nbatch and mesh)
+    # and the number of threads.  Executing a plan updates its arrays which
+    # is not thread-safe.
+    _fftw_plans = {}
+    _fftw_lock = threading.Lock()
+    def _fftw_execute(kind, a):
+        nthreads = lib.num_threads()
+        key = (kind, a.shape, nthreads)
+        with _fftw_lock:
+            plan = _fftw_plans.get(key)
+            if plan is None:
+                if len(_fftw_plans) >= FFTW_MAX_PLANS:
+                    _fftw_plans.pop(next(iter(_fftw_plans)))
+                builder = getattr(pyfftw.builders, kind)
+                plan = builder(pyfftw.empty_aligned(a.shape, dtype=a.dtype),
+                               axes=(1,2,3), threads=nthreads,
+                               planner_effort=FFTW_PLANNER_EFFORT)
+                _fftw_plans[key] = plan
+            out = pyfftw.empty_aligned(plan.output_shape, dtype=plan.output_dtype)
+            plan(a, out)
+        return out
+    def _fftn_fftw(a):
+        return _fftw_execute('fftn', np.asarray(a, dtype=np.complex128))
+    def _ifftn_fftw(a):
+        return _fftw_execute('ifftn', np.asarray(a, dtype=np.complex128))
+    def _rfftn_fftw(a):
+        return _fftw_execute('rfftn', np.asarray(a, dtype=np.double))
+    register_fft_backend('FFTW', _fftn_fftw, _ifftn_fftw, _rfftn_fftw)
+
+def _fft_benchmark(mesh, nrepeat=FFT_AUTO_NREPEAT):
+    '''Time the forward and the inverse FFT of all backends on the mesh.
+    Returns the name of the fastest backend.'''
+    a = np.ones((1,) + tuple(mesh), dtype=np.complex128)
+    timing = {}
+    for name, (fftn, ifftn, rfftn) in _FFT_BACKENDS.items():
+        ifftn(fftn(a))  # to setup the plans
+        t0 = time.time()
+        for i in range(nrepeat):
+            ifftn(fftn(a))
+        timing[name] = time.time() - t0
+    return min(timing, key=timing.get)
+
+def _fft_backend(mesh):
+    engine = FFT_ENGINE.upper()
+    if engine == 'AUTO':
+        mesh = tuple(int(n) for n in mesh)
+        if mesh not in _FFT_AUTO_CHOICE:
+            _FFT_AUTO_CHOICE[mesh] = _fft_benchmark(mesh)
+        engine = _FFT_AUTO_CHOICE[mesh]
+    # Optional backends (FFTW, SCIPY) may not be available
+    return _FFT_BACKENDS.get(engine, _FFT_BACKENDS['NUMPY'])
 
 
 def fft(f, mesh):
@@ -132,7 +234,11 @@ def fft(f, mesh):
 
     f3d = f.reshape(-1, *mesh)
     assert(f3d.shape[0] == 1 or f[0].size == f3d[0].size)
-    g3d = _fftn_wrapper(f3d)
+    fftn, ifftn, rfftn = _fft_backend(mesh)
+    if rfftn is not None and not np.iscomplexobj(f3d):
+        g3d = _complete_rfftn(rfftn(f3d), mesh)
+    else:
+        g3d = fftn(f3d)
     ngrids = np.prod(mesh)
     if f.ndim == 1 or (f.ndim == 3 and f.size == ngrids):
         return g3d.ravel()
@@ -163,7 +269,7 @@ def ifft(g, mesh):
 
     g3d = g.reshape(-1, *mesh)
     assert(g3d.shape[0] == 1 or g[0].size == g3d[0].size)
-    f3d = _ifftn_wrapper(g3d)
+    f3d = _fft_backend(mesh)[1](g3d)
     ngrids = np.prod(mesh)
     if g.ndim == 1 or (g.ndim == 3 and g.size == ngrids):
         return f3d.ravel()
@@ -156,6 +156,27 @@ class KnownValues(unittest.TestCase):
         v = tools.ifft(a, [8,n,8]).ravel()
         self.assertAlmostEqual(abs(ref-v).max(), 0, 10)
 
+    def test_fft_backends(self):
+        n = 15
+        a = numpy.random.random([3,n,9,8])
+        b = a + numpy.random.random([3,n,9,8]) * 1j
+        ref_a = numpy.fft.fftn(a, axes=(1,2,3)).reshape(3,-1)
+        ref_b = numpy.fft.fftn(b, axes=(1,2,3)).reshape(3,-1)
+        ref_ib = numpy.fft.ifftn(b, axes=(1,2,3)).reshape(3,-1)
+        engine = tools.pbc.FFT_ENGINE
+        try:
+            for name in list(tools.pbc._FFT_BACKENDS) + ['AUTO']:
+                tools.pbc.FFT_ENGINE = name
+                v = tools.fft(a, [n,9,8])
+                self.assertAlmostEqual(abs(ref_a-v).max(), 0, 10)
+                v = tools.fft(b, [n,9,8])
+                self.assertAlmostEqual(abs(ref_b-v).max(), 0, 10)
+                v = tools.ifft(b, [n,9,8])
+                self.assertAlmostEqual(abs(ref_ib-v).max(), 0, 10)
+            self.assertTrue((n,9,8) in tools.pbc._FFT_AUTO_CHOICE)
+        finally:
+            tools.pbc.FFT_ENGINE = engine
+
 
 if __name__ == '__main__':
     print("Full Tests for pbc.tools")
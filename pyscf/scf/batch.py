@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Batched SCF driver for high-throughput calculations of many small molecules
+
+Molecules are grouped by basis set and number of AOs.  The SCF iterations of
+the molecules in one group are carried out in lockstep so that the
+diagonalization of the Fock matrices of the same size can be done in one
+batched LAPACK call.  Groups are distributed over a pool of processes.
+
+Scope: only the eigensolver is batched.  The Fock builds (get_jk, XC
+integration) and DIIS are carried out for each molecule separately, and they
+dominate the cost except for the smallest molecules and basis sets.  In one
+process the driver is therefore only modestly faster than running mf.kernel()
+for each molecule (about 1.35x for RHF/6-31G water, 15% for RKS).  The
+throughput gain for many molecules comes from distributing the batches over
+nproc worker processes.  The SCF objects in a batch do not write chkfiles.
+
+Examples:
+
+>>> from pyscf import gto, scf, dft
+>>> mols = [gto.M(atom='H 0 0 0; F 0 0 %g' % r, basis='631g') for r in (.9, 1., 1.1)]
+>>> mfs = scf.batch.run(mols, dft.RKS, nproc=2, xc='b3lyp')
+>>> print([mf.e_tot for mf in mfs])
+'''
+
+import time
+import numpy
+from pyscf import lib
+from pyscf.lib import logger
+from pyscf import gto
+from pyscf.scf import hf
+from pyscf import __config__
+
+BATCH_SIZE = getattr(__config__, 'scf_batch_batch_size', 32)
+LINDEP_THRESHOLD = getattr(__config__, 'scf_batch_lindep_threshold', 1e-8)
+
+
+def group_mols(mols):
+    '''Group molecules by basis set and the number of AOs.
+
+    Returns:
+        A list of lists.  Each list holds the indices of the molecules of one
+        group.
+    '''
+    groups = {}
+    for i, mol in enumerate(mols):
+        key = (mol.nao_nr(), mol.cart, str(mol.basis))
+        groups.setdefault(key, []).append(i)
+    return [groups[key] for key in sorted(groups, key=lambda k: k[0])]
+
+def kernel(mfs, dm0=None, verbose=None):
+    '''Run the SCF iterations of the given SCF objects in lockstep.  As in
+    :func:`hf.kernel`, an extra cycle is carried out for the converged SCF
+    objects if their attribute conv_check is set.
+
+    Args:
+        mfs : a list of SCF objects
+
+    Kwargs:
+        dm0 : a list of ndarrays
+            Initial guess density matrices.
+        verbose : int
+            Print level of the batched driver.  The print level of each SCF
+            object is controlled by its own attribute verbose.
+
+    Returns:
+        A list of tuples (scf_conv, e_tot, mo_energy, mo_coeff, mo_occ), one
+        for each SCF object, in the same format as the output of
+        :func:`hf.kernel`.
+    '''
+    cput0 = (time.clock(), time.time())
+    nmf = len(mfs)
+    if nmf == 0:
+        return []
+    log = logger.new_logger(mfs[0], verbose)
+
+    h1e = []
+    s1e = []
+    orth = []
+    dm = []
+    vhf = []
+    e_tot = []
+    mf_diis = []
+    conv_tol = []
+    conv_tol_grad = []
+    for i, mf in enumerate(mfs):
+        mol = mf.mol
+        h1e.append(mf.get_hcore(mol))
+        s1e.append(mf.get_ovlp(mol))
+        orth.append(_orth(mf, s1e[i]))
+        if dm0 is None or dm0[i] is None:
+            dm.append(mf.get_init_guess(mol, mf.init_guess))
+        else:
+            dm.append(dm0[i])
+        vhf.append(mf.get_veff(mol, dm[i]))
+        e_tot.append(mf.energy_tot(dm[i], h1e[i], vhf[i]))
+
+        if isinstance(mf.diis, lib.diis.DIIS):
+            mf_diis.append(mf.diis)
+        elif mf.diis:
+            mf_diis.append(mf.DIIS(mf, mf.diis_file))
+            mf_diis[i].space = mf.diis_space
+            mf_diis[i].rollback = mf.diis_space_rollback
+        else:
+            mf_diis.append(None)
+        conv_tol.append(mf.conv_tol)
+        if mf.conv_tol_grad is None:
+            conv_tol_grad.append(numpy.sqrt(mf.conv_tol))
+        else:
+            conv_tol_grad.append(mf.conv_tol_grad)
+
+    fock = [None] * nmf
+    def update(i, mo_energy, mo_coeff, full_rebuild):
+        '''Update the density matrix, potential, energy and Fock matrix of
+        molecule i with the new orbitals'''
+        mf = mfs[i]
+        dm_last = dm[i]
+        mo_occ = mf.get_occ(mo_energy, mo_coeff)
+        dm[i] = mf.make_rdm1(mo_coeff, mo_occ)
+        dm[i] = lib.tag_array(dm[i], mo_coeff=mo_coeff, mo_occ=mo_occ)
+        if full_rebuild:
+            vhf[i] = mf.get_veff(mf.mol, dm[i])
+        else:
+            vhf[i] = mf.get_veff(mf.mol, dm[i], dm_last, vhf[i])
+        e_tot[i] = mf.energy_tot(dm[i], h1e[i], vhf[i])
+
+        fock[i] = mf.get_fock(h1e[i], s1e[i], vhf[i], dm[i])  # no DIIS
+        norm_gorb = numpy.linalg.norm(mf.get_grad(mo_coeff, mo_occ, fock[i]))
+        if not hf.TIGHT_GRAD_CONV_TOL:
+            norm_gorb = norm_gorb / numpy.sqrt(norm_gorb.size)
+        norm_ddm = numpy.linalg.norm(dm[i]-dm_last)
+        envs = {'e_tot': e_tot[i], 'norm_gorb': norm_gorb, 'norm_ddm': norm_ddm,
+                'dm': dm[i], 'dm_last': dm_last, 'mo_coeff': mo_coeff,
+                'mo_occ': mo_occ, 'mo_energy': mo_energy, 'fock': fock[i]}
+        return envs
+
+    results = [[False, e_tot[i], None, None, None] for i in range(nmf)]
+    max_cycle = max([max(1, mf.max_cycle) for mf in mfs])
+    cput1 = log.timer('initialize batched scf', *cput0)
+    for cycle in range(max_cycle):
+        active = [i for i in range(nmf)
+                  if not results[i][0] and cycle < max(1, mfs[i].max_cycle)]
+        if not active:
+            break
+
+        focks = [mfs[i].get_fock(h1e[i], s1e[i], vhf[i], dm[i], cycle, mf_diis[i])
+                 for i in active]
+        eigs = _batch_eig([mfs[i] for i in active], focks,
+                          [s1e[i] for i in active], [orth[i] for i in active])
+
+        for i, (mo_energy, mo_coeff) in zip(active, eigs):
+            mf = mfs[i]
+            last_hf_e = e_tot[i]
+            envs = update(i, mo_energy, mo_coeff, hf._full_fock_rebuild(mf, cycle))
+            norm_gorb = envs['norm_gorb']
+            logger.info(mf, 'cycle= %d E= %.15g  delta_E= %4.3g  |g|= %4.3g  |ddm|= %4.3g',
+                        cycle+1, e_tot[i], e_tot[i]-last_hf_e, norm_gorb,
+                        envs['norm_ddm'])
+
+            if callable(mf.check_convergence):
+                envs.update(last_hf_e=last_hf_e, cycle=cycle, conv_tol=conv_tol[i],
+                            conv_tol_grad=conv_tol_grad[i])
+                scf_conv = mf.check_convergence(envs)
+            else:
+                scf_conv = (abs(e_tot[i]-last_hf_e) < conv_tol[i] and
+                            norm_gorb < conv_tol_grad[i])
+            results[i] = [scf_conv, e_tot[i], mo_energy, envs['mo_coeff'],
+                          envs['mo_occ']]
+
+        cput1 = log.timer('batched cycle= %d (%d active)' % (cycle+1, len(active)),
+                          *cput1)
+
+    # An extra diagonalization for the converged SCF objects, to remove level
+    # shift, as in hf.kernel
+    extra = [i for i in range(nmf) if results[i][0] and mfs[i].conv_check]
+    eigs = _batch_eig([mfs[i] for i in extra], [fock[i] for i in extra],
+                      [s1e[i] for i in extra], [orth[i] for i in extra])
+    for i, (mo_energy, mo_coeff) in zip(extra, eigs):
+        mf = mfs[i]
+        last_hf_e = e_tot[i]
+        envs = update(i, mo_energy, mo_coeff, False)
+        scf_conv = True
+        if callable(mf.check_convergence):
+            envs.update(last_hf_e=last_hf_e, cycle=cycle,
+                        conv_tol=conv_tol[i]*10, conv_tol_grad=conv_tol_grad[i]*3)
+            scf_conv = mf.check_convergence(envs)
+        logger.info(mf, 'Extra cycle  E= %.15g  delta_E= %4.3g  |g|= %4.3g  |ddm|= %4.3g',
+                    e_tot[i], e_tot[i]-last_hf_e, envs['norm_gorb'], envs['norm_ddm'])
+        results[i] = [scf_conv, e_tot[i], mo_energy, envs['mo_coeff'],
+                      envs['mo_occ']]
+    if extra:
+        log.timer('batched extra cycle (%d)' % len(extra), *cput1)
+
+    log.timer('batched scf_cycle', *cput0)
+    return [tuple(x) for x in results]
+
+def _orth(mf, s):
+    '''Canonical orthogonalization of the AO basis.  None is returned if the
+    eigenvalue problem of the SCF object cannot be solved by the batched
+    eigensolver.'''
+    # Only the plain generalized eigenvalue solver can be batched.  Solvers
+    # with symmetry or other modifications are called individually.
+    if (type(mf).eig is not hf.SCF.eig or type(mf)._eigh is not hf.SCF._eigh or
+        s.ndim != 2 or numpy.iscomplexobj(s)):
+        return None
+    e, v = numpy.linalg.eigh(s)
+    idx = e > LINDEP_THRESHOLD
+    return v[:,idx] / numpy.sqrt(e[idx])
+
+def _batch_eig(mfs, focks, s1e, orth):
+    '''Solve FC = SCE for a list of Fock matrices.  Fock matrices of the same
+    size are diagonalized together by one batched call of numpy.linalg.eigh.'''
+    eigs = [None] * len(mfs)
+    batches = {}
+    for i, mf in enumerate(mfs):
+        if orth[i] is None:
+            eigs[i] = mf.eig(focks[i], s1e[i])
+        else:
+            batches.setdefault(orth[i].shape, []).append(i)
+
+    for idx in batches.values():
+        x = numpy.asarray([orth[i] for i in idx])
+        f = numpy.asarray([focks[i] for i in idx])
+        f = numpy.matmul(x.transpose(0,2,1), numpy.matmul(f, x))
+        es, cs = numpy.linalg.eigh(f)
+        cs = numpy.matmul(x, cs)
+        for k, i in enumerate(idx):
+            e, c = es[k], cs[k]
+            # Same sign convention as hf.eig
+            imax = numpy.argmax(abs(c), axis=0)
+            c[:,c[imax,numpy.arange(len(e))] < 0] *= -1
+            eigs[i] = (e, c)
+    return eigs
+
+def _kernel_remote(args):
+    '''Rebuild the SCF objects in a worker process and run the batched
+    kernel'''
+    method, molstrs, attrs, dm0 = args
+    lib.num_threads(1)
+    mfs = []
+    for molstr in molstrs:
+        mol = gto.loads(molstr)
+        mol.verbose = 0
+        mfs.append(method(mol).set(**attrs))
+    return kernel(mfs, dm0)
+
+def run(mols, method=None, nproc=None, batch_size=BATCH_SIZE, dm0=None,
+        verbose=logger.NOTE, **kwargs):
+    '''Run SCF for a list of molecules.
+
+    Args:
+        mols : a list of Mole objects
+
+    Kwargs:
+        method : function or class to create the SCF object, e.g. scf.RHF or
+            dft.RKS.  It must be picklable (defined at module level) if nproc
+            > 1.  Default is scf.RHF.
+        nproc : int
+            Number of worker processes.  Default is lib.num_threads().  Each
+            worker runs with one OpenMP thread.
+        batch_size : int
+            Max number of molecules to iterate in lockstep in one batch.
+        dm0 : a list of ndarrays
+            Initial guess density matrices.
+        kwargs :
+            Attributes assigned to each SCF object, e.g. conv_tol, xc.
+
+    Returns:
+        A list of SCF objects.  The SCF results (e_tot, converged, mo_energy,
+        mo_coeff, mo_occ) are stored in the SCF objects.
+    '''
+    cput0 = (time.clock(), time.time())
+    if method is None:
+        from pyscf import scf
+        method = scf.RHF
+    if nproc is None:
+        nproc = lib.num_threads()
+
+    mfs = [method(mol).set(**kwargs) for mol in mols]
+    log = logger.new_logger(mols[0], verbose)
+
+    batches = []
+    for group in group_mols(mols):
+        for p0, p1 in lib.prange(0, len(group), batch_size):
+            batches.append(group[p0:p1])
+    log.debug('%d molecules in %d batches', len(mols), len(batches))
+
+    if dm0 is None:
+        dm0 = [None] * len(mols)
+
+    if nproc > 1 and len(batches) > 1:
+        import multiprocessing
+        tasks = [(method, [mols[i].dumps() for i in idx], kwargs,
+                  [dm0[i] for i in idx]) for idx in batches]
+        pool = multiprocessing.Pool(min(nproc, len(batches)))
+        try:
+            outputs = pool.map(_kernel_remote, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        outputs = [kernel([mfs[i] for i in idx], [dm0[i] for i in idx], log)
+                   for idx in batches]
+
+    for idx, results in zip(batches, outputs):
+        for i, (conv, e_tot, mo_energy, mo_coeff, mo_occ) in zip(idx, results):
+            mf = mfs[i]
+            mf.converged = conv
+            mf.e_tot = e_tot
+            mf.mo_energy = mo_energy
+            mf.mo_coeff = mo_coeff
+            mf.mo_occ = mo_occ
+            mf._finalize()
+
+    log.timer('batched SCF for %d molecules' % len(mols), *cput0)
+    return mfs
@@ -16,10 +16,15 @@
 # Author: Qiming Sun <osirpt.sun@gmail.com>
 #
 
-import h5py
 from pyscf.lib.chkfile import load_chkfile_key, load
 from pyscf.lib.chkfile import dump_chkfile_key, dump, save
 from pyscf.lib.chkfile import load_mol, save_mol
+from pyscf.lib.chkfile import _lock, _update, _save_as_group
+from pyscf import __config__
+
+# Replace the chkfile by an updated copy in dump_scf.  A job killed during
+# dump_scf leaves the results of the previous dump intact.
+ATOMIC_DUMP = getattr(__config__, 'scf_chkfile_atomic_dump', True)
 
 def load_scf(chkfile):
     return load_mol(chkfile), load(chkfile, 'scf')
@@ -27,16 +32,16 @@ def load_scf(chkfile):
 def dump_scf(mol, chkfile, e_tot, mo_energy, mo_coeff, mo_occ,
              overwrite_mol=True):
     '''save temporary results'''
-    if h5py.is_hdf5(chkfile) and not overwrite_mol:
-        with h5py.File(chkfile) as fh5:
-            if 'mol' not in fh5:
-                fh5['mol'] = mol.dumps()
-    else:
-        save_mol(mol, chkfile)
-
     scf_dic = {'e_tot'    : e_tot,
                'mo_energy': mo_energy,
                'mo_occ'   : mo_occ,
                'mo_coeff' : mo_coeff}
-    save(chkfile, 'scf', scf_dic)
-
+    if overwrite_mol:
+        keys = ('mol', 'scf')
+    else:
+        keys = ('scf',)
+    with _lock:
+        with _update(chkfile, keys, ATOMIC_DUMP) as fh5:
+            if 'mol' not in fh5:
+                fh5['mol'] = mol.dumps()
+            _save_as_group('scf', scf_dic, fh5)
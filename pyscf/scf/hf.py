@@ -29,6 +29,8 @@ import scipy.linalg
 from pyscf import gto
 from pyscf import lib
 from pyscf.lib import logger
+from pyscf.lib import profiler
+from pyscf.lib import checkpoint
 from pyscf.scf import diis
 from pyscf.scf import _vhf
 from pyscf.scf import chkfile
@@ -140,9 +142,38 @@ Keyword argument "init_dm" is replaced by "dm0"''')
     else:
         mf_diis = None
 
-    vhf = mf.get_veff(mol, dm)
-    e_tot = mf.energy_tot(dm, h1e, vhf)
-    logger.info(mf, 'init E= %.15g', e_tot)
+    ckpt = checkpoint.new(mf, 'scf', tag=_checkpoint_tag(mf, s1e))
+    state = None
+    if ckpt is not None:
+        state = ckpt.load()
+        if state is not None and (numpy.shape(state['dm']) != numpy.shape(dm) or
+                                  len(state['mo_coeff']) != len(dm)):
+            logger.warn(mf, 'SCF state in checkpoint %s does not match the '
+                        'density matrix of %s. It is ignored.',
+                        ckpt.filename, mf.__class__.__name__)
+            state = None
+
+    if state is None:
+        vhf = mf.get_veff(mol, dm)
+        e_tot = mf.energy_tot(dm, h1e, vhf)
+        logger.info(mf, 'init E= %.15g', e_tot)
+        scf_conv = False
+        cycle = 0
+    else:
+        cycle = int(state['cycle']) + 1
+        logger.note(mf, 'Restart SCF from checkpoint %s after cycle %d',
+                    ckpt.filename, cycle)
+        mo_energy = state['mo_energy']
+        mo_coeff = state['mo_coeff']
+        mo_occ = state['mo_occ']
+        dm = lib.tag_array(state['dm'], mo_coeff=mo_coeff, mo_occ=mo_occ)
+        vhf = state['vhf']
+        fock = state['fock']
+        e_tot = state['e_tot']
+        scf_conv = bool(state['scf_conv'])
+        if mf_diis is not None and 'diis' in state:
+            mf_diis.load_state(state['diis'])
+    state = None
 
     if dump_chk and mf.chkfile:
         # Explicit overwrite the mol object in chkfile
@@ -152,10 +183,9 @@ Keyword argument "init_dm" is replaced by "dm0"''')
 #    # A preprocessing hook before the SCF iteration
 #    mf.pre_kernel(locals())
 
-    scf_conv = False
-    cycle = 0
     cput1 = logger.timer(mf, 'initialize scf', *cput0)
     while not scf_conv and cycle < max(1, mf.max_cycle):
+        region = profiler.region(mf, 'cycle').enter()
         dm_last = dm
         last_hf_e = e_tot
 
@@ -165,7 +195,14 @@ Keyword argument "init_dm" is replaced by "dm0"''')
         dm = mf.make_rdm1(mo_coeff, mo_occ)
         # attach mo_coeff and mo_occ to dm to improve DFT get_veff efficiency
         dm = lib.tag_array(dm, mo_coeff=mo_coeff, mo_occ=mo_occ)
-        vhf = mf.get_veff(mol, dm, dm_last, vhf)
+        if _full_fock_rebuild(mf, cycle):
+            # The incremental build only contracts dm-dm_last.  Screening
+            # errors of the increments accumulate in vhf.  Rebuild the full
+            # potential periodically to remove them.
+            logger.debug(mf, 'Rebuild full HF potential at cycle %d', cycle+1)
+            vhf = mf.get_veff(mol, dm)
+        else:
+            vhf = mf.get_veff(mol, dm, dm_last, vhf)
         e_tot = mf.energy_tot(dm, h1e, vhf)
 
         # Here Fock matrix is h1e + vhf, without DIIS.  Calling get_fock
@@ -187,10 +224,21 @@ Keyword argument "init_dm" is replaced by "dm0"''')
         if dump_chk:
             mf.dump_chk(locals())
 
+        if ckpt is not None:
+            state = {'cycle': cycle, 'scf_conv': scf_conv, 'e_tot': e_tot,
+                     'dm': dm, 'vhf': vhf, 'fock': fock,
+                     'mo_energy': mo_energy, 'mo_coeff': mo_coeff,
+                     'mo_occ': mo_occ}
+            if mf_diis is not None:
+                state['diis'] = mf_diis.dump_state()
+            ckpt.save(state, cycle)
+            state = None
+
         if callable(callback):
             callback(locals())
 
         cput1 = logger.timer(mf, 'cycle= %d'%(cycle+1), *cput1)
+        region.exit()
         cycle += 1
 
     if scf_conv and conv_check:
@@ -220,11 +268,30 @@ Keyword argument "init_dm" is replaced by "dm0"''')
         if dump_chk:
             mf.dump_chk(locals())
 
+    if ckpt is not None:
+        ckpt.clear()
     logger.timer(mf, 'scf_cycle', *cput0)
 #    # A post-processing hook before return
 #    mf.post_kernel(locals())
     return scf_conv, e_tot, mo_energy, mo_coeff, mo_occ
 
+def _full_fock_rebuild(mf, cycle):
+    '''Whether to rebuild the full HF potential (rather than the increment
+    dm-dm_last) in the given SCF cycle'''
+    nsteps = getattr(mf, 'direct_scf_rebuild', 0)
+    return (getattr(mf, 'direct_scf', False) and nsteps is not None and
+            nsteps > 0 and (cycle+1) % nsteps == 0)
+
+
+def _checkpoint_tag(mf, s1e):
+    '''Fingerprint of the SCF problem for the checkpoint.  It includes the
+    method (the class and the XC functional) so that the state saved by a
+    different method is not restored.'''
+    method = mf.__class__.__name__
+    if getattr(mf, 'xc', None) is not None:
+        method += ' ' + str(mf.xc).upper()
+    method = numpy.array([ord(x) for x in method], dtype=float)
+    return numpy.array([lib.finger(s1e), lib.finger(method)])
 
 def energy_elec(mf, dm=None, h1e=None, vhf=None):
     r'''Electronic part of Hartree-Fock energy, for given core hamiltonian and
@@ -1185,6 +1252,10 @@ class SCF(lib.StreamObject):
         chkfile : str
             checkpoint file to save MOs, orbital energies etc.  Writing to
             chkfile can be disabled if this attribute is set to None or False.
+        checkpoint : str or :class:`lib.checkpoint.Checkpoint`
+            File to save the state of SCF iterations.  If the file holds the
+            state of an interrupted calculation, SCF restarts from the last
+            saved cycle.  See :mod:`lib.checkpoint`.
         conv_tol : float
             converge threshold.  Default is 1e-9
         conv_tol_grad : float
@@ -1217,6 +1288,12 @@ class SCF(lib.StreamObject):
             Direct SCF is used by default.
         direct_scf_tol : float
             Direct SCF cutoff threshold.  Default is 1e-13.
+        direct_scf_rebuild : int
+            In direct SCF, the HF potential is built incrementally from the
+            density matrix difference between two iterations.  The full HF
+            potential is rebuilt every direct_scf_rebuild cycles to control
+            the error accumulated by the screening of the increments.  Set it
+            to 0 to disable the periodic rebuild.  Default is 10.
         callback : function(envs_dict) => None
             callback function takes one dict as the argument which is
             generated by the builtin function :func:`locals`, so that the
@@ -1269,6 +1346,7 @@ class SCF(lib.StreamObject):
     level_shift = getattr(__config__, 'scf_hf_SCF_level_shift', 0)
     direct_scf = getattr(__config__, 'scf_hf_SCF_direct_scf', True)
     direct_scf_tol = getattr(__config__, 'scf_hf_SCF_direct_scf_tol', 1e-13)
+    direct_scf_rebuild = getattr(__config__, 'scf_hf_SCF_direct_scf_rebuild', 10)
     conv_check = getattr(__config__, 'scf_hf_SCF_conv_check', True)
 
     def __init__(self, mol):
@@ -1289,6 +1367,7 @@ class SCF(lib.StreamObject):
 # filename to self.chkfile
             self._chkfile = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
             self.chkfile = self._chkfile.name
+        self.checkpoint = None
 
 ##################################################
 # don't modify the following attributes, they are not input options
@@ -1305,7 +1384,8 @@ class SCF(lib.StreamObject):
         keys = set(('conv_tol', 'conv_tol_grad', 'max_cycle', 'init_guess',
                     'DIIS', 'diis', 'diis_space', 'diis_start_cycle',
                     'diis_file', 'diis_space_rollback', 'damp', 'level_shift',
-                    'direct_scf', 'direct_scf_tol', 'conv_check'))
+                    'direct_scf', 'direct_scf_tol', 'direct_scf_rebuild',
+                    'conv_check'))
         self._keys = set(self.__dict__.keys()).union(keys)
 
     def build(self, mol=None):
@@ -1346,6 +1426,7 @@ class SCF(lib.StreamObject):
         logger.info(self, 'direct_scf = %s', self.direct_scf)
         if self.direct_scf:
             logger.info(self, 'direct_scf_tol = %g', self.direct_scf_tol)
+            logger.info(self, 'direct_scf_rebuild = %s', self.direct_scf_rebuild)
         if self.chkfile:
             logger.info(self, 'chkfile to save SCF result = %s', self.chkfile)
         logger.info(self, 'max_memory %d MB (current use %d MB)',
@@ -1492,13 +1573,14 @@ class SCF(lib.StreamObject):
         '''
         cput0 = (time.clock(), time.time())
 
-        self.dump_flags()
-        self.build(self.mol)
-        self.converged, self.e_tot, \
-                self.mo_energy, self.mo_coeff, self.mo_occ = \
-                kernel(self, self.conv_tol, self.conv_tol_grad,
-                       dm0=dm0, callback=self.callback,
-                       conv_check=self.conv_check, **kwargs)
+        with profiler.region(self, 'SCF'):
+            self.dump_flags()
+            self.build(self.mol)
+            self.converged, self.e_tot, \
+                    self.mo_energy, self.mo_coeff, self.mo_occ = \
+                    kernel(self, self.conv_tol, self.conv_tol_grad,
+                           dm0=dm0, callback=self.callback,
+                           conv_check=self.conv_check, **kwargs)
 
         logger.timer(self, 'SCF', *cput0)
         self._finalize()
@@ -1535,7 +1617,8 @@ class SCF(lib.StreamObject):
             self.opt = self.init_direct_scf(mol)
         dm = numpy.asarray(dm)
         nao = dm.shape[-1]
-        vj, vk = get_jk(mol, dm.reshape(-1,nao,nao), hermi, self.opt)
+        with profiler.region(self, 'get_jk'):
+            vj, vk = get_jk(mol, dm.reshape(-1,nao,nao), hermi, self.opt)
         logger.timer(self, 'vj and vk', *cpu0)
         return vj.reshape(dm.shape), vk.reshape(dm.shape)
 
@@ -1703,9 +1786,10 @@ class RHF(SCF):
         if mol is None: mol = self.mol
         if dm is None: dm = self.make_rdm1()
         if self._eri is not None or mol.incore_anyway or self._is_mem_enough():
-            if self._eri is None:
-                self._eri = mol.intor('int2e', aosym='s8')
-            vj, vk = dot_eri_dm(self._eri, dm, hermi)
+            with profiler.region(self, 'get_jk'):
+                if self._eri is None:
+                    self._eri = mol.intor('int2e', aosym='s8')
+                vj, vk = dot_eri_dm(self._eri, dm, hermi)
         else:
             vj, vk = SCF.get_jk(self, mol, dm, hermi)
         return vj, vk
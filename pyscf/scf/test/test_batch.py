@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import numpy
+from pyscf import gto
+from pyscf import scf
+from pyscf import dft
+
+mols = [gto.M(atom='H 0 0 0; F 0 0 %g' % r, basis='631g', verbose=0)
+        for r in (.9, 1., 1.1)]
+mols.append(gto.M(atom='O 0 0 0; H 0 -0.757 0.587; H 0 0.757 0.587',
+                  basis='631g', verbose=0))
+mols.append(gto.M(atom='H 0 0 0; F 0 0 1', basis='sto3g', verbose=0))
+
+class KnownValues(unittest.TestCase):
+    def test_group_mols(self):
+        groups = scf.batch.group_mols(mols)
+        self.assertEqual(groups, [[4], [0, 1, 2], [3]])
+
+    def test_rhf(self):
+        ref = [scf.RHF(mol).run(conv_tol=1e-10).e_tot for mol in mols]
+        mfs = scf.batch.run(mols, nproc=1, conv_tol=1e-10, verbose=0)
+        self.assertTrue(all(mf.converged for mf in mfs))
+        self.assertAlmostEqual(abs(numpy.array([mf.e_tot for mf in mfs]) - ref).max(), 0, 8)
+
+        mfs = scf.batch.run(mols, scf.RHF, nproc=2, conv_tol=1e-10, verbose=0)
+        self.assertAlmostEqual(abs(numpy.array([mf.e_tot for mf in mfs]) - ref).max(), 0, 8)
+        self.assertEqual(mfs[2].mo_coeff.shape, (11, 11))
+
+    def test_conv_check(self):
+        mf = scf.RHF(mols[3]).set(conv_tol=1e-10, level_shift=.3).run()
+        mfs = scf.batch.run(mols[3:4], nproc=1, conv_tol=1e-10, level_shift=.3,
+                            verbose=0)
+        self.assertAlmostEqual(mfs[0].e_tot, mf.e_tot, 9)
+        self.assertAlmostEqual(abs(mfs[0].mo_energy - mf.mo_energy).max(), 0, 7)
+
+    def test_uks(self):
+        mf = dft.UKS(mols[1]).set(xc='lda,vwn', conv_tol=1e-10).run()
+        mfs = scf.batch.run(mols[:2], dft.UKS, nproc=1, xc='lda,vwn',
+                            conv_tol=1e-10, verbose=0)
+        self.assertAlmostEqual(mfs[1].e_tot, mf.e_tot, 8)
+
+
+if __name__ == "__main__":
+    print("Full Tests for batched SCF")
+    unittest.main()
@@ -270,6 +270,20 @@ H     0    0.757    0.587'''
         self.assertAlmostEqual(lib.finger(vhf4), 4.9026999849223287, 12)
         self.assertAlmostEqual(abs(vhf4[0]-vhf3).max(), 0, 12)
 
+    def test_direct_scf_rebuild(self):
+        mf1 = scf.RHF(mol)
+        mf1.conv_tol = 1e-10
+        mf1.max_memory = 0
+        mf1.direct_scf_rebuild = 2
+        self.assertAlmostEqual(mf1.kernel(), mf.e_tot, 9)
+
+        mf1.direct_scf_rebuild = 0
+        self.assertAlmostEqual(mf1.kernel(), mf.e_tot, 9)
+
+        self.assertTrue(scf.hf._full_fock_rebuild(mf1.set(direct_scf_rebuild=3), 2))
+        self.assertFalse(scf.hf._full_fock_rebuild(mf1, 3))
+        self.assertFalse(scf.hf._full_fock_rebuild(mf1.set(direct_scf=False), 2))
+
     def test_hf_symm(self):
         pmol = mol.copy()
         pmol.symmetry = 1
@@ -21,6 +21,7 @@ import scipy.linalg
 from pyscf import lib
 from pyscf import gto
 from pyscf.lib import logger
+from pyscf.lib import profiler
 from pyscf.scf import hf
 from pyscf.scf import chkfile
 from pyscf import __config__
@@ -748,9 +749,10 @@ class UHF(hf.SCF):
         if mol is None: mol = self.mol
         if dm is None: dm = self.make_rdm1()
         if self._eri is not None or mol.incore_anyway or self._is_mem_enough():
-            if self._eri is None:
-                self._eri = mol.intor('int2e', aosym='s8')
-            vj, vk = hf.dot_eri_dm(self._eri, dm, hermi)
+            with profiler.region(self, 'get_jk'):
+                if self._eri is None:
+                    self._eri = mol.intor('int2e', aosym='s8')
+                vj, vk = hf.dot_eri_dm(self._eri, dm, hermi)
         else:
             vj, vk = hf.SCF.get_jk(self, mol, dm, hermi)
         return numpy.asarray(vj), numpy.asarray(vk)
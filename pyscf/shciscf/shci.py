@@ -980,6 +980,12 @@ def writeIntegralFile(SHCI, h1eff, eri_cas, norb, nelec, ecore=0):
           orbsym = [1]*norb
 
        eri_cas = pyscf.ao2mo.restore(8, eri_cas, norb)
+       if integralFile.endswith(pyscf.tools.fcidump.H5_SUFFIX):
+          # HDF5 variant of FCIDUMP
+          pyscf.tools.fcidump.to_h5(integralFile, h1eff, eri_cas, norb,
+                                    neleca+nelecb, ecore, abs(neleca-nelecb),
+                                    orbsym)
+          return
        # Writes the FCIDUMP file using functions in SHCI_tools.cpp.
        integralFile = integralFile.encode()  # .encode for python3 compatibility
        fcidumpFromIntegral( integralFile, h1eff, eri_cas, norb, neleca+nelecb,
@@ -48,6 +48,14 @@ from pyscf import __config__
 
 RESOLUTION = getattr(__config__, 'cubegen_resolution', None)
 BOX_MARGIN = getattr(__config__, 'cubegen_box_margin', 3.0)
+# Number of grids to evaluate and write in one block
+BLKSIZE = getattr(__config__, 'cubegen_blksize', 8000)
+# Number of grids to screen the AOs together
+AO_BLKSIZE = getattr(__config__, 'cubegen_ao_blksize', 1024)
+# Number of point charges in one call of the 3-center integrals for MEP
+MEP_BLKSIZE = getattr(__config__, 'cubegen_mep_blksize', 600)
+# Threshold to screen the shell pairs in MEP
+MEP_CUTOFF = getattr(__config__, 'cubegen_mep_cutoff', 1e-13)
 
 
 def density(mol, outfile, dm, nx=80, ny=80, nz=80, resolution=RESOLUTION):
@@ -56,10 +64,12 @@ def density(mol, outfile, dm, nx=80, ny=80, nz=80, resolution=RESOLUTION):
     Args:
         mol : Mole
             Molecule to calculate the electron density for.
-        outfile : str
-            Name of Cube file to be written.
+        outfile : str or list of str
+            Name of Cube file to be written.  If a list of density matrices
+            is given, one file for each density matrix.
         dm : ndarray
-            Density matrix of molecule.
+            Density matrix of molecule, or a list of density matrices.  All
+            densities are evaluated in one pass over the grids.
 
     Kwargs:
         nx : int
@@ -72,21 +82,26 @@ def density(mol, outfile, dm, nx=80, ny=80, nz=80, resolution=RESOLUTION):
         nz : int
             Number of grid point divisions in z direction.
     """
+    dms = numpy.asarray(dm)
+    single = dms.ndim == 2
+    dms = dms.reshape(-1,mol.nao_nr(),mol.nao_nr())
 
     cc = Cube(mol, nx, ny, nz, resolution)
 
     # Compute density on the .cube grid
-    coords = cc.get_coords()
-    ngrids = cc.get_ngrids()
-    blksize = min(8000, ngrids)
-    rho = numpy.empty(ngrids)
-    for ip0, ip1 in lib.prange(0, ngrids, blksize):
-        ao = numint.eval_ao(mol, coords[ip0:ip1])
-        rho[ip0:ip1] = numint.eval_rho(mol, ao, dm)
-    rho = rho.reshape(cc.nx,cc.ny,cc.nz)
+    def eval_rho(coords):
+        rho = numpy.empty((len(dms),len(coords)))
+        for p0, p1, ao, idx in _screened_ao_loop(mol, coords):
+            for i, dm in enumerate(dms):
+                if idx is not None:
+                    dm = dm[idx[:,None],idx]
+                rho[i,p0:p1] = numint.eval_rho(mol, ao, dm)
+        return rho
 
     # Write out density to the .cube file
-    cc.write(rho, outfile, comment='Electron density in real space (e/Bohr^3)')
+    outfile = _outfile_list(outfile, len(dms), single)
+    _write_cubes(cc, outfile, eval_rho,
+                 comment='Electron density in real space (e/Bohr^3)')
 
 def orbital(mol, outfile, coeff, nx=80, ny=80, nz=80, resolution=RESOLUTION):
     """Calculate orbital value on real space grid and write out in cube format.
@@ -94,10 +109,12 @@ def orbital(mol, outfile, coeff, nx=80, ny=80, nz=80, resolution=RESOLUTION):
     Args:
         mol : Mole
             Molecule to calculate the electron density for.
-        outfile : str
-            Name of Cube file to be written.
-        coeff : 1D array
-            coeff coefficient.
+        outfile : str or list of str
+            Name of Cube file to be written.  If coeff is a 2D array, one
+            file for each column of coeff.
+        coeff : 1D array or 2D array
+            coeff coefficient.  If coeff is a 2D array, all orbitals (the
+            columns of coeff) are evaluated in one pass over the grids.
 
     Kwargs:
         nx : int
@@ -110,20 +127,26 @@ def orbital(mol, outfile, coeff, nx=80, ny=80, nz=80, resolution=RESOLUTION):
         nz : int
             Number of grid point divisions in z direction.
     """
+    coeff = numpy.asarray(coeff)
+    single = coeff.ndim == 1
+    coeff = coeff.reshape(mol.nao_nr(),-1)
+
     cc = Cube(mol, nx, ny, nz, resolution)
 
-    # Compute density on the .cube grid
-    coords = cc.get_coords()
-    ngrids = cc.get_ngrids()
-    blksize = min(8000, ngrids)
-    orb_on_grid = numpy.empty(ngrids)
-    for ip0, ip1 in lib.prange(0, ngrids, blksize):
-        ao = numint.eval_ao(mol, coords[ip0:ip1])
-        orb_on_grid[ip0:ip1] = numpy.dot(ao, coeff)
-    orb_on_grid = orb_on_grid.reshape(cc.nx,cc.ny,cc.nz)
+    # Compute orbital values on the .cube grid
+    def eval_orb(coords):
+        orb_on_grid = numpy.empty((coeff.shape[1],len(coords)))
+        for p0, p1, ao, idx in _screened_ao_loop(mol, coords):
+            if idx is None:
+                orb_on_grid[:,p0:p1] = lib.dot(coeff.T, ao.T)
+            else:
+                orb_on_grid[:,p0:p1] = lib.dot(coeff[idx].T, ao.T)
+        return orb_on_grid
 
     # Write out orbital to the .cube file
-    cc.write(orb_on_grid, outfile, comment='Orbital value in real space (1/Bohr^3)')
+    outfile = _outfile_list(outfile, coeff.shape[1], single)
+    _write_cubes(cc, outfile, eval_orb,
+                 comment='Orbital value in real space (1/Bohr^3)')
 
 
 def mep(mol, outfile, dm, nx=80, ny=80, nz=80, resolution=RESOLUTION):
@@ -133,10 +156,11 @@ def mep(mol, outfile, dm, nx=80, ny=80, nz=80, resolution=RESOLUTION):
     Args:
         mol : Mole
             Molecule to calculate the electron density for.
-        outfile : str
-            Name of Cube file to be written.
+        outfile : str or list of str
+            Name of Cube file to be written.  If a list of density matrices
+            is given, one file for each density matrix.
         dm : ndarray
-            Density matrix of molecule.
+            Density matrix of molecule, or a list of density matrices.
 
     Kwargs:
         nx : int
@@ -149,30 +173,124 @@ def mep(mol, outfile, dm, nx=80, ny=80, nz=80, resolution=RESOLUTION):
         nz : int
             Number of grid point divisions in z direction.
     """
-    cc = Cube(mol, nx, ny, nz, resolution)
-
-    coords = cc.get_coords()
-
-    # Nuclear potential at given points
-    Vnuc = 0
-    for i in range(mol.natm):
-        r = mol.atom_coord(i)
-        Z = mol.atom_charge(i)
-        rp = r - coords
-        Vnuc += Z / numpy.einsum('xi,xi->x', rp, rp)**.5
+    dms = numpy.asarray(dm)
+    single = dms.ndim == 2
+    dms = dms.reshape(-1,mol.nao_nr(),mol.nao_nr())
 
-    # Potential of electron density
-    Vele = numpy.empty_like(Vnuc)
-    for p0, p1 in lib.prange(0, Vele.size, 600):
-        fakemol = gto.fakemol_for_charges(coords[p0:p1])
-        ints = df.incore.aux_e2(mol, fakemol)
-        Vele[p0:p1] = numpy.einsum('ijp,ij->p', ints, dm)
+    cc = Cube(mol, nx, ny, nz, resolution)
 
-    MEP = Vnuc - Vele     # MEP at each point
-    MEP = MEP.reshape(nx,ny,nz)
+    eval_vele = _gen_mep_evaluator(mol, dms)
+    def eval_mep(coords):
+        # Nuclear potential at given points
+        Vnuc = 0
+        for i in range(mol.natm):
+            r = mol.atom_coord(i)
+            Z = mol.atom_charge(i)
+            rp = r - coords
+            Vnuc += Z / numpy.einsum('xi,xi->x', rp, rp)**.5
+
+        # Potential of electron density
+        Vele = numpy.empty((len(dms),len(coords)))
+        for p0, p1 in lib.prange(0, len(coords), MEP_BLKSIZE):
+            Vele[:,p0:p1] = eval_vele(coords[p0:p1])
+        return Vnuc - Vele  # MEP at each point
 
     # Write the potential
-    cc.write(MEP, outfile, 'Molecular electrostatic potential in real space')
+    outfile = _outfile_list(outfile, len(dms), single)
+    _write_cubes(cc, outfile, eval_mep,
+                 comment='Molecular electrostatic potential in real space')
+
+def _outfile_list(outfile, nfield, single):
+    '''The list of cube files, one for each field'''
+    if single:
+        return [outfile]
+    if isinstance(outfile, str) or len(outfile) != nfield:
+        raise ValueError('A list of %d file names is required for %d fields'
+                         % (nfield, nfield))
+    return outfile
+
+def _screened_ao_loop(mol, coords, blksize=AO_BLKSIZE):
+    '''Evaluate AO values on small blocks of coords.  For each block, the
+    shells which are zero on the grids are screened.  If most shells vanish,
+    the returned AO values are compressed to the non-zero AOs idx, otherwise
+    idx is None.
+    '''
+    ao_loc = mol.ao_loc_nr()
+    for p0, p1 in lib.prange(0, len(coords), blksize):
+        non0tab = numint.make_mask(mol, coords[p0:p1])
+        ao = numint.eval_ao(mol, coords[p0:p1], non0tab=non0tab)
+        idx = numint._sparse_ao_index(non0tab, p1-p0, ao_loc)
+        if idx is not None:
+            ao = numint._compress_ao(ao, idx)
+        yield p0, p1, ao, idx
+
+def _gen_mep_evaluator(mol, dms, cutoff=MEP_CUTOFF):
+    '''Electrostatic potential of the densities dms at given coordinates.
+    The shell pairs (ij) which have negligible contributions to the
+    potential, estimated by exp(-a_i a_j/(a_i+a_j) R_ij^2) * max|D_ij| < cutoff
+    with a_i the smallest exponent of shell i, are skipped.
+    '''
+    ao_loc = mol.ao_loc_nr()
+    nbas = mol.nbas
+    dms = dms + dms.transpose(0,2,1)
+    for ish in range(nbas):
+        # Shell-diagonal blocks are doubled by dm+dm.T
+        i0, i1 = ao_loc[ish], ao_loc[ish+1]
+        dms[:,i0:i1,i0:i1] *= .5
+    # The decay factor of the product of the most diffuse primitives
+    exps = numpy.array([mol.bas_exp(ish).min() for ish in range(nbas)])
+    rc = mol.atom_coords()[mol._bas[:,gto.ATOM_OF]]
+    rr = numpy.einsum('ijx,ijx->ij', rc[:,None]-rc, rc[:,None]-rc)
+    s_cond = numpy.exp(-exps[:,None]*exps/(exps[:,None]+exps) * rr)
+    dm_cond = lib.condense('NP_absmax', abs(dms).max(axis=0), ao_loc)
+    mask = numpy.tril(s_cond * dm_cond > cutoff)
+
+    # The range of j-shells for each i-shell.  The pairs j<=i are evaluated.
+    shl_pairs = []
+    for ish in range(nbas):
+        jsh = numpy.where(mask[ish])[0]
+        if jsh.size > 0:
+            shl_pairs.append((ish, jsh[0], jsh[-1]+1))
+
+    def eval_vele(coords):
+        fakemol = gto.fakemol_for_charges(coords)
+        npts = len(coords)
+        vele = 0
+        for ish, jsh0, jsh1 in shl_pairs:
+            ints = df.incore.aux_e2(mol, fakemol,
+                                    shls_slice=(ish, ish+1, jsh0, jsh1, 0, npts))
+            i0, i1 = ao_loc[ish], ao_loc[ish+1]
+            j0, j1 = ao_loc[jsh0], ao_loc[jsh1]
+            vele += numpy.einsum('ijp,xij->xp', ints, dms[:,i0:i1,j0:j1])
+        return vele
+    return eval_vele
+
+def _write_cubes(cc, outfiles, eval_field, comment=None, blksize=BLKSIZE):
+    '''Evaluate the fields on the cube grids block by block and stream the
+    results to the cube files.  eval_field(coords) returns the values of all
+    fields on the coords.  One block holds one or more planes of constant x.
+    A block is written to disk in background while the next block is
+    evaluated.
+    '''
+    fs = [open(fname, 'w') for fname in outfiles]
+    try:
+        for f in fs:
+            cc.write_header(f, comment)
+
+        def write(field):
+            for f, v in zip(fs, field):
+                cc.write_field(f, v)
+
+        nyz = cc.ny * cc.nz
+        nplane = max(1, blksize // nyz)
+        with lib.call_in_background(write) as async_write:
+            for ix0, ix1 in lib.prange(0, cc.nx, nplane):
+                coords = lib.cartesian_prod([cc.xs[ix0:ix1], cc.ys, cc.zs])
+                coords = numpy.asarray(coords, order='C') - (-cc.boxorig)
+                async_write(numpy.asarray(eval_field(coords)))
+    finally:
+        for f in fs:
+            f.close()
 
 
 class Cube(object):
@@ -211,29 +329,39 @@ class Cube(object):
         """  Result: .cube file with the field in the file fname.  """
         assert(field.ndim == 3)
         assert(field.shape == (self.nx, self.ny, self.nz))
+        with open(fname, 'w') as f:
+            self.write_header(f, comment)
+            self.write_field(f, field)
+
+    def write_header(self, f, comment=None):
+        """  Write the header of .cube file to the file object f.  """
         if comment is None:
             comment = 'Generic field? Supply the optional argument "comment" to define this line'
 
         mol = self.mol
         coord = mol.atom_coords()
-        with open(fname, 'w') as f:
-            f.write(comment+'\n')
-            f.write('PySCF Version: %s  Date: %s\n' % (pyscf.__version__, time.ctime()))
-            f.write('%5d' % mol.natm)
-            f.write('%12.6f%12.6f%12.6f\n' % tuple(self.boxorig.tolist()))
-            f.write('%5d%12.6f%12.6f%12.6f\n' % (self.nx, self.xs[1], 0, 0))
-            f.write('%5d%12.6f%12.6f%12.6f\n' % (self.ny, 0, self.ys[1], 0))
-            f.write('%5d%12.6f%12.6f%12.6f\n' % (self.nz, 0, 0, self.zs[1]))
-            for ia in range(mol.natm):
-                chg = mol.atom_charge(ia)
-                f.write('%5d%12.6f'% (chg, chg))
-                f.write('%12.6f%12.6f%12.6f\n' % tuple(coord[ia]))
-
-            for ix in range(self.nx):
-                for iy in range(self.ny):
-                    for iz0, iz1 in lib.prange(0, self.nz, 6):
-                        fmt = '%13.5E' * (iz1-iz0) + '\n'
-                        f.write(fmt % tuple(field[ix,iy,iz0:iz1].tolist()))
+        f.write(comment+'\n')
+        f.write('PySCF Version: %s  Date: %s\n' % (pyscf.__version__, time.ctime()))
+        f.write('%5d' % mol.natm)
+        f.write('%12.6f%12.6f%12.6f\n' % tuple(self.boxorig.tolist()))
+        f.write('%5d%12.6f%12.6f%12.6f\n' % (self.nx, self.xs[1], 0, 0))
+        f.write('%5d%12.6f%12.6f%12.6f\n' % (self.ny, 0, self.ys[1], 0))
+        f.write('%5d%12.6f%12.6f%12.6f\n' % (self.nz, 0, 0, self.zs[1]))
+        for ia in range(mol.natm):
+            chg = mol.atom_charge(ia)
+            f.write('%5d%12.6f'% (chg, chg))
+            f.write('%12.6f%12.6f%12.6f\n' % tuple(coord[ia]))
+
+    def write_field(self, f, field):
+        """  Write the field values of one or more planes of constant x to
+        the file object f.  The field is written in the order of x, y, z.
+        """
+        nz = self.nz
+        fmt = ('%13.5E' * 6 + '\n') * (nz // 6)
+        if nz % 6 > 0:
+            fmt += '%13.5E' * (nz % 6) + '\n'
+        field = numpy.asarray(field).reshape(-1,nz)
+        f.write((fmt * len(field)) % tuple(field.ravel().tolist()))
 
     def read(self, cube_file):
         raise NotImplementedError
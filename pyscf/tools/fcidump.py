@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
 from functools import reduce
 import numpy
 from pyscf import ao2mo
@@ -20,6 +21,9 @@ from pyscf import __config__
 
 DEFAULT_FLOAT_FORMAT = getattr(__config__, 'fcidump_float_format', ' %.16g')
 TOL = getattr(__config__, 'fcidump_write_tol', 1e-15)
+# Number of integrals to be formatted or parsed in one batch
+BLKSIZE = getattr(__config__, 'fcidump_blksize', 100000)
+H5_SUFFIX = ('.h5', '.hdf5')
 
 def write_head(fout, nmo, nelec, ms=0, orbsym=None):
     if not isinstance(nelec, (int, numpy.number)):
@@ -40,41 +44,49 @@ def write_eri(fout, eri, nmo, tol=TOL, float_format=DEFAULT_FLOAT_FORMAT):
     if eri.size == nmo**4:
         eri = ao2mo.restore(8, eri, nmo)
 
+    # (i,j) labels of the compound index ij
+    idx, idy = numpy.tril_indices(nmo)
+    idx += 1
+    idy += 1
     if eri.ndim == 2: # 4-fold symmetry
         assert(eri.size == npair**2)
-        ij = 0
-        for i in range(nmo):
-            for j in range(0, i+1):
-                kl = 0
-                for k in range(0, nmo):
-                    for l in range(0, k+1):
-                        if abs(eri[ij,kl]) > tol:
-                            fout.write(output_format % (eri[ij,kl], i+1, j+1, k+1, l+1))
-                        kl += 1
-                ij += 1
+        blksize = max(1, BLKSIZE // npair)
+        for ij0 in range(0, npair, blksize):
+            ij1 = min(npair, ij0+blksize)
+            ij, kl = numpy.nonzero(abs(eri[ij0:ij1]) > tol)
+            val = eri[ij0:ij1][ij,kl]
+            ij += ij0
+            _write_block(fout, output_format, val, idx[ij], idy[ij], idx[kl], idy[kl])
     else:  # 8-fold symmetry
         assert(eri.size == npair*(npair+1)//2)
-        ij = 0
-        ijkl = 0
-        for i in range(nmo):
-            for j in range(0, i+1):
-                kl = 0
-                for k in range(0, i+1):
-                    for l in range(0, k+1):
-                        if ij >= kl:
-                            if abs(eri[ijkl]) > tol:
-                                fout.write(output_format % (eri[ijkl], i+1, j+1, k+1, l+1))
-                            ijkl += 1
-                        kl += 1
-                ij += 1
+        eri = eri.ravel()
+        blksize = max(1, BLKSIZE // npair)
+        for ij0 in range(0, npair, blksize):
+            ij1 = min(npair, ij0+blksize)
+            p0 = ij0*(ij0+1)//2
+            p1 = ij1*(ij1+1)//2
+            ij = numpy.repeat(numpy.arange(ij0, ij1), numpy.arange(ij0, ij1)+1)
+            kl = numpy.arange(p0, p1) - ij*(ij+1)//2
+            mask = abs(eri[p0:p1]) > tol
+            ij = ij[mask]
+            kl = kl[mask]
+            _write_block(fout, output_format, eri[p0:p1][mask],
+                         idx[ij], idy[ij], idx[kl], idy[kl])
+
+def _write_block(fout, output_format, val, *labels):
+    '''Format a block of integrals with one string operation'''
+    if val.size == 0:
+        return
+    cols = [val.tolist()] + [x.tolist() for x in labels]
+    fout.write((output_format * val.size) % tuple(itertools.chain(*zip(*cols))))
 
 def write_hcore(fout, h, nmo, tol=TOL, float_format=DEFAULT_FLOAT_FORMAT):
     h = h.reshape(nmo,nmo)
     output_format = float_format + ' %4d %4d  0  0\n'
-    for i in range(nmo):
-        for j in range(0, i+1):
-            if abs(h[i,j]) > tol:
-                fout.write(output_format % (h[i,j], i+1, j+1))
+    idx, idy = numpy.tril_indices(nmo)
+    val = h[idx,idy]
+    mask = abs(val) > tol
+    _write_block(fout, output_format, val[mask], idx[mask]+1, idy[mask]+1)
 
 
 def from_chkfile(filename, chkfile, tol=TOL, float_format=DEFAULT_FLOAT_FORMAT):
@@ -105,7 +117,12 @@ def from_chkfile(filename, chkfile, tol=TOL, float_format=DEFAULT_FLOAT_FORMAT):
 
 def from_integrals(filename, h1e, h2e, nmo, nelec, nuc=0, ms=0, orbsym=None,
                    tol=TOL, float_format=DEFAULT_FLOAT_FORMAT):
-    '''Convert the given 1-electron and 2-electron integrals to FCIDUMP format'''
+    '''Convert the given 1-electron and 2-electron integrals to FCIDUMP format.
+    If filename ends with .h5, the integrals are saved in the HDF5 variant of
+    FCIDUMP (see :func:`to_h5`).
+    '''
+    if filename.endswith(H5_SUFFIX):
+        return to_h5(filename, h1e, h2e, nmo, nelec, nuc, ms, orbsym)
     with open(filename, 'w') as fout:
         write_head(fout, nmo, nelec, ms, orbsym)
         write_eri(fout, h2e, nmo, tol=tol, float_format=float_format)
@@ -113,6 +130,40 @@ def from_integrals(filename, h1e, h2e, nmo, nelec, nuc=0, ms=0, orbsym=None,
         output_format = float_format + '  0  0  0  0\n'
         fout.write(output_format % nuc)
 
+def to_h5(filename, h1e, h2e, nmo, nelec, nuc=0, ms=0, orbsym=None):
+    '''Save the 1-electron and 2-electron integrals in HDF5 format.  The
+    datasets have the same names as the keys returned by :func:`read`.  The
+    2-electron integrals are stored in the 8-fold packed format.
+    '''
+    import h5py
+    if not isinstance(nelec, (int, numpy.number)):
+        ms = abs(nelec[0] - nelec[1])
+        nelec = nelec[0] + nelec[1]
+    if orbsym is None or len(orbsym) == 0:
+        orbsym = [1] * nmo
+    with h5py.File(filename, 'w') as f:
+        f['NORB'] = nmo
+        f['NELEC'] = nelec
+        f['MS2'] = ms
+        f['ISYM'] = 1
+        f['ORBSYM'] = numpy.asarray(orbsym, dtype=numpy.int32)
+        f['ECORE'] = nuc
+        f['H1'] = numpy.asarray(h1e).reshape(nmo,nmo)
+        f['H2'] = ao2mo.restore(8, h2e, nmo)
+
+def read_h5(filename):
+    '''Load the integrals saved by :func:`to_h5`'''
+    import h5py
+    dic = {}
+    with h5py.File(filename, 'r') as f:
+        for key in ('NORB', 'NELEC', 'MS2', 'ISYM'):
+            dic[key] = int(f[key][()])
+        dic['ORBSYM'] = f['ORBSYM'][:].tolist()
+        dic['ECORE'] = float(f['ECORE'][()])
+        dic['H1'] = f['H1'][:]
+        dic['H2'] = f['H2'][:]
+    return dic
+
 def from_mo(mol, filename, mo_coeff, orbsym=None,
             tol=TOL, float_format=DEFAULT_FLOAT_FORMAT):
     '''Use the given MOs to transfrom the 1-electron and 2-electron integrals
@@ -148,6 +199,9 @@ def read(filename):
     parameters with keys:  H1, H2, ECORE, NORB, NELEC, MS, ORBSYM, ISYM
     '''
     import re
+    import h5py
+    if h5py.is_hdf5(filename):
+        return read_h5(filename)
     dic = {}
     print('Parsing %s' % filename)
     finp = open(filename, 'r')
@@ -174,28 +228,26 @@ def read(filename):
     norb_pair = norb * (norb+1) // 2
     h1e = numpy.zeros((norb,norb))
     h2e = numpy.zeros(norb_pair*(norb_pair+1)//2)
-    dat = finp.readline().split()
-    while dat:
-        i, j, k, l = [int(x) for x in dat[1:5]]
-        if k != 0:
-            if i >= j:
-                ij = i * (i-1) // 2 + j-1
-            else:
-                ij = j * (j-1) // 2 + i-1
-            if k >= l:
-                kl = k * (k-1) // 2 + l-1
-            else:
-                kl = l * (l-1) // 2 + k-1
-            if ij >= kl:
-                h2e[ij*(ij+1)//2+kl] = float(dat[0])
-            else:
-                h2e[kl*(kl+1)//2+ij] = float(dat[0])
-        elif k == 0:
-            if j != 0:
-                h1e[i-1,j-1] = float(dat[0])
-            else:
-                dic['ECORE'] = float(dat[0])
-        dat = finp.readline().split()
+    # Parse the integrals in batches of about BLKSIZE lines
+    lines = finp.readlines(BLKSIZE*50)
+    while lines:
+        dat = numpy.array(' '.join(lines).split()).reshape(-1,5)
+        val = dat[:,0].astype(float)
+        i, j, k, l = dat[:,1:].astype(int).T
+
+        mask = k != 0
+        ij = _pair_index(i[mask], j[mask])
+        kl = _pair_index(k[mask], l[mask])
+        ijkl = numpy.where(ij >= kl, ij*(ij+1)//2+kl, kl*(kl+1)//2+ij)
+        h2e[ijkl] = val[mask]
+
+        mask = (k == 0) & (j != 0)
+        h1e[i[mask]-1,j[mask]-1] = val[mask]
+
+        mask = (k == 0) & (j == 0)
+        if numpy.any(mask):
+            dic['ECORE'] = val[mask][-1]
+        lines = finp.readlines(BLKSIZE*50)
 
     idx, idy = numpy.tril_indices(norb, -1)
     if numpy.linalg.norm(h1e[idy,idx]) == 0:
@@ -207,6 +259,11 @@ def read(filename):
     finp.close()
     return dic
 
+def _pair_index(i, j):
+    '''Compound index of the 1-based orbital pairs (i,j)'''
+    ij = numpy.where(i >= j, i*(i-1)//2+j-1, j*(j-1)//2+i-1)
+    return ij
+
 if __name__ == '__main__':
     import sys
     # fcidump.py chkfile output
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import tempfile
+import numpy
+from pyscf import lib, gto, scf, df
+from pyscf.dft import numint
+from pyscf.tools import cubegen
+
+mol = gto.Mole()
+mol.atom = '''
+O  0.00000000,  0.000000,  0.000000
+H  0.761561, 0.478993, 0.00000000
+H -0.761561, 0.478993, 0.00000000'''
+mol.basis = '6-31g'
+mol.verbose = 0
+mol.build()
+mf = scf.RHF(mol).run()
+
+def tearDownModule():
+    global mol, mf
+    del mol, mf
+
+def read_cube(fname, natm):
+    with open(fname, 'r') as f:
+        lines = f.readlines()
+    nx, ny, nz = [int(lines[i].split()[0]) for i in range(3, 6)]
+    data = ' '.join(lines[6+natm:]).split()
+    return numpy.array(data, dtype=float).reshape(nx,ny,nz)
+
+class KnownValues(unittest.TestCase):
+    def test_density(self):
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        ftmp1 = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        dm = mf.make_rdm1()
+        dm1 = numpy.dot(mf.mo_coeff[:,:1], mf.mo_coeff[:,:1].T)
+        cubegen.density(mol, [ftmp.name, ftmp1.name], [dm, dm1],
+                        nx=10, ny=10, nz=10)
+        cc = cubegen.Cube(mol, 10, 10, 10)
+        ao = numint.eval_ao(mol, cc.get_coords())
+        rho = numint.eval_rho(mol, ao, dm).reshape(10,10,10)
+        rho1 = numint.eval_rho(mol, ao, dm1).reshape(10,10,10)
+        self.assertAlmostEqual(abs(read_cube(ftmp.name, mol.natm) - rho).max(), 0, 5)
+        self.assertAlmostEqual(abs(read_cube(ftmp1.name, mol.natm) - rho1).max(), 0, 5)
+
+        with lib.temporary_env(cubegen, BLKSIZE=150, AO_BLKSIZE=128):
+            cubegen.density(mol, ftmp.name, dm, nx=10, ny=10, nz=10)
+        self.assertAlmostEqual(abs(read_cube(ftmp.name, mol.natm) - rho).max(), 0, 5)
+
+        self.assertRaises(ValueError, cubegen.density, mol, ftmp.name,
+                          [dm, dm1], nx=10, ny=10, nz=10)
+        self.assertRaises(ValueError, cubegen.mep, mol, [ftmp.name],
+                          [dm, dm1], nx=10, ny=10, nz=10)
+
+    def test_orbital(self):
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        ftmp1 = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        cubegen.orbital(mol, [ftmp.name, ftmp1.name], mf.mo_coeff[:,3:5],
+                        nx=10, ny=11, nz=7)
+        cc = cubegen.Cube(mol, 10, 11, 7)
+        ao = numint.eval_ao(mol, cc.get_coords())
+        orb = numpy.dot(ao, mf.mo_coeff[:,3:5])
+        self.assertAlmostEqual(abs(read_cube(ftmp.name, mol.natm).ravel() - orb[:,0]).max(), 0, 5)
+        self.assertAlmostEqual(abs(read_cube(ftmp1.name, mol.natm).ravel() - orb[:,1]).max(), 0, 5)
+
+    def test_mep(self):
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        dm = mf.make_rdm1()
+        cubegen.mep(mol, ftmp.name, dm, nx=8, ny=8, nz=8)
+        cc = cubegen.Cube(mol, 8, 8, 8)
+        coords = cc.get_coords()
+        Vnuc = 0
+        for i in range(mol.natm):
+            rp = mol.atom_coord(i) - coords
+            Vnuc += mol.atom_charge(i) / numpy.einsum('xi,xi->x', rp, rp)**.5
+        fakemol = gto.fakemol_for_charges(coords)
+        Vele = numpy.einsum('ijp,ij->p', df.incore.aux_e2(mol, fakemol), dm)
+        ref = (Vnuc - Vele).reshape(8,8,8)
+        self.assertAlmostEqual(abs(read_cube(ftmp.name, mol.natm) - ref).max(), 0, 5)
+
+if __name__ == "__main__":
+    print("Full Tests for cubegen")
+    unittest.main()
@@ -52,6 +52,39 @@ class KnownValues(unittest.TestCase):
         fcidump.from_integrals(tmpfcidump.name, h1, h2, h1.shape[0],
                                mol.nelectron, tol=1e-15)
 
+    def test_read(self):
+        tmpfcidump = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        h1 = reduce(numpy.dot, (mf.mo_coeff.T, mf.get_hcore(), mf.mo_coeff))
+        norb = h1.shape[0]
+        h2 = ao2mo.restore(8, ao2mo.full(mf._eri, mf.mo_coeff), norb)
+        fcidump.from_integrals(tmpfcidump.name, h1, h2, norb,
+                               mol.nelectron, nuc=1.5, tol=1e-15)
+        result = fcidump.read(tmpfcidump.name)
+        self.assertEqual(result['NORB'], norb)
+        self.assertAlmostEqual(result['ECORE'], 1.5, 12)
+        self.assertAlmostEqual(abs(result['H1'] - h1).max(), 0, 12)
+        self.assertAlmostEqual(abs(result['H2'] - h2).max(), 0, 12)
+
+        h2 = ao2mo.restore(4, h2, norb)
+        fcidump.from_integrals(tmpfcidump.name, h1, h2, norb,
+                               mol.nelectron, tol=1e-15)
+        result = fcidump.read(tmpfcidump.name)
+        self.assertAlmostEqual(abs(ao2mo.restore(4, result['H2'], norb) - h2).max(), 0, 12)
+
+    def test_h5(self):
+        tmpfcidump = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR, suffix='.h5')
+        h1 = reduce(numpy.dot, (mf.mo_coeff.T, mf.get_hcore(), mf.mo_coeff))
+        norb = h1.shape[0]
+        h2 = ao2mo.restore(8, ao2mo.full(mf._eri, mf.mo_coeff), norb)
+        fcidump.from_integrals(tmpfcidump.name, h1, h2, norb,
+                               mol.nelectron, nuc=1.5, orbsym=[1]*norb)
+        result = fcidump.read(tmpfcidump.name)
+        self.assertEqual(result['NELEC'], mol.nelectron)
+        self.assertEqual(result['ORBSYM'], [1]*norb)
+        self.assertAlmostEqual(result['ECORE'], 1.5, 12)
+        self.assertAlmostEqual(abs(result['H1'] - h1).max(), 0, 12)
+        self.assertAlmostEqual(abs(result['H2'] - h2).max(), 0, 12)
+
 if __name__ == "__main__":
     print("Full Tests for fcidump")
     unittest.main()